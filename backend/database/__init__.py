@@ -8,7 +8,8 @@ from .connection import (
     async_session_maker,
     init_postgres_db,
     get_postgres_session,
-    close_postgres_db
+    close_postgres_db,
+    is_sqlite
 )
 from .models import (
     User,
@@ -25,8 +26,27 @@ from .models import (
     SystemSetting,
     PriceCatalogItem,
     ItemAlias,
+    BestPrice,
+    SpendRollup,
     Attachment,
-    PlannedQuantity
+    PlannedQuantity,
+    PlannedQuantityStatus,
+    SequenceCounter,
+    Job,
+    JobStatus
+)
+from .sequences import (
+    allocate_order_number,
+    allocate_request_number,
+    sync_sequences,
+    reseed_sequences,
+    reset_sequences
+)
+from .settings_cache import (
+    settings_cache,
+    get_settings,
+    invalidate_settings,
+    COMPANY_SETTING_KEYS
 )
 
 __all__ = [
@@ -39,6 +59,7 @@ __all__ = [
     "init_postgres_db",
     "get_postgres_session",
     "close_postgres_db",
+    "is_sqlite",
     # Models
     "User",
     "Project",
@@ -54,6 +75,23 @@ __all__ = [
     "SystemSetting",
     "PriceCatalogItem",
     "ItemAlias",
+    "BestPrice",
+    "SpendRollup",
     "Attachment",
-    "PlannedQuantity"
+    "PlannedQuantity",
+    "PlannedQuantityStatus",
+    "SequenceCounter",
+    "Job",
+    "JobStatus",
+    # Sequences
+    "allocate_order_number",
+    "allocate_request_number",
+    "sync_sequences",
+    "reseed_sequences",
+    "reset_sequences",
+    # Settings cache
+    "settings_cache",
+    "get_settings",
+    "invalidate_settings",
+    "COMPANY_SETTING_KEYS"
 ]
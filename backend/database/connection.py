@@ -6,6 +6,7 @@ from typing import AsyncGenerator
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from sqlalchemy.orm import declarative_base
+from sqlalchemy import inspect, text
 import os
 import json
 import logging
@@ -58,6 +59,12 @@ def get_database_url():
     return postgres_settings.database_url
 
 
+def is_sqlite(session_or_engine) -> bool:
+    """Check whether a session/engine talks to the SQLite fallback database"""
+    bind = getattr(session_or_engine, "bind", None) or session_or_engine
+    return bind.dialect.name == "sqlite"
+
+
 # Determine pool class based on environment
 USE_NULL_POOL = os.environ.get("USE_NULL_POOL", "false").lower() == "true"
 
@@ -135,6 +142,40 @@ if engine:
 async_session_pg = async_session_maker
 
 
+def has_unique_index(sync_conn, table_name: str, column: str) -> bool:
+    """Whether a unique index or constraint covers exactly `column`"""
+    inspector = inspect(sync_conn)
+    indexes = [index for index in inspector.get_indexes(table_name) if index.get("unique")]
+    indexes += inspector.get_unique_constraints(table_name)
+    return any(index["column_names"] == [column] for index in indexes)
+
+
+async def ensure_catalog_code_index(conn) -> None:
+    """
+    Catalog imports upsert on item_code (ON CONFLICT), which needs a unique index.
+    Tables created before item_code was declared unique only have a plain index -
+    under the very name create_all() gives the unique one - so the unique index
+    is checked for by kind and created under a name of its own.
+    """
+    if await conn.run_sync(has_unique_index, "price_catalog", "item_code"):
+        return
+    try:
+        async with conn.begin_nested():
+            await conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_price_catalog_item_code ON price_catalog (item_code)"
+            ))
+    except Exception as e:
+        logger.warning(f"⚠️ Unique index on price_catalog.item_code not created (duplicate codes?): {e}")
+
+
+async def ensure_table_indexes(conn, table_name: str) -> None:
+    """create_all() skips tables that already exist, indexes added to them later included"""
+    table = Base.metadata.tables[table_name]
+    await conn.run_sync(
+        lambda sync_conn: [index.create(sync_conn, checkfirst=True) for index in table.indexes]
+    )
+
+
 async def init_postgres_db() -> None:
     """
     Initialize database by creating all tables defined in models.
@@ -151,6 +192,13 @@ async def init_postgres_db() -> None:
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            
+            # Keep the order number sequence ahead of existing orders
+            from .sequences import sync_sequences
+            await sync_sequences(conn)
+            
+            await ensure_catalog_code_index(conn)
+            await ensure_table_indexes(conn, "planned_quantities")
         logger.info("✅ PostgreSQL tables initialized successfully")
     except Exception as e:
         logger.error(f"❌ Failed to initialize PostgreSQL tables: {e}")
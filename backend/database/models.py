@@ -6,7 +6,7 @@ from datetime import datetime
 from typing import Optional, List
 from sqlalchemy import (
     Column, Integer, String, Text, DateTime, Boolean, Float, 
-    ForeignKey, Index, JSON, Enum as SQLEnum
+    ForeignKey, Index, JSON, Sequence, Enum as SQLEnum, text
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
@@ -269,6 +269,21 @@ class PurchaseOrderItem(Base):
     item_code: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
 
 
+# Postgres sequence behind PO-######## numbers (SQLite falls back to SequenceCounter)
+purchase_order_number_seq = Sequence("purchase_order_number_seq", metadata=Base.metadata)
+
+
+# ==================== SEQUENCE COUNTER MODEL ====================
+
+class SequenceCounter(Base):
+    """Sequence counters - one row per numbering series (e.g. request numbers per supervisor)"""
+    __tablename__ = "sequence_counters"
+    
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    value: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 # ==================== DELIVERY RECORD MODEL ====================
 
 class DeliveryRecord(Base):
@@ -374,6 +389,107 @@ class ItemAlias(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
+# ==================== BEST PRICE MODEL ====================
+
+class BestPrice(Base):
+    """Best known price per item and supplier - maintained on order approval and catalog price changes"""
+    __tablename__ = "best_prices"
+    
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid_lib.uuid4()))
+    # "cat:<catalog_item_id>" for catalog offers, "po:<item_key>|<supplier_key>" for order history
+    offer_key: Mapped[str] = mapped_column(String(600), unique=True, nullable=False)
+    item_key: Mapped[str] = mapped_column(String(255), nullable=False)  # normalized item name
+    supplier_key: Mapped[str] = mapped_column(String(255), nullable=False)  # normalized supplier name
+    source: Mapped[str] = mapped_column(String(20), nullable=False)  # catalog, purchase_order
+    catalog_item_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, index=True)
+    item_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    supplier_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    unit: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    currency: Mapped[Optional[str]] = mapped_column(String(10), nullable=True)
+    min_price: Mapped[float] = mapped_column(Float, nullable=False)
+    min_order_number: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    min_order_date: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_price: Mapped[float] = mapped_column(Float, nullable=False)
+    last_order_number: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    last_order_date: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_best_prices_item_price', 'item_key', 'min_price'),
+    )
+
+
+# ==================== SPEND ROLLUP MODEL ====================
+
+class SpendRollup(Base):
+    """Order count and amount per project, category, supplier, month and status - maintained on order changes"""
+    __tablename__ = "spend_rollups"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid_lib.uuid4()))
+    # Hash of the key below - a missing id falls back to the name the orders carry
+    rollup_key: Mapped[str] = mapped_column(String(40), unique=True, nullable=False)
+    project_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+    project_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    category_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+    category_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    supplier_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+    supplier_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    month: Mapped[datetime] = mapped_column(DateTime, nullable=False)  # first day of the order's created_at month
+    status_bucket: Mapped[str] = mapped_column(String(50), nullable=False)  # the order status
+    order_count: Mapped[int] = mapped_column(Integer, default=0)
+    total_amount: Mapped[float] = mapped_column(Float, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_spend_rollups_status_month', 'status_bucket', 'month'),
+        Index('idx_spend_rollups_project_category', 'project_id', 'category_id'),
+        Index('idx_spend_rollups_supplier', 'supplier_id'),
+    )
+
+
+# ==================== JOB MODEL ====================
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job(Base):
+    """Background jobs - long imports, exports and backups run outside the request"""
+    __tablename__ = "jobs"
+    
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid_lib.uuid4()))
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)  # catalog_import, planned_import, budget_export, backup, restore
+    status: Mapped[str] = mapped_column(String(20), default="queued", index=True)
+    progress: Mapped[int] = mapped_column(Integer, default=0)  # percent
+    message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # current step, or the error
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON
+    
+    # Downloadable output (exports, backups)
+    artifact_path: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    artifact_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    artifact_media_type: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, default=False)
+    
+    # Worker process running the job, and when it last showed it is alive
+    owner: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    
+    created_by: Mapped[str] = mapped_column(String(36), ForeignKey("users.id"), nullable=False)
+    created_by_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index('idx_jobs_user_created', 'created_by', 'created_at'),
+    )
+
+
 # ==================== ATTACHMENT MODEL ====================
 
 class Attachment(Base):
@@ -403,6 +519,7 @@ class PlannedQuantityStatus(str, enum.Enum):
     PARTIALLY_ORDERED = "partially_ordered"  # تم طلب جزء
     FULLY_ORDERED = "fully_ordered"  # تم الطلب بالكامل
     OVERDUE = "overdue"  # متأخر
+    DUE_SOON = "due_soon"  # قريب الموعد
 
 
 class PlannedQuantity(Base):
@@ -456,4 +573,14 @@ class PlannedQuantity(Base):
     __table_args__ = (
         Index('idx_planned_project_status', 'project_id', 'status'),
         Index('idx_planned_expected_date', 'expected_order_date'),
+        Index('idx_planned_status_expected_date', 'status', 'expected_order_date'),
+        # Open lines only - the supervisor alerts look nowhere else
+        Index(
+            'idx_planned_open_expected_date', 'expected_order_date',
+            postgresql_where=text('remaining_quantity > 0'), sqlite_where=text('remaining_quantity > 0')
+        ),
+        Index(
+            'idx_planned_open_priority_date', 'priority', 'expected_order_date',
+            postgresql_where=text('remaining_quantity > 0'), sqlite_where=text('remaining_quantity > 0')
+        ),
     )
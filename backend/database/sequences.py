@@ -0,0 +1,130 @@
+"""
+Sequence Allocator - O(1) order and request numbers
+PostgreSQL: purchase order numbers come from a native sequence (nextval never blocks),
+request numbers from one SequenceCounter row per supervisor, so creates for different
+supervisors never wait on each other.
+SQLite: every series uses a SequenceCounter row (SQLite serializes writers anyway).
+Counter rows are seeded lazily from the existing data the first time a series is used.
+"""
+import logging
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import func, or_, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .connection import is_sqlite
+from .models import SequenceCounter, PurchaseOrder, MaterialRequest, User
+
+logger = logging.getLogger(__name__)
+
+ORDER_SERIES = "purchase_order"
+ORDER_SEQUENCE_NAME = "purchase_order_number_seq"
+REQUEST_SERIES_PREFIX = "request:"
+
+
+async def next_counter_value(session: AsyncSession, name: str, seed_query) -> int:
+    """
+    Increment a SequenceCounter row and return the new value.
+    The row lock is held until the caller's transaction commits, so allocation
+    and the insert that uses the number are atomic.
+    """
+    now = datetime.utcnow()
+    result = await session.execute(
+        update(SequenceCounter)
+        .where(SequenceCounter.name == name)
+        .values(value=SequenceCounter.value + 1, updated_at=now)
+        .returning(SequenceCounter.value)
+    )
+    value = result.scalar_one_or_none()
+    if value is not None:
+        return value
+
+    # First use of this series - seed from the highest number already issued
+    seed = (await session.execute(seed_query)).scalar() or 0
+    insert = sqlite_insert if is_sqlite(session) else pg_insert
+    stmt = insert(SequenceCounter).values(name=name, value=seed + 1, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SequenceCounter.name],
+        set_={"value": SequenceCounter.value + 1, "updated_at": now}
+    ).returning(SequenceCounter.value)
+    result = await session.execute(stmt)
+    return result.scalar_one()
+
+
+async def allocate_order_number(session: AsyncSession) -> Tuple[str, int]:
+    """Allocate the next purchase order number - returns ("PO-00000001", 1)"""
+    if is_sqlite(session):
+        next_seq = await next_counter_value(
+            session, ORDER_SERIES, select(func.max(PurchaseOrder.order_seq))
+        )
+    else:
+        result = await session.execute(text(f"SELECT nextval('{ORDER_SEQUENCE_NAME}')"))
+        next_seq = result.scalar_one()
+
+    # Format: PO-00000001
+    return f"PO-{next_seq:08d}", next_seq
+
+
+async def allocate_request_number(session: AsyncSession, supervisor_id: str) -> Tuple[str, int]:
+    """Allocate the next material request number for a supervisor - returns ("A12", 12)"""
+    result = await session.execute(
+        select(User.supervisor_prefix).where(User.id == supervisor_id)
+    )
+    row = result.first()
+    if row is None:
+        return "X1", 1
+
+    prefix = row[0] or "X"
+    next_seq = await next_counter_value(
+        session,
+        f"{REQUEST_SERIES_PREFIX}{supervisor_id}",
+        select(func.max(MaterialRequest.request_seq)).where(MaterialRequest.supervisor_id == supervisor_id)
+    )
+    return f"{prefix}{next_seq}", next_seq
+
+
+async def sync_sequences(conn) -> None:
+    """
+    Move the PostgreSQL order sequence forward to the highest stored order_seq.
+    Never moves it backwards, so it is safe to run while other workers allocate.
+    Call on startup and after bulk data loads (restore).
+    """
+    if is_sqlite(conn):
+        return
+
+    max_seq = (await conn.execute(select(func.max(PurchaseOrder.order_seq)))).scalar() or 0
+    row = (await conn.execute(
+        text(f"SELECT last_value, is_called FROM {ORDER_SEQUENCE_NAME}")
+    )).first()
+    current = row[0] if row[1] else row[0] - 1
+
+    if max_seq > current:
+        await conn.execute(text(f"SELECT setval('{ORDER_SEQUENCE_NAME}', :value, true)"), {"value": max_seq})
+        logger.info(f"Order number sequence advanced to {max_seq}")
+
+
+def numbering_counters():
+    """Delete statement for the numbering series (cache generation counters are left alone)"""
+    return SequenceCounter.__table__.delete().where(
+        or_(
+            SequenceCounter.name == ORDER_SERIES,
+            SequenceCounter.name.like(f"{REQUEST_SERIES_PREFIX}%")
+        )
+    )
+
+
+async def reseed_sequences(session: AsyncSession) -> None:
+    """Re-derive every series from the stored data - used after restoring a backup"""
+    await session.execute(numbering_counters())
+    await sync_sequences(session)
+
+
+async def reset_sequences(session: AsyncSession) -> None:
+    """Drop the numbering counters and restart numbering - used after wiping all data"""
+    await session.execute(numbering_counters())
+    if not is_sqlite(session):
+        await session.execute(text(f"ALTER SEQUENCE {ORDER_SEQUENCE_NAME} RESTART WITH 1"))
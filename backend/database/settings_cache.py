@@ -0,0 +1,122 @@
+"""
+System Settings Cache - process-wide, write-through invalidation
+All system_settings rows are loaded once and served from memory.
+Writers call invalidate_settings() inside their transaction; this bumps a
+generation counter (sequence_counters row) so other uvicorn workers notice the
+change the next time they revalidate (at most every SETTINGS_REVALIDATE_SECONDS).
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .models import SystemSetting, SequenceCounter
+from .sequences import next_counter_value
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_GENERATION_SERIES = "settings_generation"
+SETTINGS_REVALIDATE_SECONDS = float(os.environ.get("SETTINGS_REVALIDATE_SECONDS", "5"))
+
+# Keys used for PDF/report customization
+COMPANY_SETTING_KEYS = [
+    "company_name", "company_logo", "company_address", "company_phone",
+    "company_email", "report_header", "report_footer", "pdf_primary_color", "pdf_show_logo"
+]
+
+DEFAULT_APPROVAL_LIMIT = 20000.0
+
+
+class SettingsCache:
+    """In-memory copy of system_settings with typed accessors"""
+
+    def __init__(self, revalidate_seconds: float = SETTINGS_REVALIDATE_SECONDS):
+        self.revalidate_seconds = revalidate_seconds
+        self._values: Dict[str, str] = {}
+        self._generation: Optional[int] = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._lock = asyncio.Lock()
+
+    async def load(self, session: AsyncSession) -> "SettingsCache":
+        """Make sure the cache is fresh, reloading from the database only when needed"""
+        if not self._stale and time.monotonic() - self._checked_at < self.revalidate_seconds:
+            return self
+
+        async with self._lock:
+            if not self._stale and time.monotonic() - self._checked_at < self.revalidate_seconds:
+                return self
+
+            generation = await self._read_generation(session)
+            if self._stale or generation != self._generation:
+                result = await session.execute(select(SystemSetting.key, SystemSetting.value))
+                self._values = {key: value for key, value in result.all()}
+                self._generation = generation
+                self._stale = False
+                logger.debug(f"Settings cache reloaded (generation {generation})")
+            self._checked_at = time.monotonic()
+
+        return self
+
+    async def _read_generation(self, session: AsyncSession) -> int:
+        result = await session.execute(
+            select(SequenceCounter.value).where(SequenceCounter.name == SETTINGS_GENERATION_SERIES)
+        )
+        return result.scalar() or 0
+
+    def mark_stale(self) -> None:
+        """Force a reload on next access in this worker"""
+        self._stale = True
+
+    # ==================== TYPED ACCESSORS ====================
+
+    def get_str(self, key: str, default: str = "") -> str:
+        value = self._values.get(key)
+        return value if value is not None else default
+
+    def get_float(self, key: str, default: float = 0.0) -> float:
+        try:
+            return float(self._values[key])
+        except (KeyError, TypeError, ValueError):
+            return default
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        value = self._values.get(key)
+        if value is None:
+            return default
+        return value.strip().lower() in ("true", "1", "yes", "on")
+
+    def get_many(self, keys: List[str], default: str = "") -> Dict[str, str]:
+        return {key: self.get_str(key, default) for key in keys}
+
+    @property
+    def approval_limit(self) -> float:
+        return self.get_float("approval_limit", DEFAULT_APPROVAL_LIMIT)
+
+    @property
+    def company_settings(self) -> Dict[str, str]:
+        return self.get_many(COMPANY_SETTING_KEYS)
+
+
+settings_cache = SettingsCache()
+
+
+async def get_settings(session: AsyncSession) -> SettingsCache:
+    """Return the (fresh) process-wide settings cache"""
+    return await settings_cache.load(session)
+
+
+async def invalidate_settings(session: AsyncSession) -> None:
+    """
+    Call after changing system_settings, before commit.
+    Bumps the shared generation in the same transaction and drops this worker's copy
+    again once the transaction commits (a reload in between would still see old rows).
+    """
+    await next_counter_value(session, SETTINGS_GENERATION_SERIES, select(literal(0)))
+    settings_cache.mark_stale()
+    event.listen(session.sync_session, "after_commit", lambda _session: settings_cache.mark_stale(), once=True)
@@ -22,6 +22,7 @@ pg_budget_router = APIRouter(prefix="/api/pg", tags=["PostgreSQL Budget Categori
 
 # Import auth dependency
 from routes.pg_auth_routes import get_current_user_pg, UserRole
+from services.budget_stats import category_spending
 
 
 # ==================== PYDANTIC MODELS ====================
@@ -206,23 +207,15 @@ async def get_budget_categories(
     session: AsyncSession = Depends(get_postgres_session)
 ):
     """Get budget categories with actual spent amounts"""
-    query = select(BudgetCategory)
-    if project_id:
-        query = query.where(BudgetCategory.project_id == project_id)
-    query = query.order_by(desc(BudgetCategory.created_at))
-    
-    result = await session.execute(query)
-    categories = result.scalars().all()
+    # Every order of the category counts, whatever its status or project
+    rows = await category_spending(
+        session, project_id, statuses=None, by_project=False,
+        order_by=(desc(BudgetCategory.created_at), BudgetCategory.id)
+    )
     
     response = []
-    for cat in categories:
-        # Get actual spent from purchase orders
-        spent_result = await session.execute(
-            select(func.coalesce(func.sum(PurchaseOrder.total_amount), 0))
-            .select_from(PurchaseOrder)
-            .where(PurchaseOrder.category_id == cat.id)
-        )
-        actual_spent = float(spent_result.scalar() or 0)
+    for cat, spent in rows:
+        actual_spent = float(spent or 0)
         
         remaining = cat.estimated_budget - actual_spent
         variance_percentage = ((actual_spent - cat.estimated_budget) / cat.estimated_budget * 100) if cat.estimated_budget > 0 else 0
@@ -9,14 +9,19 @@ from typing import Optional, List
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, or_, desc
+from sqlalchemy import func
 import uuid
 import json
-import io
-import csv
 
-from database import get_postgres_session, User, PriceCatalogItem, ItemAlias, BudgetCategory, Supplier, PurchaseOrder, PurchaseOrderItem
+from database import get_postgres_session, User, PriceCatalogItem, ItemAlias, BudgetCategory, Supplier
+from database.connection import get_session_maker
 from routes.pg_auth_routes import get_current_user_pg, UserRole
+from services.catalog_search import get_catalog_index, index_catalog_changes, invalidate_catalog_index
+from services.best_prices import record_catalog_items, find_best_prices, supplier_key, UNKNOWN_SUPPLIER
+from services.exports import stream_csv, stream_rows, XlsxExport
+from services.imports import iter_sheet_chunks
+from services.catalog_import import import_catalog_rows, iter_csv_chunks
+from services.jobs import JobContext, start_job, job_accepted
 
 # Create router
 pg_catalog_router = APIRouter(prefix="/api/pg", tags=["PostgreSQL Catalog"])
@@ -63,6 +68,39 @@ class AliasUpdate(BaseModel):
     catalog_item_id: Optional[str] = None
 
 
+# ==================== HELPER FUNCTIONS ====================
+
+def catalog_item_to_dict(item: PriceCatalogItem) -> dict:
+    return {
+        "id": item.id,
+        "item_code": item.item_code,
+        "name": item.name,
+        "description": item.description,
+        "unit": item.unit,
+        "supplier_id": item.supplier_id,
+        "supplier_name": item.supplier_name,
+        "price": item.price,
+        "currency": item.currency,
+        "validity_until": item.validity_until,
+        "category_id": item.category_id,
+        "category_name": item.category_name,
+        "is_active": item.is_active,
+        "created_by": item.created_by,
+        "created_by_name": item.created_by_name,
+        "created_at": item.created_at.isoformat() if item.created_at else None
+    }
+
+
+async def load_catalog_items(session: AsyncSession, item_ids: List[str]) -> dict:
+    """Load catalog items by id in one query - {id: item}"""
+    if not item_ids:
+        return {}
+    result = await session.execute(
+        select(PriceCatalogItem).where(PriceCatalogItem.id.in_(set(item_ids)))
+    )
+    return {item.id: item for item in result.scalars().all()}
+
+
 # ==================== PRICE CATALOG ROUTES ====================
 
 @pg_catalog_router.get("/price-catalog")
@@ -75,60 +113,42 @@ async def get_price_catalog(
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """Get price catalog items with pagination and search"""
-    query = select(PriceCatalogItem).where(PriceCatalogItem.is_active == True)
-    
-    # Apply search filter - include item_code in search
+    """Get price catalog items with pagination and search (Arabic-aware, ranked)"""
     if search:
-        query = query.where(
-            or_(
-                PriceCatalogItem.name.ilike(f"%{search}%"),
-                PriceCatalogItem.description.ilike(f"%{search}%"),
-                PriceCatalogItem.item_code.ilike(f"%{search}%")
-            )
-        )
-    
-    # Apply category filter
-    if category_id:
-        query = query.where(PriceCatalogItem.category_id == category_id)
-    
-    # Apply supplier filter
-    if supplier_id:
-        query = query.where(PriceCatalogItem.supplier_id == supplier_id)
-    
-    # Count total
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await session.execute(count_query)
-    total = total_result.scalar()
-    
-    # Apply pagination
-    query = query.order_by(PriceCatalogItem.item_code.asc().nullslast(), PriceCatalogItem.name).offset((page - 1) * page_size).limit(page_size)
-    
-    result = await session.execute(query)
-    items = result.scalars().all()
+        # Served from the in-memory search index - ranked by match quality
+        index = await get_catalog_index(session)
+        matched_ids = index.search(search, category_id=category_id, supplier_id=supplier_id)
+        total = len(matched_ids)
+        page_ids = matched_ids[(page - 1) * page_size:page * page_size]
+        items_by_id = await load_catalog_items(session, page_ids)
+        items = [
+            items_by_id[item_id] for item_id in page_ids
+            if item_id in items_by_id and items_by_id[item_id].is_active
+        ]
+    else:
+        query = select(PriceCatalogItem).where(PriceCatalogItem.is_active == True)
+        
+        # Apply category filter
+        if category_id:
+            query = query.where(PriceCatalogItem.category_id == category_id)
+        
+        # Apply supplier filter
+        if supplier_id:
+            query = query.where(PriceCatalogItem.supplier_id == supplier_id)
+        
+        # Count total
+        count_query = select(func.count()).select_from(query.subquery())
+        total_result = await session.execute(count_query)
+        total = total_result.scalar()
+        
+        # Apply pagination
+        query = query.order_by(PriceCatalogItem.item_code.asc().nullslast(), PriceCatalogItem.name).offset((page - 1) * page_size).limit(page_size)
+        
+        result = await session.execute(query)
+        items = result.scalars().all()
     
     return {
-        "items": [
-            {
-                "id": item.id,
-                "item_code": item.item_code,
-                "name": item.name,
-                "description": item.description,
-                "unit": item.unit,
-                "supplier_id": item.supplier_id,
-                "supplier_name": item.supplier_name,
-                "price": item.price,
-                "currency": item.currency,
-                "validity_until": item.validity_until,
-                "category_id": item.category_id,
-                "category_name": item.category_name,
-                "is_active": item.is_active,
-                "created_by": item.created_by,
-                "created_by_name": item.created_by_name,
-                "created_at": item.created_at.isoformat() if item.created_at else None
-            }
-            for item in items
-        ],
+        "items": [catalog_item_to_dict(item) for item in items],
         "total": total,
         "page": page,
         "page_size": page_size,
@@ -197,6 +217,8 @@ async def create_catalog_item(
     )
     
     session.add(new_item)
+    await index_catalog_changes(session, items=[new_item])
+    await record_catalog_items(session, [new_item])
     await session.commit()
     await session.refresh(new_item)
     
@@ -246,6 +268,8 @@ async def update_catalog_item(
     
     item.updated_at = datetime.utcnow()
     
+    await index_catalog_changes(session, items=[item])
+    await record_catalog_items(session, [item])
     await session.commit()
     
     return {"message": "تم تحديث العنصر بنجاح"}
@@ -273,11 +297,38 @@ async def delete_catalog_item(
     item.is_active = False
     item.updated_at = datetime.utcnow()
     
+    await index_catalog_changes(session, items=[item])
+    await record_catalog_items(session, [item])
     await session.commit()
     
     return {"message": "تم حذف العنصر بنجاح"}
 
 
+CATALOG_EXPORT_HEADER = ['الاسم', 'الوصف', 'الوحدة', 'السعر', 'العملة', 'المورد', 'التصنيف', 'صالح حتى']
+
+
+def catalog_export_query():
+    """Active catalog items, only the exported columns"""
+    return select(
+        PriceCatalogItem.name, PriceCatalogItem.description, PriceCatalogItem.unit,
+        PriceCatalogItem.price, PriceCatalogItem.currency, PriceCatalogItem.supplier_name,
+        PriceCatalogItem.category_name, PriceCatalogItem.validity_until
+    ).where(PriceCatalogItem.is_active == True).order_by(PriceCatalogItem.name, PriceCatalogItem.id)
+
+
+def catalog_export_row(item) -> list:
+    return [
+        item.name,
+        item.description or '',
+        item.unit,
+        item.price,
+        item.currency,
+        item.supplier_name or '',
+        item.category_name or '',
+        item.validity_until or ''
+    ]
+
+
 @pg_catalog_router.get("/price-catalog/export")
 async def export_catalog(
     current_user: User = Depends(get_current_user_pg),
@@ -287,36 +338,9 @@ async def export_catalog(
     if current_user.role not in [UserRole.PROCUREMENT_MANAGER, UserRole.SYSTEM_ADMIN]:
         raise HTTPException(status_code=403, detail="غير مصرح لك بتصدير الكتالوج")
     
-    result = await session.execute(
-        select(PriceCatalogItem).where(PriceCatalogItem.is_active == True).order_by(PriceCatalogItem.name)
-    )
-    items = result.scalars().all()
-    
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow(['الاسم', 'الوصف', 'الوحدة', 'السعر', 'العملة', 'المورد', 'التصنيف', 'صالح حتى'])
-    
-    # Data
-    for item in items:
-        writer.writerow([
-            item.name,
-            item.description or '',
-            item.unit,
-            item.price,
-            item.currency,
-            item.supplier_name or '',
-            item.category_name or '',
-            item.validity_until or ''
-        ])
-    
-    output.seek(0)
-    
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
+        stream_csv(CATALOG_EXPORT_HEADER, catalog_export_query(), catalog_export_row),
+        media_type="text/csv; charset=utf-8",
         headers={"Content-Disposition": f"attachment; filename=price_catalog_{datetime.now().strftime('%Y%m%d')}.csv"}
     )
 
@@ -330,74 +354,14 @@ async def export_catalog_excel(
     if current_user.role not in [UserRole.PROCUREMENT_MANAGER, UserRole.SYSTEM_ADMIN]:
         raise HTTPException(status_code=403, detail="غير مصرح لك بتصدير الكتالوج")
     
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-    except ImportError:
-        raise HTTPException(status_code=500, detail="مكتبة Excel غير متوفرة")
-    
-    result = await session.execute(
-        select(PriceCatalogItem).where(PriceCatalogItem.is_active == True).order_by(PriceCatalogItem.name)
-    )
-    items = result.scalars().all()
-    
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "كتالوج الأسعار"
-    ws.sheet_view.rightToLeft = True
-    
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Headers
-    headers = ['الاسم', 'الوصف', 'الوحدة', 'السعر', 'العملة', 'المورد', 'التصنيف', 'صالح حتى']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = thin_border
-    
-    # Data
-    for row_num, item in enumerate(items, 2):
-        ws.cell(row=row_num, column=1, value=item.name).border = thin_border
-        ws.cell(row=row_num, column=2, value=item.description or '').border = thin_border
-        ws.cell(row=row_num, column=3, value=item.unit).border = thin_border
-        ws.cell(row=row_num, column=4, value=item.price).border = thin_border
-        ws.cell(row=row_num, column=5, value=item.currency).border = thin_border
-        ws.cell(row=row_num, column=6, value=item.supplier_name or '').border = thin_border
-        ws.cell(row=row_num, column=7, value=item.category_name or '').border = thin_border
-        ws.cell(row=row_num, column=8, value=item.validity_until or '').border = thin_border
-    
-    # Column widths
-    ws.column_dimensions['A'].width = 30
-    ws.column_dimensions['B'].width = 40
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 10
-    ws.column_dimensions['F'].width = 25
-    ws.column_dimensions['G'].width = 20
-    ws.column_dimensions['H'].width = 15
-    
-    # Save to bytes
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=price_catalog_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-    )
+    async with XlsxExport("كتالوج الأسعار", widths=[30, 40, 15, 15, 10, 25, 20, 15]) as export:
+        export.header(CATALOG_EXPORT_HEADER)
+        
+        async for items in stream_rows(catalog_export_query(), session=session):
+            for item in items:
+                export.append(catalog_export_row(item), "cell")
+        
+        return await export.response(f"price_catalog_{datetime.now().strftime('%Y%m%d')}.xlsx")
 
 
 @pg_catalog_router.get("/price-catalog/template")
@@ -405,213 +369,79 @@ async def get_catalog_template(
     current_user: User = Depends(get_current_user_pg)
 ):
     """Download Excel template for catalog import"""
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-    except ImportError:
-        raise HTTPException(status_code=500, detail="مكتبة Excel غير متوفرة")
-    
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "نموذج الكتالوج"
-    ws.sheet_view.rightToLeft = True
-    
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Headers - must match import order
-    headers = ['كود الصنف', 'اسم الصنف', 'الوصف', 'الوحدة', 'السعر', 'العملة', 'اسم المورد', 'التصنيف', 'صالح حتى']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = thin_border
+    async with XlsxExport("نموذج الكتالوج", widths=[15, 30, 40, 12, 12, 10, 25, 20, 15]) as export:
+        # Headers - must match import order
+        export.header(['كود الصنف', 'اسم الصنف', 'الوصف', 'الوحدة', 'السعر', 'العملة', 'اسم المورد', 'التصنيف', 'صالح حتى'])
+        
+        # Example row
+        export.append(['ITM-001', 'حديد تسليح 12مم', 'حديد تسليح قطر 12مم', 'طن', '3500', 'SAR', 'شركة الحديد', 'مواد بناء', '2025-12-31'], "cell")
+        
+        return await export.response("catalog_template.xlsx")
+
+
+CATALOG_IMPORT_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+
+def catalog_import_chunks(filename: str, content: bytes, on_total=None):
+    """Row chunks of an uploaded catalog file (.xlsx/.xls or .csv)"""
+    if filename.lower().endswith('.csv'):
+        return iter_csv_chunks(content, on_total=on_total)
+    return iter_sheet_chunks(content, min_row=2, on_total=on_total)
+
+
+async def run_catalog_import(session: AsyncSession, chunks, user, on_rows=None) -> dict:
+    """Import the chunks, commit and summarize"""
+    report = await import_catalog_rows(session, chunks, user, on_rows=on_rows)
     
-    # Example row
-    example_data = ['ITM-001', 'حديد تسليح 12مم', 'حديد تسليح قطر 12مم', 'طن', '3500', 'SAR', 'شركة الحديد', 'مواد بناء', '2025-12-31']
-    for col, value in enumerate(example_data, 1):
-        cell = ws.cell(row=2, column=col, value=value)
-        cell.border = thin_border
+    if report["imported"] or report["updated"]:
+        await invalidate_catalog_index(session)
+    await session.commit()
     
-    # Column widths
-    ws.column_dimensions['A'].width = 15
-    ws.column_dimensions['B'].width = 30
-    ws.column_dimensions['C'].width = 40
-    ws.column_dimensions['D'].width = 12
-    ws.column_dimensions['E'].width = 12
-    ws.column_dimensions['F'].width = 10
-    ws.column_dimensions['G'].width = 25
-    ws.column_dimensions['H'].width = 20
-    ws.column_dimensions['I'].width = 15
+    return {
+        "message": f"تم استيراد {report['imported']} عنصر جديد وتحديث {report['updated']} عنصر",
+        "imported": report["imported"],
+        "updated": report["updated"],
+        "error_count": len(report["errors"]),
+        "errors": report["errors"]
+    }
+
+
+async def catalog_import_job(context: JobContext, filename: str, content: bytes, user_id: str) -> dict:
+    total = {}
     
-    # Save to bytes
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    async def on_rows(done: int):
+        if total.get("rows"):
+            await context.progress(done * 100 / total["rows"], f"تمت معالجة {done} صف")
     
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=catalog_template.xlsx"}
-    )
+    chunks = catalog_import_chunks(filename, content, on_total=lambda rows: total.update(rows=rows))
+    async with get_session_maker()() as session:
+        user = await session.get(User, user_id)
+        return await run_catalog_import(session, chunks, user, on_rows)
 
 
 @pg_catalog_router.post("/price-catalog/import")
 async def import_catalog(
     file: UploadFile = File(...),
+    async_mode: bool = Query(False, alias="async"),
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """Import catalog from CSV or Excel"""
+    """Import catalog from CSV or Excel - with async=true it runs as a background job (poll /api/pg/jobs/{id})"""
     if current_user.role not in [UserRole.PROCUREMENT_MANAGER, UserRole.SYSTEM_ADMIN]:
         raise HTTPException(status_code=403, detail="غير مصرح لك باستيراد الكتالوج")
     
-    filename = file.filename.lower()
-    content = await file.read()
-    
-    imported = 0
-    updated = 0
-    errors = []
-    
-    # Handle Excel files
-    if filename.endswith('.xlsx') or filename.endswith('.xls'):
-        try:
-            from openpyxl import load_workbook
-            
-            wb = load_workbook(io.BytesIO(content))
-            ws = wb.active
-            
-            for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                try:
-                    if not row or not row[1]:  # Skip empty rows, check name column
-                        continue
-                    
-                    item_code = str(row[0]).strip() if row[0] else None
-                    name = str(row[1]).strip() if row[1] else None
-                    description = str(row[2]).strip() if len(row) > 2 and row[2] else None
-                    unit = str(row[3]).strip() if len(row) > 3 and row[3] else "قطعة"
-                    price = float(row[4]) if len(row) > 4 and row[4] else 0
-                    currency = str(row[5]).strip() if len(row) > 5 and row[5] else "SAR"
-                    supplier_name = str(row[6]).strip() if len(row) > 6 and row[6] else None
-                    category_name = str(row[7]).strip() if len(row) > 7 and row[7] else None
-                    validity_until = str(row[8]).strip() if len(row) > 8 and row[8] else None
-                    
-                    if not name or price <= 0:
-                        continue
-                    
-                    # Check if item with same code exists
-                    existing_item = None
-                    if item_code:
-                        existing_result = await session.execute(
-                            select(PriceCatalogItem).where(
-                                PriceCatalogItem.name == name,
-                                PriceCatalogItem.supplier_name == supplier_name
-                            )
-                        )
-                        existing_item = existing_result.scalar_one_or_none()
-                    
-                    if existing_item:
-                        # Update existing item
-                        existing_item.description = description
-                        existing_item.unit = unit
-                        existing_item.price = price
-                        existing_item.currency = currency
-                        existing_item.category_name = category_name
-                        existing_item.validity_until = validity_until
-                        existing_item.updated_at = datetime.utcnow()
-                        updated += 1
-                    else:
-                        # Create new item
-                        new_item = PriceCatalogItem(
-                            id=str(uuid.uuid4()),
-                            name=name,
-                            description=description,
-                            unit=unit,
-                            price=price,
-                            currency=currency,
-                            supplier_name=supplier_name,
-                            category_name=category_name,
-                            validity_until=validity_until,
-                            is_active=True,
-                            created_by=current_user.id,
-                            created_by_name=current_user.name
-                        )
-                        session.add(new_item)
-                        imported += 1
-                        
-                except Exception as e:
-                    errors.append(f"خطأ في السطر {row_num}: {str(e)}")
-                    
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"فشل في قراءة ملف Excel: {str(e)}")
-    
-    # Handle CSV files
-    elif filename.endswith('.csv'):
-        decoded = content.decode('utf-8-sig')
-        reader = csv.reader(io.StringIO(decoded))
-        
-        # Skip header
-        next(reader, None)
-        
-        for row_num, row in enumerate(reader, start=2):
-            try:
-                if len(row) < 2:
-                    continue
-                
-                item_code = row[0].strip() if len(row) > 0 else None
-                name = row[1].strip() if len(row) > 1 else None
-                description = row[2].strip() if len(row) > 2 else None
-                unit = row[3].strip() if len(row) > 3 else "قطعة"
-                price = float(row[4]) if len(row) > 4 and row[4] else 0
-                currency = row[5].strip() if len(row) > 5 else "SAR"
-                supplier_name = row[6].strip() if len(row) > 6 else None
-                category_name = row[7].strip() if len(row) > 7 else None
-                validity_until = row[8].strip() if len(row) > 8 else None
-                
-                if not name or price <= 0:
-                    continue
-                
-                new_item = PriceCatalogItem(
-                    id=str(uuid.uuid4()),
-                    name=name,
-                    description=description,
-                    unit=unit,
-                    price=price,
-                    currency=currency,
-                    supplier_name=supplier_name,
-                    category_name=category_name,
-                    validity_until=validity_until,
-                    is_active=True,
-                    created_by=current_user.id,
-                    created_by_name=current_user.name
-                )
-                
-                session.add(new_item)
-                imported += 1
-                
-            except Exception as e:
-                errors.append(f"خطأ في السطر {row_num}: {str(e)}")
-    else:
+    if not file.filename.lower().endswith(CATALOG_IMPORT_EXTENSIONS):
         raise HTTPException(status_code=400, detail="يجب أن يكون الملف بصيغة CSV أو Excel")
+    content = await file.read()
     
-    await session.commit()
+    if async_mode:
+        job = await start_job(
+            session, "catalog_import", current_user, catalog_import_job,
+            filename=file.filename, content=content, user_id=current_user.id
+        )
+        return job_accepted(job)
     
-    return {
-        "message": f"تم استيراد {imported} عنصر جديد وتحديث {updated} عنصر",
-        "imported": imported,
-        "updated": updated,
-        "errors": errors[:10] if errors else []
-    }
+    return await run_catalog_import(session, catalog_import_chunks(file.filename, content), current_user)
 
 
 # ==================== ITEM ALIASES ROUTES ====================
@@ -667,20 +497,24 @@ async def suggest_alias(
     session: AsyncSession = Depends(get_postgres_session)
 ):
     """Suggest catalog item for a given item name"""
-    # First check aliases
-    alias_result = await session.execute(
-        select(ItemAlias).where(ItemAlias.alias_name.ilike(f"%{item_name}%"))
-    )
-    alias = alias_result.scalar_one_or_none()
+    index = await get_catalog_index(session)
     
-    if alias:
+    # First check aliases (best match only)
+    alias_matches = index.match_aliases(item_name)
+    if alias_matches:
+        alias_id, catalog_item_id, _ = alias_matches[0]
+        alias_result = await session.execute(
+            select(ItemAlias).where(ItemAlias.id == alias_id)
+        )
+        alias = alias_result.scalar_one_or_none()
+        
         # Get the catalog item
         catalog_result = await session.execute(
-            select(PriceCatalogItem).where(PriceCatalogItem.id == alias.catalog_item_id)
+            select(PriceCatalogItem).where(PriceCatalogItem.id == catalog_item_id)
         )
         catalog_item = catalog_result.scalar_one_or_none()
         
-        if catalog_item:
+        if alias and catalog_item:
             # Increment usage count
             alias.usage_count += 1
             await session.commit()
@@ -697,14 +531,10 @@ async def suggest_alias(
                 }
             }
     
-    # Search in catalog directly
-    catalog_result = await session.execute(
-        select(PriceCatalogItem).where(
-            PriceCatalogItem.is_active == True,
-            PriceCatalogItem.name.ilike(f"%{item_name}%")
-        ).limit(5)
-    )
-    items = catalog_result.scalars().all()
+    # Search in catalog directly (substring first, then spelling variants)
+    suggested_ids = index.suggest(item_name, limit=5)
+    items_by_id = await load_catalog_items(session, suggested_ids)
+    items = [items_by_id[item_id] for item_id in suggested_ids if item_id in items_by_id]
     
     if items:
         return {
@@ -750,24 +580,60 @@ async def validate_items_for_order(
     - التحقق من وجود كل صنف في الكتالوج
     - إرجاع قائمة الأصناف غير الموجودة
     - إقتراح أصناف مشابهة من الكتالوج
+    عدد الاستعلامات ثابت مهما كان عدد الأصناف (IN + join + فهرس البحث)
     """
-    results = []
-    missing_items = []
+    names = list(dict.fromkeys(
+        item.get("name", "").strip() for item in request.items if item.get("name", "").strip()
+    ))
     
-    for item in request.items:
-        item_name = item.get("name", "").strip()
-        if not item_name:
-            continue
-        
-        # Search in catalog by exact name first
+    # 1) All exact names in one IN query
+    exact_by_name = {}
+    if names:
         exact_result = await session.execute(
             select(PriceCatalogItem).where(
                 PriceCatalogItem.is_active == True,
-                PriceCatalogItem.name == item_name
+                PriceCatalogItem.name.in_(names)
             )
         )
-        exact_match = exact_result.scalars().all()
+        for ci in exact_result.scalars().all():
+            exact_by_name.setdefault(ci.name, []).append(ci)
+    unresolved = [name for name in names if name not in exact_by_name]
+    
+    # 2) All exact aliases of the unresolved names in one join
+    exact_aliases = {}
+    if unresolved:
+        alias_result = await session.execute(
+            select(ItemAlias.alias_name, PriceCatalogItem)
+            .join(PriceCatalogItem, PriceCatalogItem.id == ItemAlias.catalog_item_id)
+            .where(ItemAlias.alias_name.in_(unresolved))
+        )
+        for alias_name, cat_item in alias_result.all():
+            exact_aliases[alias_name] = cat_item
+    
+    # 3) Fuzzy fallbacks from the search index in one pass, then one query for their items
+    index = await get_catalog_index(session) if unresolved else None
+    similar_by_name = {}
+    aliases_by_name = {}
+    wanted_ids = set()
+    for name in unresolved:
+        similar_by_name[name] = index.suggest(name, limit=5)
+        aliases_by_name[name] = [
+            (catalog_item_id, alias_name)
+            for _, catalog_item_id, alias_name in index.match_aliases(name, fuzzy=True)
+            if alias_name != name
+        ]
+        wanted_ids.update(similar_by_name[name])
+        wanted_ids.update(catalog_item_id for catalog_item_id, _ in aliases_by_name[name])
+    items_by_id = await load_catalog_items(session, list(wanted_ids))
+    
+    results = []
+    missing_items = []
+    for item in request.items:
+        item_name = item.get("name", "").strip()
+        if not item_name:
+            continue
         
+        exact_match = exact_by_name.get(item_name)
         if exact_match:
             results.append({
                 "item_name": item_name,
@@ -786,45 +652,35 @@ async def validate_items_for_order(
             })
             continue
         
-        # Search for similar items
-        similar_result = await session.execute(
-            select(PriceCatalogItem).where(
-                PriceCatalogItem.is_active == True,
-                PriceCatalogItem.name.ilike(f"%{item_name}%")
-            ).limit(5)
-        )
-        similar_items = similar_result.scalars().all()
-        
-        # Also check aliases
-        alias_result = await session.execute(
-            select(ItemAlias).where(ItemAlias.alias_name.ilike(f"%{item_name}%"))
-        )
-        aliases = alias_result.scalars().all()
-        
         suggestions = []
-        for si in similar_items:
-            suggestions.append({
-                "id": si.id,
-                "name": si.name,
-                "price": si.price,
-                "unit": si.unit,
-                "supplier_name": si.supplier_name
-            })
+        for item_id in similar_by_name[item_name]:
+            si = items_by_id.get(item_id)
+            if si:
+                suggestions.append({
+                    "id": si.id,
+                    "name": si.name,
+                    "price": si.price,
+                    "unit": si.unit,
+                    "supplier_name": si.supplier_name
+                })
         
-        for alias in aliases:
-            # Get catalog item for alias
-            cat_result = await session.execute(
-                select(PriceCatalogItem).where(PriceCatalogItem.id == alias.catalog_item_id)
-            )
-            cat_item = cat_result.scalar_one_or_none()
-            if cat_item and cat_item.id not in [s["id"] for s in suggestions]:
+        alias_candidates = list(aliases_by_name[item_name])
+        if item_name in exact_aliases:
+            items_by_id.setdefault(exact_aliases[item_name].id, exact_aliases[item_name])
+            alias_candidates.insert(0, (exact_aliases[item_name].id, item_name))
+        
+        suggested_ids = {s["id"] for s in suggestions}
+        for catalog_item_id, alias_name in alias_candidates:
+            cat_item = items_by_id.get(catalog_item_id)
+            if cat_item and cat_item.id not in suggested_ids:
+                suggested_ids.add(cat_item.id)
                 suggestions.append({
                     "id": cat_item.id,
                     "name": cat_item.name,
                     "price": cat_item.price,
                     "unit": cat_item.unit,
                     "supplier_name": cat_item.supplier_name,
-                    "matched_alias": alias.alias_name
+                    "matched_alias": alias_name
                 })
         
         results.append({
@@ -871,76 +727,47 @@ async def check_best_price(
         if supplier:
             supplier_name = supplier.name
     
-    # Search for this item in catalog from other suppliers
-    query = select(PriceCatalogItem).where(
-        PriceCatalogItem.is_active == True,
-        PriceCatalogItem.name.ilike(f"%{item_name}%")
-    )
-    
-    result = await session.execute(query)
-    catalog_items = result.scalars().all()
-    
-    # Also search in historical purchase orders
-    po_items_query = select(PurchaseOrderItem).where(
-        PurchaseOrderItem.name.ilike(f"%{item_name}%")
-    ).order_by(desc(PurchaseOrderItem.id)).limit(20)
+    # One indexed lookup: catalog offers and approved order history per supplier
+    offers = await find_best_prices(session, item_name)
     
-    po_result = await session.execute(po_items_query)
-    po_items = po_result.scalars().all()
-    
-    # Collect all prices from different suppliers
-    supplier_prices = {}  # {supplier_name: {price, source, date}}
-    
-    for ci in catalog_items:
-        sup_name = ci.supplier_name or "غير محدد"
-        if sup_name not in supplier_prices or ci.price < supplier_prices[sup_name]["price"]:
-            supplier_prices[sup_name] = {
-                "price": ci.price,
-                "source": "catalog",
-                "unit": ci.unit,
-                "currency": ci.currency,
-                "item_name": ci.name,
-                "catalog_item_id": ci.id
-            }
-    
-    # Check historical PO prices
-    for poi in po_items:
-        # Get order to find supplier
-        order_result = await session.execute(
-            select(PurchaseOrder).where(PurchaseOrder.id == poi.order_id)
-        )
-        order = order_result.scalar_one_or_none()
-        if order:
-            sup_name = order.supplier_name or "غير محدد"
-            if sup_name not in supplier_prices or poi.unit_price < supplier_prices[sup_name]["price"]:
-                supplier_prices[sup_name] = {
-                    "price": poi.unit_price,
-                    "source": "purchase_order",
-                    "unit": poi.unit,
-                    "currency": order.currency or "SAR",
-                    "item_name": poi.name,
-                    "order_number": order.order_number,
-                    "order_date": order.created_at.strftime("%Y-%m-%d") if order.created_at else None
-                }
+    # Collect the best price per supplier - {supplier_key: {price, source, ...}}
+    supplier_prices = {}
+    for offer in offers:
+        key = offer.supplier_key
+        if key in supplier_prices and offer.min_price >= supplier_prices[key]["price"]:
+            continue
+        supplier_prices[key] = {
+            "supplier_name": offer.supplier_name or UNKNOWN_SUPPLIER,
+            "price": offer.min_price,
+            "source": offer.source,
+            "unit": offer.unit or "",
+            "currency": offer.currency or "SAR",
+            "item_name": offer.item_name,
+            "order_number": offer.min_order_number,
+            "order_date": offer.min_order_date.strftime("%Y-%m-%d") if offer.min_order_date else None
+        }
     
     # Find better prices (excluding current supplier)
+    current_key = supplier_key(supplier_name) if supplier_name else None
     better_prices = []
-    for sup_name, data in supplier_prices.items():
-        if supplier_name and sup_name.lower() == supplier_name.lower():
+    for key, data in supplier_prices.items():
+        if current_key and key == current_key:
             continue  # Skip current supplier
         
         if unit_price > 0 and data["price"] < unit_price:
             savings = round(unit_price - data["price"], 2)
             savings_percent = round((savings / unit_price) * 100, 1)
             better_prices.append({
-                "supplier_name": sup_name,
+                "supplier_name": data["supplier_name"],
                 "price": data["price"],
-                "unit": data.get("unit", ""),
-                "currency": data.get("currency", "SAR"),
+                "unit": data["unit"],
+                "currency": data["currency"],
                 "source": data["source"],
                 "savings": savings,
                 "savings_percent": savings_percent,
-                "item_name": data["item_name"]
+                "item_name": data["item_name"],
+                "order_number": data["order_number"],
+                "order_date": data["order_date"]
             })
     
     # Sort by price
@@ -956,12 +783,12 @@ async def check_best_price(
         "better_options": better_prices[:5],  # Top 5 better prices
         "all_suppliers": [
             {
-                "supplier_name": k,
+                "supplier_name": v["supplier_name"],
                 "price": v["price"],
-                "unit": v.get("unit", ""),
+                "unit": v["unit"],
                 "source": v["source"]
             }
-            for k, v in sorted(supplier_prices.items(), key=lambda x: x[1]["price"])
+            for v in sorted(supplier_prices.values(), key=lambda x: x["price"])
         ][:10]
     }
 
@@ -1001,6 +828,8 @@ async def quick_add_catalog_item(
     )
     
     session.add(new_item)
+    await index_catalog_changes(session, items=[new_item])
+    await record_catalog_items(session, [new_item])
     await session.commit()
     
     return {
@@ -1052,6 +881,7 @@ async def create_alias(
     )
     
     session.add(new_alias)
+    await index_catalog_changes(session, aliases=[new_alias])
     await session.commit()
     
     return {"message": "تم إضافة المسمى البديل بنجاح", "id": new_alias.id}
@@ -1076,6 +906,7 @@ async def delete_alias(
         raise HTTPException(status_code=404, detail="المسمى غير موجود")
     
     await session.delete(alias)
+    await index_catalog_changes(session, removed_aliases=[alias_id])
     await session.commit()
     
     return {"message": "تم حذف المسمى بنجاح"}
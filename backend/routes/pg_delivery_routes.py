@@ -22,6 +22,8 @@ pg_delivery_router = APIRouter(prefix="/api/pg", tags=["PostgreSQL Delivery Trac
 
 # Import auth dependency
 from routes.pg_auth_routes import get_current_user_pg, UserRole
+from services.order_read_model import load_orders_with_items, order_item_to_dict, iso_or_none
+from services.spend_rollups import spend_entry, record_spend
 
 
 # ==================== HELPER FUNCTIONS ====================
@@ -110,39 +112,18 @@ async def get_delivery_orders(
     
     query = query.order_by(desc(PurchaseOrder.created_at))
     
-    result = await session.execute(query)
-    orders = result.scalars().all()
+    # Headers + all items in a constant number of queries
+    orders_with_items = await load_orders_with_items(session, query)
     
     response = []
-    for order in orders:
-        # Get order items
-        items_result = await session.execute(
-            select(PurchaseOrderItem)
-            .where(PurchaseOrderItem.order_id == order.id)
-            .order_by(PurchaseOrderItem.item_index)
-        )
-        items = items_result.scalars().all()
-        
+    for order, items in orders_with_items:
         response.append({
             "id": order.id,
             "order_number": order.order_number,
             "order_seq": order.order_seq,
             "request_id": order.request_id,
             "request_number": order.request_number,
-            "items": [
-                {
-                    "id": item.id,
-                    "name": item.name,
-                    "quantity": item.quantity,
-                    "unit": item.unit,
-                    "unit_price": item.unit_price,
-                    "total_price": item.total_price,
-                    "delivered_quantity": item.delivered_quantity,
-                    "catalog_item_id": item.catalog_item_id,
-                    "item_code": item.item_code
-                }
-                for item in items
-            ],
+            "items": [order_item_to_dict(item) for item in items],
             "project_id": order.project_id,
             "project_name": order.project_name,
             "supplier_id": order.supplier_id,
@@ -160,9 +141,9 @@ async def get_delivery_orders(
             "received_by_name": order.received_by_name,
             "delivery_notes": order.delivery_notes,
             "expected_delivery_date": order.expected_delivery_date,
-            "created_at": order.created_at.isoformat() if order.created_at else None,
-            "shipped_at": order.shipped_at.isoformat() if order.shipped_at else None,
-            "delivered_at": order.delivered_at.isoformat() if order.delivered_at else None
+            "created_at": iso_or_none(order.created_at),
+            "shipped_at": iso_or_none(order.shipped_at),
+            "delivered_at": iso_or_none(order.delivered_at)
         })
     
     return response
@@ -225,6 +206,7 @@ async def confirm_receipt(
                 all_fully_delivered = False
     
     # Update order status
+    before = spend_entry(order)
     if all_fully_delivered:
         order.status = "delivered"
         order.delivered_at = now
@@ -232,6 +214,7 @@ async def confirm_receipt(
         order.status = "partially_delivered"
     
     order.updated_at = now
+    await record_spend(session, [before], [spend_entry(order)])
     
     # Create delivery record
     delivery_record = DeliveryRecord(
@@ -0,0 +1,92 @@
+"""
+PostgreSQL Background Job Routes
+Status polling, cancellation and downloads for jobs started in async mode
+(catalog and planned-quantity imports, budget export, backup and restore)
+"""
+import os
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import desc
+
+from database import get_postgres_session, User, Job, JobStatus
+
+# Create router
+pg_jobs_router = APIRouter(prefix="/api/pg/jobs", tags=["PostgreSQL Background Jobs"])
+
+# Import auth dependency
+from routes.pg_auth_routes import get_current_user_pg, UserRole
+from services.jobs import job_to_dict, cancel_job
+
+
+# ==================== HELPER FUNCTIONS ====================
+
+async def get_job_for_user(session: AsyncSession, job_id: str, current_user: User) -> Job:
+    """The job, if the user started it (system admins see every job)"""
+    result = await session.execute(select(Job).where(Job.id == job_id))
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="المهمة غير موجودة")
+    if job.created_by != current_user.id and current_user.role != UserRole.SYSTEM_ADMIN:
+        raise HTTPException(status_code=403, detail="غير مصرح لك بالوصول لهذه المهمة")
+    return job
+
+
+# ==================== JOB ROUTES ====================
+
+@pg_jobs_router.get("")
+async def get_my_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user_pg),
+    session: AsyncSession = Depends(get_postgres_session)
+):
+    """Recent jobs started by the current user"""
+    result = await session.execute(
+        select(Job).where(Job.created_by == current_user.id).order_by(desc(Job.created_at)).limit(limit)
+    )
+    return [job_to_dict(job) for job in result.scalars().all()]
+
+
+@pg_jobs_router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user_pg),
+    session: AsyncSession = Depends(get_postgres_session)
+):
+    """Poll a job: status, progress percent, result and download link"""
+    job = await get_job_for_user(session, job_id, current_user)
+    return job_to_dict(job)
+
+
+@pg_jobs_router.post("/{job_id}/cancel")
+async def cancel_job_route(
+    job_id: str,
+    current_user: User = Depends(get_current_user_pg),
+    session: AsyncSession = Depends(get_postgres_session)
+):
+    """Cancel a queued or running job - an interrupted import or restore is rolled back"""
+    job = await get_job_for_user(session, job_id, current_user)
+    await cancel_job(session, job)
+    return {"message": "تم طلب إلغاء المهمة", "job": job_to_dict(job)}
+
+
+@pg_jobs_router.get("/{job_id}/download")
+async def download_job_artifact(
+    job_id: str,
+    current_user: User = Depends(get_current_user_pg),
+    session: AsyncSession = Depends(get_postgres_session)
+):
+    """Download the file a finished export or backup job produced"""
+    job = await get_job_for_user(session, job_id, current_user)
+    if job.status != JobStatus.SUCCEEDED.value or not job.artifact_path:
+        raise HTTPException(status_code=400, detail="لا يوجد ملف جاهز لهذه المهمة")
+    if not os.path.exists(job.artifact_path):
+        raise HTTPException(status_code=404, detail="انتهت صلاحية ملف المهمة")
+
+    return FileResponse(
+        job.artifact_path,
+        media_type=job.artifact_media_type,
+        headers={"Content-Disposition": f"attachment; filename={job.artifact_name}"}
+    )
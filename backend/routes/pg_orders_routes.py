@@ -2,20 +2,22 @@
 PostgreSQL Purchase Orders Routes
 Migrated from MongoDB to PostgreSQL
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, desc, and_, or_
+from sqlalchemy import desc, and_, or_, update, insert
 import uuid
 import json
 
 from database import (
     get_postgres_session, PurchaseOrder, PurchaseOrderItem,
     MaterialRequest, MaterialRequestItem, User, Project, 
-    Supplier, BudgetCategory, SystemSetting, AuditLog, PriceCatalogItem
+    Supplier, BudgetCategory, AuditLog, PriceCatalogItem,
+    allocate_order_number, get_settings
 )
 
 # Create router
@@ -23,6 +25,16 @@ pg_orders_router = APIRouter(prefix="/api/pg", tags=["PostgreSQL Purchase Orders
 
 # Import auth dependency
 from routes.pg_auth_routes import get_current_user_pg, UserRole
+from services.order_read_model import (
+    load_orders_with_items, load_order_items, order_item_to_dict,
+    order_item_to_summary_dict, iso_or_none
+)
+from services.pagination import apply_keyset, split_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from services.po_pdf import order_to_render_dict, render_merged, iter_bytes
+from services.fieldsets import FieldSet, Related, iso_datetime
+from services.best_prices import record_approved_orders, APPROVED_ORDER_STATUSES
+from services.plan_deduction import deduct_from_plan
+from services.spend_rollups import spend_entry, record_spend
 
 
 # ==================== PYDANTIC MODELS ====================
@@ -42,6 +54,7 @@ class PurchaseOrderCreate(BaseModel):
     notes: Optional[str] = None
     terms_conditions: Optional[str] = None
     expected_delivery_date: Optional[str] = None
+    deduct_planned: bool = False  # خصم الأصناف المرتبطة بالكتالوج من الكميات المخططة للمشروع
 
 
 class PurchaseOrderUpdate(BaseModel):
@@ -73,31 +86,46 @@ async def log_audit_pg(session, entity_type, entity_id, action, user, descriptio
 
 
 async def get_next_order_number(session: AsyncSession) -> tuple:
-    """Get next sequential order number"""
-    result = await session.execute(
-        select(func.max(PurchaseOrder.order_seq))
-    )
-    max_seq = result.scalar() or 0
-    next_seq = max_seq + 1
-    
-    # Format: PO-00000001
-    order_number = f"PO-{next_seq:08d}"
-    return order_number, next_seq
+    """Get next sequential order number (O(1), allocated inside the caller's transaction)"""
+    return await allocate_order_number(session)
 
 
 async def get_approval_limit(session: AsyncSession) -> float:
-    """Get the approval limit from system settings"""
-    result = await session.execute(
-        select(SystemSetting).where(SystemSetting.key == "approval_limit")
-    )
-    setting = result.scalar_one_or_none()
-    
-    if setting:
-        try:
-            return float(setting.value)
-        except ValueError:
-            return 20000.0
-    return 20000.0
+    """Get the approval limit from the cached system settings"""
+    settings = await get_settings(session)
+    return settings.approval_limit
+
+
+# Fields of the /purchase-orders listing (see services/fieldsets.py)
+ORDER_LIST_FIELDS = FieldSet({
+    "id": PurchaseOrder.id,
+    "order_number": PurchaseOrder.order_number,
+    "order_seq": PurchaseOrder.order_seq,
+    "request_id": PurchaseOrder.request_id,
+    "request_number": PurchaseOrder.request_number,
+    "items": Related(PurchaseOrder.id),
+    "project_id": PurchaseOrder.project_id,
+    "project_name": PurchaseOrder.project_name,
+    "supplier_id": PurchaseOrder.supplier_id,
+    "supplier_name": PurchaseOrder.supplier_name,
+    "category_id": PurchaseOrder.category_id,
+    "category_name": PurchaseOrder.category_name,
+    "manager_id": PurchaseOrder.manager_id,
+    "manager_name": PurchaseOrder.manager_name,
+    "supervisor_name": PurchaseOrder.supervisor_name,
+    "engineer_name": PurchaseOrder.engineer_name,
+    "status": PurchaseOrder.status,
+    "needs_gm_approval": PurchaseOrder.needs_gm_approval,
+    "approved_by_name": PurchaseOrder.approved_by_name,
+    "gm_approved_by_name": PurchaseOrder.gm_approved_by_name,
+    "total_amount": PurchaseOrder.total_amount,
+    "notes": PurchaseOrder.notes,
+    "supplier_invoice_number": PurchaseOrder.supplier_invoice_number,
+    "expected_delivery_date": PurchaseOrder.expected_delivery_date,
+    "created_at": iso_datetime(PurchaseOrder.created_at),
+    "approved_at": iso_datetime(PurchaseOrder.approved_at),
+    "printed_at": iso_datetime(PurchaseOrder.printed_at)
+})
 
 
 # ==================== PURCHASE ORDERS ROUTES ====================
@@ -235,6 +263,7 @@ async def create_purchase_order(
         created_at=now
     )
     session.add(new_order)
+    await record_spend(session, added=[spend_entry(new_order)])
     
     # Create order items
     for idx, item_data in enumerate(order_items):
@@ -260,6 +289,13 @@ async def create_purchase_order(
         request.status = "partially_ordered"
     request.updated_at = now
     
+    # Plan deduction commits (or rolls back) together with the order
+    plan_deductions = None
+    if order_data.deduct_planned:
+        plan_deductions = await deduct_from_plan(session, [
+            (item["catalog_item_id"], request.project_id, item["quantity"]) for item in order_items
+        ])
+    
     await log_audit_pg(
         session, "order", order_id, "create", current_user,
         f"إصدار أمر شراء: {order_number} بقيمة {total_amount}"
@@ -281,6 +317,7 @@ async def create_purchase_order(
         "status": initial_status,
         "needs_gm_approval": needs_gm_approval,
         "total_amount": total_amount,
+        "plan_deductions": plan_deductions,
         "created_at": now.isoformat()
     }
 
@@ -289,12 +326,22 @@ async def create_purchase_order(
 async def get_purchase_orders(
     status: Optional[str] = None,
     project_id: Optional[str] = None,
+    project_name: Optional[str] = None,
     supplier_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """Get purchase orders based on user role"""
-    query = select(PurchaseOrder)
+    """
+    Get purchase orders based on user role.
+    Passing `limit` and/or `cursor` switches to keyset pagination and returns
+    {"items": [...], "next_cursor": ...} instead of the full list.
+    `fields` (comma separated) limits the response - and the SELECT - to those fields.
+    """
+    selected = ORDER_LIST_FIELDS.parse(fields)
+    query = select(*ORDER_LIST_FIELDS.columns(selected, PurchaseOrder.id, PurchaseOrder.created_at))
     
     # Role-based filtering
     if current_user.role == UserRole.PRINTER:
@@ -311,68 +358,35 @@ async def get_purchase_orders(
         query = query.where(PurchaseOrder.status == status)
     if project_id:
         query = query.where(PurchaseOrder.project_id == project_id)
+    if project_name:
+        # Served by idx_orders_project_created_at (project_name, created_at)
+        query = query.where(PurchaseOrder.project_name == project_name)
     if supplier_id:
         query = query.where(PurchaseOrder.supplier_id == supplier_id)
     
-    query = query.order_by(desc(PurchaseOrder.created_at))
+    # Keyset pagination mode (opt-in)
+    paged = cursor is not None or limit is not None
+    if paged:
+        page_size = limit or DEFAULT_PAGE_SIZE
+        query = apply_keyset(query, PurchaseOrder.created_at, PurchaseOrder.id, cursor, page_size)
+        result = await session.execute(query)
+        rows, next_cursor = split_page(result.all(), page_size)
+    else:
+        query = query.order_by(desc(PurchaseOrder.created_at))
+        result = await session.execute(query)
+        rows = result.all()
     
-    result = await session.execute(query)
-    orders = result.scalars().all()
+    # Items only when requested - all of them in a constant number of queries
+    related = {}
+    if "items" in selected:
+        items_by_order = await load_order_items(session, [row.id for row in rows])
+        related["items"] = lambda row: [order_item_to_dict(item) for item in items_by_order.get(row.id, [])]
     
-    response = []
-    for order in orders:
-        # Get order items
-        items_result = await session.execute(
-            select(PurchaseOrderItem)
-            .where(PurchaseOrderItem.order_id == order.id)
-            .order_by(PurchaseOrderItem.item_index)
-        )
-        items = items_result.scalars().all()
-        
-        response.append({
-            "id": order.id,
-            "order_number": order.order_number,
-            "order_seq": order.order_seq,
-            "request_id": order.request_id,
-            "request_number": order.request_number,
-            "items": [
-                {
-                    "id": item.id,
-                    "name": item.name,
-                    "quantity": item.quantity,
-                    "unit": item.unit,
-                    "unit_price": item.unit_price,
-                    "total_price": item.total_price,
-                    "delivered_quantity": item.delivered_quantity,
-                    "catalog_item_id": item.catalog_item_id,
-                    "item_code": item.item_code
-                }
-                for item in items
-            ],
-            "project_id": order.project_id,
-            "project_name": order.project_name,
-            "supplier_id": order.supplier_id,
-            "supplier_name": order.supplier_name,
-            "category_id": order.category_id,
-            "category_name": order.category_name,
-            "manager_id": order.manager_id,
-            "manager_name": order.manager_name,
-            "supervisor_name": order.supervisor_name,
-            "engineer_name": order.engineer_name,
-            "status": order.status,
-            "needs_gm_approval": order.needs_gm_approval,
-            "approved_by_name": order.approved_by_name,
-            "gm_approved_by_name": order.gm_approved_by_name,
-            "total_amount": order.total_amount,
-            "notes": order.notes,
-            "supplier_invoice_number": order.supplier_invoice_number,
-            "expected_delivery_date": order.expected_delivery_date,
-            "created_at": order.created_at.isoformat() if order.created_at else None,
-            "approved_at": order.approved_at.isoformat() if order.approved_at else None,
-            "printed_at": order.printed_at.isoformat() if order.printed_at else None
-        })
+    orders = [ORDER_LIST_FIELDS.serialize(row, selected, related) for row in rows]
     
-    return response
+    if paged:
+        return {"items": orders, "next_cursor": next_cursor, "limit": page_size}
+    return orders
 
 
 @pg_orders_router.get("/purchase-orders/{order_id}")
@@ -469,6 +483,7 @@ async def update_purchase_order(
     if order.gm_approved_by:
         raise HTTPException(status_code=400, detail="لا يمكن تعديل أمر شراء موافق عليه من المدير العام")
     
+    before = spend_entry(order)
     changes = {}
     
     if update_data.supplier_name is not None:
@@ -534,6 +549,12 @@ async def update_purchase_order(
             changes["needs_gm_approval"] = {"old": False, "new": True, "reason": f"المبلغ {total_amount} أكبر من حد الموافقة {approval_limit}"}
     
     order.updated_at = datetime.utcnow()
+    await record_spend(session, [before], [spend_entry(order)])
+    
+    # Repricing an already approved order updates the best-price table too
+    if update_data.item_prices and order.status in APPROVED_ORDER_STATUSES:
+        await session.flush()
+        await record_approved_orders(session, [order_id])
     
     if changes:
         await log_audit_pg(
@@ -563,6 +584,7 @@ async def approve_purchase_order(
     
     now = datetime.utcnow()
     approval_limit = await get_approval_limit(session)
+    before = spend_entry(order)
     
     # Check approval requirements
     if order.total_amount > approval_limit:
@@ -604,6 +626,8 @@ async def approve_purchase_order(
         )
     
     order.updated_at = now
+    await record_approved_orders(session, [order_id])
+    await record_spend(session, [before], [spend_entry(order)])
     await session.commit()
     
     return {"message": "تم اعتماد أمر الشراء بنجاح", "status": "approved"}
@@ -635,9 +659,11 @@ async def gm_reject_order(
     if order.status != "pending_gm_approval":
         raise HTTPException(status_code=400, detail="أمر الشراء ليس في انتظار موافقة المدير العام")
     
+    before = spend_entry(order)
     order.status = "rejected_by_gm"
     order.rejection_reason = reject_data.reason
     order.updated_at = datetime.utcnow()
+    await record_spend(session, [before], [spend_entry(order)])
     
     await log_audit_pg(
         session, "order", order_id, "gm_reject", current_user,
@@ -671,9 +697,11 @@ async def print_purchase_order(
         raise HTTPException(status_code=400, detail="أمر الشراء غير معتمد بعد")
     
     now = datetime.utcnow()
+    before = spend_entry(order)
     order.status = "printed"
     order.printed_at = now
     order.updated_at = now
+    await record_spend(session, [before], [spend_entry(order)])
     
     await log_audit_pg(
         session, "order", order_id, "print", current_user,
@@ -707,9 +735,11 @@ async def ship_purchase_order(
         raise HTTPException(status_code=400, detail="يجب طباعة أمر الشراء أولاً")
     
     now = datetime.utcnow()
+    before = spend_entry(order)
     order.status = "shipped"
     order.shipped_at = now
     order.updated_at = now
+    await record_spend(session, [before], [spend_entry(order)])
     
     await log_audit_pg(
         session, "order", order_id, "ship", current_user,
@@ -721,6 +751,193 @@ async def ship_purchase_order(
     return {"message": "تم تسجيل الشحن بنجاح", "status": "shipped"}
 
 
+class BulkTransitionData(BaseModel):
+    order_ids: List[str]
+    action: str  # approve | print | ship
+
+
+BULK_TRANSITION_MAX_ORDERS = 500
+
+
+def check_order_transition(action: str, order, current_user: User, approval_limit: float) -> dict:
+    """
+    Apply the state/role rules of the single-order /approve, /print and /ship handlers.
+    Returns {"error": (status_code, detail)} or {"kind": ..., "from_status": ...}
+    """
+    if action == "approve":
+        if order.total_amount > approval_limit:
+            if current_user.role != UserRole.GENERAL_MANAGER:
+                return {"error": (403, f"أمر الشراء بقيمة {order.total_amount} يتجاوز حد الموافقة ({approval_limit}). يتطلب موافقة المدير العام")}
+            if order.status != "pending_gm_approval":
+                return {"error": (400, "أمر الشراء ليس في انتظار موافقة المدير العام")}
+            return {"kind": "gm_approve", "from_status": "pending_gm_approval"}
+        
+        if current_user.role != UserRole.PROCUREMENT_MANAGER:
+            return {"error": (403, "غير مصرح لك باعتماد هذا الأمر")}
+        if order.status != "pending_approval":
+            return {"error": (400, "أمر الشراء ليس في انتظار الاعتماد")}
+        return {"kind": "approve", "from_status": "pending_approval"}
+    
+    if action == "print":
+        if current_user.role not in [UserRole.PRINTER, UserRole.PROCUREMENT_MANAGER]:
+            return {"error": (403, "غير مصرح لك بهذا الإجراء")}
+        if order.status != "approved":
+            return {"error": (400, "أمر الشراء غير معتمد بعد")}
+        return {"kind": "print", "from_status": "approved"}
+    
+    # ship
+    if current_user.role not in [UserRole.PROCUREMENT_MANAGER, UserRole.DELIVERY_TRACKER]:
+        return {"error": (403, "غير مصرح لك بهذا الإجراء")}
+    if order.status != "printed":
+        return {"error": (400, "يجب طباعة أمر الشراء أولاً")}
+    return {"kind": "ship", "from_status": "printed"}
+
+
+def bulk_transition_values(kind: str, current_user: User, now: datetime) -> dict:
+    """Column values written by each transition kind"""
+    if kind == "gm_approve":
+        return {
+            "status": "approved", "gm_approved_by": current_user.id,
+            "gm_approved_by_name": current_user.name, "gm_approved_at": now, "updated_at": now
+        }
+    if kind == "approve":
+        return {
+            "status": "approved", "approved_by": current_user.id,
+            "approved_by_name": current_user.name, "approved_at": now, "updated_at": now
+        }
+    if kind == "print":
+        return {"status": "printed", "printed_at": now, "updated_at": now}
+    return {"status": "shipped", "shipped_at": now, "updated_at": now}
+
+
+BULK_AUDIT_DESCRIPTIONS = {
+    "gm_approve": "موافقة المدير العام على أمر الشراء: {}",
+    "approve": "اعتماد أمر الشراء: {}",
+    "print": "طباعة أمر الشراء: {}",
+    "ship": "شحن أمر الشراء: {}",
+}
+
+
+@pg_orders_router.post("/purchase-orders/bulk-transition")
+async def bulk_transition_purchase_orders(
+    transition_data: BulkTransitionData,
+    current_user: User = Depends(get_current_user_pg),
+    session: AsyncSession = Depends(get_postgres_session)
+):
+    """
+    Approve, print or ship many orders at once.
+    One SELECT validates every order, set-based UPDATEs apply the changes and
+    all audit rows are written with a single INSERT. Returns a result per order.
+    """
+    action = transition_data.action
+    if action not in ["approve", "print", "ship"]:
+        raise HTTPException(status_code=400, detail="الإجراء غير مدعوم")
+    
+    order_ids = list(dict.fromkeys(transition_data.order_ids))
+    if not order_ids:
+        raise HTTPException(status_code=400, detail="يجب اختيار أمر شراء واحد على الأقل")
+    if len(order_ids) > BULK_TRANSITION_MAX_ORDERS:
+        raise HTTPException(status_code=400, detail=f"الحد الأقصى {BULK_TRANSITION_MAX_ORDERS} أمر شراء في المرة الواحدة")
+    
+    # One batched read of everything the rules and the spend rollups need
+    result = await session.execute(
+        select(
+            PurchaseOrder.id, PurchaseOrder.order_number,
+            PurchaseOrder.status, PurchaseOrder.total_amount,
+            PurchaseOrder.project_id, PurchaseOrder.project_name,
+            PurchaseOrder.category_id, PurchaseOrder.category_name,
+            PurchaseOrder.supplier_id, PurchaseOrder.supplier_name,
+            PurchaseOrder.created_at
+        ).where(PurchaseOrder.id.in_(order_ids))
+    )
+    orders = {row.id: row for row in result.all()}
+    
+    approval_limit = (await get_settings(session)).approval_limit if action == "approve" else 0
+    
+    outcomes = {}
+    ids_by_kind = {}
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if not order:
+            outcomes[order_id] = {"order_id": order_id, "success": False, "status_code": 404, "error": "أمر الشراء غير موجود"}
+            continue
+        
+        decision = check_order_transition(action, order, current_user, approval_limit)
+        if "error" in decision:
+            status_code, detail = decision["error"]
+            outcomes[order_id] = {
+                "order_id": order_id, "order_number": order.order_number,
+                "success": False, "status_code": status_code, "error": detail
+            }
+            continue
+        
+        ids_by_kind.setdefault((decision["kind"], decision["from_status"]), []).append(order_id)
+    
+    # Set-based updates - the status guard skips orders changed concurrently since the SELECT
+    now = datetime.utcnow()
+    audit_rows = []
+    approved_ids = []
+    spend_moves = ([], [])
+    for (kind, from_status), ids in ids_by_kind.items():
+        values = bulk_transition_values(kind, current_user, now)
+        update_result = await session.execute(
+            update(PurchaseOrder)
+            .where(PurchaseOrder.id.in_(ids), PurchaseOrder.status == from_status)
+            .values(**values)
+            .returning(PurchaseOrder.id)
+            .execution_options(synchronize_session=False)
+        )
+        updated_ids = set(update_result.scalars().all())
+        
+        for order_id in ids:
+            order = orders[order_id]
+            if order_id not in updated_ids:
+                outcomes[order_id] = {
+                    "order_id": order_id, "order_number": order.order_number,
+                    "success": False, "status_code": 409, "error": "تم تعديل حالة أمر الشراء، يرجى التحديث"
+                }
+                continue
+            
+            outcomes[order_id] = {
+                "order_id": order_id, "order_number": order.order_number,
+                "success": True, "status": values["status"]
+            }
+            spend_moves[0].append(spend_entry(order))
+            spend_moves[1].append(spend_entry(order, values["status"]))
+            if values["status"] == "approved":
+                approved_ids.append(order_id)
+            audit_rows.append({
+                "id": str(uuid.uuid4()),
+                "entity_type": "order",
+                "entity_id": order_id,
+                "action": kind,
+                "changes": None,
+                "user_id": current_user.id,
+                "user_name": current_user.name,
+                "user_role": current_user.role,
+                "description": BULK_AUDIT_DESCRIPTIONS[kind].format(order.order_number),
+                "timestamp": now
+            })
+    
+    if audit_rows:
+        await session.execute(insert(AuditLog), audit_rows)
+    
+    if approved_ids:
+        await record_approved_orders(session, approved_ids)
+    await record_spend(session, *spend_moves)
+    
+    await session.commit()
+    
+    results = [outcomes[order_id] for order_id in order_ids]
+    succeeded = sum(1 for r in results if r["success"])
+    return {
+        "action": action,
+        "results": results,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded
+    }
+
+
 @pg_orders_router.post("/purchase-orders/{order_id}/deliver")
 async def deliver_purchase_order(
     order_id: str,
@@ -744,6 +961,7 @@ async def deliver_purchase_order(
         raise HTTPException(status_code=400, detail="حالة أمر الشراء لا تسمح بتسجيل التسليم")
     
     now = datetime.utcnow()
+    before = spend_entry(order)
     order.status = "delivered"
     order.delivered_at = now
     order.updated_at = now
@@ -759,11 +977,74 @@ async def deliver_purchase_order(
         f"تسليم أمر الشراء: {order.order_number}"
     )
     
+    await record_spend(session, [before], [spend_entry(order)])
     await session.commit()
     
     return {"message": "تم تسجيل التسليم بنجاح", "status": "delivered"}
 
 
+class BulkPdfData(BaseModel):
+    order_ids: List[str]
+
+
+BULK_PDF_MAX_ORDERS = 200
+
+
+async def render_orders_pdf_response(session: AsyncSession, order_ids: List[str], filename: str):
+    """Load orders + items in batch, render them (cached) and stream one PDF"""
+    result = await session.execute(select(PurchaseOrder).where(PurchaseOrder.id.in_(order_ids)))
+    orders = {order.id: order for order in result.scalars().all()}
+    missing = [order_id for order_id in order_ids if order_id not in orders]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"أمر الشراء غير موجود: {missing[0]}")
+    
+    items_by_order = await load_order_items(session, order_ids)
+    render_data = [
+        order_to_render_dict(orders[order_id], items_by_order.get(order_id, []))
+        for order_id in order_ids
+    ]
+    settings = await get_settings(session)
+    
+    try:
+        pdf_bytes = await render_merged(render_data, settings.company_settings)
+    except ImportError:
+        raise HTTPException(status_code=500, detail="مكتبة PDF غير متوفرة")
+    
+    return StreamingResponse(
+        iter_bytes(pdf_bytes),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@pg_orders_router.get("/purchase-orders/{order_id}/pdf")
+async def get_purchase_order_pdf(
+    order_id: str,
+    current_user: User = Depends(get_current_user_pg),
+    session: AsyncSession = Depends(get_postgres_session)
+):
+    """Render a purchase order as PDF on the server (cached per order version)"""
+    return await render_orders_pdf_response(session, [order_id], f"purchase_order_{order_id[:8]}.pdf")
+
+
+@pg_orders_router.post("/purchase-orders/pdf/bulk")
+async def get_purchase_orders_bulk_pdf(
+    pdf_data: BulkPdfData,
+    current_user: User = Depends(get_current_user_pg),
+    session: AsyncSession = Depends(get_postgres_session)
+):
+    """Render many purchase orders in a process pool and stream one merged PDF"""
+    order_ids = list(dict.fromkeys(pdf_data.order_ids))
+    if not order_ids:
+        raise HTTPException(status_code=400, detail="يجب اختيار أمر شراء واحد على الأقل")
+    if len(order_ids) > BULK_PDF_MAX_ORDERS:
+        raise HTTPException(status_code=400, detail=f"الحد الأقصى {BULK_PDF_MAX_ORDERS} أمر شراء في المرة الواحدة")
+    
+    return await render_orders_pdf_response(
+        session, order_ids, f"purchase_orders_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
+    )
+
+
 @pg_orders_router.put("/purchase-orders/{order_id}/supplier-invoice")
 async def update_supplier_invoice(
     order_id: str,
@@ -883,22 +1164,15 @@ async def get_gm_pending_orders(
     if current_user.role != UserRole.GENERAL_MANAGER:
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
-    result = await session.execute(
+    orders_with_items = await load_orders_with_items(
+        session,
         select(PurchaseOrder)
         .where(PurchaseOrder.status == "pending_gm_approval")
         .order_by(desc(PurchaseOrder.created_at))
     )
-    orders = result.scalars().all()
     
     response = []
-    for order in orders:
-        items_result = await session.execute(
-            select(PurchaseOrderItem)
-            .where(PurchaseOrderItem.order_id == order.id)
-            .order_by(PurchaseOrderItem.item_index)
-        )
-        items = items_result.scalars().all()
-        
+    for order, items in orders_with_items:
         response.append({
             "id": order.id,
             "order_number": order.order_number,
@@ -915,17 +1189,8 @@ async def get_gm_pending_orders(
             "terms_conditions": order.terms_conditions,
             "expected_delivery_date": order.expected_delivery_date,
             "items_count": len(items),
-            "created_at": order.created_at.isoformat() if order.created_at else None,
-            "items": [
-                {
-                    "name": item.name,
-                    "quantity": item.quantity,
-                    "unit": item.unit,
-                    "unit_price": item.unit_price,
-                    "total_price": item.total_price
-                }
-                for item in items
-            ]
+            "created_at": iso_or_none(order.created_at),
+            "items": [order_item_to_summary_dict(item) for item in items]
         })
     
     return response
@@ -957,19 +1222,11 @@ async def get_gm_all_orders(
     
     query = query.order_by(desc(PurchaseOrder.created_at))
     
-    result = await session.execute(query)
-    orders = result.scalars().all()
+    # Order items are needed for PDF export
+    orders_with_items = await load_orders_with_items(session, query)
     
     response = []
-    for order in orders:
-        # Fetch order items for PDF export
-        items_result = await session.execute(
-            select(PurchaseOrderItem)
-            .where(PurchaseOrderItem.order_id == order.id)
-            .order_by(PurchaseOrderItem.item_index)
-        )
-        items = items_result.scalars().all()
-        
+    for order, items in orders_with_items:
         response.append({
             "id": order.id,
             "order_number": order.order_number,
@@ -987,19 +1244,10 @@ async def get_gm_all_orders(
             "notes": order.notes,
             "terms_conditions": order.terms_conditions,
             "expected_delivery_date": order.expected_delivery_date,
-            "created_at": order.created_at.isoformat() if order.created_at else None,
-            "approved_at": order.approved_at.isoformat() if order.approved_at else None,
-            "gm_approved_at": order.gm_approved_at.isoformat() if order.gm_approved_at else None,
-            "items": [
-                {
-                    "name": item.name,
-                    "quantity": item.quantity,
-                    "unit": item.unit,
-                    "unit_price": item.unit_price,
-                    "total_price": item.total_price
-                }
-                for item in items
-            ]
+            "created_at": iso_or_none(order.created_at),
+            "approved_at": iso_or_none(order.approved_at),
+            "gm_approved_at": iso_or_none(order.gm_approved_at),
+            "items": [order_item_to_summary_dict(item) for item in items]
         })
     
     return response
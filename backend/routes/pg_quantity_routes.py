@@ -2,24 +2,37 @@
 PostgreSQL Quantity Engineer Routes - إدارة الكميات المخططة
 النظام الصحيح: اختيار أصناف من كتالوج الأسعار وتحديد كميات مع تواريخ توريد
 """
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query, Request, Response
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import Optional, List
-from datetime import datetime, timedelta
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, desc, and_, or_
+from sqlalchemy import func, desc, and_, or_, insert
 import uuid
 import json
-import io
 import csv
 
 from database import (
-    get_postgres_session, User, Project, PlannedQuantity,
+    get_postgres_session, User, Project, PlannedQuantity, PlannedQuantityStatus,
     PriceCatalogItem, BudgetCategory, PurchaseOrder, PurchaseOrderItem
 )
+from database.connection import get_session_maker
 from routes.pg_auth_routes import get_current_user_pg, UserRole
+from services.fieldsets import FieldSet, Constant, iso_datetime
+from services.exports import stream_rows, XlsxExport, XLSX_MEDIA_TYPE
+from services.imports import iter_sheet_chunks
+from services.planned_import import import_planned_rows
+from services.jobs import JobContext, start_job, job_accepted
+from services.plan_deduction import deduct_from_plan
+from services.plan_schedule import plan_status
+from services.template_cache import FileCache, data_version
+from services.pagination import apply_keyset, split_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from services.quantity_stats import (
+    plan_filters, overdue_condition, due_soon_condition, plan_totals, status_counts,
+    project_totals, top_rows, completion_rate, alert_lists
+)
 
 # Create router
 pg_quantity_router = APIRouter(prefix="/api/pg/quantity", tags=["Quantity Engineer"])
@@ -61,6 +74,19 @@ class DeductQuantityRequest(BaseModel):
     order_id: Optional[str] = None
 
 
+class DeductLine(BaseModel):
+    """سطر خصم: صنف ومشروع وكمية"""
+    catalog_item_id: str
+    project_id: str
+    quantity: float
+
+
+class BatchDeductRequest(BaseModel):
+    """خصم كل أسطر أمر الشراء من الخطة دفعة واحدة"""
+    lines: List[DeductLine]
+    order_id: Optional[str] = None
+
+
 # ==================== HELPER FUNCTIONS ====================
 
 def require_quantity_access(current_user: User):
@@ -74,6 +100,56 @@ def require_quantity_access(current_user: User):
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
 
 
+def parse_expected_date(value: Optional[str]) -> Optional[datetime]:
+    """تاريخ الطلب المتوقع - ISO أو YYYY-MM-DD، وإلا None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            return datetime.strptime(value[:10], "%Y-%m-%d")
+        except ValueError:
+            return None
+
+
+async def fetch_by_ids(session: AsyncSession, model, ids) -> dict:
+    """جلب السجلات المشار إليها باستعلام IN واحد - {id: record}"""
+    ids = {record_id for record_id in ids if record_id}
+    if not ids:
+        return {}
+    result = await session.execute(select(model).where(model.id.in_(ids)))
+    return {record.id: record for record in result.scalars().all()}
+
+
+# حقول قائمة الكميات المخططة (fields=)
+PLANNED_LIST_FIELDS = FieldSet({
+    "id": PlannedQuantity.id,
+    "item_name": PlannedQuantity.item_name,
+    "item_code": PlannedQuantity.item_code,
+    "unit": PlannedQuantity.unit,
+    "description": PlannedQuantity.description,
+    "planned_quantity": PlannedQuantity.planned_quantity,
+    "ordered_quantity": PlannedQuantity.ordered_quantity,
+    "remaining_quantity": PlannedQuantity.remaining_quantity,
+    "project_id": PlannedQuantity.project_id,
+    "project_name": PlannedQuantity.project_name,
+    "category_id": PlannedQuantity.category_id,
+    "category_name": PlannedQuantity.category_name,
+    "catalog_item_id": PlannedQuantity.catalog_item_id,
+    "supplier_name": Constant(None),
+    "unit_price": Constant(None),
+    "expected_order_date": iso_datetime(PlannedQuantity.expected_order_date),
+    "status": PlannedQuantity.status,
+    "priority": PlannedQuantity.priority,
+    "notes": PlannedQuantity.notes,
+    "created_by": PlannedQuantity.created_by,
+    "created_by_name": PlannedQuantity.created_by_name,
+    "created_at": iso_datetime(PlannedQuantity.created_at),
+    "updated_at": iso_datetime(PlannedQuantity.updated_at)
+})
+
+
 # ==================== CATALOG ITEMS ENDPOINTS ====================
 
 @pg_quantity_router.get("/catalog-items")
@@ -173,13 +249,15 @@ async def get_planned_quantities(
     search: Optional[str] = None,
     page: int = 1,
     page_size: int = 50,
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """جلب الكميات المخططة مع الفلاتر"""
+    """جلب الكميات المخططة مع الفلاتر - fields= لاختيار الحقول المطلوبة فقط"""
     require_quantity_access(current_user)
     
-    query = select(PlannedQuantity)
+    selected = PLANNED_LIST_FIELDS.parse(fields)
+    query = select(*PLANNED_LIST_FIELDS.columns(selected))
     
     # Apply filters
     if project_id:
@@ -209,37 +287,10 @@ async def get_planned_quantities(
     query = query.order_by(desc(PlannedQuantity.created_at)).offset(offset).limit(page_size)
     
     result = await session.execute(query)
-    items = result.scalars().all()
+    rows = result.all()
     
     return {
-        "items": [
-            {
-                "id": item.id,
-                "item_name": item.item_name,
-                "item_code": item.item_code,
-                "unit": item.unit,
-                "description": item.description,
-                "planned_quantity": item.planned_quantity,
-                "ordered_quantity": item.ordered_quantity,
-                "remaining_quantity": item.remaining_quantity,
-                "project_id": item.project_id,
-                "project_name": item.project_name,
-                "category_id": item.category_id,
-                "category_name": item.category_name,
-                "catalog_item_id": item.catalog_item_id,
-                "supplier_name": getattr(item, 'supplier_name', None),
-                "unit_price": getattr(item, 'unit_price', None),
-                "expected_order_date": item.expected_order_date.isoformat() if item.expected_order_date else None,
-                "status": item.status,
-                "priority": item.priority,
-                "notes": item.notes,
-                "created_by": item.created_by,
-                "created_by_name": item.created_by_name,
-                "created_at": item.created_at.isoformat() if item.created_at else None,
-                "updated_at": item.updated_at.isoformat() if item.updated_at else None
-            }
-            for item in items
-        ],
+        "items": [PLANNED_LIST_FIELDS.serialize(row, selected) for row in rows],
         "total": total,
         "page": page,
         "page_size": page_size,
@@ -289,15 +340,7 @@ async def create_planned_quantity(
         category_name = catalog_item.category_name
     
     # Parse expected order date
-    expected_date = None
-    if data.expected_order_date:
-        try:
-            expected_date = datetime.fromisoformat(data.expected_order_date.replace('Z', '+00:00'))
-        except:
-            try:
-                expected_date = datetime.strptime(data.expected_order_date[:10], "%Y-%m-%d")
-            except:
-                pass
+    expected_date = parse_expected_date(data.expected_order_date)
     
     new_item = PlannedQuantity(
         id=str(uuid.uuid4()),
@@ -321,7 +364,7 @@ async def create_planned_quantity(
         # تاريخ الطلب المتوقع
         expected_order_date=expected_date,
         # الحالة والأولوية
-        status="planned",
+        status=plan_status(expected_date, 0, data.planned_quantity),
         priority=data.priority,
         notes=data.notes,
         # التتبع
@@ -345,88 +388,65 @@ async def create_bulk_planned_quantities(
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """إضافة كميات مخططة بالجملة"""
+    """إضافة كميات مخططة بالجملة - الأصناف والمشاريع والفئات تُجلب مسبقاً والإدراج دفعة واحدة"""
     require_quantity_access(current_user)
     
-    created = 0
     errors = []
+    rows = []
     
-    for idx, item_data in enumerate(data.items):
-        try:
-            # جلب الصنف من الكتالوج
-            catalog_result = await session.execute(
-                select(PriceCatalogItem).where(PriceCatalogItem.id == item_data.catalog_item_id)
-            )
-            catalog_item = catalog_result.scalar_one_or_none()
-            if not catalog_item:
-                errors.append(f"العنصر {idx+1}: الصنف غير موجود في الكتالوج")
-                continue
-            
-            # جلب المشروع
-            project_result = await session.execute(
-                select(Project).where(Project.id == item_data.project_id)
-            )
-            project = project_result.scalar_one_or_none()
-            if not project:
-                errors.append(f"العنصر {idx+1}: المشروع غير موجود")
-                continue
-            
-            # Parse expected date
-            expected_date = None
-            if item_data.expected_order_date:
-                try:
-                    expected_date = datetime.fromisoformat(item_data.expected_order_date.replace('Z', '+00:00'))
-                except:
-                    try:
-                        expected_date = datetime.strptime(item_data.expected_order_date[:10], "%Y-%m-%d")
-                    except:
-                        pass
-            
-            # جلب فئة الميزانية إذا تم تحديدها
-            bulk_category_id = getattr(item_data, 'category_id', None) or catalog_item.category_id
-            bulk_category_name = None
-            if bulk_category_id:
-                cat_result = await session.execute(
-                    select(BudgetCategory).where(BudgetCategory.id == bulk_category_id)
-                )
-                cat = cat_result.scalar_one_or_none()
-                bulk_category_name = cat.name if cat else catalog_item.category_name
-            else:
-                bulk_category_name = catalog_item.category_name
-            
-            new_item = PlannedQuantity(
-                id=str(uuid.uuid4()),
-                item_name=catalog_item.name,
-                item_code=catalog_item.item_code or f"ITM{catalog_item.id[:5].upper()}",
-                unit=catalog_item.unit,
-                description=catalog_item.description,
-                planned_quantity=item_data.planned_quantity,
-                ordered_quantity=0,
-                remaining_quantity=item_data.planned_quantity,
-                project_id=item_data.project_id,
-                project_name=project.name,
-                category_id=bulk_category_id,
-                category_name=bulk_category_name,
-                catalog_item_id=item_data.catalog_item_id,
-                expected_order_date=expected_date,
-                status="planned",
-                priority=item_data.priority,
-                notes=item_data.notes,
-                created_by=current_user.id,
-                created_by_name=current_user.name
-            )
-            
-            session.add(new_item)
-            created += 1
-            
-        except Exception as e:
-            errors.append(f"العنصر {idx+1}: {str(e)}")
+    catalog_items = await fetch_by_ids(session, PriceCatalogItem, (item.catalog_item_id for item in data.items))
+    projects = await fetch_by_ids(session, Project, (item.project_id for item in data.items))
+    categories = await fetch_by_ids(session, BudgetCategory, (
+        item.category_id or catalog_items[item.catalog_item_id].category_id
+        for item in data.items if item.catalog_item_id in catalog_items
+    ))
     
+    for idx, item_data in enumerate(data.items):
+        catalog_item = catalog_items.get(item_data.catalog_item_id)
+        if not catalog_item:
+            errors.append(f"العنصر {idx+1}: الصنف غير موجود في الكتالوج")
+            continue
+        
+        project = projects.get(item_data.project_id)
+        if not project:
+            errors.append(f"العنصر {idx+1}: المشروع غير موجود")
+            continue
+        
+        # فئة الميزانية: المختارة أو فئة الصنف في الكتالوج
+        bulk_category_id = item_data.category_id or catalog_item.category_id
+        category = categories.get(bulk_category_id)
+        bulk_category_name = category.name if category else catalog_item.category_name
+        expected_date = parse_expected_date(item_data.expected_order_date)
+        
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "item_name": catalog_item.name,
+            "item_code": catalog_item.item_code or f"ITM{catalog_item.id[:5].upper()}",
+            "unit": catalog_item.unit,
+            "description": catalog_item.description,
+            "planned_quantity": item_data.planned_quantity,
+            "ordered_quantity": 0,
+            "remaining_quantity": item_data.planned_quantity,
+            "project_id": item_data.project_id,
+            "project_name": project.name,
+            "category_id": bulk_category_id,
+            "category_name": bulk_category_name,
+            "catalog_item_id": item_data.catalog_item_id,
+            "expected_order_date": expected_date,
+            "status": plan_status(expected_date, 0, item_data.planned_quantity),
+            "priority": item_data.priority,
+            "notes": item_data.notes,
+            "created_by": current_user.id,
+            "created_by_name": current_user.name
+        })
+    
+    if rows:
+        await session.execute(insert(PlannedQuantity), rows)
     await session.commit()
     
     return {
-        "message": f"تم إضافة {created} عنصر بنجاح",
-        "created": created,
+        "message": f"تم إضافة {len(rows)} عنصر بنجاح",
+        "created": len(rows),
         "errors": errors[:10] if errors else []
     }
 
@@ -457,13 +477,6 @@ async def update_planned_quantity(
         item.remaining_quantity = data.planned_quantity - item.ordered_quantity
         if item.remaining_quantity < 0:
             item.remaining_quantity = 0
-        # تحديث الحالة
-        if item.remaining_quantity == 0:
-            item.status = "fully_ordered"
-        elif item.ordered_quantity > 0:
-            item.status = "partially_ordered"
-        else:
-            item.status = "planned"
     
     if data.priority is not None:
         item.priority = data.priority
@@ -471,9 +484,6 @@ async def update_planned_quantity(
     if data.notes is not None:
         item.notes = data.notes
     
-    if data.status is not None:
-        item.status = data.status
-    
     if data.expected_order_date is not None:
         try:
             item.expected_order_date = datetime.fromisoformat(data.expected_order_date.replace('Z', '+00:00'))
@@ -483,6 +493,12 @@ async def update_planned_quantity(
             except:
                 pass
     
+    # الحالة: المدخلة يدوياً، وإلا من الكميات والموعد
+    if data.status is not None:
+        item.status = data.status
+    elif data.planned_quantity is not None or data.expected_order_date is not None:
+        item.status = plan_status(item.expected_order_date, item.ordered_quantity, item.remaining_quantity)
+    
     # تحديث فئة الميزانية
     if data.category_id is not None:
         if data.category_id == "":
@@ -546,54 +562,49 @@ async def deduct_quantity_from_plan(
     if current_user.role not in [UserRole.PROCUREMENT_MANAGER, UserRole.SYSTEM_ADMIN]:
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
-    # البحث عن الكميات المخططة لهذا الصنف في هذا المشروع
-    result = await session.execute(
-        select(PlannedQuantity).where(
-            and_(
-                PlannedQuantity.catalog_item_id == data.catalog_item_id,
-                PlannedQuantity.project_id == data.project_id,
-                PlannedQuantity.remaining_quantity > 0
-            )
-        ).order_by(PlannedQuantity.expected_order_date.asc().nullslast())
+    # السطور المخططة مقفلة حتى الحفظ - لا يخصم أمران نفس الكمية
+    deduction = await deduct_from_plan(
+        session, [(data.catalog_item_id, data.project_id, data.quantity_to_deduct)]
     )
-    planned_items = result.scalars().all()
+    await session.commit()
     
-    if not planned_items:
+    if not deduction or not deduction[0]["planned_lines"]:
         return {
             "message": "لا توجد كميات مخططة لهذا الصنف",
             "deducted": 0,
             "remaining_to_deduct": data.quantity_to_deduct
         }
     
-    remaining_to_deduct = data.quantity_to_deduct
-    total_deducted = 0
-    
-    for planned_item in planned_items:
-        if remaining_to_deduct <= 0:
-            break
-        
-        available = planned_item.remaining_quantity
-        deduct_amount = min(available, remaining_to_deduct)
-        
-        planned_item.ordered_quantity += deduct_amount
-        planned_item.remaining_quantity -= deduct_amount
-        remaining_to_deduct -= deduct_amount
-        total_deducted += deduct_amount
-        
-        # تحديث الحالة
-        if planned_item.remaining_quantity == 0:
-            planned_item.status = "fully_ordered"
-        else:
-            planned_item.status = "partially_ordered"
-        
-        planned_item.updated_at = datetime.utcnow()
+    total_deducted = deduction[0]["deducted"]
+    return {
+        "message": f"تم خصم {total_deducted} من الكمية المخططة",
+        "deducted": total_deducted,
+        "remaining_to_deduct": deduction[0]["remaining_to_deduct"]
+    }
+
+
+@pg_quantity_router.post("/deduct/batch")
+async def deduct_order_lines_from_plan(
+    data: BatchDeductRequest,
+    current_user: User = Depends(get_current_user_pg),
+    session: AsyncSession = Depends(get_postgres_session)
+):
+    """خصم كل أسطر أمر شراء من الخطة في معاملة واحدة (الأقدم موعداً أولاً)"""
+    if current_user.role not in [UserRole.PROCUREMENT_MANAGER, UserRole.SYSTEM_ADMIN]:
+        raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
+    if not data.lines:
+        raise HTTPException(status_code=400, detail="يجب إدخال سطر واحد على الأقل")
     
+    deduction = await deduct_from_plan(
+        session, [(line.catalog_item_id, line.project_id, line.quantity) for line in data.lines]
+    )
     await session.commit()
     
+    total_deducted = sum(line["deducted"] for line in deduction)
     return {
-        "message": f"تم خصم {total_deducted} من الكمية المخططة",
+        "message": f"تم خصم {total_deducted} من الكميات المخططة",
         "deducted": total_deducted,
-        "remaining_to_deduct": remaining_to_deduct
+        "lines": deduction
     }
 
 
@@ -649,9 +660,7 @@ async def get_quantity_dashboard_stats(
     """إحصائيات لوحة معلومات مهندس الكميات"""
     require_quantity_access(current_user)
     
-    # جلب كل الكميات المخططة
-    result = await session.execute(select(PlannedQuantity))
-    items = result.scalars().all()
+    totals = await plan_totals(session, plan_filters())
     
     # عدد المشاريع
     projects_result = await session.execute(select(func.count()).select_from(Project))
@@ -663,17 +672,13 @@ async def get_quantity_dashboard_stats(
     )
     catalog_count = catalog_result.scalar()
     
-    now = datetime.utcnow()
-    overdue = len([i for i in items if i.expected_order_date and i.expected_order_date < now and i.remaining_quantity > 0])
-    due_soon = len([i for i in items if i.expected_order_date and now <= i.expected_order_date <= now + timedelta(days=10) and i.remaining_quantity > 0])
-    
     return {
-        "total_planned_items": len(items),
-        "total_planned_qty": sum(i.planned_quantity for i in items),
-        "total_ordered_qty": sum(i.ordered_quantity for i in items),
-        "total_remaining_qty": sum(i.remaining_quantity for i in items),
-        "overdue_items": overdue,
-        "due_soon_items": due_soon,
+        "total_planned_items": totals["items"],
+        "total_planned_qty": totals["planned"],
+        "total_ordered_qty": totals["ordered"],
+        "total_remaining_qty": totals["remaining"],
+        "overdue_items": totals["overdue"],
+        "due_soon_items": totals["due_soon"],
         "projects_count": projects_count,
         "catalog_items_count": catalog_count
     }
@@ -696,65 +701,33 @@ async def get_quantity_summary_report(
     if current_user.role not in allowed_roles:
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
-    query = select(PlannedQuantity)
-    if project_id:
-        query = query.where(PlannedQuantity.project_id == project_id)
-    
-    result = await session.execute(query)
-    items = result.scalars().all()
-    
-    total_planned = sum(item.planned_quantity for item in items)
-    total_ordered = sum(item.ordered_quantity for item in items)
-    total_remaining = sum(item.remaining_quantity for item in items)
-    
-    # إحصاء حسب الحالة
-    status_counts = {}
-    for item in items:
-        status_counts[item.status] = status_counts.get(item.status, 0) + 1
-    
+    filters = plan_filters(project_id)
     now = datetime.utcnow()
     
-    # الأصناف المتأخرة
-    overdue_items = [
-        item for item in items 
-        if item.expected_order_date and item.expected_order_date < now and item.remaining_quantity > 0
-    ]
+    totals = await plan_totals(session, filters)
     
-    # الأصناف القريبة من الموعد (خلال 10 أيام)
-    due_soon = [
-        item for item in items
-        if item.expected_order_date and now <= item.expected_order_date <= now + timedelta(days=10) and item.remaining_quantity > 0
-    ]
+    # إحصاء حسب الحالة
+    status_breakdown = await status_counts(session, filters)
     
     # حسب المشروع
-    projects_data = {}
-    for item in items:
-        if item.project_name not in projects_data:
-            projects_data[item.project_name] = {
-                "project_name": item.project_name,
-                "project_id": item.project_id,
-                "total_items": 0,
-                "planned_qty": 0,
-                "ordered_qty": 0,
-                "remaining_qty": 0
-            }
-        projects_data[item.project_name]["total_items"] += 1
-        projects_data[item.project_name]["planned_qty"] += item.planned_quantity
-        projects_data[item.project_name]["ordered_qty"] += item.ordered_quantity
-        projects_data[item.project_name]["remaining_qty"] += item.remaining_quantity
+    by_project = await project_totals(session, filters)
+    
+    # الأصناف المتأخرة والقريبة من الموعد (خلال 10 أيام) - أقدمها أولاً
+    overdue_items = await top_rows(session, filters, overdue_condition())
+    due_soon = await top_rows(session, filters, due_soon_condition())
     
     return {
         "summary": {
-            "total_items": len(items),
-            "total_planned_qty": total_planned,
-            "total_ordered_qty": total_ordered,
-            "total_remaining_qty": total_remaining,
-            "completion_rate": round((total_ordered / total_planned * 100), 1) if total_planned > 0 else 0,
-            "overdue_count": len(overdue_items),
-            "due_soon_count": len(due_soon)
+            "total_items": totals["items"],
+            "total_planned_qty": totals["planned"],
+            "total_ordered_qty": totals["ordered"],
+            "total_remaining_qty": totals["remaining"],
+            "completion_rate": completion_rate(totals),
+            "overdue_count": totals["overdue"],
+            "due_soon_count": totals["due_soon"]
         },
-        "status_breakdown": status_counts,
-        "by_project": list(projects_data.values()),
+        "status_breakdown": status_breakdown,
+        "by_project": by_project,
         "overdue_items": [
             {
                 "id": item.id,
@@ -764,7 +737,7 @@ async def get_quantity_summary_report(
                 "expected_date": item.expected_order_date.isoformat() if item.expected_order_date else None,
                 "days_overdue": (now - item.expected_order_date).days if item.expected_order_date else 0
             }
-            for item in sorted(overdue_items, key=lambda x: x.expected_order_date or now)[:10]
+            for item in overdue_items
         ],
         "due_soon_items": [
             {
@@ -775,7 +748,7 @@ async def get_quantity_summary_report(
                 "expected_date": item.expected_order_date.isoformat() if item.expected_order_date else None,
                 "days_until": (item.expected_order_date - now).days if item.expected_order_date else 0
             }
-            for item in sorted(due_soon, key=lambda x: x.expected_order_date or now)[:10]
+            for item in due_soon
         ]
     }
 
@@ -800,89 +773,39 @@ async def get_supervisor_alerts(
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
     now = datetime.utcnow()
-    threshold_date = now + timedelta(days=days_threshold)
     
-    # الأصناف المتأخرة
-    overdue_result = await session.execute(
-        select(PlannedQuantity).where(
-            and_(
-                PlannedQuantity.expected_order_date < now,
-                PlannedQuantity.remaining_quantity > 0
-            )
-        ).order_by(PlannedQuantity.expected_order_date.asc())
-    )
-    overdue_items = overdue_result.scalars().all()
+    # القوائم الثلاث وأعدادها باستعلام واحد
+    alerts = await alert_lists(session, now, days_threshold)
     
-    # الأصناف القريبة من الموعد
-    due_soon_result = await session.execute(
-        select(PlannedQuantity).where(
-            and_(
-                PlannedQuantity.expected_order_date >= now,
-                PlannedQuantity.expected_order_date <= threshold_date,
-                PlannedQuantity.remaining_quantity > 0
-            )
-        ).order_by(PlannedQuantity.expected_order_date.asc())
-    )
-    due_soon_items = due_soon_result.scalars().all()
-    
-    # الأصناف ذات الأولوية العالية
-    high_priority_result = await session.execute(
-        select(PlannedQuantity).where(
-            and_(
-                PlannedQuantity.priority == 1,
-                PlannedQuantity.remaining_quantity > 0
-            )
-        ).order_by(PlannedQuantity.expected_order_date.asc().nullslast())
-    )
-    high_priority_items = high_priority_result.scalars().all()
+    def alert_item(item) -> dict:
+        return {
+            "id": item.id,
+            "item_name": item.item_name,
+            "project_name": item.project_name,
+            "remaining_qty": item.remaining_quantity,
+            "unit": item.unit,
+            "expected_date": item.expected_order_date.isoformat() if item.expected_order_date else None,
+            "priority": item.priority
+        }
     
     return {
         "overdue": {
-            "count": len(overdue_items),
+            "count": alerts["overdue"]["count"],
             "items": [
-                {
-                    "id": item.id,
-                    "item_name": item.item_name,
-                    "project_name": item.project_name,
-                    "remaining_qty": item.remaining_quantity,
-                    "unit": item.unit,
-                    "expected_date": item.expected_order_date.isoformat() if item.expected_order_date else None,
-                    "days_overdue": (now - item.expected_order_date).days if item.expected_order_date else 0,
-                    "priority": item.priority
-                }
-                for item in overdue_items[:20]
+                {**alert_item(item), "days_overdue": (now - item.expected_order_date).days if item.expected_order_date else 0}
+                for item in alerts["overdue"]["rows"]
             ]
         },
         "due_soon": {
-            "count": len(due_soon_items),
+            "count": alerts["due_soon"]["count"],
             "items": [
-                {
-                    "id": item.id,
-                    "item_name": item.item_name,
-                    "project_name": item.project_name,
-                    "remaining_qty": item.remaining_quantity,
-                    "unit": item.unit,
-                    "expected_date": item.expected_order_date.isoformat() if item.expected_order_date else None,
-                    "days_until": (item.expected_order_date - now).days if item.expected_order_date else 0,
-                    "priority": item.priority
-                }
-                for item in due_soon_items[:20]
+                {**alert_item(item), "days_until": (item.expected_order_date - now).days if item.expected_order_date else 0}
+                for item in alerts["due_soon"]["rows"]
             ]
         },
         "high_priority": {
-            "count": len(high_priority_items),
-            "items": [
-                {
-                    "id": item.id,
-                    "item_name": item.item_name,
-                    "project_name": item.project_name,
-                    "remaining_qty": item.remaining_quantity,
-                    "unit": item.unit,
-                    "expected_date": item.expected_order_date.isoformat() if item.expected_order_date else None,
-                    "priority": item.priority
-                }
-                for item in high_priority_items[:20]
-            ]
+            "count": alerts["high_priority"]["count"],
+            "items": [alert_item(item) for item in alerts["high_priority"]["rows"]]
         }
     }
 
@@ -899,83 +822,42 @@ async def export_planned_quantities(
     """تصدير الكميات المخططة إلى Excel"""
     require_quantity_access(current_user)
     
-    query = select(PlannedQuantity)
-    if project_id:
-        query = query.where(PlannedQuantity.project_id == project_id)
-    query = query.order_by(desc(PlannedQuantity.created_at))
-    
-    result = await session.execute(query)
-    items = result.scalars().all()
-    
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-    except ImportError:
-        raise HTTPException(status_code=500, detail="مكتبة Excel غير متوفرة")
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "الكميات المخططة"
-    ws.sheet_view.rightToLeft = True
-    
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Headers
-    headers = ['اسم الصنف', 'الوحدة', 'المشروع', 'الكمية المخططة', 'الكمية المطلوبة', 'الكمية المتبقية', 'تاريخ الطلب المتوقع', 'الحالة', 'الأولوية']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = thin_border
-    
-    # Data
-    status_ar = {
-        "planned": "مخطط",
-        "partially_ordered": "طلب جزئي",
-        "fully_ordered": "مكتمل",
-        "overdue": "متأخر"
-    }
-    priority_ar = {1: "عالية", 2: "متوسطة", 3: "منخفضة"}
-    
-    for row_num, item in enumerate(items, 2):
-        ws.cell(row=row_num, column=1, value=item.item_name).border = thin_border
-        ws.cell(row=row_num, column=2, value=item.unit).border = thin_border
-        ws.cell(row=row_num, column=3, value=item.project_name).border = thin_border
-        ws.cell(row=row_num, column=4, value=item.planned_quantity).border = thin_border
-        ws.cell(row=row_num, column=5, value=item.ordered_quantity).border = thin_border
-        ws.cell(row=row_num, column=6, value=item.remaining_quantity).border = thin_border
-        ws.cell(row=row_num, column=7, value=item.expected_order_date.strftime("%Y-%m-%d") if item.expected_order_date else "-").border = thin_border
-        ws.cell(row=row_num, column=8, value=status_ar.get(item.status, item.status)).border = thin_border
-        ws.cell(row=row_num, column=9, value=priority_ar.get(item.priority, "متوسطة")).border = thin_border
-    
-    # Column widths
-    ws.column_dimensions['A'].width = 30
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 25
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 15
-    ws.column_dimensions['F'].width = 15
-    ws.column_dimensions['G'].width = 18
-    ws.column_dimensions['H'].width = 12
-    ws.column_dimensions['I'].width = 12
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=planned_quantities_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-    )
+    async with XlsxExport("الكميات المخططة", widths=[30, 12, 25, 15, 15, 15, 18, 12, 12]) as export:
+        export.header(['اسم الصنف', 'الوحدة', 'المشروع', 'الكمية المخططة', 'الكمية المطلوبة', 'الكمية المتبقية', 'تاريخ الطلب المتوقع', 'الحالة', 'الأولوية'])
+        
+        query = select(
+            PlannedQuantity.item_name, PlannedQuantity.unit, PlannedQuantity.project_name,
+            PlannedQuantity.planned_quantity, PlannedQuantity.ordered_quantity, PlannedQuantity.remaining_quantity,
+            PlannedQuantity.expected_order_date, PlannedQuantity.status, PlannedQuantity.priority
+        )
+        if project_id:
+            query = query.where(PlannedQuantity.project_id == project_id)
+        query = query.order_by(desc(PlannedQuantity.created_at), PlannedQuantity.id)
+        
+        status_ar = {
+            "planned": "مخطط",
+            "partially_ordered": "طلب جزئي",
+            "fully_ordered": "مكتمل",
+            "overdue": "متأخر",
+            "due_soon": "قريب الموعد"
+        }
+        priority_ar = {1: "عالية", 2: "متوسطة", 3: "منخفضة"}
+        
+        async for items in stream_rows(query, session=session):
+            for item in items:
+                export.append([
+                    item.item_name,
+                    item.unit,
+                    item.project_name,
+                    item.planned_quantity,
+                    item.ordered_quantity,
+                    item.remaining_quantity,
+                    item.expected_order_date.strftime("%Y-%m-%d") if item.expected_order_date else "-",
+                    status_ar.get(item.status, item.status),
+                    priority_ar.get(item.priority, "متوسطة")
+                ], "cell")
+        
+        return await export.response(f"planned_quantities_{datetime.now().strftime('%Y%m%d')}.xlsx")
 
 
 # ==================== فئات الميزانية ====================
@@ -1003,392 +885,184 @@ async def get_budget_categories(
 
 # ==================== استيراد من Excel ====================
 
+planned_template_cache = FileCache("planned_quantities_template", ".xlsx")
+
+
+async def planned_template_version(session: AsyncSession) -> str:
+    """نسخة بيانات النموذج - عدد وآخر تعديل للأصناف والمشاريع، ومحتوى فئات الميزانية (لا تحمل updated_at)"""
+    catalog = select(
+        func.count(), func.max(PriceCatalogItem.updated_at), func.max(PriceCatalogItem.created_at)
+    ).where(PriceCatalogItem.is_active == True)
+    projects = select(func.count(), func.max(Project.updated_at), func.max(Project.created_at))
+    categories = select(BudgetCategory.id, BudgetCategory.code, BudgetCategory.name, BudgetCategory.project_name).order_by(BudgetCategory.id)
+    
+    parts = list((await session.execute(catalog)).one()) + list((await session.execute(projects)).one())
+    parts += [tuple(row) for row in (await session.execute(categories)).all()]
+    return data_version(parts)
+
+
+async def build_planned_template() -> str:
+    """بناء النموذج بجلسة مستقلة (يعمل في الخلفية بعد انتهاء الطلب) - يعيد مسار الملف"""
+    async with get_session_maker()() as session:
+        export = await planned_template_export(session)
+    return await export.build()
+
+
 @pg_quantity_router.get("/planned/template")
 async def download_planned_template(
+    request: Request,
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """تحميل نموذج Excel للاستيراد - قسم الإدخال في الأعلى"""
+    """تحميل نموذج Excel للاستيراد - ملف محفوظ لكل نسخة من البيانات مع ETag"""
     require_quantity_access(current_user)
     
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-        from openpyxl.utils import get_column_letter
-    except ImportError:
-        raise HTTPException(status_code=500, detail="مكتبة Excel غير متوفرة")
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "الكميات المخططة"
-    ws.sheet_view.rightToLeft = True
-    
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    input_header_fill = PatternFill(start_color="7030A0", end_color="7030A0", fill_type="solid")
-    item_header_fill = PatternFill(start_color="70AD47", end_color="70AD47", fill_type="solid")
-    project_header_fill = PatternFill(start_color="ED7D31", end_color="ED7D31", fill_type="solid")
-    category_header_fill = PatternFill(start_color="5B9BD5", end_color="5B9BD5", fill_type="solid")
-    example_fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
-    thin_border = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
-    )
-    center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    right_align = Alignment(horizontal='right', vertical='center', wrap_text=True)
-    
-    # جلب البيانات
-    catalog_result = await session.execute(
-        select(PriceCatalogItem).where(PriceCatalogItem.is_active == True).order_by(PriceCatalogItem.item_code.asc().nullslast())
+    version = await planned_template_version(session)
+    version, path = await planned_template_cache.get(version, build_planned_template)
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    return FileResponse(
+        path,
+        media_type=XLSX_MEDIA_TYPE,
+        headers={**headers, "Content-Disposition": "attachment; filename=planned_quantities_template.xlsx"}
     )
-    catalog_items = catalog_result.scalars().all()
-    
-    projects_result = await session.execute(select(Project).order_by(Project.name))
-    projects = projects_result.scalars().all()
-    
-    categories_result = await session.execute(select(BudgetCategory).order_by(BudgetCategory.code.asc().nullslast()))
-    categories = categories_result.scalars().all()
-    
-    # === قسم الإدخال (في الأعلى) ===
-    ws.merge_cells('A1:I1')
-    input_title = ws['A1']
-    input_title.value = "✏️ أدخل الكميات المخططة هنا (انسخ كود الصنف من القائمة أدناه)"
-    input_title.font = Font(bold=True, size=14, color="FFFFFF")
-    input_title.fill = input_header_fill
-    input_title.alignment = center_align
-    
-    # رؤوس قسم الإدخال - الترتيب الجديد
-    input_headers = ['كود الصنف *', 'اسم الصنف *', 'كود التصنيف', 'تصنيف الميزانية', 'اسم المشروع *', 'الكمية المخططة *', 'تاريخ الطلب المتوقع', 'الأولوية (1-3)', 'ملاحظات']
-    for col, header in enumerate(input_headers, 1):
-        cell = ws.cell(row=2, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = thin_border
-        cell.alignment = center_align
-    
-    # صف مثال
-    if catalog_items and projects:
-        example_item = catalog_items[0]
-        example_project = projects[0]
-        example_category = categories[0] if categories else None
+
+
+async def planned_template_export(session: AsyncSession) -> XlsxExport:
+    """محتوى النموذج - قسم الإدخال في الأعلى ثم الأصناف والمشاريع والفئات"""
+    export = XlsxExport("الكميات المخططة", widths=[18, 25, 15, 18, 20, 18, 20, 15, 25])
+    try:
+        # جلب البيانات
+        catalog_query = select(
+            PriceCatalogItem.id, PriceCatalogItem.item_code, PriceCatalogItem.name, PriceCatalogItem.unit,
+            PriceCatalogItem.price, PriceCatalogItem.supplier_name, PriceCatalogItem.category_name
+        ).where(PriceCatalogItem.is_active == True).order_by(PriceCatalogItem.item_code.asc().nullslast(), PriceCatalogItem.id)
         
-        example_data = [
-            example_item.item_code or f"ITM{example_item.id[:5].upper()}",
-            example_item.name,
-            example_category.code if example_category else "",
-            example_category.name if example_category else "",
-            example_project.name,
-            25,
-            "2026-02-01",
-            2,
-            "مثال - احذف هذا الصف"
-        ]
+        first_item = (await session.execute(catalog_query.limit(1))).first()
         
-        for col, value in enumerate(example_data, 1):
-            cell = ws.cell(row=3, column=col, value=value)
-            cell.fill = example_fill
-            cell.border = thin_border
-            cell.alignment = right_align
-    
-    # صفوف فارغة للإدخال
-    for row in range(4, 14):
-        for col in range(1, 10):
-            cell = ws.cell(row=row, column=col, value="")
-            cell.border = thin_border
-    
-    # === قسم الأصناف المتاحة ===
-    items_start_row = 16
-    
-    ws.merge_cells(f'A{items_start_row}:F{items_start_row}')
-    items_title = ws[f'A{items_start_row}']
-    items_title.value = "📋 الأصناف المتاحة للاستيراد"
-    items_title.font = Font(bold=True, size=14, color="FFFFFF")
-    items_title.fill = item_header_fill
-    items_title.alignment = center_align
-    
-    item_headers = ['كود الصنف', 'اسم الصنف', 'الوحدة', 'السعر', 'المورد', 'التصنيف']
-    for col, header in enumerate(item_headers, 1):
-        cell = ws.cell(row=items_start_row + 1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = thin_border
-        cell.alignment = center_align
-    
-    for row_num, item in enumerate(catalog_items, items_start_row + 2):
-        ws.cell(row=row_num, column=1, value=item.item_code or f"ITM{item.id[:5].upper()}").border = thin_border
-        ws.cell(row=row_num, column=2, value=item.name).border = thin_border
-        ws.cell(row=row_num, column=3, value=item.unit).border = thin_border
-        ws.cell(row=row_num, column=4, value=item.price).border = thin_border
-        ws.cell(row=row_num, column=5, value=item.supplier_name or "-").border = thin_border
-        ws.cell(row=row_num, column=6, value=item.category_name or "-").border = thin_border
-    
-    # === قسم المشاريع ===
-    projects_start_row = items_start_row + len(catalog_items) + 4
-    
-    ws.merge_cells(f'A{projects_start_row}:B{projects_start_row}')
-    projects_title = ws[f'A{projects_start_row}']
-    projects_title.value = "📁 المشاريع المتاحة"
-    projects_title.font = Font(bold=True, size=14, color="FFFFFF")
-    projects_title.fill = project_header_fill
-    projects_title.alignment = center_align
-    
-    project_headers = ['اسم المشروع', 'كود المشروع']
-    for col, header in enumerate(project_headers, 1):
-        cell = ws.cell(row=projects_start_row + 1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = thin_border
-        cell.alignment = center_align
-    
-    for row_num, project in enumerate(projects, projects_start_row + 2):
-        ws.cell(row=row_num, column=1, value=project.name).border = thin_border
-        ws.cell(row=row_num, column=2, value=getattr(project, 'code', None) or "-").border = thin_border
-    
-    # === قسم فئات الميزانية ===
-    categories_start_row = projects_start_row + len(projects) + 4
-    
-    ws.merge_cells(f'A{categories_start_row}:C{categories_start_row}')
-    categories_title = ws[f'A{categories_start_row}']
-    categories_title.value = "🏷️ فئات الميزانية المتاحة"
-    categories_title.font = Font(bold=True, size=14, color="FFFFFF")
-    categories_title.fill = category_header_fill
-    categories_title.alignment = center_align
-    
-    cat_headers = ['كود الفئة', 'اسم الفئة', 'المشروع']
-    for col, header in enumerate(cat_headers, 1):
-        cell = ws.cell(row=categories_start_row + 1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = thin_border
-        cell.alignment = center_align
-    
-    for row_num, cat in enumerate(categories, categories_start_row + 2):
-        ws.cell(row=row_num, column=1, value=cat.code or "-").border = thin_border
-        ws.cell(row=row_num, column=2, value=cat.name).border = thin_border
-        ws.cell(row=row_num, column=3, value=cat.project_name or "-").border = thin_border
-    
-    # ضبط عرض الأعمدة
-    ws.column_dimensions['A'].width = 18
-    ws.column_dimensions['B'].width = 25
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 18
-    ws.column_dimensions['E'].width = 20
-    ws.column_dimensions['F'].width = 18
-    ws.column_dimensions['G'].width = 20
-    ws.column_dimensions['H'].width = 15
-    ws.column_dimensions['I'].width = 25
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=planned_quantities_template.xlsx"}
-    )
+        projects_result = await session.execute(select(Project.name, Project.code).order_by(Project.name))
+        projects = projects_result.all()
+        
+        categories_result = await session.execute(
+            select(BudgetCategory.code, BudgetCategory.name, BudgetCategory.project_name)
+            .order_by(BudgetCategory.code.asc().nullslast())
+        )
+        categories = categories_result.all()
+        
+        # === قسم الإدخال (في الأعلى) ===
+        export.title("✏️ أدخل الكميات المخططة هنا (انسخ كود الصنف من القائمة أدناه)", span=9, style="banner_purple")
+        
+        # رؤوس قسم الإدخال - الترتيب الجديد
+        export.header(['كود الصنف *', 'اسم الصنف *', 'كود التصنيف', 'تصنيف الميزانية', 'اسم المشروع *', 'الكمية المخططة *', 'تاريخ الطلب المتوقع', 'الأولوية (1-3)', 'ملاحظات'])
+        
+        # صف مثال
+        if first_item and projects:
+            example_category = categories[0] if categories else None
+            export.append([
+                first_item.item_code or f"ITM{first_item.id[:5].upper()}",
+                first_item.name,
+                example_category.code if example_category else "",
+                example_category.name if example_category else "",
+                projects[0].name,
+                25,
+                "2026-02-01",
+                2,
+                "مثال - احذف هذا الصف"
+            ], "summary")
+        else:
+            export.blank()
+        
+        # صفوف فارغة للإدخال
+        for _ in range(10):
+            export.append([""] * 9, "cell")
+        export.blank(2)
+        
+        # === قسم الأصناف المتاحة ===
+        export.title("📋 الأصناف المتاحة للاستيراد", span=6, style="banner_green")
+        export.header(['كود الصنف', 'اسم الصنف', 'الوحدة', 'السعر', 'المورد', 'التصنيف'])
+        
+        async for items in stream_rows(catalog_query, session=session):
+            for item in items:
+                export.append([
+                    item.item_code or f"ITM{item.id[:5].upper()}",
+                    item.name,
+                    item.unit,
+                    item.price,
+                    item.supplier_name or "-",
+                    item.category_name or "-"
+                ], "cell")
+        export.blank(2)
+        
+        # === قسم المشاريع ===
+        export.title("📁 المشاريع المتاحة", span=2, style="banner_orange")
+        export.header(['اسم المشروع', 'كود المشروع'])
+        for project in projects:
+            export.append([project.name, project.code or "-"], "cell")
+        export.blank(2)
+        
+        # === قسم فئات الميزانية ===
+        export.title("🏷️ فئات الميزانية المتاحة", span=3, style="banner_sky")
+        export.header(['كود الفئة', 'اسم الفئة', 'المشروع'])
+        for cat in categories:
+            export.append([cat.code or "-", cat.name, cat.project_name or "-"], "cell")
+    except BaseException:
+        export.discard()
+        raise
+    
+    return export
+
+
+async def run_planned_import(session: AsyncSession, chunks, user, on_rows=None) -> dict:
+    """استيراد الصفوف وحفظها - مع ملخص النتيجة"""
+    report = await import_planned_rows(session, chunks, user, on_rows=on_rows)
+    await session.commit()
+    
+    return {
+        "message": f"تم استيراد {report['created']} كمية مخططة بنجاح",
+        "created": report["created"],
+        "errors": report["errors"][:20]
+    }
+
+
+async def planned_import_job(context: JobContext, content: bytes, user_id: str) -> dict:
+    total = {}
+    
+    async def on_rows(done: int):
+        if total.get("rows"):
+            await context.progress(done * 100 / total["rows"], f"تمت معالجة {done} صف")
+    
+    chunks = iter_sheet_chunks(content, on_total=lambda rows: total.update(rows=rows))
+    async with get_session_maker()() as session:
+        user = await session.get(User, user_id)
+        return await run_planned_import(session, chunks, user, on_rows)
 
 
 @pg_quantity_router.post("/planned/import")
 async def import_planned_quantities(
     file: UploadFile = File(...),
+    async_mode: bool = Query(False, alias="async"),
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """استيراد الكميات المخططة من Excel - الترتيب الجديد"""
+    """استيراد الكميات المخططة من Excel - الترتيب الجديد (مع async=true تعمل في الخلفية: /api/pg/jobs/{id})"""
     require_quantity_access(current_user)
     
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="يجب أن يكون الملف بصيغة Excel (.xlsx أو .xls)")
     
-    try:
-        from openpyxl import load_workbook
-    except ImportError:
-        raise HTTPException(status_code=500, detail="مكتبة Excel غير متوفرة")
-    
     content = await file.read()
-    wb = load_workbook(io.BytesIO(content))
-    ws = wb.active
     
-    created = 0
-    errors = []
-    
-    # البحث عن صف بداية الإدخال (يحتوي على "كود الصنف")
-    start_row = 2  # افتراضياً - بعد رؤوس الأعمدة
-    for row_num, row in enumerate(ws.iter_rows(min_row=1, max_row=10, values_only=True), 1):
-        if row and row[0] and 'كود الصنف' in str(row[0]):
-            start_row = row_num + 1
-            break
-    
-    # الترتيب الجديد للأعمدة:
-    # 0: كود الصنف | 1: اسم الصنف | 2: كود التصنيف | 3: تصنيف الميزانية | 4: اسم المشروع | 5: الكمية | 6: التاريخ | 7: الأولوية | 8: ملاحظات
-    
-    for row_num, row in enumerate(ws.iter_rows(min_row=start_row, values_only=True), start_row):
-        # تجاهل الصفوف الفارغة
-        if not row or not row[0]:
-            continue
-        
-        # تجاهل صفوف العناوين والأقسام
-        first_cell = str(row[0]).strip()
-        if first_cell.startswith('📋') or first_cell.startswith('📁') or first_cell.startswith('✏️') or first_cell.startswith('🏷️'):
-            break  # وصلنا لقسم البيانات المرجعية - توقف
-        if 'الصنف' in first_cell or 'المشروع' in first_cell or 'اسم' in first_cell or 'الفئة' in first_cell:
-            continue
-        
-        # استخراج البيانات من الأعمدة
-        item_code = first_cell
-        item_name = str(row[1]).strip() if len(row) > 1 and row[1] else None
-        category_code = str(row[2]).strip() if len(row) > 2 and row[2] else None
-        category_name_input = str(row[3]).strip() if len(row) > 3 and row[3] else None
-        project_name = str(row[4]).strip() if len(row) > 4 and row[4] else None
-        
-        # الكمية في العمود السادس (index 5)
-        try:
-            planned_quantity = float(row[5]) if len(row) > 5 and row[5] else 0
-        except (ValueError, TypeError):
-            errors.append(f"صف {row_num}: الكمية '{row[5] if len(row) > 5 else 'فارغ'}' غير صالحة")
-            continue
-        
-        if planned_quantity <= 0:
-            continue
-        
-        # التحقق من البيانات المطلوبة
-        if not project_name:
-            errors.append(f"صف {row_num}: اسم المشروع مطلوب")
-            continue
-        
-        expected_order_date = None
-        priority = 2
-        notes = None
-        
-        # معالجة التاريخ (العمود السابع - index 6)
-        if len(row) > 6 and row[6]:
-            try:
-                if hasattr(row[6], 'strftime'):
-                    expected_order_date = row[6]
-                else:
-                    expected_order_date = datetime.strptime(str(row[6])[:10], "%Y-%m-%d")
-            except:
-                pass
-        
-        # معالجة الأولوية (العمود الثامن - index 7)
-        if len(row) > 7 and row[7]:
-            try:
-                priority = int(row[7])
-                if priority not in [1, 2, 3]:
-                    priority = 2
-            except (ValueError, TypeError):
-                priority = 2
-        
-        # معالجة الملاحظات (العمود التاسع - index 8)
-        if len(row) > 8 and row[8]:
-            notes = str(row[8]).strip()
-            if notes.lower() in ['none', 'مثال', 'مثال - احذف هذا الصف']:
-                continue  # تجاهل صف المثال
-        
-        # البحث عن الصنف بالكود أولاً
-        catalog_result = await session.execute(
-            select(PriceCatalogItem).where(
-                or_(
-                    PriceCatalogItem.item_code == item_code,
-                    PriceCatalogItem.id == item_code,
-                    PriceCatalogItem.name == item_code
-                )
-            )
+    if async_mode:
+        job = await start_job(
+            session, "planned_import", current_user, planned_import_job,
+            content=content, user_id=current_user.id
         )
-        catalog_item = catalog_result.scalar_one_or_none()
-        if not catalog_item:
-            errors.append(f"صف {row_num}: الصنف '{item_code}' غير موجود في الكتالوج")
-            continue
-        
-        # البحث عن المشروع بالاسم أو الكود
-        project_result = await session.execute(
-            select(Project).where(
-                or_(
-                    Project.name == project_name,
-                    Project.id == project_name,
-                    func.lower(Project.name) == func.lower(project_name),
-                    Project.code == project_name
-                )
-            )
-        )
-        project = project_result.scalar_one_or_none()
-        if not project:
-            errors.append(f"صف {row_num}: المشروع '{project_name}' غير موجود")
-            continue
-        
-        # البحث عن فئة الميزانية بالكود أو الاسم
-        import_category_id = None
-        import_category_name = None
-        
-        # أولاً: البحث بكود الفئة
-        if category_code and category_code != '-' and category_code.lower() != 'none':
-            cat_result = await session.execute(
-                select(BudgetCategory).where(
-                    or_(
-                        BudgetCategory.code == category_code,
-                        BudgetCategory.name == category_code,
-                        BudgetCategory.id == category_code
-                    )
-                )
-            )
-            category = cat_result.scalar_one_or_none()
-            if category:
-                import_category_id = category.id
-                import_category_name = category.name
-        
-        # ثانياً: البحث باسم الفئة إذا لم نجد بالكود
-        if not import_category_id and category_name_input and category_name_input != '-' and category_name_input.lower() != 'none':
-            cat_result = await session.execute(
-                select(BudgetCategory).where(
-                    or_(
-                        BudgetCategory.name == category_name_input,
-                        func.lower(BudgetCategory.name) == func.lower(category_name_input)
-                    )
-                )
-            )
-            category = cat_result.scalar_one_or_none()
-            if category:
-                import_category_id = category.id
-                import_category_name = category.name
-        
-        # استخدام الفئة من الاستيراد أو من الكتالوج
-        final_category_id = import_category_id or catalog_item.category_id
-        final_category_name = import_category_name or catalog_item.category_name
-        
-        new_item = PlannedQuantity(
-            id=str(uuid.uuid4()),
-            item_name=catalog_item.name,
-            item_code=catalog_item.item_code or f"ITM{catalog_item.id[:5].upper()}",
-            unit=catalog_item.unit,
-            description=catalog_item.description,
-            planned_quantity=planned_quantity,
-            ordered_quantity=0,
-            remaining_quantity=planned_quantity,
-            project_id=project.id,
-            project_name=project.name,
-            category_id=final_category_id,
-            category_name=final_category_name,
-            catalog_item_id=catalog_item.id,
-            expected_order_date=expected_order_date,
-            status="planned",
-            priority=priority,
-            notes=notes,
-            created_by=current_user.id,
-            created_by_name=current_user.name
-        )
-        
-        session.add(new_item)
-        created += 1
+        return job_accepted(job)
     
-    await session.commit()
-    
-    return {
-        "message": f"تم استيراد {created} كمية مخططة بنجاح",
-        "created": created,
-        "errors": errors[:20]
-    }
+    return await run_planned_import(session, iter_sheet_chunks(content), current_user)
 
 
 # ==================== تصدير التقارير ====================
@@ -1410,138 +1084,85 @@ async def export_quantity_report(
     if current_user.role not in allowed_roles:
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
-    query = select(PlannedQuantity)
-    if project_id:
-        query = query.where(PlannedQuantity.project_id == project_id)
-    query = query.order_by(PlannedQuantity.project_name, desc(PlannedQuantity.created_at))
-    
-    result = await session.execute(query)
-    items = result.scalars().all()
-    
-    now = datetime.utcnow()
-    
-    # Calculate summary
-    total_planned = sum(item.planned_quantity for item in items)
-    total_ordered = sum(item.ordered_quantity for item in items)
-    total_remaining = sum(item.remaining_quantity for item in items)
-    overdue_count = len([i for i in items if i.expected_order_date and i.expected_order_date < now and i.remaining_quantity > 0])
-    
-    # Group by project
-    projects_data = {}
-    for item in items:
-        if item.project_name not in projects_data:
-            projects_data[item.project_name] = {
-                "items": [],
-                "planned_qty": 0,
-                "ordered_qty": 0,
-                "remaining_qty": 0
-            }
-        projects_data[item.project_name]["items"].append(item)
-        projects_data[item.project_name]["planned_qty"] += item.planned_quantity
-        projects_data[item.project_name]["ordered_qty"] += item.ordered_quantity
-        projects_data[item.project_name]["remaining_qty"] += item.remaining_quantity
+    filters = plan_filters(project_id)
     
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-    except ImportError:
-        raise HTTPException(status_code=500, detail="مكتبة Excel غير متوفرة")
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "تقرير الكميات"
-    ws.sheet_view.rightToLeft = True
-    
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    summary_fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
-    project_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-    thin_border = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
-    )
+    # Summary and per-project totals are aggregated in SQL; the detail rows are streamed
+    totals = await plan_totals(session, filters)
+    projects_data = {project["project_id"]: project for project in await project_totals(session, filters)}
     
-    # Title
-    ws.cell(row=1, column=1, value="تقرير الكميات المخططة").font = Font(bold=True, size=14)
-    ws.cell(row=2, column=1, value=f"تاريخ التقرير: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    
-    # Summary
-    row = 4
-    ws.cell(row=row, column=1, value="ملخص التقرير").font = Font(bold=True)
-    row += 1
-    summary_data = [
-        ("إجمالي الأصناف", len(items)),
-        ("الكمية المخططة", total_planned),
-        ("الكمية المطلوبة", total_ordered),
-        ("الكمية المتبقية", total_remaining),
-        ("نسبة الإنجاز", f"{round((total_ordered / total_planned * 100), 1) if total_planned > 0 else 0}%"),
-        ("الأصناف المتأخرة", overdue_count)
-    ]
-    for label, value in summary_data:
-        ws.cell(row=row, column=1, value=label).fill = summary_fill
-        ws.cell(row=row, column=2, value=value).fill = summary_fill
-        ws.cell(row=row, column=1).border = thin_border
-        ws.cell(row=row, column=2).border = thin_border
-        row += 1
-    
-    # Details by project
-    row += 2
-    status_ar = {"planned": "مخطط", "partially_ordered": "طلب جزئي", "fully_ordered": "مكتمل"}
-    priority_ar = {1: "عالية", 2: "متوسطة", 3: "منخفضة"}
-    
-    for project_name, project_data in projects_data.items():
-        # Project header
-        ws.cell(row=row, column=1, value=f"المشروع: {project_name}").font = Font(bold=True)
-        ws.cell(row=row, column=1).fill = project_fill
-        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=8)
-        row += 1
+    async with XlsxExport("تقرير الكميات", widths=[30, 12, 18, 12, 12, 12, 15, 12]) as export:
+        # Title
+        export.append(["تقرير الكميات المخططة"], "heading")
+        export.append([f"تاريخ التقرير: {datetime.now().strftime('%Y-%m-%d %H:%M')}"])
+        export.blank()
         
-        ws.cell(row=row, column=1, value=f"إجمالي: مخطط {project_data['planned_qty']} | مطلوب {project_data['ordered_qty']} | متبقي {project_data['remaining_qty']}")
-        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=8)
-        row += 1
+        # Summary
+        export.append(["ملخص التقرير"], "label")
+        summary_data = [
+            ("إجمالي الأصناف", totals["items"]),
+            ("الكمية المخططة", totals["planned"]),
+            ("الكمية المطلوبة", totals["ordered"]),
+            ("الكمية المتبقية", totals["remaining"]),
+            ("نسبة الإنجاز", f"{completion_rate(totals)}%"),
+            ("الأصناف المتأخرة", totals["overdue"])
+        ]
+        for label, value in summary_data:
+            export.append([label, value], "summary")
         
-        # Headers
+        # Details by project
+        export.blank(2)
+        status_ar = {
+            "planned": "مخطط", "partially_ordered": "طلب جزئي", "fully_ordered": "مكتمل",
+            "overdue": "متأخر", "due_soon": "قريب الموعد"
+        }
         headers = ['الصنف', 'الوحدة', 'التصنيف', 'مخطط', 'مطلوب', 'متبقي', 'تاريخ الطلب', 'الحالة']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = thin_border
-        row += 1
         
-        # Items
-        for item in project_data["items"]:
-            ws.cell(row=row, column=1, value=item.item_name).border = thin_border
-            ws.cell(row=row, column=2, value=item.unit).border = thin_border
-            ws.cell(row=row, column=3, value=item.category_name or "-").border = thin_border
-            ws.cell(row=row, column=4, value=item.planned_quantity).border = thin_border
-            ws.cell(row=row, column=5, value=item.ordered_quantity).border = thin_border
-            ws.cell(row=row, column=6, value=item.remaining_quantity).border = thin_border
-            ws.cell(row=row, column=7, value=item.expected_order_date.strftime("%Y-%m-%d") if item.expected_order_date else "-").border = thin_border
-            ws.cell(row=row, column=8, value=status_ar.get(item.status, item.status)).border = thin_border
-            row += 1
+        detail_query = (
+            select(
+                PlannedQuantity.project_id,
+                PlannedQuantity.item_name,
+                PlannedQuantity.unit,
+                PlannedQuantity.category_name,
+                PlannedQuantity.planned_quantity,
+                PlannedQuantity.ordered_quantity,
+                PlannedQuantity.remaining_quantity,
+                PlannedQuantity.expected_order_date,
+                PlannedQuantity.status
+            )
+            .where(*filters)
+            .order_by(PlannedQuantity.project_name, PlannedQuantity.project_id, desc(PlannedQuantity.created_at))
+        )
         
-        row += 1
-    
-    # Column widths
-    ws.column_dimensions['A'].width = 30
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 18
-    ws.column_dimensions['D'].width = 12
-    ws.column_dimensions['E'].width = 12
-    ws.column_dimensions['F'].width = 12
-    ws.column_dimensions['G'].width = 15
-    ws.column_dimensions['H'].width = 12
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=quantity_report_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-    )
+        current_project = None
+        async for rows in stream_rows(detail_query, session=session):
+            for item in rows:
+                if item.project_id != current_project:
+                    if current_project is not None:
+                        export.blank()
+                    current_project = item.project_id
+                    project_data = projects_data.get(item.project_id, {})
+                    export.title(f"المشروع: {project_data.get('project_name')}", span=8, style="group")
+                    export.title(
+                        f"إجمالي: مخطط {project_data.get('planned_qty')} | مطلوب {project_data.get('ordered_qty')} | متبقي {project_data.get('remaining_qty')}",
+                        span=8, style=None
+                    )
+                    export.header(headers)
+                
+                export.append([
+                    item.item_name,
+                    item.unit,
+                    item.category_name or "-",
+                    item.planned_quantity,
+                    item.ordered_quantity,
+                    item.remaining_quantity,
+                    item.expected_order_date.strftime("%Y-%m-%d") if item.expected_order_date else "-",
+                    status_ar.get(item.status, item.status)
+                ], "cell")
+        
+        if current_project is not None:
+            export.blank()
+        
+        return await export.response(f"quantity_report_{datetime.now().strftime('%Y%m%d')}.xlsx")
 
 
 # ==================== APIs للمشرفين والمهندسين ====================
@@ -1549,10 +1170,15 @@ async def export_quantity_report(
 @pg_quantity_router.get("/by-role")
 async def get_quantities_by_role(
     project_id: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """جلب الكميات المخططة حسب دور المستخدم"""
+    """
+    جلب الكميات المخططة حسب دور المستخدم - أحدث `limit` صنف مع next_cursor
+    للصفحة التالية، والملخص يشمل كل الأصناف
+    """
     allowed_roles = [
         UserRole.SUPERVISOR,
         UserRole.ENGINEER,
@@ -1563,18 +1189,31 @@ async def get_quantities_by_role(
     if current_user.role not in allowed_roles:
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
-    query = select(PlannedQuantity)
-    
-    # فلترة حسب المشروع
-    if project_id:
-        query = query.where(PlannedQuantity.project_id == project_id)
+    filters = plan_filters(project_id)
+    now = datetime.utcnow()
     
-    query = query.order_by(desc(PlannedQuantity.created_at))
+    # أحدث الأصناف فقط (صفحة بمؤشر) - الملخص محسوب في قاعدة البيانات
+    query = select(
+        PlannedQuantity.id,
+        PlannedQuantity.item_name,
+        PlannedQuantity.unit,
+        PlannedQuantity.category_name,
+        PlannedQuantity.planned_quantity,
+        PlannedQuantity.ordered_quantity,
+        PlannedQuantity.remaining_quantity,
+        PlannedQuantity.project_id,
+        PlannedQuantity.project_name,
+        PlannedQuantity.expected_order_date,
+        PlannedQuantity.status,
+        PlannedQuantity.priority,
+        PlannedQuantity.created_at
+    ).where(*filters)
+    query = apply_keyset(query, PlannedQuantity.created_at, PlannedQuantity.id, cursor, limit)
     
     result = await session.execute(query)
-    items = result.scalars().all()
+    items, next_cursor = split_page(result.all(), limit)
     
-    now = datetime.utcnow()
+    totals = await plan_totals(session, filters)
     
     return {
         "items": [
@@ -1591,16 +1230,19 @@ async def get_quantities_by_role(
                 "expected_order_date": item.expected_order_date.isoformat() if item.expected_order_date else None,
                 "status": item.status,
                 "priority": item.priority,
-                "is_overdue": item.expected_order_date and item.expected_order_date < now and item.remaining_quantity > 0,
+                "is_overdue": item.status == PlannedQuantityStatus.OVERDUE.value,
                 "days_until": (item.expected_order_date - now).days if item.expected_order_date and item.expected_order_date >= now else None
             }
             for item in items
         ],
+        "next_cursor": next_cursor,
+        "limit": limit,
         "summary": {
-            "total_items": len(items),
-            "total_planned": sum(i.planned_quantity for i in items),
-            "total_ordered": sum(i.ordered_quantity for i in items),
-            "total_remaining": sum(i.remaining_quantity for i in items),
-            "overdue_count": len([i for i in items if i.expected_order_date and i.expected_order_date < now and i.remaining_quantity > 0])
+            "total_items": totals["items"],
+            "total_planned": totals["planned"],
+            "total_ordered": totals["ordered"],
+            "total_remaining": totals["remaining"],
+            "overdue_count": totals["overdue"],
+            "due_soon_count": totals["due_soon"]
         }
     }
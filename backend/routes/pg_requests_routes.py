@@ -2,19 +2,19 @@
 PostgreSQL Material Requests Routes
 Migrated from MongoDB to PostgreSQL
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, desc, and_, or_
+from sqlalchemy import desc, and_, or_
 import uuid
 import json
 
 from database import (
     get_postgres_session, MaterialRequest, MaterialRequestItem,
-    User, Project, AuditLog
+    User, Project, AuditLog, allocate_request_number
 )
 
 # Create router
@@ -22,6 +22,9 @@ pg_requests_router = APIRouter(prefix="/api/pg", tags=["PostgreSQL Material Requ
 
 # Import auth dependency
 from routes.pg_auth_routes import get_current_user_pg, UserRole
+from services.fieldsets import FieldSet, Related, iso_datetime
+from services.pagination import apply_keyset, split_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from services.order_read_model import load_items
 
 
 # ==================== PYDANTIC MODELS ====================
@@ -68,25 +71,75 @@ async def log_audit_pg(session, entity_type, entity_id, action, user, descriptio
 
 
 async def get_next_request_number(session: AsyncSession, supervisor_id: str) -> tuple:
-    """Get next sequential request number for a supervisor"""
-    # Get supervisor
-    result = await session.execute(select(User).where(User.id == supervisor_id))
-    supervisor = result.scalar_one_or_none()
-    
-    if not supervisor:
-        return "X1", 1
-    
-    prefix = supervisor.supervisor_prefix or "X"
-    
-    # Find highest request sequence for this supervisor
-    result = await session.execute(
-        select(func.max(MaterialRequest.request_seq))
-        .where(MaterialRequest.supervisor_id == supervisor_id)
-    )
-    max_seq = result.scalar() or 0
-    next_seq = max_seq + 1
-    
-    return f"{prefix}{next_seq}", next_seq
+    """Get next sequential request number for a supervisor (per-supervisor counter row)"""
+    return await allocate_request_number(session, supervisor_id)
+
+
+async def load_request_items(session: AsyncSession, request_ids: List[str]) -> dict:
+    """Load items for many requests at once, grouped by request id and sorted by item_index"""
+    return await load_items(session, MaterialRequestItem, MaterialRequestItem.request_id, request_ids)
+
+
+def request_item_to_dict(item: MaterialRequestItem) -> dict:
+    return {
+        "name": item.name,
+        "quantity": item.quantity,
+        "unit": item.unit,
+        "estimated_price": item.estimated_price
+    }
+
+
+# Fields of the /requests listing (see services/fieldsets.py)
+REQUEST_LIST_FIELDS = FieldSet({
+    "id": MaterialRequest.id,
+    "request_number": MaterialRequest.request_number,
+    "request_seq": MaterialRequest.request_seq,
+    "items": Related(MaterialRequest.id),
+    "project_id": MaterialRequest.project_id,
+    "project_name": MaterialRequest.project_name,
+    "reason": MaterialRequest.reason,
+    "supervisor_id": MaterialRequest.supervisor_id,
+    "supervisor_name": MaterialRequest.supervisor_name,
+    "engineer_id": MaterialRequest.engineer_id,
+    "engineer_name": MaterialRequest.engineer_name,
+    "status": MaterialRequest.status,
+    "rejection_reason": MaterialRequest.rejection_reason,
+    "expected_delivery_date": MaterialRequest.expected_delivery_date,
+    "created_at": iso_datetime(MaterialRequest.created_at),
+    "updated_at": iso_datetime(MaterialRequest.updated_at)
+})
+
+# Fields returned by the procurement manager's approved-requests queue
+APPROVED_REQUEST_FIELDS = [
+    "id", "request_number", "items", "project_id", "project_name", "reason",
+    "supervisor_name", "engineer_name", "status", "created_at"
+]
+
+
+async def list_requests_response(session: AsyncSession, query, selected: List[str],
+                                 cursor: Optional[str], limit: Optional[int]):
+    """Run a request listing query (plain list or keyset page) and attach items in one query"""
+    paged = cursor is not None or limit is not None
+    if paged:
+        page_size = limit or DEFAULT_PAGE_SIZE
+        query = apply_keyset(query, MaterialRequest.created_at, MaterialRequest.id, cursor, page_size)
+        result = await session.execute(query)
+        rows, next_cursor = split_page(result.all(), page_size)
+    else:
+        query = query.order_by(desc(MaterialRequest.created_at), desc(MaterialRequest.id))
+        result = await session.execute(query)
+        rows = result.all()
+    
+    related = {}
+    if "items" in selected:
+        items_by_request = await load_request_items(session, [row.id for row in rows])
+        related["items"] = lambda row: [request_item_to_dict(item) for item in items_by_request[row.id]]
+    
+    requests = [REQUEST_LIST_FIELDS.serialize(row, selected, related) for row in rows]
+    
+    if paged:
+        return {"items": requests, "next_cursor": next_cursor, "limit": page_size}
+    return requests
 
 
 # ==================== MATERIAL REQUESTS ROUTES ====================
@@ -194,66 +247,62 @@ async def create_material_request(
 async def get_material_requests(
     status: Optional[str] = None,
     project_id: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """Get material requests based on user role"""
-    query = select(MaterialRequest)
+    """
+    Get material requests based on user role.
+    `fields` (comma separated) limits the response - and the SELECT - to those fields.
+    Passing `limit` and/or `cursor` switches to keyset pagination and returns
+    {"items": [...], "next_cursor": ...} instead of the full list.
+    """
+    selected = REQUEST_LIST_FIELDS.parse(fields)
+    query = select(*REQUEST_LIST_FIELDS.columns(selected, MaterialRequest.id, MaterialRequest.created_at))
     
     # Filter based on role
     if current_user.role == UserRole.SUPERVISOR:
+        # Served by idx_requests_supervisor_seq
         query = query.where(MaterialRequest.supervisor_id == current_user.id)
     elif current_user.role == UserRole.ENGINEER:
+        # Served by idx_requests_engineer_status (engineer_id, status)
         query = query.where(MaterialRequest.engineer_id == current_user.id)
     
     if status:
         query = query.where(MaterialRequest.status == status)
     if project_id:
+        # Served by idx_requests_project_status (project_id, status, created_at)
         query = query.where(MaterialRequest.project_id == project_id)
     
-    query = query.order_by(desc(MaterialRequest.created_at))
-    
-    result = await session.execute(query)
-    requests = result.scalars().all()
+    return await list_requests_response(session, query, selected, cursor, limit)
+
+
+@pg_requests_router.get("/requests/approved")
+async def get_approved_requests(
+    project_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user_pg),
+    session: AsyncSession = Depends(get_postgres_session)
+):
+    """
+    Get all approved requests - for procurement manager.
+    Supports the same cursor/limit pagination as /requests.
+    """
+    if current_user.role != UserRole.PROCUREMENT_MANAGER:
+        raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
-    response = []
-    for req in requests:
-        # Get items
-        items_result = await session.execute(
-            select(MaterialRequestItem)
-            .where(MaterialRequestItem.request_id == req.id)
-            .order_by(MaterialRequestItem.item_index)
-        )
-        items = items_result.scalars().all()
-        
-        response.append({
-            "id": req.id,
-            "request_number": req.request_number,
-            "request_seq": req.request_seq,
-            "items": [
-                {
-                    "name": item.name,
-                    "quantity": item.quantity,
-                    "unit": item.unit,
-                    "estimated_price": item.estimated_price
-                }
-                for item in items
-            ],
-            "project_id": req.project_id,
-            "project_name": req.project_name,
-            "reason": req.reason,
-            "supervisor_id": req.supervisor_id,
-            "supervisor_name": req.supervisor_name,
-            "engineer_id": req.engineer_id,
-            "engineer_name": req.engineer_name,
-            "status": req.status,
-            "rejection_reason": req.rejection_reason,
-            "expected_delivery_date": req.expected_delivery_date,
-            "created_at": req.created_at.isoformat() if req.created_at else None,
-            "updated_at": req.updated_at.isoformat() if req.updated_at else None
-        })
+    selected = APPROVED_REQUEST_FIELDS
+    # Served by idx_requests_status_created_at, or idx_requests_project_status with project_id
+    query = select(*REQUEST_LIST_FIELDS.columns(selected, MaterialRequest.id, MaterialRequest.created_at)).where(
+        MaterialRequest.status.in_(["approved_by_engineer", "partially_ordered"])
+    )
+    if project_id:
+        query = query.where(MaterialRequest.project_id == project_id)
     
-    return response
+    return await list_requests_response(session, query, selected, cursor, limit)
 
 
 @pg_requests_router.get("/requests/{request_id}")
@@ -417,52 +466,3 @@ async def reject_request_by_manager(
     await session.commit()
     
     return {"message": "تم رفض الطلب وإعادته للمهندس", "status": "rejected_by_manager"}
-
-
-@pg_requests_router.get("/requests/approved")
-async def get_approved_requests(
-    current_user: User = Depends(get_current_user_pg),
-    session: AsyncSession = Depends(get_postgres_session)
-):
-    """Get all approved requests - for procurement manager"""
-    if current_user.role != UserRole.PROCUREMENT_MANAGER:
-        raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
-    
-    result = await session.execute(
-        select(MaterialRequest)
-        .where(MaterialRequest.status.in_(["approved_by_engineer", "partially_ordered"]))
-        .order_by(desc(MaterialRequest.created_at))
-    )
-    requests = result.scalars().all()
-    
-    response = []
-    for req in requests:
-        items_result = await session.execute(
-            select(MaterialRequestItem)
-            .where(MaterialRequestItem.request_id == req.id)
-            .order_by(MaterialRequestItem.item_index)
-        )
-        items = items_result.scalars().all()
-        
-        response.append({
-            "id": req.id,
-            "request_number": req.request_number,
-            "items": [
-                {
-                    "name": item.name,
-                    "quantity": item.quantity,
-                    "unit": item.unit,
-                    "estimated_price": item.estimated_price
-                }
-                for item in items
-            ],
-            "project_id": req.project_id,
-            "project_name": req.project_name,
-            "reason": req.reason,
-            "supervisor_name": req.supervisor_name,
-            "engineer_name": req.engineer_name,
-            "status": req.status,
-            "created_at": req.created_at.isoformat() if req.created_at else None
-        })
-    
-    return response
@@ -3,20 +3,18 @@ PostgreSQL System Settings & Reports Routes
 Migrated from MongoDB to PostgreSQL
 """
 from fastapi import APIRouter, HTTPException, Depends, Query
-from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Callable, Awaitable
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, desc, and_
+from sqlalchemy import func, desc, and_, case
 import uuid
 import json
-import io
 
 from database import (
-    get_postgres_session, SystemSetting, AuditLog, User,
-    PurchaseOrder, PurchaseOrderItem, Project, BudgetCategory, Supplier, MaterialRequest
+    get_postgres_session, SystemSetting, AuditLog, User, invalidate_settings,
+    PurchaseOrder, PurchaseOrderItem, Project, Supplier, MaterialRequest, SpendRollup
 )
 
 # Create router
@@ -24,6 +22,11 @@ pg_settings_router = APIRouter(prefix="/api/pg", tags=["PostgreSQL Settings & Re
 
 # Import auth dependency
 from routes.pg_auth_routes import get_current_user_pg, UserRole
+from database.connection import get_session_maker
+from services.exports import stream_rows, XlsxExport, XLSX_MEDIA_TYPE
+from services.jobs import JobContext, start_job, job_accepted
+from services.budget_stats import project_budgets
+from services.spend_rollups import spend_totals, month_start
 
 
 # ==================== PYDANTIC MODELS ====================
@@ -120,6 +123,7 @@ async def update_system_setting(
     )
     session.add(audit_log)
     
+    await invalidate_settings(session)
     await session.commit()
     
     return {"message": "تم تحديث الإعداد بنجاح"}
@@ -167,6 +171,8 @@ async def init_system_settings(
         session.add(setting)
         added += 1
     
+    if added:
+        await invalidate_settings(session)
     await session.commit()
     
     return {"message": f"تم إضافة {added} إعداد", "added_count": added}
@@ -174,6 +180,28 @@ async def init_system_settings(
 
 # ==================== REPORTS ROUTES ====================
 
+SPENDING_ORDER_STATUSES = ["approved", "printed", "shipped", "delivered"]
+
+
+async def spend_by_name(
+    session: AsyncSession,
+    field: str,
+    statuses: Optional[List[str]] = SPENDING_ORDER_STATUSES,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    unnamed: Optional[str] = None,
+    **filters
+) -> list:
+    """Order count and amount per project, category or supplier name from the spend rollups - largest first"""
+    groups = {}
+    for row in await spend_totals(session, [field], statuses, start, end, **filters):
+        name = row[field] or unnamed
+        group = groups.setdefault(name, {field: name, "total_amount": 0, "order_count": 0})
+        group["total_amount"] += row["total_amount"]
+        group["order_count"] += row["order_count"]
+    return sorted(groups.values(), key=lambda g: g["total_amount"], reverse=True)
+
+
 @pg_settings_router.get("/reports/cost-savings")
 async def get_cost_savings_report(
     project_id: Optional[str] = None,
@@ -187,60 +215,20 @@ async def get_cost_savings_report(
     if current_user.role not in [UserRole.PROCUREMENT_MANAGER, UserRole.GENERAL_MANAGER]:
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
-    query = select(PurchaseOrder).where(PurchaseOrder.status.in_(["approved", "printed", "shipped", "delivered"]))
-    
+    filters = {}
     if project_id:
-        query = query.where(PurchaseOrder.project_id == project_id)
+        filters["project_id"] = project_id
     if category_id:
-        query = query.where(PurchaseOrder.category_id == category_id)
-    if start_date:
-        query = query.where(PurchaseOrder.created_at >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.where(PurchaseOrder.created_at <= datetime.fromisoformat(end_date))
+        filters["category_id"] = category_id
+    start = datetime.fromisoformat(start_date) if start_date else None
+    end = datetime.fromisoformat(end_date) if end_date else None
     
-    result = await session.execute(query)
-    orders = result.scalars().all()
-    
-    # Group by project
-    by_project = {}
-    for order in orders:
-        project_name = order.project_name
-        if project_name not in by_project:
-            by_project[project_name] = {
-                "project_name": project_name,
-                "total_amount": 0,
-                "order_count": 0
-            }
-        by_project[project_name]["total_amount"] += order.total_amount
-        by_project[project_name]["order_count"] += 1
-    
-    # Group by category
-    by_category = {}
-    for order in orders:
-        category_name = order.category_name or "غير مصنف"
-        if category_name not in by_category:
-            by_category[category_name] = {
-                "category_name": category_name,
-                "total_amount": 0,
-                "order_count": 0
-            }
-        by_category[category_name]["total_amount"] += order.total_amount
-        by_category[category_name]["order_count"] += 1
-    
-    # Group by supplier
-    by_supplier = {}
-    for order in orders:
-        supplier_name = order.supplier_name
-        if supplier_name not in by_supplier:
-            by_supplier[supplier_name] = {
-                "supplier_name": supplier_name,
-                "total_amount": 0,
-                "order_count": 0
-            }
-        by_supplier[supplier_name]["total_amount"] += order.total_amount
-        by_supplier[supplier_name]["order_count"] += 1
+    by_project = await spend_by_name(session, "project_name", start=start, end=end, **filters)
+    by_category = await spend_by_name(session, "category_name", start=start, end=end, unnamed="غير مصنف", **filters)
+    by_supplier = await spend_by_name(session, "supplier_name", start=start, end=end, **filters)
     
-    total_amount = sum(o.total_amount for o in orders)
+    total_orders = sum(p["order_count"] for p in by_project)
+    total_amount = sum(p["total_amount"] for p in by_project)
     
     # Calculate summary data for frontend compatibility
     summary = {
@@ -252,7 +240,7 @@ async def get_cost_savings_report(
     
     # Add summary data to by_project for compatibility
     by_project_with_summary = []
-    for p in by_project.values():
+    for p in by_project:
         by_project_with_summary.append({
             **p,
             "estimated": p["total_amount"],
@@ -263,7 +251,7 @@ async def get_cost_savings_report(
     
     # Add summary data to by_category for compatibility
     by_category_with_summary = []
-    for c in by_category.values():
+    for c in by_category:
         by_category_with_summary.append({
             **c,
             "estimated": c["total_amount"],
@@ -273,12 +261,12 @@ async def get_cost_savings_report(
         })
     
     return {
-        "total_orders": len(orders),
+        "total_orders": total_orders,
         "total_amount": total_amount,
         "summary": summary,
         "by_project": by_project_with_summary,
         "by_category": by_category_with_summary,
-        "by_supplier": list(by_supplier.values())
+        "by_supplier": by_supplier
     }
 
 
@@ -340,244 +328,89 @@ async def get_budget_report(
     session: AsyncSession = Depends(get_postgres_session)
 ):
     """Get budget report - spending by category and project"""
-    
-    # Get all budget categories
-    categories_result = await session.execute(
-        select(BudgetCategory).order_by(BudgetCategory.name)
-    )
-    categories = categories_result.scalars().all()
-    
-    # Get all projects
-    projects_query = select(Project).where(Project.status == "active")
-    if project_id:
-        projects_query = projects_query.where(Project.id == project_id)
-    projects_result = await session.execute(projects_query.order_by(Project.name))
-    projects = projects_result.scalars().all()
-    
-    budget_data = []
-    
-    for project in projects:
-        project_budget = {
-            "project_id": project.id,
-            "project_name": project.name,
-            "categories": [],
-            "total_spent": 0,
-            "total_budget": 0
-        }
+    return await project_budgets(session, project_id)
+
+
+async def build_budget_export(
+    session: AsyncSession,
+    project_id: Optional[str] = None,
+    progress: Optional[Callable[..., Awaitable[None]]] = None
+) -> XlsxExport:
+    """Budget report rows per active project and category - progress(percent, message) is reported per project"""
+    export = XlsxExport("تقرير الميزانية", widths=[25, 15, 15, 15, 12, 12])
+    try:
+        export.title(f"📊 تقرير الميزانية - {datetime.now().strftime('%Y-%m-%d')}", span=6, style="banner")
+        export.blank()
         
-        # Get categories for this project
-        project_cats_result = await session.execute(
-            select(BudgetCategory).where(BudgetCategory.project_id == project.id)
-        )
-        project_cats = project_cats_result.scalars().all()
+        report = await project_budgets(session, project_id)
+        projects = report["projects"]
         
-        for category in project_cats:
-            # Sum of approved orders in this category for this project
-            spending_result = await session.execute(
-                select(func.coalesce(func.sum(PurchaseOrder.total_amount), 0))
-                .select_from(PurchaseOrder)
-                .where(
-                    PurchaseOrder.project_id == project.id,
-                    PurchaseOrder.category_id == category.id,
-                    PurchaseOrder.status.in_(["approved", "printed", "shipped", "delivered"])
-                )
-            )
-            spent = float(spending_result.scalar() or 0)
-            cat_budget = float(category.estimated_budget or 0)
+        for index, project in enumerate(projects):
+            if progress:
+                await progress(index * 100 / len(projects), f"المشروع {project['project_name']}")
+            export.title(f"🏢 {project['project_name']}", span=6, style="section")
+            export.header(['التصنيف', 'الميزانية', 'المصروف', 'المتبقي', 'النسبة %', 'الحالة'])
             
-            project_budget["categories"].append({
-                "category_id": category.id,
-                "category_name": category.name,
-                "budget": cat_budget,
-                "spent": spent,
-                "remaining": cat_budget - spent,
-                "percentage": round((spent / cat_budget * 100), 1) if cat_budget > 0 else 0
-            })
+            for line in project["categories"]:
+                # Determine status
+                if line["percentage"] >= 100:
+                    status, status_style = "تجاوز", "danger"
+                elif line["percentage"] >= 80:
+                    status, status_style = "تحذير", "warning"
+                else:
+                    status, status_style = "طبيعي", "cell_center"
+                
+                export.append(
+                    [line["category_name"], line["budget"], line["spent"], line["remaining"], f"{line['percentage']}%", status],
+                    ["cell"] * 5 + [status_style]
+                )
             
-            project_budget["total_spent"] += spent
-            project_budget["total_budget"] += cat_budget
-        
-        project_budget["remaining"] = project_budget["total_budget"] - project_budget["total_spent"]
-        project_budget["percentage"] = round(
-            (project_budget["total_spent"] / project_budget["total_budget"] * 100), 1
-        ) if project_budget["total_budget"] > 0 else 0
+            # Project totals
+            export.append(
+                ["المجموع", project["total_budget"], project["total_spent"], project["remaining"]],
+                "total"
+            )
+            export.blank()
         
-        budget_data.append(project_budget)
-    
-    # Summary
-    total_all_budgets = sum(p["total_budget"] for p in budget_data)
-    total_all_spent = sum(p["total_spent"] for p in budget_data)
+        # Grand total
+        summary = report["summary"]
+        export.title(
+            f"الإجمالي الكلي: الميزانية {summary['total_budget']:,.0f} | المصروف {summary['total_spent']:,.0f} | المتبقي {summary['total_remaining']:,.0f}",
+            span=6, style="banner"
+        )
+    except BaseException:
+        export.discard()
+        raise
     
-    return {
-        "projects": budget_data,
-        "summary": {
-            "total_budget": total_all_budgets,
-            "total_spent": total_all_spent,
-            "total_remaining": total_all_budgets - total_all_spent,
-            "overall_percentage": round((total_all_spent / total_all_budgets * 100), 1) if total_all_budgets > 0 else 0
-        }
-    }
+    return export
+
+
+def budget_export_filename() -> str:
+    return f"budget_report_{datetime.now().strftime('%Y%m%d')}.xlsx"
+
+
+async def budget_export_job(context: JobContext, project_id: Optional[str] = None) -> dict:
+    async with get_session_maker()() as session:
+        export = await build_budget_export(session, project_id, context.progress)
+    context.attach(await export.build(), budget_export_filename(), XLSX_MEDIA_TYPE)
+    return {"message": "تم إنشاء تقرير الميزانية"}
 
 
 @pg_settings_router.get("/reports/budget/export")
 async def export_budget_report(
     project_id: Optional[str] = None,
     format: str = "excel",
+    async_mode: bool = Query(False, alias="async"),
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """تصدير تقرير الميزانية إلى Excel"""
-    
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-    except ImportError:
-        raise HTTPException(status_code=500, detail="مكتبة Excel غير متوفرة")
+    """تصدير تقرير الميزانية إلى Excel - مع async=true يُنشأ في الخلفية ويُنزّل من /api/pg/jobs/{id}/download"""
+    if async_mode:
+        job = await start_job(session, "budget_export", current_user, budget_export_job, project_id=project_id)
+        return job_accepted(job)
     
-    # Get budget data
-    projects_query = select(Project).where(Project.status == "active")
-    if project_id:
-        projects_query = projects_query.where(Project.id == project_id)
-    projects_result = await session.execute(projects_query.order_by(Project.name))
-    projects = projects_result.scalars().all()
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "تقرير الميزانية"
-    ws.sheet_view.rightToLeft = True
-    
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    title_fill = PatternFill(start_color="2E75B6", end_color="2E75B6", fill_type="solid")
-    warning_fill = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
-    danger_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
-    thin_border = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
-    )
-    center_align = Alignment(horizontal='center', vertical='center')
-    
-    # Title
-    ws.merge_cells('A1:F1')
-    title_cell = ws['A1']
-    title_cell.value = f"📊 تقرير الميزانية - {datetime.now().strftime('%Y-%m-%d')}"
-    title_cell.font = Font(bold=True, size=16, color="FFFFFF")
-    title_cell.fill = title_fill
-    title_cell.alignment = center_align
-    
-    row_num = 3
-    total_all_budget = 0
-    total_all_spent = 0
-    
-    for project in projects:
-        # Project header
-        ws.merge_cells(f'A{row_num}:F{row_num}')
-        project_cell = ws.cell(row=row_num, column=1, value=f"🏢 {project.name}")
-        project_cell.font = Font(bold=True, size=12)
-        project_cell.fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
-        row_num += 1
-        
-        # Headers
-        headers = ['التصنيف', 'الميزانية', 'المصروف', 'المتبقي', 'النسبة %', 'الحالة']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=row_num, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = thin_border
-            cell.alignment = center_align
-        row_num += 1
-        
-        # Get categories for project
-        cats_result = await session.execute(
-            select(BudgetCategory).where(BudgetCategory.project_id == project.id)
-        )
-        categories = cats_result.scalars().all()
-        
-        project_total_budget = 0
-        project_total_spent = 0
-        
-        for category in categories:
-            # Calculate spending
-            spending_result = await session.execute(
-                select(func.coalesce(func.sum(PurchaseOrder.total_amount), 0))
-                .select_from(PurchaseOrder)
-                .where(
-                    PurchaseOrder.project_id == project.id,
-                    PurchaseOrder.category_id == category.id,
-                    PurchaseOrder.status.in_(["approved", "printed", "shipped", "delivered"])
-                )
-            )
-            spent = float(spending_result.scalar() or 0)
-            budget = float(category.estimated_budget or 0)
-            remaining = budget - spent
-            percentage = round((spent / budget * 100), 1) if budget > 0 else 0
-            
-            # Determine status
-            if percentage >= 100:
-                status = "تجاوز"
-                status_fill = danger_fill
-            elif percentage >= 80:
-                status = "تحذير"
-                status_fill = warning_fill
-            else:
-                status = "طبيعي"
-                status_fill = None
-            
-            ws.cell(row=row_num, column=1, value=category.name).border = thin_border
-            ws.cell(row=row_num, column=2, value=budget).border = thin_border
-            ws.cell(row=row_num, column=3, value=spent).border = thin_border
-            ws.cell(row=row_num, column=4, value=remaining).border = thin_border
-            ws.cell(row=row_num, column=5, value=f"{percentage}%").border = thin_border
-            status_cell = ws.cell(row=row_num, column=6, value=status)
-            status_cell.border = thin_border
-            status_cell.alignment = center_align
-            if status_fill:
-                status_cell.fill = status_fill
-                status_cell.font = Font(bold=True, color="FFFFFF")
-            
-            row_num += 1
-            project_total_budget += budget
-            project_total_spent += spent
-        
-        # Project totals
-        ws.cell(row=row_num, column=1, value="المجموع").font = Font(bold=True)
-        ws.cell(row=row_num, column=1).border = thin_border
-        ws.cell(row=row_num, column=2, value=project_total_budget).font = Font(bold=True)
-        ws.cell(row=row_num, column=2).border = thin_border
-        ws.cell(row=row_num, column=3, value=project_total_spent).font = Font(bold=True)
-        ws.cell(row=row_num, column=3).border = thin_border
-        ws.cell(row=row_num, column=4, value=project_total_budget - project_total_spent).font = Font(bold=True)
-        ws.cell(row=row_num, column=4).border = thin_border
-        
-        total_all_budget += project_total_budget
-        total_all_spent += project_total_spent
-        row_num += 2
-    
-    # Grand total
-    ws.merge_cells(f'A{row_num}:F{row_num}')
-    grand_total = ws.cell(row=row_num, column=1, value=f"الإجمالي الكلي: الميزانية {total_all_budget:,.0f} | المصروف {total_all_spent:,.0f} | المتبقي {total_all_budget - total_all_spent:,.0f}")
-    grand_total.font = Font(bold=True, size=12)
-    grand_total.fill = title_fill
-    grand_total.font = Font(bold=True, color="FFFFFF", size=12)
-    
-    # Column widths
-    ws.column_dimensions['A'].width = 25
-    ws.column_dimensions['B'].width = 15
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 12
-    ws.column_dimensions['F'].width = 12
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=budget_report_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-    )
+    export = await build_budget_export(session, project_id)
+    return await export.response(budget_export_filename())
 
 
 # ==================== ADVANCED REPORTS ====================
@@ -597,35 +430,26 @@ async def get_advanced_summary_report(
     if current_user.role not in [UserRole.PROCUREMENT_MANAGER, UserRole.GENERAL_MANAGER]:
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
-    # Build filters for orders
-    order_filters = []
+    # Filters - orders are counted from the spend rollups
+    order_filters = {}
     request_filters = []
+    start = datetime.fromisoformat(start_date) if start_date else None
+    end = datetime.fromisoformat(end_date) if end_date else None
     
     if project_id:
-        order_filters.append(PurchaseOrder.project_id == project_id)
+        order_filters["project_id"] = project_id
         request_filters.append(MaterialRequest.project_id == project_id)
     if supplier_id:
-        order_filters.append(PurchaseOrder.supplier_id == supplier_id)
+        order_filters["supplier_id"] = supplier_id
     if engineer_id:
         request_filters.append(MaterialRequest.engineer_id == engineer_id)
     if supervisor_id:
         request_filters.append(MaterialRequest.supervisor_id == supervisor_id)
-    if start_date:
-        start = datetime.fromisoformat(start_date)
-        order_filters.append(PurchaseOrder.created_at >= start)
+    if start:
         request_filters.append(MaterialRequest.created_at >= start)
-    if end_date:
-        end = datetime.fromisoformat(end_date)
-        order_filters.append(PurchaseOrder.created_at <= end)
+    if end:
         request_filters.append(MaterialRequest.created_at <= end)
     
-    # Total Purchase Orders
-    orders_query = select(PurchaseOrder)
-    if order_filters:
-        orders_query = orders_query.where(and_(*order_filters))
-    orders_result = await session.execute(orders_query)
-    all_orders = orders_result.scalars().all()
-    
     # Total Material Requests
     requests_query = select(MaterialRequest)
     if request_filters:
@@ -636,11 +460,10 @@ async def get_advanced_summary_report(
     # Order statistics
     orders_by_status = {}
     total_order_amount = 0
-    for order in all_orders:
-        status = order.status or "pending"
-        orders_by_status[status] = orders_by_status.get(status, 0) + 1
-        if order.status in ["approved", "printed", "shipped", "delivered"]:
-            total_order_amount += order.total_amount or 0
+    for row in await spend_totals(session, ["status_bucket"], None, start, end, **order_filters):
+        orders_by_status[row["status_bucket"]] = row["order_count"]
+        if row["status_bucket"] in SPENDING_ORDER_STATUSES:
+            total_order_amount += row["total_amount"]
     
     # Request statistics
     requests_by_status = {}
@@ -649,70 +472,43 @@ async def get_advanced_summary_report(
         requests_by_status[status] = requests_by_status.get(status, 0) + 1
     
     # Monthly spending trend (last 6 months)
-    monthly_spending = []
     from datetime import timedelta
     now = datetime.utcnow()
-    for i in range(5, -1, -1):
-        month_start = (now.replace(day=1) - timedelta(days=i*30)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1)
-        
-        month_result = await session.execute(
-            select(func.coalesce(func.sum(PurchaseOrder.total_amount), 0))
-            .where(
-                PurchaseOrder.status.in_(["approved", "printed", "shipped", "delivered"]),
-                PurchaseOrder.created_at >= month_start,
-                PurchaseOrder.created_at < month_end
-            )
-        )
-        month_total = float(month_result.scalar() or 0)
-        monthly_spending.append({
-            "month": month_start.strftime("%Y-%m"),
-            "month_name": month_start.strftime("%B %Y"),
-            "amount": month_total
-        })
+    months = [month_start(now.replace(day=1) - timedelta(days=i*30)) for i in range(5, -1, -1)]
+    month_totals = {
+        row["month"].strftime("%Y-%m"): row["total_amount"]
+        for row in await spend_totals(session, ["month"], SPENDING_ORDER_STATUSES, start=months[0])
+    }
+    monthly_spending = [
+        {
+            "month": month.strftime("%Y-%m"),
+            "month_name": month.strftime("%B %Y"),
+            "amount": month_totals.get(month.strftime("%Y-%m"), 0.0)
+        }
+        for month in months
+    ]
     
     # Top 5 projects by spending
-    top_projects_result = await session.execute(
-        select(
-            PurchaseOrder.project_name,
-            func.sum(PurchaseOrder.total_amount).label("total")
-        )
-        .where(PurchaseOrder.status.in_(["approved", "printed", "shipped", "delivered"]))
-        .group_by(PurchaseOrder.project_name)
-        .order_by(desc("total"))
-        .limit(5)
-    )
-    top_projects = [{"name": r[0], "amount": float(r[1] or 0)} for r in top_projects_result.all()]
+    top_projects = [
+        {"name": p["project_name"], "amount": p["total_amount"]}
+        for p in (await spend_by_name(session, "project_name"))[:5]
+    ]
     
     # Top 5 suppliers by amount
-    top_suppliers_result = await session.execute(
-        select(
-            PurchaseOrder.supplier_name,
-            func.sum(PurchaseOrder.total_amount).label("total"),
-            func.count(PurchaseOrder.id).label("order_count")
-        )
-        .where(PurchaseOrder.status.in_(["approved", "printed", "shipped", "delivered"]))
-        .group_by(PurchaseOrder.supplier_name)
-        .order_by(desc("total"))
-        .limit(5)
-    )
-    top_suppliers = [{"name": r[0], "amount": float(r[1] or 0), "orders": r[2]} for r in top_suppliers_result.all()]
+    top_suppliers = [
+        {"name": s["supplier_name"], "amount": s["total_amount"], "orders": s["order_count"]}
+        for s in (await spend_by_name(session, "supplier_name"))[:5]
+    ]
     
     # Spending by category
-    by_category_result = await session.execute(
-        select(
-            PurchaseOrder.category_name,
-            func.sum(PurchaseOrder.total_amount).label("total")
-        )
-        .where(PurchaseOrder.status.in_(["approved", "printed", "shipped", "delivered"]))
-        .group_by(PurchaseOrder.category_name)
-        .order_by(desc("total"))
-    )
-    spending_by_category = [{"name": r[0] or "غير مصنف", "amount": float(r[1] or 0)} for r in by_category_result.all()]
+    spending_by_category = [
+        {"name": c["category_name"], "amount": c["total_amount"]}
+        for c in await spend_by_name(session, "category_name", unnamed="غير مصنف")
+    ]
     
     return {
         "summary": {
-            "total_orders": len(all_orders),
+            "total_orders": sum(orders_by_status.values()),
             "total_requests": len(all_requests),
             "total_spending": total_order_amount,
             "approved_orders": orders_by_status.get("approved", 0) + orders_by_status.get("printed", 0) + orders_by_status.get("shipped", 0) + orders_by_status.get("delivered", 0),
@@ -847,100 +643,134 @@ async def get_supplier_performance_report(
     suppliers_result = await session.execute(suppliers_query)
     suppliers = suppliers_result.scalars().all()
     
-    performance_data = []
+    # Date filters
+    start = end = None
+    if start_date:
+        try:
+            start = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+        except:
+            pass
     
-    for supplier in suppliers:
-        # Orders for this supplier
-        orders_query = select(PurchaseOrder).where(PurchaseOrder.supplier_id == supplier.id)
+    if end_date:
+        try:
+            end = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+        except:
+            pass
+    
+    # Order counts and amounts per supplier from the spend rollups
+    approved_statuses = ["approved", "printed", "shipped", "delivered", "partially_delivered"]
+    order_filters = {"project_id": project_id} if project_id else {}
+    if supplier_id:
+        order_filters["supplier_id"] = supplier_id
+    supplier_stats = {}
+    for row in await spend_totals(session, ["supplier_id", "status_bucket"], None, start, end, **order_filters):
+        stats = supplier_stats.setdefault(row["supplier_id"], {"total": 0, "completed": 0, "approved": 0, "amount": 0.0})
+        stats["total"] += row["order_count"]
+        if row["status_bucket"] == "delivered":
+            stats["completed"] += row["order_count"]
+        if row["status_bucket"] in approved_statuses:
+            stats["approved"] += row["order_count"]
+            stats["amount"] += row["total_amount"]
+    
+    # Delivery timing and item prices need the orders themselves - one query each for all suppliers
+    def supplier_orders(query):
+        if supplier_id:
+            query = query.where(PurchaseOrder.supplier_id == supplier_id)
+        else:
+            query = query.where(PurchaseOrder.supplier_id.isnot(None))
         if project_id:
-            orders_query = orders_query.where(PurchaseOrder.project_id == project_id)
-        
-        # Date filters
-        if start_date:
-            try:
-                start = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                orders_query = orders_query.where(PurchaseOrder.created_at >= start)
-            except:
-                pass
-        
-        if end_date:
+            query = query.where(PurchaseOrder.project_id == project_id)
+        if start:
+            query = query.where(PurchaseOrder.created_at >= start)
+        if end:
+            query = query.where(PurchaseOrder.created_at <= end)
+        return query
+    
+    # On-time delivery: [on time, late, late and not yet delivered] per supplier
+    delivery_stats = {}
+    timing_query = supplier_orders(
+        select(
+            PurchaseOrder.supplier_id, PurchaseOrder.status,
+            PurchaseOrder.expected_delivery_date, PurchaseOrder.delivered_at
+        ).where(PurchaseOrder.expected_delivery_date.isnot(None))
+    )
+    now = datetime.now()
+    async for rows in stream_rows(timing_query, session=session):
+        for order in rows:
+            if not order.expected_delivery_date:
+                continue
             try:
-                end = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                orders_query = orders_query.where(PurchaseOrder.created_at <= end)
-            except:
-                pass
-        
-        orders_result = await session.execute(orders_query.order_by(desc(PurchaseOrder.created_at)))
-        orders = orders_result.scalars().all()
-        
-        if not orders:
+                expected = datetime.strptime(order.expected_delivery_date, "%Y-%m-%d")
+            except ValueError:
+                continue
+            counts = delivery_stats.setdefault(order.supplier_id, [0, 0, 0])
+            if order.status == "delivered" and order.delivered_at:
+                if order.delivered_at.replace(tzinfo=None) <= expected:
+                    counts[0] += 1
+                else:
+                    counts[1] += 1
+            elif order.status != "delivered" and now > expected:
+                counts[2] += 1  # Should have been delivered but wasn't
+    
+    # Items per supplier, newest orders first
+    supplier_items = {}
+    items_query = supplier_orders(
+        select(
+            PurchaseOrder.supplier_id, PurchaseOrder.order_number, PurchaseOrder.created_at,
+            PurchaseOrderItem.name, PurchaseOrderItem.unit, PurchaseOrderItem.quantity,
+            PurchaseOrderItem.unit_price, PurchaseOrderItem.total_price
+        )
+        .join(PurchaseOrderItem, PurchaseOrderItem.order_id == PurchaseOrder.id)
+        .order_by(desc(PurchaseOrder.created_at), PurchaseOrder.id, PurchaseOrderItem.item_index)
+    )
+    async for rows in stream_rows(items_query, session=session):
+        for item in rows:
+            # Filter by item name if specified
+            if item_name and item_name.lower() not in item.name.lower():
+                continue
+            
+            items_data = supplier_items.setdefault(item.supplier_id, {})
+            if item.name not in items_data:
+                items_data[item.name] = {
+                    "name": item.name,
+                    "unit": item.unit,
+                    "total_quantity": 0,
+                    "total_price": 0,
+                    "prices": [],
+                    "order_count": 0,
+                    "min_price": None,
+                    "max_price": None
+                }
+            
+            items_data[item.name]["total_quantity"] += item.quantity
+            items_data[item.name]["total_price"] += item.total_price or 0
+            items_data[item.name]["order_count"] += 1
+            items_data[item.name]["prices"].append({
+                "unit_price": item.unit_price,
+                "quantity": item.quantity,
+                "order_number": item.order_number,
+                "date": item.created_at.strftime("%Y-%m-%d") if item.created_at else None
+            })
+            
+            # Track min/max prices
+            if items_data[item.name]["min_price"] is None or item.unit_price < items_data[item.name]["min_price"]:
+                items_data[item.name]["min_price"] = item.unit_price
+            if items_data[item.name]["max_price"] is None or item.unit_price > items_data[item.name]["max_price"]:
+                items_data[item.name]["max_price"] = item.unit_price
+    
+    performance_data = []
+    
+    for supplier in suppliers:
+        stats = supplier_stats.get(supplier.id)
+        if not stats:
             continue
         
-        total_orders = len(orders)
-        completed_orders = len([o for o in orders if o.status in ["delivered"]])
-        approved_orders = len([o for o in orders if o.status in ["approved", "printed", "shipped", "delivered", "partially_delivered"]])
-        total_amount = sum(o.total_amount or 0 for o in orders if o.status in ["approved", "printed", "shipped", "delivered", "partially_delivered"])
-        
-        # Calculate on-time delivery rate
-        on_time_deliveries = 0
-        late_deliveries = 0
-        pending_late = 0  # Orders that are late but not yet delivered
-        
-        for order in orders:
-            if order.expected_delivery_date:
-                try:
-                    expected = datetime.strptime(order.expected_delivery_date, "%Y-%m-%d")
-                    
-                    if order.status == "delivered" and order.delivered_at:
-                        if order.delivered_at.replace(tzinfo=None) <= expected:
-                            on_time_deliveries += 1
-                        else:
-                            late_deliveries += 1
-                    elif order.status not in ["delivered"] and datetime.now() > expected:
-                        pending_late += 1  # Should have been delivered but wasn't
-                except:
-                    pass
-        
-        # Get items for this supplier's orders
-        items_data = {}
-        for order in orders:
-            items_result = await session.execute(
-                select(PurchaseOrderItem).where(PurchaseOrderItem.order_id == order.id)
-            )
-            items = items_result.scalars().all()
-            
-            for item in items:
-                # Filter by item name if specified
-                if item_name and item_name.lower() not in item.name.lower():
-                    continue
-                
-                if item.name not in items_data:
-                    items_data[item.name] = {
-                        "name": item.name,
-                        "unit": item.unit,
-                        "total_quantity": 0,
-                        "total_price": 0,
-                        "prices": [],
-                        "order_count": 0,
-                        "min_price": None,
-                        "max_price": None
-                    }
-                
-                items_data[item.name]["total_quantity"] += item.quantity
-                items_data[item.name]["total_price"] += item.total_price or 0
-                items_data[item.name]["order_count"] += 1
-                items_data[item.name]["prices"].append({
-                    "unit_price": item.unit_price,
-                    "quantity": item.quantity,
-                    "order_number": order.order_number,
-                    "date": order.created_at.strftime("%Y-%m-%d") if order.created_at else None
-                })
-                
-                # Track min/max prices
-                if items_data[item.name]["min_price"] is None or item.unit_price < items_data[item.name]["min_price"]:
-                    items_data[item.name]["min_price"] = item.unit_price
-                if items_data[item.name]["max_price"] is None or item.unit_price > items_data[item.name]["max_price"]:
-                    items_data[item.name]["max_price"] = item.unit_price
+        total_orders = stats["total"]
+        completed_orders = stats["completed"]
+        approved_orders = stats["approved"]
+        total_amount = stats["amount"]
+        on_time_deliveries, late_deliveries, pending_late = delivery_stats.get(supplier.id, [0, 0, 0])
+        items_data = supplier_items.get(supplier.id, {})
         
         # Calculate average prices
         items_list = []
@@ -1167,88 +997,42 @@ async def export_price_variance_report(
     )
     
     if format == "excel":
-        try:
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        except ImportError:
-            raise HTTPException(status_code=500, detail="مكتبة Excel غير متوفرة")
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "تقرير اختلاف الأسعار"
-        ws.sheet_view.rightToLeft = True
-        
-        # Styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="9333EA", end_color="9333EA", fill_type="solid")
-        increase_fill = PatternFill(start_color="FEE2E2", end_color="FEE2E2", fill_type="solid")
-        decrease_fill = PatternFill(start_color="D1FAE5", end_color="D1FAE5", fill_type="solid")
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Title
-        ws.merge_cells('A1:H1')
-        ws['A1'] = "تقرير اختلاف الأسعار (التحليل الزمني)"
-        ws['A1'].font = Font(bold=True, size=14)
-        ws['A1'].alignment = Alignment(horizontal='center')
-        
-        # Headers
-        headers = ['الصنف', 'الوحدة', 'أول سعر', 'آخر سعر', 'أقل سعر', 'أعلى سعر', 'التغير', 'نسبة التغير %']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = thin_border
-        
-        # Data
-        for row_num, item in enumerate(report_data["items"], 4):
-            ws.cell(row=row_num, column=1, value=item["name"]).border = thin_border
-            ws.cell(row=row_num, column=2, value=item["unit"]).border = thin_border
-            ws.cell(row=row_num, column=3, value=item["first_price"]).border = thin_border
-            ws.cell(row=row_num, column=4, value=item["last_price"]).border = thin_border
-            ws.cell(row=row_num, column=5, value=item["min_price"]).border = thin_border
-            ws.cell(row=row_num, column=6, value=item["max_price"]).border = thin_border
-            
-            change_cell = ws.cell(row=row_num, column=7, value=item["price_change"])
-            change_cell.border = thin_border
+        async with XlsxExport("تقرير اختلاف الأسعار", widths=[35, 12, 14, 14, 14, 14, 14, 14], header_color="9333EA") as export:
+            export.title("تقرير اختلاف الأسعار (التحليل الزمني)", span=8, style="heading")
+            export.blank()
+            export.header(['الصنف', 'الوحدة', 'أول سعر', 'آخر سعر', 'أقل سعر', 'أعلى سعر', 'التغير', 'نسبة التغير %'])
             
-            percent_cell = ws.cell(row=row_num, column=8, value=f"{item['price_change_percent']}%")
-            percent_cell.border = thin_border
+            for item in report_data["items"]:
+                # Color code based on trend
+                if item["price_change"] > 0:
+                    style = "increase"
+                elif item["price_change"] < 0:
+                    style = "decrease"
+                else:
+                    style = "cell"
+                export.append([
+                    item["name"],
+                    item["unit"],
+                    item["first_price"],
+                    item["last_price"],
+                    item["min_price"],
+                    item["max_price"],
+                    item["price_change"],
+                    f"{item['price_change_percent']}%"
+                ], style)
             
-            # Color code based on trend
-            if item["price_change"] > 0:
-                for c in range(1, 9):
-                    ws.cell(row=row_num, column=c).fill = increase_fill
-            elif item["price_change"] < 0:
-                for c in range(1, 9):
-                    ws.cell(row=row_num, column=c).fill = decrease_fill
-        
-        # Column widths
-        ws.column_dimensions['A'].width = 35
-        ws.column_dimensions['B'].width = 12
-        for c in 'CDEFGH':
-            ws.column_dimensions[c].width = 14
-        
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=price_variance_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-        )
+            return await export.response(f"price_variance_{datetime.now().strftime('%Y%m%d')}.xlsx")
     
     return report_data
 
 
 # ==================== EXPORT ENDPOINTS ====================
-from fastapi.responses import StreamingResponse
-import io
+
+# Orders whose amounts count as spending in the exported reports
+def or_unknown(column):
+    """Group label for a name column - NULL and empty names become غير محدد"""
+    return func.coalesce(func.nullif(column, ""), "غير محدد")
+
 
 @pg_settings_router.get("/reports/advanced/summary/export")
 async def export_summary_report(
@@ -1264,90 +1048,31 @@ async def export_summary_report(
     if current_user.role not in [UserRole.PROCUREMENT_MANAGER, UserRole.GENERAL_MANAGER]:
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        
-        # Get data with filters
-        filters = []
-        if project_id:
-            filters.append(PurchaseOrder.project_id == project_id)
-        if supplier_id:
-            filters.append(PurchaseOrder.supplier_id == supplier_id)
-        
-        orders_query = select(PurchaseOrder).where(
-            PurchaseOrder.status.in_(["approved", "printed", "shipped", "delivered"])
-        )
-        if filters:
-            orders_query = orders_query.where(and_(*filters))
-        
-        orders_result = await session.execute(orders_query)
-        orders = orders_result.scalars().all()
-        
-        # Create workbook
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "الملخص التنفيذي"
-        ws.sheet_view.rightToLeft = True
-        
-        # Styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="EA580C", end_color="EA580C", fill_type="solid")
-        
-        # Title
-        ws.merge_cells('A1:E1')
-        ws['A1'] = "تقرير الملخص التنفيذي"
-        ws['A1'].font = Font(bold=True, size=16)
-        ws['A1'].alignment = Alignment(horizontal='center')
+    # Get data with filters - from the spend rollups
+    filters = {}
+    if project_id:
+        filters["project_id"] = project_id
+    if supplier_id:
+        filters["supplier_id"] = supplier_id
+    
+    by_project = await spend_by_name(session, "project_name", unnamed="غير محدد", **filters)
+    by_project.sort(key=lambda p: p["project_name"])
+    
+    async with XlsxExport("الملخص التنفيذي", widths=[30, 15, 20, 15, 15], header_color="EA580C") as export:
+        export.title("تقرير الملخص التنفيذي", span=5)
+        export.blank()
         
         # Summary
-        ws['A3'] = "إجمالي أوامر الشراء:"
-        ws['B3'] = len(orders)
-        ws['A4'] = "إجمالي المصروفات:"
-        ws['B4'] = sum(o.total_amount or 0 for o in orders)
+        export.append(["إجمالي أوامر الشراء:", sum(p["order_count"] for p in by_project)])
+        export.append(["إجمالي المصروفات:", sum(p["total_amount"] for p in by_project)])
+        export.blank(2)
         
         # Orders by project
-        ws['A7'] = "المشروع"
-        ws['B7'] = "عدد الطلبات"
-        ws['C7'] = "المبلغ"
-        for cell in ['A7', 'B7', 'C7']:
-            ws[cell].font = header_font
-            ws[cell].fill = header_fill
-        
-        by_project = {}
-        for order in orders:
-            pname = order.project_name or "غير محدد"
-            if pname not in by_project:
-                by_project[pname] = {"count": 0, "amount": 0}
-            by_project[pname]["count"] += 1
-            by_project[pname]["amount"] += order.total_amount or 0
-        
-        row = 8
-        for pname, data in by_project.items():
-            ws[f'A{row}'] = pname
-            ws[f'B{row}'] = data["count"]
-            ws[f'C{row}'] = data["amount"]
-            row += 1
-        
-        # Set column widths manually
-        ws.column_dimensions['A'].width = 30
-        ws.column_dimensions['B'].width = 15
-        ws.column_dimensions['C'].width = 20
-        ws.column_dimensions['D'].width = 15
-        ws.column_dimensions['E'].width = 15
+        export.header(["المشروع", "عدد الطلبات", "المبلغ"])
+        for project in by_project:
+            export.append([project["project_name"], project["order_count"], project["total_amount"]])
         
-        # Save to buffer
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        return StreamingResponse(
-            buffer,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=summary_report.xlsx"}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"فشل في تصدير التقرير: {str(e)}")
+        return await export.response("summary_report.xlsx")
 
 
 @pg_settings_router.get("/reports/advanced/approval-analytics/export")
@@ -1363,99 +1088,45 @@ async def export_approval_report(
     if current_user.role not in [UserRole.PROCUREMENT_MANAGER, UserRole.GENERAL_MANAGER]:
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, Alignment, PatternFill
-        
-        # Get data with filters
-        filters = []
-        if project_id:
-            filters.append(MaterialRequest.project_id == project_id)
-        if engineer_id:
-            filters.append(MaterialRequest.engineer_id == engineer_id)
-        if supervisor_id:
-            filters.append(MaterialRequest.supervisor_id == supervisor_id)
-        
-        query = select(MaterialRequest)
-        if filters:
-            query = query.where(and_(*filters))
-        
-        result = await session.execute(query)
-        requests = result.scalars().all()
-        
-        # Create workbook
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "تحليل الاعتمادات"
-        ws.sheet_view.rightToLeft = True
-        
-        # Styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="16A34A", end_color="16A34A", fill_type="solid")
-        
-        # Title
-        ws.merge_cells('A1:E1')
-        ws['A1'] = "تقرير تحليل الاعتمادات"
-        ws['A1'].font = Font(bold=True, size=16)
+    # Get data with filters
+    filters = []
+    if project_id:
+        filters.append(MaterialRequest.project_id == project_id)
+    if engineer_id:
+        filters.append(MaterialRequest.engineer_id == engineer_id)
+    if supervisor_id:
+        filters.append(MaterialRequest.supervisor_id == supervisor_id)
+    
+    is_approved = MaterialRequest.status.in_(["approved", "po_issued"])
+    is_rejected = MaterialRequest.status.in_(["rejected", "rejected_engineer"])
+    counts = (
+        func.count(MaterialRequest.id).label("total"),
+        func.coalesce(func.sum(case((is_approved, 1), else_=0)), 0).label("approved"),
+        func.coalesce(func.sum(case((is_rejected, 1), else_=0)), 0).label("rejected")
+    )
+    
+    totals = (await session.execute(select(*counts).where(*filters))).one()
+    
+    engineer_name = or_unknown(MaterialRequest.engineer_name).label("engineer_name")
+    by_engineer = select(engineer_name, *counts).where(*filters).group_by(engineer_name).order_by(engineer_name)
+    
+    async with XlsxExport("تحليل الاعتمادات", widths=[25, 12, 12, 12, 12], header_color="16A34A") as export:
+        export.title("تقرير تحليل الاعتمادات", span=5)
+        export.blank()
         
         # Summary
-        total = len(requests)
-        approved = len([r for r in requests if r.status in ["approved", "po_issued"]])
-        rejected = len([r for r in requests if r.status in ["rejected", "rejected_engineer"]])
-        
-        ws['A3'] = "إجمالي الطلبات:"
-        ws['B3'] = total
-        ws['A4'] = "معتمدة:"
-        ws['B4'] = approved
-        ws['A5'] = "مرفوضة:"
-        ws['B5'] = rejected
+        export.append(["إجمالي الطلبات:", totals.total])
+        export.append(["معتمدة:", totals.approved])
+        export.append(["مرفوضة:", totals.rejected])
+        export.blank(2)
         
         # By engineer
-        ws['A8'] = "المهندس"
-        ws['B8'] = "الإجمالي"
-        ws['C8'] = "معتمدة"
-        ws['D8'] = "مرفوضة"
-        for cell in ['A8', 'B8', 'C8', 'D8']:
-            ws[cell].font = header_font
-            ws[cell].fill = header_fill
-        
-        by_engineer = {}
-        for req in requests:
-            eng = req.engineer_name or "غير محدد"
-            if eng not in by_engineer:
-                by_engineer[eng] = {"total": 0, "approved": 0, "rejected": 0}
-            by_engineer[eng]["total"] += 1
-            if req.status in ["approved", "po_issued"]:
-                by_engineer[eng]["approved"] += 1
-            elif req.status in ["rejected", "rejected_engineer"]:
-                by_engineer[eng]["rejected"] += 1
-        
-        row = 9
-        for eng, data in by_engineer.items():
-            ws[f'A{row}'] = eng
-            ws[f'B{row}'] = data["total"]
-            ws[f'C{row}'] = data["approved"]
-            ws[f'D{row}'] = data["rejected"]
-            row += 1
+        export.header(["المهندس", "الإجمالي", "معتمدة", "مرفوضة"])
+        async for rows in stream_rows(by_engineer, session=session):
+            for row in rows:
+                export.append([row.engineer_name, row.total, row.approved, row.rejected])
         
-        # Set column widths
-        ws.column_dimensions['A'].width = 25
-        ws.column_dimensions['B'].width = 12
-        ws.column_dimensions['C'].width = 12
-        ws.column_dimensions['D'].width = 12
-        ws.column_dimensions['E'].width = 12
-        
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        return StreamingResponse(
-            buffer,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=approval_report.xlsx"}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"فشل في تصدير التقرير: {str(e)}")
+        return await export.response("approval_report.xlsx")
 
 
 @pg_settings_router.get("/reports/advanced/supplier-performance/export")
@@ -1469,93 +1140,54 @@ async def export_supplier_report(
     if current_user.role not in [UserRole.PROCUREMENT_MANAGER, UserRole.GENERAL_MANAGER]:
         raise HTTPException(status_code=403, detail="غير مصرح لك بهذا الإجراء")
     
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, Alignment, PatternFill
-        
-        # Get suppliers
-        query = select(Supplier)
-        if supplier_id:
-            query = query.where(Supplier.id == supplier_id)
-        result = await session.execute(query)
-        suppliers = result.scalars().all()
-        
-        # Create workbook
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "أداء الموردين"
-        ws.sheet_view.rightToLeft = True
-        
-        # Styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="3B82F6", end_color="3B82F6", fill_type="solid")
-        
-        # Title
-        ws.merge_cells('A1:G1')
-        ws['A1'] = "تقرير أداء الموردين"
-        ws['A1'].font = Font(bold=True, size=16)
-        
-        # Headers
-        headers = ["المورد", "جهة الاتصال", "الهاتف", "عدد الطلبات", "المكتملة", "إجمالي المشتريات", "متوسط الطلب"]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
+    # Order stats per supplier from the spend rollups
+    is_spending = SpendRollup.status_bucket.in_(SPENDING_ORDER_STATUSES)
+    stats = select(
+        SpendRollup.supplier_id,
+        func.sum(SpendRollup.order_count).label("order_count"),
+        func.sum(case((SpendRollup.status_bucket == "delivered", SpendRollup.order_count), else_=0)).label("completed"),
+        func.sum(case((is_spending, SpendRollup.total_amount), else_=0)).label("amount")
+    ).where(SpendRollup.supplier_id.isnot(None)).group_by(SpendRollup.supplier_id).subquery()
+    
+    query = select(
+        Supplier.name, Supplier.contact_person, Supplier.phone,
+        func.coalesce(stats.c.order_count, 0).label("order_count"),
+        func.coalesce(stats.c.completed, 0).label("completed"),
+        func.coalesce(stats.c.amount, 0).label("amount")
+    ).outerjoin(stats, stats.c.supplier_id == Supplier.id)
+    if supplier_id:
+        query = query.where(Supplier.id == supplier_id)
+    query = query.order_by(Supplier.name)
+    
+    async with XlsxExport("أداء الموردين", widths=[25, 20, 15, 12, 12, 18, 15], header_color="3B82F6") as export:
+        export.title("تقرير أداء الموردين", span=7)
+        export.blank()
+        export.header(["المورد", "جهة الاتصال", "الهاتف", "عدد الطلبات", "المكتملة", "إجمالي المشتريات", "متوسط الطلب"])
         
-        row = 4
         total_orders = 0
         total_spending = 0
         
-        for supplier in suppliers:
-            # Get orders for this supplier
-            orders_result = await session.execute(
-                select(PurchaseOrder).where(PurchaseOrder.supplier_id == supplier.id)
-            )
-            orders = orders_result.scalars().all()
-            
-            order_count = len(orders)
-            completed = len([o for o in orders if o.status == "delivered"])
-            amount = sum(o.total_amount or 0 for o in orders if o.status in ["approved", "printed", "shipped", "delivered"])
-            avg = amount / order_count if order_count > 0 else 0
-            
-            ws.cell(row=row, column=1, value=supplier.name)
-            ws.cell(row=row, column=2, value=supplier.contact_person or "-")
-            ws.cell(row=row, column=3, value=supplier.phone or "-")
-            ws.cell(row=row, column=4, value=order_count)
-            ws.cell(row=row, column=5, value=completed)
-            ws.cell(row=row, column=6, value=amount)
-            ws.cell(row=row, column=7, value=round(avg, 2))
-            
-            total_orders += order_count
-            total_spending += amount
-            row += 1
+        async for rows in stream_rows(query, session=session):
+            for row in rows:
+                amount = row.amount or 0
+                avg = amount / row.order_count if row.order_count > 0 else 0
+                export.append([
+                    row.name,
+                    row.contact_person or "-",
+                    row.phone or "-",
+                    row.order_count,
+                    row.completed,
+                    amount,
+                    round(avg, 2)
+                ])
+                total_orders += row.order_count
+                total_spending += amount
         
         # Summary row
-        ws.cell(row=row+1, column=1, value="الإجمالي")
-        ws.cell(row=row+1, column=1).font = Font(bold=True)
-        ws.cell(row=row+1, column=4, value=total_orders)
-        ws.cell(row=row+1, column=6, value=total_spending)
+        export.blank()
+        export.append(["الإجمالي", None, None, total_orders, None, total_spending], ["label", None, None, None, None, None])
         
-        # Set column widths
-        ws.column_dimensions['A'].width = 25
-        ws.column_dimensions['B'].width = 20
-        ws.column_dimensions['C'].width = 15
-        ws.column_dimensions['D'].width = 12
-        ws.column_dimensions['E'].width = 12
-        ws.column_dimensions['F'].width = 18
-        ws.column_dimensions['G'].width = 15
-        
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        return StreamingResponse(
-            buffer,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=supplier_report.xlsx"}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"فشل في تصدير التقرير: {str(e)}")
+        return await export.response("supplier_report.xlsx")
 
 
 # ==================== AUDIT LOG ROUTES ====================
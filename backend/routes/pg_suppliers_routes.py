@@ -3,7 +3,6 @@ PostgreSQL Suppliers Routes - Supplier Management
 Migrated from MongoDB to PostgreSQL
 """
 from fastapi import APIRouter, HTTPException, Depends, Query
-from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, timedelta
@@ -11,7 +10,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func, desc, and_, or_
 import uuid
-import io
 
 from database import get_postgres_session, Supplier, User, PurchaseOrder, PurchaseOrderItem, PriceCatalogItem
 
@@ -20,6 +18,7 @@ pg_suppliers_router = APIRouter(prefix="/api/pg", tags=["PostgreSQL Suppliers"])
 
 # Import auth dependency
 from routes.pg_auth_routes import get_current_user_pg, UserRole
+from services.exports import XlsxExport
 
 
 # ==================== PYDANTIC MODELS ====================
@@ -428,62 +427,20 @@ async def export_supplier_performance(
     )
     
     if format == "excel":
-        try:
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        except ImportError:
-            raise HTTPException(status_code=500, detail="مكتبة Excel غير متوفرة")
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "تقرير أداء الموردين"
-        ws.sheet_view.rightToLeft = True
-        
-        # Styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Headers
-        headers = ['المورد', 'إجمالي الأوامر', 'إجمالي المبلغ', 'الأوامر المسلمة', 'في الوقت', 'متأخرة', 'نسبة الالتزام %']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = thin_border
-        
-        # Data
-        for row_num, r in enumerate(report_data["report"], 2):
-            ws.cell(row=row_num, column=1, value=r["supplier"]["name"]).border = thin_border
-            ws.cell(row=row_num, column=2, value=r["performance"]["total_orders"]).border = thin_border
-            ws.cell(row=row_num, column=3, value=r["performance"]["total_amount"]).border = thin_border
-            ws.cell(row=row_num, column=4, value=r["performance"]["delivered_orders"]).border = thin_border
-            ws.cell(row=row_num, column=5, value=r["performance"]["on_time_deliveries"]).border = thin_border
-            ws.cell(row=row_num, column=6, value=r["performance"]["late_deliveries"]).border = thin_border
-            ws.cell(row=row_num, column=7, value=f"{r['performance']['on_time_rate']}%").border = thin_border
-        
-        # Column widths
-        ws.column_dimensions['A'].width = 30
-        ws.column_dimensions['B'].width = 15
-        ws.column_dimensions['C'].width = 18
-        ws.column_dimensions['D'].width = 18
-        ws.column_dimensions['E'].width = 12
-        ws.column_dimensions['F'].width = 12
-        ws.column_dimensions['G'].width = 15
-        
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=supplier_performance_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-        )
+        async with XlsxExport("تقرير أداء الموردين", widths=[30, 15, 18, 18, 12, 12, 15]) as export:
+            export.header(['المورد', 'إجمالي الأوامر', 'إجمالي المبلغ', 'الأوامر المسلمة', 'في الوقت', 'متأخرة', 'نسبة الالتزام %'])
+            
+            for r in report_data["report"]:
+                export.append([
+                    r["supplier"]["name"],
+                    r["performance"]["total_orders"],
+                    r["performance"]["total_amount"],
+                    r["performance"]["delivered_orders"],
+                    r["performance"]["on_time_deliveries"],
+                    r["performance"]["late_deliveries"],
+                    f"{r['performance']['on_time_rate']}%"
+                ], "cell")
+            
+            return await export.response(f"supplier_performance_{datetime.now().strftime('%Y%m%d')}.xlsx")
     
     return report_data
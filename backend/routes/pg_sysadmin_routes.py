@@ -2,7 +2,7 @@
 PostgreSQL System Admin Routes - Backup, Restore, Company Settings
 For System Admin role only
 """
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, field_validator
 from typing import Optional, List, Union, Any
@@ -10,23 +10,33 @@ from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func
+import asyncio
 import uuid
 import json
 import io
+import os
 import base64
+import tempfile
 
 from database import (
     get_postgres_session, User, Project, Supplier, BudgetCategory,
     DefaultBudgetCategory, MaterialRequest, MaterialRequestItem,
     PurchaseOrder, PurchaseOrderItem, DeliveryRecord, AuditLog,
-    SystemSetting, PriceCatalogItem, ItemAlias, Attachment
+    SystemSetting, PriceCatalogItem, ItemAlias, Attachment, BestPrice, SpendRollup,
+    reseed_sequences, reset_sequences, get_settings, invalidate_settings
 )
+from database.connection import get_session_maker
 
 # Create router
 pg_sysadmin_router = APIRouter(prefix="/api/pg/sysadmin", tags=["PostgreSQL System Admin"])
 
 # Import auth dependency
 from routes.pg_auth_routes import get_current_user_pg, UserRole
+from services.catalog_search import invalidate_catalog_index
+from services.best_prices import forget_orders, rebuild_best_prices
+from services.spend_rollups import spend_entry, record_spend, rebuild_spend_rollups
+from services.exports import stream_rows
+from services.jobs import JobContext, start_job, job_accepted, delete_jobs
 
 
 # ==================== PYDANTIC MODELS ====================
@@ -73,21 +83,8 @@ async def get_company_settings(
     """Get company settings for PDF customization - System Admin only"""
     require_system_admin(current_user)
     
-    # Define company setting keys
-    setting_keys = [
-        "company_name", "company_logo", "company_address", "company_phone",
-        "company_email", "report_header", "report_footer", "pdf_primary_color", "pdf_show_logo"
-    ]
-    
-    settings = {}
-    for key in setting_keys:
-        result = await session.execute(
-            select(SystemSetting).where(SystemSetting.key == key)
-        )
-        setting = result.scalar_one_or_none()
-        settings[key] = setting.value if setting else ""
-    
-    return settings
+    settings = await get_settings(session)
+    return settings.company_settings
 
 
 @pg_sysadmin_router.get("/company-settings/public")
@@ -96,21 +93,8 @@ async def get_company_settings_public(
     session: AsyncSession = Depends(get_postgres_session)
 ):
     """Get company settings for PDF customization - Available for all authenticated users"""
-    # Define company setting keys
-    setting_keys = [
-        "company_name", "company_logo", "company_address", "company_phone",
-        "company_email", "report_header", "report_footer", "pdf_primary_color", "pdf_show_logo"
-    ]
-    
-    settings = {}
-    for key in setting_keys:
-        result = await session.execute(
-            select(SystemSetting).where(SystemSetting.key == key)
-        )
-        setting = result.scalar_one_or_none()
-        settings[key] = setting.value if setting else ""
-    
-    return settings
+    settings = await get_settings(session)
+    return settings.company_settings
 
 
 @pg_sysadmin_router.put("/company-settings")
@@ -148,6 +132,7 @@ async def update_company_settings(
             )
             session.add(new_setting)
     
+    await invalidate_settings(session)
     await session.commit()
     
     return {"message": "تم تحديث إعدادات الشركة بنجاح"}
@@ -198,6 +183,7 @@ async def upload_company_logo(
         )
         session.add(new_setting)
     
+    await invalidate_settings(session)
     await session.commit()
     
     return {"message": "تم رفع الشعار بنجاح", "logo": logo_data}
@@ -205,134 +191,119 @@ async def upload_company_logo(
 
 # ==================== BACKUP & RESTORE ====================
 
+# Tables in a backup file, with the columns written for each
+BACKUP_TABLES = [
+    ("users", User, [
+        "id", "name", "email", "password", "role", "is_active", "supervisor_prefix",
+        "assigned_projects", "assigned_engineers", "created_at"
+    ]),
+    ("projects", Project, [
+        "id", "name", "owner_name", "description", "location", "status",
+        "created_by", "created_by_name", "created_at"
+    ]),
+    ("suppliers", Supplier, [
+        "id", "name", "contact_person", "phone", "email", "address", "notes", "created_at"
+    ]),
+    ("budget_categories", BudgetCategory, [
+        "id", "name", "project_id", "project_name", "estimated_budget",
+        "created_by", "created_by_name", "created_at"
+    ]),
+    ("default_budget_categories", DefaultBudgetCategory, [
+        "id", "name", "default_budget", "created_by", "created_by_name", "created_at"
+    ]),
+    ("material_requests", MaterialRequest, [
+        "id", "request_number", "request_seq", "project_id", "project_name", "reason",
+        "supervisor_id", "supervisor_name", "engineer_id", "engineer_name", "status",
+        "rejection_reason", "expected_delivery_date", "created_at"
+    ]),
+    ("material_request_items", MaterialRequestItem, [
+        "id", "request_id", "name", "quantity", "unit", "estimated_price", "item_index"
+    ]),
+    ("purchase_orders", PurchaseOrder, [
+        "id", "order_number", "order_seq", "request_id", "request_number",
+        "project_id", "project_name", "supplier_id", "supplier_name",
+        "category_id", "category_name", "manager_id", "manager_name",
+        "supervisor_name", "engineer_name", "status", "needs_gm_approval",
+        "approved_by", "approved_by_name", "gm_approved_by", "gm_approved_by_name",
+        "total_amount", "notes", "terms_conditions", "expected_delivery_date",
+        "created_at", "approved_at"
+    ]),
+    ("purchase_order_items", PurchaseOrderItem, [
+        "id", "order_id", "name", "quantity", "unit", "unit_price", "total_price",
+        "delivered_quantity", "item_index"
+    ]),
+    ("system_settings", SystemSetting, ["id", "key", "value", "description"]),
+]
+
+# Sections of the file format, in order (delivery records and audit logs are not backed up)
+BACKUP_SECTIONS = [
+    "users", "projects", "suppliers", "budget_categories", "default_budget_categories",
+    "material_requests", "material_request_items", "purchase_orders", "purchase_order_items",
+    "delivery_records", "system_settings", "audit_logs"
+]
+
+
+def backup_filename() -> str:
+    return f"backup_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+
+
+async def build_backup(session: AsyncSession, created_by: str, progress=None) -> dict:
+    """Every backed-up table as plain rows, read in chunks - progress(percent, message) per table"""
+    backup_data = {
+        "backup_info": {
+            "created_at": datetime.utcnow().isoformat(),
+            "created_by": created_by,
+            "version": "1.0"
+        },
+        **{section: [] for section in BACKUP_SECTIONS}
+    }
+    
+    for index, (section, model, fields) in enumerate(BACKUP_TABLES):
+        if progress:
+            await progress(index * 100 / len(BACKUP_TABLES), f"نسخ {section}")
+        query = select(*[getattr(model, field) for field in fields])
+        async for rows in stream_rows(query, session=session):
+            backup_data[section].extend(
+                {field: value.isoformat() if isinstance(value, datetime) else value for field, value in zip(fields, row)}
+                for row in rows
+            )
+    
+    return backup_data
+
+
+def write_backup_file(backup_data: dict) -> str:
+    fd, path = tempfile.mkstemp(prefix="backup-", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as backup_file:
+        json.dump(backup_data, backup_file, ensure_ascii=False, indent=2)
+    return path
+
+
+async def backup_job(context: JobContext, created_by: str) -> dict:
+    async with get_session_maker()() as session:
+        backup_data = await build_backup(session, created_by, context.progress)
+    await context.progress(95, "كتابة الملف")
+    path = await asyncio.to_thread(write_backup_file, backup_data)
+    context.attach(path, backup_filename(), "application/json")
+    return {
+        "message": "تم إنشاء النسخة الاحتياطية بنجاح",
+        "counts": {section: len(backup_data[section]) for section, _, _ in BACKUP_TABLES}
+    }
+
+
 @pg_sysadmin_router.get("/backup")
 async def create_backup(
+    async_mode: bool = Query(False, alias="async"),
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """Create a full system backup as JSON"""
+    """Create a full system backup as JSON - with async=true it is built as a background job"""
     require_system_admin(current_user)
     
-    backup_data = {
-        "backup_info": {
-            "created_at": datetime.utcnow().isoformat(),
-            "created_by": current_user.name,
-            "version": "1.0"
-        },
-        "users": [],
-        "projects": [],
-        "suppliers": [],
-        "budget_categories": [],
-        "default_budget_categories": [],
-        "material_requests": [],
-        "material_request_items": [],
-        "purchase_orders": [],
-        "purchase_order_items": [],
-        "delivery_records": [],
-        "system_settings": [],
-        "audit_logs": []
-    }
+    if async_mode:
+        job = await start_job(session, "backup", current_user, backup_job, created_by=current_user.name)
+        return job_accepted(job)
     
-    # Export Users
-    result = await session.execute(select(User))
-    for u in result.scalars().all():
-        backup_data["users"].append({
-            "id": u.id, "name": u.name, "email": u.email, "password": u.password,
-            "role": u.role, "is_active": u.is_active, "supervisor_prefix": u.supervisor_prefix,
-            "assigned_projects": u.assigned_projects, "assigned_engineers": u.assigned_engineers,
-            "created_at": u.created_at.isoformat() if u.created_at else None
-        })
-    
-    # Export Projects
-    result = await session.execute(select(Project))
-    for p in result.scalars().all():
-        backup_data["projects"].append({
-            "id": p.id, "name": p.name, "owner_name": p.owner_name, "description": p.description,
-            "location": p.location, "status": p.status, "created_by": p.created_by,
-            "created_by_name": p.created_by_name, "created_at": p.created_at.isoformat() if p.created_at else None
-        })
-    
-    # Export Suppliers
-    result = await session.execute(select(Supplier))
-    for s in result.scalars().all():
-        backup_data["suppliers"].append({
-            "id": s.id, "name": s.name, "contact_person": s.contact_person, "phone": s.phone,
-            "email": s.email, "address": s.address, "notes": s.notes,
-            "created_at": s.created_at.isoformat() if s.created_at else None
-        })
-    
-    # Export Budget Categories
-    result = await session.execute(select(BudgetCategory))
-    for c in result.scalars().all():
-        backup_data["budget_categories"].append({
-            "id": c.id, "name": c.name, "project_id": c.project_id, "project_name": c.project_name,
-            "estimated_budget": c.estimated_budget, "created_by": c.created_by,
-            "created_by_name": c.created_by_name, "created_at": c.created_at.isoformat() if c.created_at else None
-        })
-    
-    # Export Default Budget Categories
-    result = await session.execute(select(DefaultBudgetCategory))
-    for c in result.scalars().all():
-        backup_data["default_budget_categories"].append({
-            "id": c.id, "name": c.name, "default_budget": c.default_budget, "created_by": c.created_by,
-            "created_by_name": c.created_by_name, "created_at": c.created_at.isoformat() if c.created_at else None
-        })
-    
-    # Export Material Requests
-    result = await session.execute(select(MaterialRequest))
-    for r in result.scalars().all():
-        backup_data["material_requests"].append({
-            "id": r.id, "request_number": r.request_number, "request_seq": r.request_seq,
-            "project_id": r.project_id, "project_name": r.project_name, "reason": r.reason,
-            "supervisor_id": r.supervisor_id, "supervisor_name": r.supervisor_name,
-            "engineer_id": r.engineer_id, "engineer_name": r.engineer_name, "status": r.status,
-            "rejection_reason": r.rejection_reason, "expected_delivery_date": r.expected_delivery_date,
-            "created_at": r.created_at.isoformat() if r.created_at else None
-        })
-    
-    # Export Material Request Items
-    result = await session.execute(select(MaterialRequestItem))
-    for i in result.scalars().all():
-        backup_data["material_request_items"].append({
-            "id": i.id, "request_id": i.request_id, "name": i.name, "quantity": i.quantity,
-            "unit": i.unit, "estimated_price": i.estimated_price, "item_index": i.item_index
-        })
-    
-    # Export Purchase Orders
-    result = await session.execute(select(PurchaseOrder))
-    for o in result.scalars().all():
-        backup_data["purchase_orders"].append({
-            "id": o.id, "order_number": o.order_number, "order_seq": o.order_seq,
-            "request_id": o.request_id, "request_number": o.request_number,
-            "project_id": o.project_id, "project_name": o.project_name,
-            "supplier_id": o.supplier_id, "supplier_name": o.supplier_name,
-            "category_id": o.category_id, "category_name": o.category_name,
-            "manager_id": o.manager_id, "manager_name": o.manager_name,
-            "supervisor_name": o.supervisor_name, "engineer_name": o.engineer_name,
-            "status": o.status, "needs_gm_approval": o.needs_gm_approval,
-            "approved_by": o.approved_by, "approved_by_name": o.approved_by_name,
-            "gm_approved_by": o.gm_approved_by, "gm_approved_by_name": o.gm_approved_by_name,
-            "total_amount": o.total_amount, "notes": o.notes, "terms_conditions": o.terms_conditions,
-            "expected_delivery_date": o.expected_delivery_date,
-            "created_at": o.created_at.isoformat() if o.created_at else None,
-            "approved_at": o.approved_at.isoformat() if o.approved_at else None
-        })
-    
-    # Export Purchase Order Items
-    result = await session.execute(select(PurchaseOrderItem))
-    for i in result.scalars().all():
-        backup_data["purchase_order_items"].append({
-            "id": i.id, "order_id": i.order_id, "name": i.name, "quantity": i.quantity,
-            "unit": i.unit, "unit_price": i.unit_price, "total_price": i.total_price,
-            "delivered_quantity": i.delivered_quantity, "item_index": i.item_index
-        })
-    
-    # Export System Settings
-    result = await session.execute(select(SystemSetting))
-    for s in result.scalars().all():
-        backup_data["system_settings"].append({
-            "id": s.id, "key": s.key, "value": s.value, "description": s.description
-        })
+    backup_data = await build_backup(session, current_user.name)
     
     # Create JSON file
     json_content = json.dumps(backup_data, ensure_ascii=False, indent=2)
@@ -342,18 +313,154 @@ async def create_backup(
         io.BytesIO(json_content.encode('utf-8')),
         media_type="application/json",
         headers={
-            "Content-Disposition": f"attachment; filename=backup_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+            "Content-Disposition": f"attachment; filename={backup_filename()}"
         }
     )
 
 
+async def restore_backup_data(session: AsyncSession, backup_data: dict, progress=None) -> dict:
+    """Add the rows that do not exist yet and commit - returns the restored counts"""
+    async def advance(step: int, label: str):
+        if progress:
+            await progress(step * 100 / 10, f"استعادة {label}")
+    
+    restored_counts = {
+        "users": 0, "projects": 0, "suppliers": 0, "budget_categories": 0,
+        "material_requests": 0, "purchase_orders": 0
+    }
+    
+    await advance(0, "المستخدمين")
+    # Restore Users (skip if already exists)
+    for u_data in backup_data.get("users", []):
+        result = await session.execute(select(User).where(User.id == u_data["id"]))
+        if result.scalar_one_or_none():
+            continue
+        user = User(**{k: v for k, v in u_data.items() if k != "created_at"})
+        if u_data.get("created_at"):
+            user.created_at = datetime.fromisoformat(u_data["created_at"])
+        session.add(user)
+        restored_counts["users"] += 1
+    
+    await advance(1, "المشاريع")
+    # Restore Projects
+    for p_data in backup_data.get("projects", []):
+        result = await session.execute(select(Project).where(Project.id == p_data["id"]))
+        if result.scalar_one_or_none():
+            continue
+        project = Project(**{k: v for k, v in p_data.items() if k not in ["created_at", "updated_at"]})
+        if p_data.get("created_at"):
+            project.created_at = datetime.fromisoformat(p_data["created_at"])
+        session.add(project)
+        restored_counts["projects"] += 1
+    
+    await advance(2, "الموردين")
+    # Restore Suppliers
+    for s_data in backup_data.get("suppliers", []):
+        result = await session.execute(select(Supplier).where(Supplier.id == s_data["id"]))
+        if result.scalar_one_or_none():
+            continue
+        supplier = Supplier(**{k: v for k, v in s_data.items() if k != "created_at"})
+        if s_data.get("created_at"):
+            supplier.created_at = datetime.fromisoformat(s_data["created_at"])
+        session.add(supplier)
+        restored_counts["suppliers"] += 1
+    
+    await advance(3, "تصنيفات الميزانية")
+    # Restore Budget Categories
+    for c_data in backup_data.get("budget_categories", []):
+        result = await session.execute(select(BudgetCategory).where(BudgetCategory.id == c_data["id"]))
+        if result.scalar_one_or_none():
+            continue
+        category = BudgetCategory(**{k: v for k, v in c_data.items() if k != "created_at"})
+        if c_data.get("created_at"):
+            category.created_at = datetime.fromisoformat(c_data["created_at"])
+        session.add(category)
+        restored_counts["budget_categories"] += 1
+    
+    await advance(4, "طلبات المواد")
+    # Restore Material Requests
+    for r_data in backup_data.get("material_requests", []):
+        result = await session.execute(select(MaterialRequest).where(MaterialRequest.id == r_data["id"]))
+        if result.scalar_one_or_none():
+            continue
+        request = MaterialRequest(**{k: v for k, v in r_data.items() if k not in ["created_at", "updated_at"]})
+        if r_data.get("created_at"):
+            request.created_at = datetime.fromisoformat(r_data["created_at"])
+        session.add(request)
+        restored_counts["material_requests"] += 1
+    
+    await advance(5, "أصناف الطلبات")
+    # Restore Material Request Items
+    for i_data in backup_data.get("material_request_items", []):
+        result = await session.execute(select(MaterialRequestItem).where(MaterialRequestItem.id == i_data["id"]))
+        if result.scalar_one_or_none():
+            continue
+        item = MaterialRequestItem(**i_data)
+        session.add(item)
+    
+    await advance(6, "أوامر الشراء")
+    # Restore Purchase Orders
+    for o_data in backup_data.get("purchase_orders", []):
+        result = await session.execute(select(PurchaseOrder).where(PurchaseOrder.id == o_data["id"]))
+        if result.scalar_one_or_none():
+            continue
+        order = PurchaseOrder(**{k: v for k, v in o_data.items() if k not in ["created_at", "approved_at", "updated_at"]})
+        if o_data.get("created_at"):
+            order.created_at = datetime.fromisoformat(o_data["created_at"])
+        if o_data.get("approved_at"):
+            order.approved_at = datetime.fromisoformat(o_data["approved_at"])
+        session.add(order)
+        restored_counts["purchase_orders"] += 1
+    
+    await advance(7, "أصناف أوامر الشراء")
+    # Restore Purchase Order Items
+    for i_data in backup_data.get("purchase_order_items", []):
+        result = await session.execute(select(PurchaseOrderItem).where(PurchaseOrderItem.id == i_data["id"]))
+        if result.scalar_one_or_none():
+            continue
+        item = PurchaseOrderItem(**i_data)
+        session.add(item)
+    
+    await advance(8, "إعدادات النظام")
+    # Restore System Settings
+    for s_data in backup_data.get("system_settings", []):
+        result = await session.execute(select(SystemSetting).where(SystemSetting.key == s_data["key"]))
+        if result.scalar_one_or_none():
+            continue
+        setting = SystemSetting(**s_data)
+        session.add(setting)
+    
+    # Last chance to cancel - nothing is written before this commit
+    await advance(9, "العدادات")
+    await session.commit()
+    
+    # Restored orders/requests carry their own numbers - re-derive the counters
+    await reseed_sequences(session)
+    await invalidate_settings(session)
+    await rebuild_best_prices(session)
+    await rebuild_spend_rollups(session)
+    await session.commit()
+    
+    return restored_counts
+
+
+async def restore_job(context: JobContext, backup_data: dict) -> dict:
+    async with get_session_maker()() as session:
+        restored_counts = await restore_backup_data(session, backup_data, context.progress)
+    return {
+        "message": "تم استعادة النسخة الاحتياطية بنجاح",
+        "restored": restored_counts
+    }
+
+
 @pg_sysadmin_router.post("/restore")
 async def restore_backup(
     file: UploadFile = File(...),
+    async_mode: bool = Query(False, alias="async"),
     current_user: User = Depends(get_current_user_pg),
     session: AsyncSession = Depends(get_postgres_session)
 ):
-    """Restore system from backup file"""
+    """Restore system from backup file - with async=true it runs as a background job"""
     require_system_admin(current_user)
     
     try:
@@ -365,106 +472,12 @@ async def restore_backup(
     if "backup_info" not in backup_data:
         raise HTTPException(status_code=400, detail="ملف النسخة الاحتياطية غير صالح")
     
-    restored_counts = {
-        "users": 0, "projects": 0, "suppliers": 0, "budget_categories": 0,
-        "material_requests": 0, "purchase_orders": 0
-    }
+    if async_mode:
+        job = await start_job(session, "restore", current_user, restore_job, backup_data=backup_data)
+        return job_accepted(job)
     
     try:
-        # Restore Users (skip if already exists)
-        for u_data in backup_data.get("users", []):
-            result = await session.execute(select(User).where(User.id == u_data["id"]))
-            if result.scalar_one_or_none():
-                continue
-            user = User(**{k: v for k, v in u_data.items() if k != "created_at"})
-            if u_data.get("created_at"):
-                user.created_at = datetime.fromisoformat(u_data["created_at"])
-            session.add(user)
-            restored_counts["users"] += 1
-        
-        # Restore Projects
-        for p_data in backup_data.get("projects", []):
-            result = await session.execute(select(Project).where(Project.id == p_data["id"]))
-            if result.scalar_one_or_none():
-                continue
-            project = Project(**{k: v for k, v in p_data.items() if k not in ["created_at", "updated_at"]})
-            if p_data.get("created_at"):
-                project.created_at = datetime.fromisoformat(p_data["created_at"])
-            session.add(project)
-            restored_counts["projects"] += 1
-        
-        # Restore Suppliers
-        for s_data in backup_data.get("suppliers", []):
-            result = await session.execute(select(Supplier).where(Supplier.id == s_data["id"]))
-            if result.scalar_one_or_none():
-                continue
-            supplier = Supplier(**{k: v for k, v in s_data.items() if k != "created_at"})
-            if s_data.get("created_at"):
-                supplier.created_at = datetime.fromisoformat(s_data["created_at"])
-            session.add(supplier)
-            restored_counts["suppliers"] += 1
-        
-        # Restore Budget Categories
-        for c_data in backup_data.get("budget_categories", []):
-            result = await session.execute(select(BudgetCategory).where(BudgetCategory.id == c_data["id"]))
-            if result.scalar_one_or_none():
-                continue
-            category = BudgetCategory(**{k: v for k, v in c_data.items() if k != "created_at"})
-            if c_data.get("created_at"):
-                category.created_at = datetime.fromisoformat(c_data["created_at"])
-            session.add(category)
-            restored_counts["budget_categories"] += 1
-        
-        # Restore Material Requests
-        for r_data in backup_data.get("material_requests", []):
-            result = await session.execute(select(MaterialRequest).where(MaterialRequest.id == r_data["id"]))
-            if result.scalar_one_or_none():
-                continue
-            request = MaterialRequest(**{k: v for k, v in r_data.items() if k not in ["created_at", "updated_at"]})
-            if r_data.get("created_at"):
-                request.created_at = datetime.fromisoformat(r_data["created_at"])
-            session.add(request)
-            restored_counts["material_requests"] += 1
-        
-        # Restore Material Request Items
-        for i_data in backup_data.get("material_request_items", []):
-            result = await session.execute(select(MaterialRequestItem).where(MaterialRequestItem.id == i_data["id"]))
-            if result.scalar_one_or_none():
-                continue
-            item = MaterialRequestItem(**i_data)
-            session.add(item)
-        
-        # Restore Purchase Orders
-        for o_data in backup_data.get("purchase_orders", []):
-            result = await session.execute(select(PurchaseOrder).where(PurchaseOrder.id == o_data["id"]))
-            if result.scalar_one_or_none():
-                continue
-            order = PurchaseOrder(**{k: v for k, v in o_data.items() if k not in ["created_at", "approved_at", "updated_at"]})
-            if o_data.get("created_at"):
-                order.created_at = datetime.fromisoformat(o_data["created_at"])
-            if o_data.get("approved_at"):
-                order.approved_at = datetime.fromisoformat(o_data["approved_at"])
-            session.add(order)
-            restored_counts["purchase_orders"] += 1
-        
-        # Restore Purchase Order Items
-        for i_data in backup_data.get("purchase_order_items", []):
-            result = await session.execute(select(PurchaseOrderItem).where(PurchaseOrderItem.id == i_data["id"]))
-            if result.scalar_one_or_none():
-                continue
-            item = PurchaseOrderItem(**i_data)
-            session.add(item)
-        
-        # Restore System Settings
-        for s_data in backup_data.get("system_settings", []):
-            result = await session.execute(select(SystemSetting).where(SystemSetting.key == s_data["key"]))
-            if result.scalar_one_or_none():
-                continue
-            setting = SystemSetting(**s_data)
-            session.add(setting)
-        
-        await session.commit()
-        
+        restored_counts = await restore_backup_data(session, backup_data)
         return {
             "message": "تم استعادة النسخة الاحتياطية بنجاح",
             "restored": restored_counts
@@ -496,7 +509,9 @@ async def delete_order_sysadmin(
     
     order_number = order.order_number
     
-    # Delete order items first
+    # Drop its prices from the best-price table and its spend from the rollups, then delete order items
+    await forget_orders(session, [order_id])
+    await record_spend(session, removed=[spend_entry(order)])
     await session.execute(
         PurchaseOrderItem.__table__.delete().where(PurchaseOrderItem.order_id == order_id)
     )
@@ -538,22 +553,43 @@ async def clean_all_data_sysadmin(
     await session.execute(MaterialRequest.__table__.delete())
     await session.execute(BudgetCategory.__table__.delete())
     await session.execute(Project.__table__.delete())
+    await session.execute(BestPrice.__table__.delete())
+    await session.execute(SpendRollup.__table__.delete())
     await session.execute(ItemAlias.__table__.delete())
     await session.execute(PriceCatalogItem.__table__.delete())
     await session.execute(Supplier.__table__.delete())
     await session.execute(Attachment.__table__.delete())
     await session.execute(AuditLog.__table__.delete())
+    await delete_jobs(session)
     
     # Delete users except the preserved admin
     await session.execute(
         User.__table__.delete().where(User.email != preserve_admin_email)
     )
     
+    # Numbering starts again from PO-00000001
+    await reset_sequences(session)
+    await invalidate_catalog_index(session)
+    
     await session.commit()
     
     return {"message": "تم تنظيف جميع البيانات بنجاح"}
 
 
+@pg_sysadmin_router.post("/spend-rollups/rebuild")
+async def rebuild_spend_rollups_sysadmin(
+    current_user: User = Depends(get_current_user_pg),
+    session: AsyncSession = Depends(get_postgres_session)
+):
+    """Recompute the report spend rollups from the purchase orders - system admin only"""
+    require_system_admin(current_user)
+    
+    rows = await rebuild_spend_rollups(session)
+    await session.commit()
+    
+    return {"message": "تمت إعادة بناء ملخصات المصروفات بنجاح", "rows": rows}
+
+
 # ==================== STATS & DASHBOARD ====================
 
 @pg_sysadmin_router.get("/stats")
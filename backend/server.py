@@ -46,6 +46,7 @@ from routes.pg_catalog_routes import pg_catalog_router
 from routes.pg_domain_routes import pg_domain_router
 from routes.pg_quantity_routes import pg_quantity_router
 from routes.pg_delivery_routes import pg_delivery_router
+from routes.pg_jobs_routes import pg_jobs_router
 
 # Include all PostgreSQL routers
 app.include_router(pg_auth_router)
@@ -60,6 +61,7 @@ app.include_router(pg_catalog_router)
 app.include_router(pg_domain_router)
 app.include_router(pg_quantity_router)
 app.include_router(pg_delivery_router)
+app.include_router(pg_jobs_router)
 
 # ==================== CORS Configuration ====================
 app.add_middleware(
@@ -87,6 +89,32 @@ async def startup_db_client():
     from database import init_postgres_db
     await init_postgres_db()
     
+    # One-time build of the best-price table for existing data
+    from database.connection import get_session_maker
+    from services.best_prices import backfill_best_prices
+    try:
+        async with get_session_maker()() as session:
+            await backfill_best_prices(session)
+    except Exception as e:
+        logger.warning(f"⚠️ Best price table backfill skipped: {e}")
+    
+    # One-time build of the report spend rollups for existing orders
+    from services.spend_rollups import backfill_spend_rollups
+    try:
+        async with get_session_maker()() as session:
+            await backfill_spend_rollups(session)
+    except Exception as e:
+        logger.warning(f"⚠️ Spend rollups backfill skipped: {e}")
+    
+    # Periodic maintenance - runs on one worker only (leader lock)
+    from services.scheduler import scheduler
+    from services.plan_schedule import run_plan_status_sweep, PLAN_SWEEP_INTERVAL
+    from services.jobs import run_job_recovery, JOB_RECOVERY_INTERVAL
+    scheduler.every(PLAN_SWEEP_INTERVAL, run_plan_status_sweep)
+    # Jobs do not survive their worker - fail the ones whose heartbeat stopped
+    scheduler.every(JOB_RECOVERY_INTERVAL, run_job_recovery)
+    scheduler.start()
+    
     logger.info("✅ PostgreSQL database initialized successfully")
 
 @app.on_event("shutdown")
@@ -94,6 +122,14 @@ async def shutdown_db_client():
     """Close database connections on shutdown"""
     logger.info("🛑 Shutting down...")
     
+    # Stop scheduled jobs and give up the leader lock
+    from services.scheduler import scheduler
+    await scheduler.stop()
+    
+    # Stop workbook and PDF workers
+    from services.workers import shutdown_worker_pool
+    shutdown_worker_pool()
+    
     # Close PostgreSQL connection
     from database import close_postgres_db
     await close_postgres_db()
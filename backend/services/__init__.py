@@ -0,0 +1,4 @@
+"""
+Shared services used by the PostgreSQL routes
+Read models, caches and background helpers that more than one router needs
+"""
@@ -0,0 +1,34 @@
+"""
+Arabic text normalization
+Folds the spelling variants users type interchangeably so that lookups match:
+أ/إ/آ/ٱ -> ا, ة -> ه, ى -> ي, ؤ -> و, ئ -> ي, strips tashkeel and tatweel,
+maps Arabic-Indic digits to ASCII, casefolds Latin text and collapses whitespace.
+"""
+import re
+
+# Tashkeel (harakat, tanween, shadda, sukun, superscript alef, Quranic marks) and tatweel
+_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_WHITESPACE = re.compile(r"\s+")
+
+_FOLD = str.maketrans({
+    "\u0623": "\u0627",  # أ -> ا
+    "\u0625": "\u0627",  # إ -> ا
+    "\u0622": "\u0627",  # آ -> ا
+    "\u0671": "\u0627",  # ٱ -> ا
+    "\u0629": "\u0647",  # ة -> ه
+    "\u0649": "\u064a",  # ى -> ي
+    "\u0624": "\u0648",  # ؤ -> و
+    "\u0626": "\u064a",  # ئ -> ي
+    "\u06cc": "\u064a",  # Persian yeh -> ي
+    "\u06a9": "\u0643",  # Persian kaf -> ك
+    **{chr(0x0660 + d): str(d) for d in range(10)},  # ٠-٩
+    **{chr(0x06f0 + d): str(d) for d in range(10)},  # ۰-۹
+})
+
+
+def normalize_text(value) -> str:
+    """Normalized form used for every Arabic-aware comparison (None -> "")"""
+    if value is None:
+        return ""
+    text = _DIACRITICS.sub("", str(value)).translate(_FOLD).casefold()
+    return _WHITESPACE.sub(" ", text).strip()
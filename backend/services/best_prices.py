@@ -0,0 +1,281 @@
+"""
+Best Price Table - maintained best known price per item and supplier
+Rows are keyed by the Arabic-normalized item name and supplier name and come
+from two sources: active catalog offers (one row per catalog item) and approved
+purchase order history (one row per item/supplier with min and last price).
+check-best-price is then a single indexed lookup on item_key.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import case, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import BestPrice, PriceCatalogItem, PurchaseOrder, PurchaseOrderItem, is_sqlite
+from services.arabic_text import normalize_text
+from services.exports import stream_rows
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_SUPPLIER = "غير محدد"
+
+# Orders whose prices count as agreed prices
+APPROVED_ORDER_STATUSES = ["approved", "printed", "shipped", "partially_delivered", "delivered"]
+
+# Rows per executemany batch
+UPSERT_BATCH_SIZE = 1000
+
+
+def supplier_key(supplier_name) -> str:
+    return normalize_text(supplier_name or UNKNOWN_SUPPLIER)
+
+
+def catalog_offer_key(catalog_item_id: str) -> str:
+    return f"cat:{catalog_item_id}"
+
+
+def order_offer_key(item_key: str, supplier: str) -> str:
+    return f"po:{item_key}|{supplier}"
+
+
+def upsert_statement(session: AsyncSession, keep_lower_min: bool):
+    """INSERT ... ON CONFLICT (offer_key) DO UPDATE for the session's dialect"""
+    insert = sqlite_insert if is_sqlite(session) else pg_insert
+    stmt = insert(BestPrice)
+    excluded = stmt.excluded
+
+    values = {
+        "item_key": excluded.item_key,
+        "supplier_key": excluded.supplier_key,
+        "catalog_item_id": excluded.catalog_item_id,
+        "item_name": excluded.item_name,
+        "supplier_name": excluded.supplier_name,
+        "unit": excluded.unit,
+        "currency": excluded.currency,
+        "last_price": excluded.last_price,
+        "last_order_number": excluded.last_order_number,
+        "last_order_date": excluded.last_order_date,
+        "updated_at": excluded.updated_at
+    }
+    if keep_lower_min:
+        is_lower = excluded.min_price < BestPrice.min_price
+        values["min_price"] = case((is_lower, excluded.min_price), else_=BestPrice.min_price)
+        values["min_order_number"] = case((is_lower, excluded.min_order_number), else_=BestPrice.min_order_number)
+        values["min_order_date"] = case((is_lower, excluded.min_order_date), else_=BestPrice.min_order_date)
+    else:
+        values["min_price"] = excluded.min_price
+        values["min_order_number"] = excluded.min_order_number
+        values["min_order_date"] = excluded.min_order_date
+
+    return stmt.on_conflict_do_update(index_elements=[BestPrice.offer_key], set_=values)
+
+
+async def execute_upsert(session: AsyncSession, rows: List[dict], keep_lower_min: bool) -> None:
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        await session.execute(upsert_statement(session, keep_lower_min), rows[start:start + UPSERT_BATCH_SIZE])
+
+
+# ==================== CATALOG OFFERS ====================
+
+def catalog_offer_row(item, now: datetime) -> dict:
+    return {
+        "offer_key": catalog_offer_key(item.id),
+        "item_key": normalize_text(item.name),
+        "supplier_key": supplier_key(item.supplier_name),
+        "source": "catalog",
+        "catalog_item_id": item.id,
+        "item_name": item.name,
+        "supplier_name": item.supplier_name,
+        "unit": item.unit,
+        "currency": item.currency or "SAR",
+        "min_price": item.price,
+        "min_order_number": None,
+        "min_order_date": None,
+        "last_price": item.price,
+        "last_order_number": None,
+        "last_order_date": None,
+        "updated_at": now
+    }
+
+
+async def record_catalog_items(session: AsyncSession, items: Iterable) -> None:
+    """
+    Call when catalog items are created, repriced, renamed or deactivated (before commit).
+    Active items replace their catalog offer, inactive ones drop it.
+    """
+    now = datetime.utcnow()
+    rows = []
+    removed = []
+    for item in items:
+        if item.is_active is False or not item.price or item.price <= 0:
+            removed.append(catalog_offer_key(item.id))
+        else:
+            rows.append(catalog_offer_row(item, now))
+
+    if removed:
+        await session.execute(delete(BestPrice).where(BestPrice.offer_key.in_(removed)))
+    if rows:
+        await execute_upsert(session, rows, keep_lower_min=False)
+
+
+# ==================== ORDER HISTORY ====================
+
+def fold_order_rows(
+    offers: Dict[str, dict],
+    rows: Sequence,
+    now: datetime,
+    only: Optional[Set[str]] = None
+) -> None:
+    """
+    Fold (order, item) rows - oldest first - into offers, one per item/supplier:
+    lowest price with its order, latest price with its order. With `only`, rows
+    of other offer keys are skipped.
+    """
+    for row in rows:
+        if not row.unit_price or row.unit_price <= 0:
+            continue
+        item_key = normalize_text(row.name)
+        if not item_key:
+            continue
+        supplier = supplier_key(row.supplier_name)
+        key = order_offer_key(item_key, supplier)
+        if only is not None and key not in only:
+            continue
+
+        offer = offers.get(key)
+        if offer is None:
+            offer = offers[key] = {
+                "offer_key": key,
+                "item_key": item_key,
+                "supplier_key": supplier,
+                "source": "purchase_order",
+                "min_price": row.unit_price,
+                "min_order_number": row.order_number,
+                "min_order_date": row.created_at,
+                "currency": None
+            }
+        elif row.unit_price < offer["min_price"]:
+            offer["min_price"] = row.unit_price
+            offer["min_order_number"] = row.order_number
+            offer["min_order_date"] = row.created_at
+
+        offer.update({
+            "catalog_item_id": row.catalog_item_id,
+            "item_name": row.name,
+            "supplier_name": row.supplier_name,
+            "unit": row.unit,
+            "last_price": row.unit_price,
+            "last_order_number": row.order_number,
+            "last_order_date": row.created_at,
+            "updated_at": now
+        })
+
+
+def aggregate_order_rows(rows: Sequence, now: datetime) -> List[dict]:
+    offers: Dict[str, dict] = {}
+    fold_order_rows(offers, rows, now)
+    return list(offers.values())
+
+
+def order_rows_query():
+    return (
+        select(
+            PurchaseOrderItem.name, PurchaseOrderItem.unit, PurchaseOrderItem.unit_price,
+            PurchaseOrderItem.catalog_item_id, PurchaseOrder.supplier_name,
+            PurchaseOrder.order_number, PurchaseOrder.created_at
+        )
+        .join(PurchaseOrder, PurchaseOrder.id == PurchaseOrderItem.order_id)
+        .order_by(PurchaseOrder.created_at, PurchaseOrder.id, PurchaseOrderItem.item_index)
+    )
+
+
+async def record_approved_orders(session: AsyncSession, order_ids: Sequence[str]) -> None:
+    """Call when orders are approved (before commit) - folds their item prices into the table"""
+    if not order_ids:
+        return
+    result = await session.execute(order_rows_query().where(PurchaseOrder.id.in_(list(order_ids))))
+    rows = aggregate_order_rows(result.all(), datetime.utcnow())
+    if rows:
+        await execute_upsert(session, rows, keep_lower_min=True)
+
+
+async def forget_orders(session: AsyncSession, order_ids: Sequence[str]) -> None:
+    """
+    Call before deleting orders - recomputes the affected item/supplier rows
+    from the remaining approved orders. Offers are keyed on the normalized
+    names (spelling variants and a missing supplier included), which SQL cannot
+    filter on, so the approved order items are streamed and matched by key.
+    """
+    if not order_ids:
+        return
+    order_ids = list(order_ids)
+    result = await session.execute(order_rows_query().where(PurchaseOrder.id.in_(order_ids)))
+    rows = result.all()
+    affected = {
+        order_offer_key(normalize_text(row.name), supplier_key(row.supplier_name)) for row in rows
+    }
+    if not affected:
+        return
+
+    offers: Dict[str, dict] = {}
+    now = datetime.utcnow()
+    others = order_rows_query().where(
+        PurchaseOrder.status.in_(APPROVED_ORDER_STATUSES),
+        PurchaseOrder.id.notin_(order_ids)
+    )
+    async for chunk in stream_rows(others, session=session):
+        fold_order_rows(offers, chunk, now, only=affected)
+    remaining = list(offers.values())
+
+    await session.execute(delete(BestPrice).where(BestPrice.offer_key.in_(affected)))
+    if remaining:
+        await execute_upsert(session, remaining, keep_lower_min=False)
+
+
+# ==================== LOOKUP & REBUILD ====================
+
+async def find_best_prices(session: AsyncSession, item_name: str) -> List[BestPrice]:
+    """All offers for an item name (Arabic-normalized exact match), cheapest first"""
+    item_key = normalize_text(item_name)
+    if not item_key:
+        return []
+    result = await session.execute(
+        select(BestPrice).where(BestPrice.item_key == item_key).order_by(BestPrice.min_price)
+    )
+    return result.scalars().all()
+
+
+async def rebuild_best_prices(session: AsyncSession) -> int:
+    """Recompute the whole table from the catalog and approved order history (caller commits)"""
+    await session.execute(delete(BestPrice))
+
+    catalog_result = await session.execute(
+        select(PriceCatalogItem).where(PriceCatalogItem.is_active == True, PriceCatalogItem.price > 0)
+    )
+    now = datetime.utcnow()
+    catalog_rows = [catalog_offer_row(item, now) for item in catalog_result.scalars().all()]
+
+    order_result = await session.execute(
+        order_rows_query().where(PurchaseOrder.status.in_(APPROVED_ORDER_STATUSES))
+    )
+    order_rows = aggregate_order_rows(order_result.all(), now)
+
+    await execute_upsert(session, catalog_rows + order_rows, keep_lower_min=True)
+    logger.info(f"Best price table rebuilt: {len(catalog_rows)} catalog offers, {len(order_rows)} order offers")
+    return len(catalog_rows) + len(order_rows)
+
+
+async def backfill_best_prices(session: AsyncSession) -> None:
+    """Build the table once for databases created before it existed"""
+    existing = (await session.execute(select(func.count()).select_from(BestPrice))).scalar()
+    if existing:
+        return
+    has_data = (await session.execute(select(func.count()).select_from(PriceCatalogItem))).scalar() or \
+        (await session.execute(select(func.count()).select_from(PurchaseOrder))).scalar()
+    if has_data:
+        await rebuild_best_prices(session)
+        await session.commit()
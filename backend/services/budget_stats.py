@@ -0,0 +1,110 @@
+"""
+Budget Statistics
+Spend per budget category in one grouped query: the spend rollups are summed
+per (project_id, category_id) and left-joined to the categories, instead of one
+SUM query per category inside a per-project loop. The budget report, its Excel
+export and the budget categories list all read from here.
+"""
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import BudgetCategory, Project, SpendRollup
+
+# Order statuses that count as spent against the budget
+SPENT_STATUSES = ["approved", "printed", "shipped", "delivered"]
+
+
+def percentage(spent: float, budget: float) -> float:
+    return round((spent / budget * 100), 1) if budget > 0 else 0
+
+
+def spend_subquery(statuses: Optional[Sequence[str]] = SPENT_STATUSES, by_project: bool = True):
+    """Order totals per category - and per project unless by_project is False"""
+    keys = [SpendRollup.category_id] + ([SpendRollup.project_id] if by_project else [])
+    query = (
+        select(*keys, func.sum(SpendRollup.total_amount).label("spent"))
+        .where(SpendRollup.category_id.isnot(None))
+        .group_by(*keys)
+    )
+    if statuses:
+        query = query.where(SpendRollup.status_bucket.in_(statuses))
+    return query.subquery()
+
+
+async def category_spending(
+    session: AsyncSession,
+    project_id: Optional[str] = None,
+    active_projects: bool = False,
+    statuses: Optional[Sequence[str]] = SPENT_STATUSES,
+    by_project: bool = True,
+    order_by=None
+) -> list:
+    """
+    (category, spent) rows for every budget category. With by_project only
+    orders of the category's own project count; statuses=None counts every order.
+    """
+    spend = spend_subquery(statuses, by_project)
+    on = BudgetCategory.id == spend.c.category_id
+    if by_project:
+        on = and_(on, BudgetCategory.project_id == spend.c.project_id)
+
+    query = select(BudgetCategory, func.coalesce(spend.c.spent, 0).label("spent")).outerjoin(spend, on)
+    if project_id:
+        query = query.where(BudgetCategory.project_id == project_id)
+    if active_projects:
+        query = query.where(BudgetCategory.project_id.in_(select(Project.id).where(Project.status == "active")))
+    if order_by is None:
+        order_by = (BudgetCategory.created_at, BudgetCategory.id)
+    result = await session.execute(query.order_by(*order_by))
+    return result.all()
+
+
+async def project_budgets(session: AsyncSession, project_id: Optional[str] = None) -> Dict:
+    """Budget against approved spend per active project and category, with overall totals"""
+    projects_query = select(Project.id, Project.name).where(Project.status == "active")
+    if project_id:
+        projects_query = projects_query.where(Project.id == project_id)
+    projects = (await session.execute(projects_query.order_by(Project.name))).all()
+
+    lines: Dict[str, List[Dict]] = {}
+    for category, spent in await category_spending(session, project_id, active_projects=True):
+        budget = float(category.estimated_budget or 0)
+        spent = float(spent or 0)
+        lines.setdefault(category.project_id, []).append({
+            "category_id": category.id,
+            "category_name": category.name,
+            "budget": budget,
+            "spent": spent,
+            "remaining": budget - spent,
+            "percentage": percentage(spent, budget)
+        })
+
+    budget_data = []
+    for project in projects:
+        categories = lines.get(project.id, [])
+        total_budget = sum(line["budget"] for line in categories)
+        total_spent = sum(line["spent"] for line in categories)
+        budget_data.append({
+            "project_id": project.id,
+            "project_name": project.name,
+            "categories": categories,
+            "total_spent": total_spent,
+            "total_budget": total_budget,
+            "remaining": total_budget - total_spent,
+            "percentage": percentage(total_spent, total_budget)
+        })
+
+    total_budget = sum(p["total_budget"] for p in budget_data)
+    total_spent = sum(p["total_spent"] for p in budget_data)
+    return {
+        "projects": budget_data,
+        "summary": {
+            "total_budget": total_budget,
+            "total_spent": total_spent,
+            "total_remaining": total_budget - total_spent,
+            "overall_percentage": percentage(total_spent, total_budget)
+        }
+    }
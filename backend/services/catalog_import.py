@@ -0,0 +1,241 @@
+"""
+Catalog Import Pipeline
+Rows are parsed in chunks (Excel in the worker pool, CSV in-process), validated
+and normalized, then written with set-based upserts - one statement per chunk
+and match kind:
+- rows with an item code upsert on item_code (INSERT ... ON CONFLICT)
+- rows without one update the existing item with the same name and supplier,
+  or are inserted
+Rows repeated within the file are folded (the last one wins) and every rejected
+row is reported with its row number.
+"""
+import csv
+import io
+import uuid
+from datetime import date, datetime
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import PriceCatalogItem, is_sqlite
+from services.best_prices import record_catalog_items
+from services.imports import SHEET_CHUNK_SIZE
+
+# File column order (matches the catalog template)
+IMPORT_COLUMNS = [
+    "item_code", "name", "description", "unit", "price",
+    "currency", "supplier_name", "category_name", "validity_until"
+]
+
+COLUMN_LABELS = {
+    "item_code": "كود الصنف",
+    "name": "اسم الصنف",
+    "unit": "الوحدة",
+    "currency": "العملة",
+    "supplier_name": "اسم المورد",
+    "category_name": "التصنيف",
+    "validity_until": "صالح حتى",
+}
+
+# Column sizes in price_catalog - longer values would fail the whole chunk
+MAX_LENGTHS = {
+    "item_code": 50, "name": 255, "unit": 50, "currency": 10,
+    "supplier_name": 255, "category_name": 255, "validity_until": 50
+}
+
+# Columns an import overwrites on existing items
+UPDATED_COLUMNS = [
+    "name", "description", "unit", "price", "currency", "supplier_name",
+    "category_name", "validity_until", "is_active", "updated_at"
+]
+
+
+# ==================== PARSING ====================
+
+def cell_text(value) -> Optional[str]:
+    """Cell value as stripped text - whole floats lose the .0, dates become YYYY-MM-DD"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, datetime):
+        value = value.date().isoformat()
+    elif isinstance(value, date):
+        value = value.isoformat()
+    return str(value).strip() or None
+
+
+def normalize_row(row: Sequence) -> dict:
+    """Validated column values for one row - raises ValueError with the reason"""
+    values = {
+        column: cell_text(row[index]) if index < len(row) else None
+        for index, column in enumerate(IMPORT_COLUMNS)
+    }
+    if not values["name"]:
+        raise ValueError("اسم الصنف مطلوب")
+
+    try:
+        price = float(values["price"]) if values["price"] else 0
+    except ValueError:
+        raise ValueError(f"السعر '{values['price']}' غير صالح")
+    if price <= 0:
+        raise ValueError("السعر يجب أن يكون أكبر من صفر")
+
+    for column, limit in MAX_LENGTHS.items():
+        if values[column] and len(values[column]) > limit:
+            raise ValueError(f"{COLUMN_LABELS[column]} أطول من {limit} حرفاً")
+
+    values["price"] = price
+    values["unit"] = values["unit"] or "قطعة"
+    values["currency"] = values["currency"] or "SAR"
+    return values
+
+
+async def iter_csv_chunks(
+    content: bytes,
+    chunk_size: int = SHEET_CHUNK_SIZE,
+    on_total: Optional[Callable[[int], None]] = None
+) -> AsyncIterator[List[list]]:
+    """CSV rows after the header, chunk by chunk - on_total receives the (line-count) row estimate first"""
+    try:
+        decoded = content.decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"فشل في قراءة ملف CSV: {str(e)}")
+    if on_total:
+        on_total(max(decoded.count("\n"), 1))
+
+    reader = csv.reader(io.StringIO(decoded))
+    next(reader, None)
+    while True:
+        chunk = list(islice(reader, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+# ==================== UPSERT ====================
+
+def upsert_statement(session: AsyncSession, conflict_column, keep_code: bool):
+    """INSERT ... ON CONFLICT DO UPDATE for the session's dialect"""
+    insert = sqlite_insert if is_sqlite(session) else pg_insert
+    stmt = insert(PriceCatalogItem)
+    values = {column: stmt.excluded[column] for column in UPDATED_COLUMNS}
+    if keep_code:
+        # Rows without a code never clear the code of the item they match
+        values["item_code"] = func.coalesce(stmt.excluded.item_code, PriceCatalogItem.item_code)
+    return stmt.on_conflict_do_update(index_elements=[conflict_column], set_=values)
+
+
+async def upsert_chunk(session: AsyncSession, rows: List[dict], user, report: dict) -> None:
+    """Write one chunk of deduplicated rows - two statements at most"""
+    now = datetime.utcnow()
+
+    codes = [row["item_code"] for row in rows if row["item_code"]]
+    existing_codes: Dict[str, str] = {}
+    if codes:
+        result = await session.execute(
+            select(PriceCatalogItem.item_code, PriceCatalogItem.id).where(PriceCatalogItem.item_code.in_(codes))
+        )
+        existing_codes = dict(result.all())
+
+    # Everything not matched by code is matched by name + supplier
+    unmatched = [row for row in rows if row["item_code"] not in existing_codes]
+    existing_names = {}
+    if unmatched:
+        result = await session.execute(
+            select(PriceCatalogItem.id, PriceCatalogItem.name, PriceCatalogItem.supplier_name, PriceCatalogItem.item_code)
+            .where(PriceCatalogItem.name.in_({row["name"] for row in unmatched}))
+            .order_by(PriceCatalogItem.is_active.desc(), PriceCatalogItem.created_at)
+        )
+        for item in result.all():
+            existing_names.setdefault((item.name, item.supplier_name), item)
+
+    by_code, by_id = [], []
+    touched_ids, claimed = [], set()
+    for row in rows:
+        record = {
+            **row,
+            "id": str(uuid.uuid4()),
+            "is_active": True,
+            "created_by": user.id,
+            "created_by_name": user.name,
+            "created_at": now,
+            "updated_at": now
+        }
+        code = row["item_code"]
+        if code in existing_codes:
+            # The fresh id is never used: the row conflicts on item_code and updates in place
+            by_code.append(record)
+            touched_ids.append(existing_codes[code])
+            report["updated"] += 1
+            continue
+
+        # A new code may be adopted by an existing item that has none yet
+        match = existing_names.get((row["name"], row["supplier_name"]))
+        if match is not None and match.id not in claimed and (not code or match.item_code is None):
+            claimed.add(match.id)
+            record["id"] = match.id
+            by_id.append(record)
+            report["updated"] += 1
+        else:
+            (by_code if code else by_id).append(record)
+            report["imported"] += 1
+        touched_ids.append(record["id"])
+
+    if by_code:
+        await session.execute(upsert_statement(session, PriceCatalogItem.item_code, keep_code=False), by_code)
+    if by_id:
+        await session.execute(upsert_statement(session, PriceCatalogItem.id, keep_code=True), by_id)
+
+    touched = await session.execute(
+        select(
+            PriceCatalogItem.id, PriceCatalogItem.name, PriceCatalogItem.supplier_name, PriceCatalogItem.unit,
+            PriceCatalogItem.currency, PriceCatalogItem.price, PriceCatalogItem.is_active
+        ).where(PriceCatalogItem.id.in_(touched_ids))
+    )
+    await record_catalog_items(session, touched.all())
+
+
+async def import_catalog_rows(
+    session: AsyncSession,
+    chunks: AsyncIterator[Sequence[Sequence]],
+    user,
+    first_row: int = 2,
+    on_rows: Optional[Callable[[int], Awaitable[None]]] = None
+) -> dict:
+    """
+    Run the pipeline over parsed chunks (caller commits). on_rows receives the
+    number of rows read so far after each chunk.
+    Returns {"imported", "updated", "errors": [{"row", "error"}]}.
+    """
+    report = {"imported": 0, "updated": 0, "errors": []}
+    row_num = first_row
+
+    async for chunk in chunks:
+        # Later rows with the same code (or name + supplier) replace earlier ones
+        rows: Dict[tuple, dict] = {}
+        for row in chunk:
+            current, row_num = row_num, row_num + 1
+            if not row or all(cell_text(value) is None for value in row):
+                continue
+            try:
+                values = normalize_row(row)
+            except ValueError as e:
+                report["errors"].append({"row": current, "error": str(e)})
+                continue
+            key = ("code", values["item_code"]) if values["item_code"] else ("name", values["name"], values["supplier_name"])
+            rows.pop(key, None)
+            rows[key] = values
+
+        if rows:
+            await upsert_chunk(session, list(rows.values()), user, report)
+        if on_rows:
+            await on_rows(row_num - first_row)
+
+    return report
@@ -0,0 +1,349 @@
+"""
+Catalog Search Index - in-memory, Arabic-aware
+Active price_catalog items (name, item_code, description) and item_aliases are
+normalized (services/arabic_text.py) and indexed by character trigrams, so a
+search is a handful of set intersections instead of an ILIKE '%term%' full scan.
+
+Consistency follows database/settings_cache.py: writers call
+index_catalog_changes() before commit. This worker applies the changes to its
+index once the transaction commits, and a shared generation counter makes the
+other uvicorn workers reload on their next revalidation.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from heapq import nsmallest
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import PriceCatalogItem, ItemAlias, SequenceCounter
+from database.sequences import next_counter_value
+from services.arabic_text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+NGRAM = 3
+CATALOG_GENERATION_SERIES = "catalog_generation"
+CATALOG_REVALIDATE_SECONDS = float(os.environ.get("CATALOG_REVALIDATE_SECONDS", "5"))
+
+# Minimum trigram similarity (Dice) for fuzzy suggestions
+DEFAULT_MIN_SIMILARITY = 0.4
+
+
+def ngrams(text: str) -> Set[str]:
+    if len(text) < NGRAM:
+        return {text} if text else set()
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class TextIndex:
+    """Trigram inverted index over normalized strings"""
+
+    def __init__(self):
+        self.texts: Dict[str, str] = {}
+        self.sizes: Dict[str, int] = {}
+        self.grams: Dict[str, Set[str]] = {}
+
+    def add(self, key: str, text: str) -> None:
+        self.remove(key)
+        if not text:
+            return
+        grams = ngrams(text)
+        self.texts[key] = text
+        self.sizes[key] = len(grams)
+        for gram in grams:
+            self.grams.setdefault(gram, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        text = self.texts.pop(key, None)
+        if text is None:
+            return
+        self.sizes.pop(key, None)
+        for gram in ngrams(text):
+            keys = self.grams.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.grams[gram]
+
+    def containing(self, query: str) -> Set[str]:
+        """Keys whose text contains `query` (already normalized) as a substring"""
+        if not query:
+            return set()
+        if len(query) < NGRAM:
+            return {key for key, text in self.texts.items() if query in text}
+
+        postings = [self.grams.get(gram) for gram in ngrams(query)]
+        if not all(postings):
+            return set()
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for keys in postings[1:]:
+            candidates &= keys
+            if not candidates:
+                return candidates
+        return {key for key in candidates if query in self.texts[key]}
+
+    def similar(self, query: str, min_similarity: float) -> Dict[str, float]:
+        """Keys sharing enough trigrams with `query` -> Dice similarity"""
+        query_grams = ngrams(query)
+        if not query_grams:
+            return {}
+
+        # Counter counts in C, so even grams shared by most keys (e.g. "ال") stay cheap
+        n = len(query_grams)
+        hits = Counter(chain.from_iterable(self.grams.get(gram, ()) for gram in query_grams))
+        needed = min_similarity * n / (2 - min_similarity)
+
+        scores = {}
+        for key, count in hits.items():
+            if count >= needed:
+                score = 2 * count / (n + self.sizes[key])
+                if score >= min_similarity:
+                    scores[key] = score
+        return scores
+
+
+def item_snapshot(item) -> Tuple:
+    """The fields of a PriceCatalogItem the index needs (taken before commit)"""
+    return (item.id, item.name, item.item_code, item.description,
+            item.supplier_id, item.category_id, item.is_active is not False)
+
+
+def alias_snapshot(alias) -> Tuple:
+    return (alias.id, alias.alias_name, alias.catalog_item_id)
+
+
+class CatalogSearchIndex:
+    """Searchable copy of the active catalog and all aliases"""
+
+    def __init__(self, revalidate_seconds: float = CATALOG_REVALIDATE_SECONDS):
+        self.revalidate_seconds = revalidate_seconds
+        self._reset()
+        self._generation: Optional[int] = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._lock = asyncio.Lock()
+
+    def _reset(self) -> None:
+        self.names = TextIndex()
+        self.codes = TextIndex()
+        self.descriptions = TextIndex()
+        self.alias_names = TextIndex()
+        self.items: Dict[str, dict] = {}
+        self.aliases: Dict[str, Tuple[str, str]] = {}  # alias_id -> (catalog_item_id, alias_name)
+
+    # ==================== LOADING ====================
+
+    async def load(self, session: AsyncSession) -> "CatalogSearchIndex":
+        """Make sure the index is fresh, rebuilding it from the database only when needed"""
+        if not self._stale and time.monotonic() - self._checked_at < self.revalidate_seconds:
+            return self
+
+        async with self._lock:
+            if not self._stale and time.monotonic() - self._checked_at < self.revalidate_seconds:
+                return self
+
+            generation = await self._read_generation(session)
+            if self._stale or generation != self._generation:
+                await self._rebuild(session)
+                self._generation = generation
+                self._stale = False
+            self._checked_at = time.monotonic()
+
+        return self
+
+    async def _read_generation(self, session: AsyncSession) -> int:
+        result = await session.execute(
+            select(SequenceCounter.value).where(SequenceCounter.name == CATALOG_GENERATION_SERIES)
+        )
+        return result.scalar() or 0
+
+    async def _rebuild(self, session: AsyncSession) -> None:
+        started = time.monotonic()
+
+        # Read everything first so searches never see a half-built index
+        items = await session.execute(
+            select(
+                PriceCatalogItem.id, PriceCatalogItem.name, PriceCatalogItem.item_code,
+                PriceCatalogItem.description, PriceCatalogItem.supplier_id,
+                PriceCatalogItem.category_id, PriceCatalogItem.is_active
+            ).where(PriceCatalogItem.is_active == True)
+        )
+        item_rows = items.all()
+        aliases = await session.execute(
+            select(ItemAlias.id, ItemAlias.alias_name, ItemAlias.catalog_item_id)
+        )
+        alias_rows = aliases.all()
+
+        self._reset()
+        for row in item_rows:
+            self.put_item(tuple(row))
+        for row in alias_rows:
+            self.put_alias(tuple(row))
+
+        logger.info(
+            f"Catalog search index built: {len(self.items)} items, {len(self.aliases)} aliases "
+            f"in {(time.monotonic() - started) * 1000:.0f}ms"
+        )
+
+    def mark_stale(self) -> None:
+        """Force a rebuild on next access in this worker"""
+        self._stale = True
+
+    # ==================== INCREMENTAL UPDATES ====================
+
+    def put_item(self, snapshot: Tuple) -> None:
+        item_id, name, item_code, description, supplier_id, category_id, is_active = snapshot
+        if not is_active:
+            self.remove_item(item_id)
+            return
+        name_norm = normalize_text(name)
+        self.items[item_id] = {
+            "name": name_norm,
+            "item_code": normalize_text(item_code),
+            "supplier_id": supplier_id,
+            "category_id": category_id
+        }
+        self.names.add(item_id, name_norm)
+        self.codes.add(item_id, self.items[item_id]["item_code"])
+        self.descriptions.add(item_id, normalize_text(description))
+
+    def remove_item(self, item_id: str) -> None:
+        self.items.pop(item_id, None)
+        self.names.remove(item_id)
+        self.codes.remove(item_id)
+        self.descriptions.remove(item_id)
+
+    def put_alias(self, snapshot: Tuple) -> None:
+        alias_id, alias_name, catalog_item_id = snapshot
+        self.aliases[alias_id] = (catalog_item_id, alias_name)
+        self.alias_names.add(alias_id, normalize_text(alias_name))
+
+    def remove_alias(self, alias_id: str) -> None:
+        self.aliases.pop(alias_id, None)
+        self.alias_names.remove(alias_id)
+
+    def apply_committed(self, generation: int, items: List[Tuple], aliases: List[Tuple],
+                        removed_aliases: List[str]) -> None:
+        """Apply a committed change set - falls back to a rebuild if another worker changed the catalog too"""
+        if self._stale or self._generation is None or generation != self._generation + 1:
+            self.mark_stale()
+            return
+        for snapshot in items:
+            self.put_item(snapshot)
+        for snapshot in aliases:
+            self.put_alias(snapshot)
+        for alias_id in removed_aliases:
+            self.remove_alias(alias_id)
+        self._generation = generation
+
+    # ==================== QUERIES ====================
+
+    def search(self, text: str, category_id: Optional[str] = None, supplier_id: Optional[str] = None,
+               limit: Optional[int] = None, names_only: bool = False) -> List[str]:
+        """
+        Active item ids whose name, item_code or description contains `text`
+        (only the name with names_only), best matches first:
+        exact name/code, then prefix, then contains.
+        """
+        query = normalize_text(text)
+        if not query:
+            return []
+
+        ranks: Dict[str, int] = {}
+        for item_id in self.names.containing(query):
+            name = self.items[item_id]["name"]
+            ranks[item_id] = 0 if name == query else (2 if name.startswith(query) else 4)
+        if not names_only:
+            for item_id in self.codes.containing(query):
+                code = self.items[item_id]["item_code"]
+                rank = 1 if code == query else (3 if code.startswith(query) else 5)
+                ranks[item_id] = min(rank, ranks.get(item_id, rank))
+            for item_id in self.descriptions.containing(query):
+                ranks.setdefault(item_id, 6)
+
+        matches = [
+            item_id for item_id in ranks
+            if (not category_id or self.items[item_id]["category_id"] == category_id)
+            and (not supplier_id or self.items[item_id]["supplier_id"] == supplier_id)
+        ]
+        sort_key = lambda item_id: (ranks[item_id], self.items[item_id]["name"])
+        if limit is not None:
+            return nsmallest(limit, matches, key=sort_key)
+        return sorted(matches, key=sort_key)
+
+    def suggest(self, text: str, limit: int = 5,
+                min_similarity: float = DEFAULT_MIN_SIMILARITY) -> List[str]:
+        """Item ids for a free-typed name: substring matches first, then fuzzy (spelling variants, typos)"""
+        query = normalize_text(text)
+        if not query:
+            return []
+
+        ranked = self.search(text, limit=limit)
+        if len(ranked) < limit:
+            seen = set(ranked)
+            scores = self.names.similar(query, min_similarity)
+            best = nsmallest(limit, scores, key=lambda key: (-scores[key], self.items[key]["name"]))
+            ranked.extend(item_id for item_id in best if item_id not in seen)
+        return ranked[:limit]
+
+    def match_aliases(self, text: str, fuzzy: bool = False,
+                      min_similarity: float = DEFAULT_MIN_SIMILARITY) -> List[Tuple[str, str, str]]:
+        """(alias_id, catalog_item_id, alias_name) for aliases containing `text` (or close to it with fuzzy) - exact alias first"""
+        query = normalize_text(text)
+        if not query:
+            return []
+
+        scores: Dict[str, float] = {}
+        for alias_id in self.alias_names.containing(query):
+            scores[alias_id] = 3.0 if self.alias_names.texts[alias_id] == query else 2.0
+        if fuzzy:
+            for alias_id, score in self.alias_names.similar(query, min_similarity).items():
+                scores.setdefault(alias_id, score)
+
+        ordered = sorted(scores, key=lambda key: (-scores[key], self.alias_names.texts[key]))
+        return [(alias_id, *self.aliases[alias_id]) for alias_id in ordered]
+
+
+catalog_index = CatalogSearchIndex()
+
+
+async def get_catalog_index(session: AsyncSession) -> CatalogSearchIndex:
+    """Return the (fresh) process-wide catalog search index"""
+    return await catalog_index.load(session)
+
+
+async def index_catalog_changes(
+    session: AsyncSession,
+    items: Iterable = (),
+    aliases: Iterable = (),
+    removed_aliases: Iterable[str] = ()
+) -> None:
+    """
+    Call after changing catalog items or aliases, before commit.
+    Pass the changed PriceCatalogItem / ItemAlias objects (deactivated items are
+    dropped from the index) and the ids of deleted aliases.
+    """
+    generation = await next_counter_value(session, CATALOG_GENERATION_SERIES, select(literal(0)))
+    item_snapshots = [item_snapshot(item) for item in items]
+    alias_snapshots = [alias_snapshot(alias) for alias in aliases]
+    removed = list(removed_aliases)
+
+    event.listen(
+        session.sync_session, "after_commit",
+        lambda _session: catalog_index.apply_committed(generation, item_snapshots, alias_snapshots, removed),
+        once=True
+    )
+
+
+async def invalidate_catalog_index(session: AsyncSession) -> None:
+    """Call before committing bulk catalog changes (imports, wipes) - every worker rebuilds"""
+    await next_counter_value(session, CATALOG_GENERATION_SERIES, select(literal(0)))
+    event.listen(session.sync_session, "after_commit", lambda _session: catalog_index.mark_stale(), once=True)
@@ -0,0 +1,273 @@
+"""
+Streaming exports (CSV and XLSX)
+Rows are read through a server-side cursor in chunks and written as they arrive,
+so memory stays flat however large the table is. XLSX workbooks use openpyxl
+write-only mode with shared named styles instead of per-cell style objects and
+are built in the worker pool (services.workers).
+"""
+from typing import AsyncIterator, Callable, Optional, Sequence, Union
+import csv
+import io
+import os
+import pickle
+import tempfile
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+
+from database.connection import get_session_maker
+from services.workers import run_in_worker
+
+# Rows fetched per round trip and encoded per response chunk
+EXPORT_CHUNK_SIZE = 2000
+
+# UTF-8 byte order mark - makes Excel open Arabic CSV files correctly
+UTF8_BOM = b"\xef\xbb\xbf"
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+HEADER_COLOR = "4472C4"
+
+# Section title bars: white bold text on a solid colour
+BANNER_COLORS = {
+    "banner": "2E75B6",
+    "banner_purple": "7030A0",
+    "banner_green": "70AD47",
+    "banner_orange": "ED7D31",
+    "banner_sky": "5B9BD5",
+}
+
+
+# ==================== DB STREAMING ====================
+
+async def stream_rows(
+    query,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    session: Optional[AsyncSession] = None
+) -> AsyncIterator[Sequence]:
+    """
+    Yield the query's rows in chunks of chunk_size.
+    Without a session one is opened here: the request session is already closed
+    by the time a streaming response body is sent.
+    """
+    if session is not None:
+        result = await session.stream(query.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield rows
+        return
+
+    async with get_session_maker()() as own_session:
+        result = await own_session.stream(query.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield rows
+
+
+# ==================== CSV ====================
+
+async def stream_csv(
+    header: Sequence[str],
+    query,
+    to_row: Callable[[object], Sequence],
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Encode the query as UTF-8 CSV with a BOM, one chunk of bytes per fetched chunk of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    yield UTF8_BOM + buffer.getvalue().encode("utf-8")
+
+    async for rows in stream_rows(query, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(to_row(row) for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+# ==================== XLSX ====================
+
+def named_styles(header_color: str) -> list:
+    """The styles every report draws from - registered once per workbook"""
+    from openpyxl.styles import NamedStyle, Font, PatternFill, Border, Side, Alignment
+
+    thin = Side(style="thin")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    center = Alignment(horizontal="center", vertical="center")
+
+    def fill(color):
+        return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+    return [
+        NamedStyle(name="title", font=Font(bold=True, size=16), alignment=center),
+        NamedStyle(name="heading", font=Font(bold=True, size=14)),
+        *[
+            NamedStyle(name=name, font=Font(bold=True, size=14, color="FFFFFF"), fill=fill(color), alignment=center)
+            for name, color in BANNER_COLORS.items()
+        ],
+        NamedStyle(name="label", font=Font(bold=True)),
+        NamedStyle(name="section", font=Font(bold=True, size=12), fill=fill("E2EFDA")),
+        NamedStyle(name="group", font=Font(bold=True), fill=fill("D9E1F2")),
+        NamedStyle(name="header", font=Font(bold=True, color="FFFFFF"), fill=fill(header_color),
+                   border=border, alignment=center),
+        NamedStyle(name="cell", border=border),
+        NamedStyle(name="cell_center", border=border, alignment=center),
+        NamedStyle(name="total", font=Font(bold=True), border=border),
+        NamedStyle(name="summary", fill=fill("E2EFDA"), border=border),
+        NamedStyle(name="increase", fill=fill("FEE2E2"), border=border),
+        NamedStyle(name="decrease", fill=fill("D1FAE5"), border=border),
+        NamedStyle(name="warning", font=Font(bold=True, color="FFFFFF"), fill=fill("FFC000"),
+                   border=border, alignment=center),
+        NamedStyle(name="danger", font=Font(bold=True, color="FFFFFF"), fill=fill("FF0000"),
+                   border=border, alignment=center),
+    ]
+
+
+def styled_row(sheet, values: Sequence, style) -> list:
+    """Turn (values, style) into write-only cells - style is one name, one per column, or None"""
+    from openpyxl.cell import WriteOnlyCell
+
+    styles = [style] * len(values) if style is None or isinstance(style, str) else style
+    row = []
+    for value, cell_style in zip(values, styles):
+        if cell_style is None:
+            row.append(value)
+        else:
+            cell = WriteOnlyCell(sheet, value=value)
+            cell.style = cell_style
+            row.append(cell)
+    return row
+
+
+def build_xlsx(spec: dict, rows_path: Optional[str]) -> str:
+    """
+    Runs in the worker pool: write the recorded rows into a write-only workbook
+    and return the path of the finished .xlsx file.
+    """
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    for style in named_styles(spec["header_color"]):
+        workbook.add_named_style(style)
+
+    sheet = workbook.create_sheet(spec["title"])
+    sheet.sheet_view.rightToLeft = True
+    for index, width in enumerate(spec["widths"], 1):
+        sheet.column_dimensions[get_column_letter(index)].width = width
+    for row, span in spec["merges"]:
+        sheet.merged_cells.add(f"A{row}:{get_column_letter(span)}{row}")
+
+    if rows_path is not None:
+        with open(rows_path, "rb") as rows_file:
+            while True:
+                try:
+                    chunk = pickle.load(rows_file)
+                except EOFError:
+                    break
+                for values, style in chunk:
+                    sheet.append(styled_row(sheet, values, style))
+
+    fd, output_path = tempfile.mkstemp(prefix="export-", suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(output_path)
+    except Exception:
+        os.remove(output_path)
+        raise
+    return output_path
+
+
+def remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class XlsxExport:
+    """
+    A single right-to-left sheet. Rows are recorded to a temp file in chunks as
+    they are appended (so they must come in order); response() then builds the
+    workbook in the worker pool and streams the file back (or build() hands over
+    the file itself). Use it as `async with XlsxExport(...) as export:` - or call
+    discard() - so the temp file is removed when filling it fails halfway.
+    """
+
+    def __init__(self, title: str, widths: Sequence[float], header_color: str = HEADER_COLOR):
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=500, detail="مكتبة Excel غير متوفرة")
+
+        self.spec = {"title": title, "widths": list(widths), "header_color": header_color, "merges": []}
+        self.row_count = 0
+        self._pending = []
+        self._rows_file = None  # created on the first flush
+
+    async def __aenter__(self) -> "XlsxExport":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.discard()
+
+    def append(self, values: Sequence, style: Union[str, Sequence[Optional[str]], None] = None) -> None:
+        """
+        Write one row. style is a named style for every cell, or one per column
+        (None leaves a cell unstyled).
+        """
+        self._pending.append((list(values), style))
+        self.row_count += 1
+        if len(self._pending) >= EXPORT_CHUNK_SIZE:
+            self._flush()
+
+    def title(self, text: str, span: int, style: Optional[str] = "title") -> None:
+        """A row whose first cell is merged across span columns"""
+        self.append([text], style)
+        if span > 1:
+            self.spec["merges"].append((self.row_count, span))
+
+    def header(self, headers: Sequence[str]) -> None:
+        self.append(headers, "header")
+
+    def blank(self, count: int = 1) -> None:
+        for _ in range(count):
+            self.append([])
+
+    def _flush(self) -> None:
+        if self._pending:
+            if self._rows_file is None:
+                self._rows_file = tempfile.NamedTemporaryFile(prefix="export-", suffix=".rows", delete=False)
+            pickle.dump(self._pending, self._rows_file, protocol=pickle.HIGHEST_PROTOCOL)
+            self._pending = []
+
+    def discard(self) -> None:
+        """Drop the recorded rows and their temp file (safe to call more than once)"""
+        self._pending = []
+        if self._rows_file is not None:
+            self._rows_file.close()
+            remove_file(self._rows_file.name)
+            self._rows_file = None
+
+    async def build(self) -> str:
+        """Build the workbook off the event loop - returns the .xlsx path, which the caller removes"""
+        self._flush()
+        rows_path = None
+        if self._rows_file is not None:
+            self._rows_file.close()
+            rows_path = self._rows_file.name
+        try:
+            return await run_in_worker(build_xlsx, self.spec, rows_path)
+        finally:
+            self.discard()
+
+    async def response(self, filename: str) -> FileResponse:
+        """Build the workbook off the event loop and stream it back"""
+        path = await self.build()
+        return FileResponse(
+            path,
+            media_type=XLSX_MEDIA_TYPE,
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+            background=BackgroundTask(remove_file, path)
+        )
@@ -0,0 +1,100 @@
+"""
+Sparse fieldsets for list endpoints
+`?fields=id,order_number,status,total_amount` selects only the columns those
+fields need, so large free-text columns (notes, terms, reason) are neither read
+from the database nor hydrated into ORM objects nor serialized.
+Without `fields` the endpoint returns its full, unchanged shape.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+
+class Computed:
+    """A field whose value is derived from one or more columns of the row"""
+
+    def __init__(self, columns: Sequence, value: Callable[[Any], Any]):
+        self.columns = tuple(columns)
+        self.value = value
+
+
+def iso_datetime(column) -> Computed:
+    """Optional datetime column rendered as ISO 8601, the way every list endpoint does"""
+    def value(row):
+        dt = getattr(row, column.key)
+        return dt.isoformat() if dt else None
+    return Computed((column,), value)
+
+
+class Related:
+    """A field filled in by the endpoint (e.g. nested items) - needs only the given columns"""
+
+    def __init__(self, *columns):
+        self.columns = tuple(columns)
+
+
+class Constant:
+    """A field kept for backwards compatibility that always has the same value"""
+
+    def __init__(self, value: Any = None):
+        self.columns = ()
+        self.value = value
+
+
+class FieldSet:
+    """
+    Output field name -> source, where the source is a mapped column attribute,
+    Computed, Related or Constant. Field order is the order of the full response.
+    """
+
+    def __init__(self, fields: Dict[str, Any], always: Iterable[str] = ("id",)):
+        self.fields = fields
+        self.always = [name for name in always if name in fields]
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.fields.keys())
+
+    def parse(self, fields: Optional[str]) -> List[str]:
+        """Turn the `fields` query value into an ordered list of field names (400 on unknown fields)"""
+        if not fields:
+            return self.names
+
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = sorted(requested - set(self.fields))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"حقول غير معروفة: {', '.join(unknown)}")
+
+        requested.update(self.always)
+        return [name for name in self.fields if name in requested]
+
+    def columns(self, selected: Sequence[str], *extra) -> list:
+        """Columns to put in the SELECT for the selected fields (plus any the endpoint needs itself)"""
+        columns = []
+        seen = set()
+        for name in selected:
+            source = self.fields[name]
+            for column in getattr(source, "columns", (source,)):
+                if column.key not in seen:
+                    seen.add(column.key)
+                    columns.append(column)
+        for column in extra:
+            if column.key not in seen:
+                seen.add(column.key)
+                columns.append(column)
+        return columns
+
+    def serialize(self, row, selected: Sequence[str], related: Optional[Dict[str, Callable]] = None) -> dict:
+        """Build the response dict for one row; `related` maps Related field names to row -> value"""
+        data = {}
+        for name in selected:
+            source = self.fields[name]
+            if isinstance(source, Computed):
+                data[name] = source.value(row)
+            elif isinstance(source, Related):
+                data[name] = related[name](row) if related and name in related else None
+            elif isinstance(source, Constant):
+                data[name] = source.value
+            else:
+                data[name] = getattr(row, source.key)
+        return data
@@ -0,0 +1,83 @@
+"""
+Spreadsheet imports
+Uploaded workbooks are parsed in the worker pool (services.workers) in openpyxl
+read-only mode, so parsing neither blocks the event loop nor builds a full cell
+model of the sheet; the routes only see plain row tuples.
+"""
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+import io
+import os
+import pickle
+import tempfile
+
+from fastapi import HTTPException
+
+from services.workers import run_in_worker
+
+# Rows per chunk handed back from the worker
+SHEET_CHUNK_SIZE = 1000
+
+
+def require_openpyxl() -> None:
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=500, detail="مكتبة Excel غير متوفرة")
+
+
+def spool_sheet_rows(content: bytes, min_row: int, chunk_size: int) -> Tuple[str, int]:
+    """
+    Runs in the worker pool: pickle the active sheet's rows to a temp file in
+    chunks, return its path and the row count.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(content), read_only=True)
+    fd, path = tempfile.mkstemp(prefix="import-", suffix=".rows")
+    count = 0
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            chunk = []
+            for row in workbook.active.iter_rows(min_row=min_row, values_only=True):
+                chunk.append(row)
+                count += 1
+                if len(chunk) >= chunk_size:
+                    pickle.dump(chunk, spool, protocol=pickle.HIGHEST_PROTOCOL)
+                    chunk = []
+            if chunk:
+                pickle.dump(chunk, spool, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        os.remove(path)
+        raise
+    finally:
+        workbook.close()
+    return path, count
+
+
+async def iter_sheet_chunks(
+    content: bytes,
+    min_row: int = 1,
+    chunk_size: int = SHEET_CHUNK_SIZE,
+    on_total: Optional[Callable[[int], None]] = None
+) -> AsyncIterator[List[tuple]]:
+    """
+    Parse an uploaded .xlsx off the event loop and yield its rows chunk by chunk.
+    on_total receives the row count before the first chunk (for progress reporting).
+    """
+    require_openpyxl()
+    try:
+        path, count = await run_in_worker(spool_sheet_rows, content, min_row, chunk_size)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"فشل في قراءة ملف Excel: {str(e)}")
+    if on_total:
+        on_total(count)
+    try:
+        with open(path, "rb") as spool:
+            while True:
+                try:
+                    chunk = pickle.load(spool)
+                except EOFError:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
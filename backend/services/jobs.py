@@ -0,0 +1,340 @@
+"""
+Background Jobs
+Long imports, exports and backups run as asyncio tasks in the app worker that
+accepted them; their state lives in the jobs table so any worker can answer a
+status poll. CPU-heavy steps inside a job still go to the process pool
+(services.workers). A job opens its own database sessions - the request that
+started it returns the job id straight away (202).
+Each job records the worker process that runs it (owner) and a heartbeat the
+worker refreshes while it runs. Jobs do not survive their worker: recover_jobs(),
+run by the scheduler, fails the unfinished jobs whose heartbeat has gone stale -
+never those another live worker is still running.
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, update, delete, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import Job, JobStatus, is_sqlite
+from database.connection import get_session_maker
+
+logger = logging.getLogger(__name__)
+
+JOB_ARTIFACT_DIR = Path(__file__).parent.parent / "data" / "job_artifacts"
+JOB_RETENTION_HOURS = int(os.environ.get("JOB_RETENTION_HOURS", "24"))
+
+# Progress is written at most this often (seconds); each write also checks for cancellation
+PROGRESS_INTERVAL = 1.0
+
+# This process, as recorded in the owner column of the jobs it runs
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Running jobs have their heartbeat refreshed this often (seconds); a job silent
+# for JOB_STALE_AFTER has lost its worker. Recovery runs every JOB_RECOVERY_INTERVAL.
+HEARTBEAT_INTERVAL = 30.0
+JOB_STALE_AFTER = timedelta(seconds=HEARTBEAT_INTERVAL * 4)
+JOB_RECOVERY_INTERVAL = 60
+
+ACTIVE_STATUSES = [JobStatus.QUEUED.value, JobStatus.RUNNING.value]
+
+JobHandler = Callable[..., Awaitable[Optional[dict]]]
+
+# Tasks running in this process and their latest progress, by job id
+_tasks: Dict[str, asyncio.Task] = {}
+_live: Dict[str, dict] = {}
+_heartbeat: Optional[asyncio.Task] = None
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once its cancellation has been requested"""
+
+
+class JobContext:
+    """Handed to every job handler: progress reporting, cancellation and the download file"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.artifact: Optional[dict] = None
+        self._last_write = float("-inf")
+
+    async def progress(self, percent: float, message: Optional[str] = None) -> None:
+        """
+        Record progress (0-99, success sets 100). Throttled to one write per
+        PROGRESS_INTERVAL; raises JobCancelled if the job was cancelled meanwhile.
+        """
+        now = time.monotonic()
+        if now - self._last_write < PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+
+        values = {"progress": max(0, min(99, int(percent)))}
+        if message is not None:
+            values["message"] = message
+        _live.setdefault(self.job_id, {}).update(values)
+        values["heartbeat_at"] = datetime.utcnow()
+
+        async with get_session_maker()() as session:
+            # SQLite allows one writer: the job's own open transaction would block this
+            # update, so progress stays in memory there (SQLite runs a single app worker)
+            if is_sqlite(session):
+                return
+            result = await session.execute(
+                update(Job).where(Job.id == self.job_id).values(**values).returning(Job.cancel_requested)
+            )
+            cancelled = result.scalar()
+            await session.commit()
+        if cancelled:
+            raise JobCancelled()
+
+    def attach(self, path: str, filename: str, media_type: str) -> None:
+        """Move a finished file into the artifact directory as the job's download"""
+        JOB_ARTIFACT_DIR.mkdir(parents=True, exist_ok=True)
+        target = JOB_ARTIFACT_DIR / f"{self.job_id}{Path(filename).suffix}"
+        shutil.move(path, target)
+        self.artifact = {
+            "artifact_path": str(target),
+            "artifact_name": filename,
+            "artifact_media_type": media_type
+        }
+
+
+# ==================== RUNNER ====================
+
+def remove_artifact(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def update_job(job_id: str, **values) -> bool:
+    """Record how an unfinished job ended - False if it had already finished (e.g. failed by recovery)"""
+    async with get_session_maker()() as session:
+        result = await session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status.in_(ACTIVE_STATUSES))
+            .values(**values)
+            .returning(Job.id)
+        )
+        updated = result.scalar() is not None
+        await session.commit()
+    if not updated:
+        logger.warning(f"Job {job_id} had already finished - its outcome was not recorded")
+    return updated
+
+
+async def run_job(job_id: str, handler: JobHandler, kwargs: dict) -> None:
+    """Task body: run the handler and record how it ended"""
+    context = JobContext(job_id)
+    try:
+        # A job cancelled while still queued never starts
+        async with get_session_maker()() as session:
+            started = await session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JobStatus.QUEUED.value)
+                .values(status=JobStatus.RUNNING.value, started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+                .returning(Job.id)
+            )
+            if started.scalar() is None:
+                return
+            await session.commit()
+
+        result = await handler(context, **kwargs)
+    except (JobCancelled, asyncio.CancelledError):
+        remove_artifact((context.artifact or {}).get("artifact_path"))
+        await update_job(
+            job_id, status=JobStatus.CANCELLED.value, message="تم إلغاء المهمة", finished_at=datetime.utcnow()
+        )
+    except HTTPException as e:
+        await update_job(job_id, status=JobStatus.FAILED.value, message=str(e.detail), finished_at=datetime.utcnow())
+    except Exception as e:
+        logger.exception(f"Job {job_id} failed")
+        await update_job(job_id, status=JobStatus.FAILED.value, message=str(e), finished_at=datetime.utcnow())
+    else:
+        recorded = await update_job(
+            job_id,
+            status=JobStatus.SUCCEEDED.value,
+            progress=100,
+            message=(result or {}).get("message"),
+            result=json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+            finished_at=datetime.utcnow(),
+            **(context.artifact or {})
+        )
+        if not recorded:
+            remove_artifact((context.artifact or {}).get("artifact_path"))
+
+
+def forget_task(job_id: str) -> None:
+    _tasks.pop(job_id, None)
+    _live.pop(job_id, None)
+
+
+async def heartbeat() -> None:
+    """Refresh heartbeat_at of the jobs running in this process until none is left"""
+    while _tasks:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        job_ids = list(_tasks)
+        if not job_ids:
+            break
+        try:
+            async with get_session_maker()() as session:
+                # SQLite runs a single worker - recovery there does not go by heartbeats
+                if is_sqlite(session):
+                    return
+                await session.execute(
+                    update(Job)
+                    .where(Job.id.in_(job_ids), Job.status.in_(ACTIVE_STATUSES))
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"Job heartbeat failed: {e}")
+
+
+def ensure_heartbeat() -> None:
+    global _heartbeat
+    if _heartbeat is None or _heartbeat.done():
+        _heartbeat = asyncio.create_task(heartbeat())
+
+
+async def start_job(session: AsyncSession, kind: str, user, handler: JobHandler, **kwargs) -> Job:
+    """
+    Record a queued job and start handler(context, **kwargs) in this process.
+    Commits the session. The handler returns the job's JSON result (or None) and
+    opens its own sessions - the request's is closed long before it finishes.
+    """
+    await purge_expired_jobs(session)
+
+    job = Job(
+        id=str(uuid.uuid4()),
+        kind=kind,
+        status=JobStatus.QUEUED.value,
+        created_by=user.id,
+        created_by_name=user.name,
+        owner=WORKER_ID,
+        heartbeat_at=datetime.utcnow()
+    )
+    session.add(job)
+    await session.commit()
+
+    task = asyncio.create_task(run_job(job.id, handler, kwargs))
+    _tasks[job.id] = task
+    task.add_done_callback(lambda _: forget_task(job.id))
+    ensure_heartbeat()
+    return job
+
+
+async def cancel_job(session: AsyncSession, job: Job) -> None:
+    """Flag the job for cancellation - a queued job is cancelled at once, a running one at its next progress check"""
+    if job.status not in ACTIVE_STATUSES:
+        raise HTTPException(status_code=400, detail="المهمة منتهية ولا يمكن إلغاؤها")
+
+    # Interrupt it right away if it runs in this process
+    task = _tasks.get(job.id)
+    if task is not None:
+        task.cancel()
+
+    job.cancel_requested = True
+    if job.status == JobStatus.QUEUED.value:
+        job.status = JobStatus.CANCELLED.value
+        job.message = "تم إلغاء المهمة"
+        job.finished_at = datetime.utcnow()
+    await session.commit()
+
+
+# ==================== HOUSEKEEPING ====================
+
+async def delete_jobs(session: AsyncSession, *conditions) -> None:
+    """Delete the jobs matching conditions (all without any) together with their files (caller commits)"""
+    jobs = (await session.execute(select(Job.id, Job.artifact_path).where(*conditions))).all()
+    if not jobs:
+        return
+    for job in jobs:
+        remove_artifact(job.artifact_path)
+    await session.execute(delete(Job).where(Job.id.in_([job.id for job in jobs])))
+
+
+async def purge_expired_jobs(session: AsyncSession) -> None:
+    """Delete finished jobs older than JOB_RETENTION_HOURS together with their files (caller commits)"""
+    cutoff = datetime.utcnow() - timedelta(hours=JOB_RETENTION_HOURS)
+    await delete_jobs(session, Job.created_at < cutoff, Job.status.notin_(ACTIVE_STATUSES))
+
+
+async def recover_jobs(session: AsyncSession) -> None:
+    """
+    Fail the unfinished jobs whose worker is gone and drop expired ones. On
+    PostgreSQL a job is orphaned once its heartbeat is older than JOB_STALE_AFTER;
+    SQLite runs a single worker, so there every job this process did not start is.
+    """
+    orphaned = or_(Job.owner.is_(None), Job.owner != WORKER_ID)
+    if not is_sqlite(session):
+        last_seen = func.coalesce(Job.heartbeat_at, Job.created_at)
+        orphaned = and_(orphaned, last_seen < datetime.utcnow() - JOB_STALE_AFTER)
+
+    await session.execute(
+        update(Job)
+        .where(Job.status.in_(ACTIVE_STATUSES), orphaned)
+        .values(
+            status=JobStatus.FAILED.value,
+            message="توقفت المهمة بسبب إعادة تشغيل الخادم",
+            finished_at=datetime.utcnow()
+        )
+    )
+    await purge_expired_jobs(session)
+    await session.commit()
+
+
+async def run_job_recovery() -> None:
+    """Scheduled job: recover in its own session"""
+    async with get_session_maker()() as session:
+        await recover_jobs(session)
+
+
+# ==================== RESPONSES ====================
+
+def job_to_dict(job: Job) -> dict:
+    has_artifact = job.status == JobStatus.SUCCEEDED.value and bool(job.artifact_path)
+    # Jobs running in this process may be ahead of their last write
+    live = _live.get(job.id, {}) if job.status == JobStatus.RUNNING.value else {}
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": live.get("progress", job.progress or 0),
+        "message": live.get("message", job.message),
+        "result": json.loads(job.result) if job.result else None,
+        "artifact_name": job.artifact_name if has_artifact else None,
+        "download_url": f"/api/pg/jobs/{job.id}/download" if has_artifact else None,
+        "cancel_requested": job.cancel_requested,
+        "created_by_name": job.created_by_name,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+def job_accepted(job: Job) -> JSONResponse:
+    """202 reply for endpoints called in async mode"""
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": "تم بدء المهمة في الخلفية",
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/api/pg/jobs/{job.id}"
+        }
+    )
@@ -0,0 +1,92 @@
+"""
+Purchase Order Read Model
+Loads order headers together with their items in a constant number of queries
+instead of one PurchaseOrderItem query per order. The chunked loader
+(load_items) serves the material request listings as well.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import PurchaseOrder, PurchaseOrderItem
+
+# Maximum number of parent ids sent in a single IN (...) list.
+# Keeps us well below the asyncpg bind-parameter limit (32767).
+ITEMS_BATCH_SIZE = 1000
+
+
+async def load_items(session: AsyncSession, model, parent_column, parent_ids: Sequence[str]) -> Dict[str, list]:
+    """
+    Load the item rows (model) of many parents at once, in chunked IN queries on
+    parent_column, grouped by parent id and sorted by item_index
+    """
+    items_by_parent: Dict[str, list] = {parent_id: [] for parent_id in parent_ids}
+    if not items_by_parent:
+        return items_by_parent
+
+    unique_ids = list(items_by_parent.keys())
+    for start in range(0, len(unique_ids), ITEMS_BATCH_SIZE):
+        chunk = unique_ids[start:start + ITEMS_BATCH_SIZE]
+        result = await session.execute(
+            select(model)
+            .where(parent_column.in_(chunk))
+            .order_by(parent_column, model.item_index)
+        )
+        for item in result.scalars().all():
+            items_by_parent[getattr(item, parent_column.key)].append(item)
+
+    return items_by_parent
+
+
+async def load_order_items(
+    session: AsyncSession,
+    order_ids: Sequence[str]
+) -> Dict[str, List[PurchaseOrderItem]]:
+    """Load items for many orders at once, grouped by order id and sorted by item_index"""
+    return await load_items(session, PurchaseOrderItem, PurchaseOrderItem.order_id, order_ids)
+
+
+async def load_orders_with_items(
+    session: AsyncSession,
+    query
+) -> List[Tuple[PurchaseOrder, List[PurchaseOrderItem]]]:
+    """Run an order header query and attach the items of every returned order"""
+    result = await session.execute(query)
+    orders = result.scalars().all()
+
+    items_by_order = await load_order_items(session, [order.id for order in orders])
+    return [(order, items_by_order.get(order.id, [])) for order in orders]
+
+
+# ==================== SERIALIZERS ====================
+
+def order_item_to_dict(item: PurchaseOrderItem) -> dict:
+    """Full item shape used by /purchase-orders and /delivery-tracker/orders"""
+    return {
+        "id": item.id,
+        "name": item.name,
+        "quantity": item.quantity,
+        "unit": item.unit,
+        "unit_price": item.unit_price,
+        "total_price": item.total_price,
+        "delivered_quantity": item.delivered_quantity,
+        "catalog_item_id": item.catalog_item_id,
+        "item_code": item.item_code
+    }
+
+
+def order_item_to_summary_dict(item: PurchaseOrderItem) -> dict:
+    """Short item shape used by the GM dashboard (PDF export)"""
+    return {
+        "name": item.name,
+        "quantity": item.quantity,
+        "unit": item.unit,
+        "unit_price": item.unit_price,
+        "total_price": item.total_price
+    }
+
+
+def iso_or_none(value):
+    """Format an optional datetime the way every order endpoint does"""
+    return value.isoformat() if value else None
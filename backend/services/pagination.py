@@ -0,0 +1,68 @@
+"""
+Keyset (cursor) pagination helpers
+Pages are keyed on (created_at, id) in descending order so that page N costs
+the same as page 1, unlike OFFSET which rescans every skipped row.
+"""
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+import base64
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, desc
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: str) -> str:
+    """Build an opaque cursor pointing just after the given row"""
+    payload = json.dumps({
+        "c": created_at.isoformat() if created_at else None,
+        "i": row_id
+    }, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Parse a cursor produced by encode_cursor - raises 400 if it was tampered with"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        return datetime.fromisoformat(payload["c"]), str(payload["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="مؤشر الصفحة غير صالح")
+
+
+def apply_keyset(query, created_at_column, id_column, cursor: Optional[str], limit: int):
+    """
+    Restrict a select() to the page after `cursor` and order it newest first.
+    One extra row is fetched so the caller can tell whether a next page exists.
+
+    The predicate is written as `created_at <= c AND (created_at < c OR id < i)`
+    rather than a row comparison so that indexes ending in created_at
+    (e.g. idx_orders_status_created_at) can serve it as a range scan.
+    """
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            and_(
+                created_at_column <= cursor_created_at,
+                or_(
+                    created_at_column < cursor_created_at,
+                    id_column < cursor_id
+                )
+            )
+        )
+
+    return query.order_by(desc(created_at_column), desc(id_column)).limit(limit + 1)
+
+
+def split_page(rows: Sequence, limit: int) -> Tuple[List, Optional[str]]:
+    """Trim the look-ahead row and return (page_rows, next_cursor)"""
+    page = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit and page:
+        last = page[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return page, next_cursor
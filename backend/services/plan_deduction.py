@@ -0,0 +1,114 @@
+"""
+Planned Quantity Deduction
+Spends ordered quantities against the plan: every (catalog_item_id,
+project_id, quantity) line of an order is served from the open plan lines of
+that item and project, earliest expected_order_date first (FIFO).
+
+The affected plan rows are locked once (SELECT ... FOR UPDATE, in id order so
+concurrent orders always lock in the same sequence and cannot deadlock), the
+allocation is computed in one pass and written back with a single executemany
+UPDATE. Nothing is committed here - callers run it inside their own
+transaction (e.g. while creating a purchase order).
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import bindparam, case, or_, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import PlannedQuantity
+from services.plan_schedule import SCHEDULE_STATUSES
+
+PlanKey = Tuple[str, str]  # (catalog_item_id, project_id)
+
+
+def merge_lines(lines: Iterable[Tuple[str, str, float]]) -> Dict[PlanKey, float]:
+    """Total quantity per (catalog_item_id, project_id), in first-seen order"""
+    totals: Dict[PlanKey, float] = {}
+    for catalog_item_id, project_id, quantity in lines:
+        if catalog_item_id and project_id and quantity and quantity > 0:
+            key = (catalog_item_id, project_id)
+            totals[key] = totals.get(key, 0) + quantity
+    return totals
+
+
+def fifo_order(row) -> tuple:
+    """Earliest expected date first, undated lines last"""
+    return (row.expected_order_date is None, row.expected_order_date or datetime.min, row.created_at or datetime.min, row.id)
+
+
+async def deduct_from_plan(session: AsyncSession, lines: Iterable[Tuple[str, str, float]]) -> List[Dict]:
+    """
+    Deduct (catalog_item_id, project_id, quantity) lines from the plan.
+    Returns one entry per item and project: requested, deducted,
+    remaining_to_deduct and the number of open plan lines found.
+    """
+    totals = merge_lines(lines)
+    if not totals:
+        return []
+
+    result = await session.execute(
+        select(
+            PlannedQuantity.id,
+            PlannedQuantity.catalog_item_id,
+            PlannedQuantity.project_id,
+            PlannedQuantity.remaining_quantity,
+            PlannedQuantity.expected_order_date,
+            PlannedQuantity.created_at
+        )
+        .where(
+            tuple_(PlannedQuantity.catalog_item_id, PlannedQuantity.project_id).in_(list(totals)),
+            PlannedQuantity.remaining_quantity > 0
+        )
+        .order_by(PlannedQuantity.id)
+        .with_for_update()
+    )
+    open_lines = defaultdict(list)
+    for row in result.all():
+        open_lines[(row.catalog_item_id, row.project_id)].append(row)
+
+    now = datetime.utcnow()
+    updates = []
+    report = []
+    for (catalog_item_id, project_id), requested in totals.items():
+        rows = sorted(open_lines.get((catalog_item_id, project_id), []), key=fifo_order)
+        to_deduct = requested
+        for row in rows:
+            if to_deduct <= 0:
+                break
+            amount = min(row.remaining_quantity, to_deduct)
+            to_deduct -= amount
+            updates.append({"b_id": row.id, "amount": amount, "now": now})
+
+        report.append({
+            "catalog_item_id": catalog_item_id,
+            "project_id": project_id,
+            "requested": requested,
+            "deducted": requested - to_deduct,
+            "remaining_to_deduct": to_deduct,
+            "planned_lines": len(rows)
+        })
+
+    if updates:
+        table = PlannedQuantity.__table__
+        remaining_after = table.c.remaining_quantity - bindparam("amount")
+        await session.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                ordered_quantity=table.c.ordered_quantity + bindparam("amount"),
+                remaining_quantity=remaining_after,
+                # Lines still open stay overdue / due soon (no IN: executemany cannot expand it)
+                status=case(
+                    (remaining_after <= 0, "fully_ordered"),
+                    (or_(*[table.c.status == status for status in SCHEDULE_STATUSES]), table.c.status),
+                    else_="partially_ordered"
+                ),
+                updated_at=bindparam("now")
+            ),
+            updates
+        )
+
+    return report
@@ -0,0 +1,117 @@
+"""
+Planned Quantity Schedule Status
+Open plan lines whose expected order date has passed are marked "overdue",
+those due within DUE_SOON_DAYS "due_soon"; every other line carries its
+ordering progress (planned / partially_ordered / fully_ordered), which follows
+from its quantities. Writes set the status right away (plan_status); the
+sweeper moves lines along as time passes, with set-based UPDATEs run by the
+scheduler (services.scheduler) every PLAN_SWEEP_INTERVAL seconds.
+Reports and alerts can then filter on the indexed status column.
+"""
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import case, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import PlannedQuantity, PlannedQuantityStatus
+from database.connection import get_session_maker
+from services.quantity_stats import DUE_SOON_DAYS, OPEN_CONDITION
+
+logger = logging.getLogger(__name__)
+
+PLAN_SWEEP_INTERVAL = int(os.environ.get("PLAN_SWEEP_INTERVAL_SECONDS", "300"))
+
+OVERDUE = PlannedQuantityStatus.OVERDUE.value
+DUE_SOON = PlannedQuantityStatus.DUE_SOON.value
+SCHEDULE_STATUSES = [OVERDUE, DUE_SOON]
+
+
+def plan_status(
+    expected_order_date: Optional[datetime],
+    ordered_quantity: float,
+    remaining_quantity: float,
+    now: Optional[datetime] = None
+) -> str:
+    """Status of one plan line as the sweeper would set it"""
+    now = now or datetime.utcnow()
+    if expected_order_date and remaining_quantity > 0:
+        if expected_order_date.tzinfo:
+            expected_order_date = expected_order_date.astimezone(timezone.utc).replace(tzinfo=None)
+        if expected_order_date < now:
+            return OVERDUE
+        if expected_order_date <= now + timedelta(days=DUE_SOON_DAYS):
+            return DUE_SOON
+    if remaining_quantity <= 0:
+        return PlannedQuantityStatus.FULLY_ORDERED.value
+    if ordered_quantity > 0:
+        return PlannedQuantityStatus.PARTIALLY_ORDERED.value
+    return PlannedQuantityStatus.PLANNED.value
+
+
+def progress_status():
+    """SQL expression for the ordering progress of a line"""
+    return case(
+        (PlannedQuantity.remaining_quantity <= 0, PlannedQuantityStatus.FULLY_ORDERED.value),
+        (PlannedQuantity.ordered_quantity > 0, PlannedQuantityStatus.PARTIALLY_ORDERED.value),
+        else_=PlannedQuantityStatus.PLANNED.value
+    )
+
+
+async def sweep_plan_statuses(session: AsyncSession, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Bring every line's status up to date with three set-based UPDATEs (caller
+    commits). Only lines whose status changes are written; updated_at is left
+    alone, the lines were not edited.
+    Returns the number of lines moved to each state.
+    """
+    now = now or datetime.utcnow()
+    due_soon_until = now + timedelta(days=DUE_SOON_DAYS)
+
+    overdue = await session.execute(
+        update(PlannedQuantity)
+        .where(
+            PlannedQuantity.expected_order_date < now,
+            OPEN_CONDITION,
+            PlannedQuantity.status != OVERDUE
+        )
+        .values(status=OVERDUE)
+        .execution_options(synchronize_session=False)
+    )
+    due_soon = await session.execute(
+        update(PlannedQuantity)
+        .where(
+            PlannedQuantity.expected_order_date >= now,
+            PlannedQuantity.expected_order_date <= due_soon_until,
+            OPEN_CONDITION,
+            PlannedQuantity.status != DUE_SOON
+        )
+        .values(status=DUE_SOON)
+        .execution_options(synchronize_session=False)
+    )
+    # Ordered in full, rescheduled or undated since - back to the ordering progress
+    cleared = await session.execute(
+        update(PlannedQuantity)
+        .where(
+            PlannedQuantity.status.in_(SCHEDULE_STATUSES),
+            or_(
+                PlannedQuantity.remaining_quantity <= 0,
+                PlannedQuantity.expected_order_date.is_(None),
+                PlannedQuantity.expected_order_date > due_soon_until
+            )
+        )
+        .values(status=progress_status())
+        .execution_options(synchronize_session=False)
+    )
+    return {"overdue": overdue.rowcount, "due_soon": due_soon.rowcount, "cleared": cleared.rowcount}
+
+
+async def run_plan_status_sweep() -> None:
+    """Scheduled job: sweep in its own session"""
+    async with get_session_maker()() as session:
+        counts = await sweep_plan_statuses(session)
+        await session.commit()
+    if any(counts.values()):
+        logger.info(f"Plan status sweep: {counts}")
@@ -0,0 +1,258 @@
+"""
+Planned Quantity Import
+Rows of the planned-quantities template arrive in chunks from the worker pool
+(services.imports, openpyxl read-only). Catalog items, projects and budget
+categories are resolved through lookup maps loaded once per import - keys are
+normalized with services.arabic_text, so spelling and case variants match - and
+each chunk is written with one executemany INSERT.
+"""
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import PriceCatalogItem, Project, BudgetCategory, PlannedQuantity
+from services.arabic_text import normalize_text
+from services.plan_schedule import plan_status
+
+# Template columns:
+# 0: كود الصنف | 1: اسم الصنف | 2: كود التصنيف | 3: تصنيف الميزانية | 4: اسم المشروع | 5: الكمية | 6: التاريخ | 7: الأولوية | 8: ملاحظات
+
+# The column header row is looked for in the first rows of the sheet
+HEADER_SCAN_ROWS = 10
+
+# First cells of the reference sections below the data - reading stops there
+SECTION_MARKERS = ('📋', '📁', '✏️', '🏷️')
+
+# First cells of title and header rows
+HEADER_WORDS = ('الصنف', 'المشروع', 'اسم', 'الفئة')
+
+# Notes of the template's example row
+EXAMPLE_NOTES = ['none', 'مثال', 'مثال - احذف هذا الصف']
+
+EMPTY_MARKERS = ('', '-', 'none')
+
+
+def generated_item_code(item_id: str) -> str:
+    """Code the templates show for catalog items without an item_code"""
+    return f"ITM{item_id[:5].upper()}"
+
+
+def cell(row: Sequence, index: int) -> Optional[str]:
+    return str(row[index]).strip() if len(row) > index and row[index] else None
+
+
+# ==================== LOOKUPS ====================
+
+class PlannedLookups:
+    """Catalog items, projects and budget categories by every key the template may use"""
+
+    def __init__(self):
+        self.catalog: Dict[tuple, object] = {}
+        self.projects: Dict[tuple, object] = {}
+        # Keyed per project and, as a fallback, across projects (project None)
+        self.categories: Dict[tuple, object] = {}
+
+    @classmethod
+    async def load(cls, session: AsyncSession) -> "PlannedLookups":
+        lookups = cls()
+
+        # Active items first, so they win a shared name
+        result = await session.execute(
+            select(
+                PriceCatalogItem.id, PriceCatalogItem.item_code, PriceCatalogItem.name, PriceCatalogItem.unit,
+                PriceCatalogItem.description, PriceCatalogItem.category_id, PriceCatalogItem.category_name
+            ).order_by(PriceCatalogItem.is_active.desc(), PriceCatalogItem.created_at)
+        )
+        for item in result.all():
+            lookups.catalog.setdefault(("id", item.id), item)
+            lookups.catalog.setdefault(("code", normalize_text(item.item_code or generated_item_code(item.id))), item)
+            lookups.catalog.setdefault(("name", normalize_text(item.name)), item)
+
+        result = await session.execute(select(Project.id, Project.name, Project.code).order_by(Project.created_at))
+        for project in result.all():
+            lookups.projects.setdefault(("id", project.id), project)
+            lookups.projects.setdefault(("name", normalize_text(project.name)), project)
+            if project.code:
+                lookups.projects.setdefault(("code", normalize_text(project.code)), project)
+
+        result = await session.execute(
+            select(BudgetCategory.id, BudgetCategory.name, BudgetCategory.code, BudgetCategory.project_id)
+            .order_by(BudgetCategory.created_at)
+        )
+        for category in result.all():
+            keys = [("id", category.id), ("name", normalize_text(category.name))]
+            if category.code:
+                keys.append(("code", normalize_text(category.code)))
+            for kind, key in keys:
+                lookups.categories.setdefault((category.project_id, kind, key), category)
+                lookups.categories.setdefault((None, kind, key), category)
+
+        return lookups
+
+    def catalog_item(self, value: str):
+        """By item code (or the generated ITM code), id or name"""
+        key = normalize_text(value)
+        return self.catalog.get(("code", key)) or self.catalog.get(("id", value)) or self.catalog.get(("name", key))
+
+    def project(self, value: str):
+        """By name, id or project code"""
+        key = normalize_text(value)
+        return self.projects.get(("name", key)) or self.projects.get(("id", value)) or self.projects.get(("code", key))
+
+    def category(self, project_id: str, value: Optional[str], kinds: Sequence[str]):
+        """The first category matching value as one of kinds - the project's own categories first"""
+        if not value or value.lower() in EMPTY_MARKERS:
+            return None
+        for owner in (project_id, None):
+            for kind in kinds:
+                category = self.categories.get((owner, kind, value if kind == "id" else normalize_text(value)))
+                if category:
+                    return category
+        return None
+
+
+# ==================== ROWS ====================
+
+def planned_record(row: Sequence, lookups: PlannedLookups, user) -> Optional[dict]:
+    """
+    The planned_quantities row for one data row, None for rows that are skipped
+    (no quantity, the example row); raises ValueError with the reason.
+    """
+    item_code = str(row[0]).strip()
+    category_code = cell(row, 2)
+    category_name_input = cell(row, 3)
+    project_name = cell(row, 4)
+
+    try:
+        planned_quantity = float(row[5]) if len(row) > 5 and row[5] else 0
+    except (ValueError, TypeError):
+        raise ValueError(f"الكمية '{row[5] if len(row) > 5 else 'فارغ'}' غير صالحة")
+    if planned_quantity <= 0:
+        return None
+
+    if not project_name:
+        raise ValueError("اسم المشروع مطلوب")
+
+    expected_order_date = None
+    if len(row) > 6 and row[6]:
+        if hasattr(row[6], 'strftime'):
+            expected_order_date = row[6]
+        else:
+            try:
+                expected_order_date = datetime.strptime(str(row[6])[:10], "%Y-%m-%d")
+            except ValueError:
+                pass
+
+    priority = 2
+    if len(row) > 7 and row[7]:
+        try:
+            priority = int(row[7])
+        except (ValueError, TypeError):
+            pass
+        if priority not in [1, 2, 3]:
+            priority = 2
+
+    notes = cell(row, 8)
+    if notes and notes.lower() in EXAMPLE_NOTES:
+        return None
+
+    catalog_item = lookups.catalog_item(item_code)
+    if not catalog_item:
+        raise ValueError(f"الصنف '{item_code}' غير موجود في الكتالوج")
+
+    project = lookups.project(project_name)
+    if not project:
+        raise ValueError(f"المشروع '{project_name}' غير موجود")
+
+    # Category by code (or name/id) first, then by name - else the catalog item's
+    category = (
+        lookups.category(project.id, category_code, ("code", "name", "id"))
+        or lookups.category(project.id, category_name_input, ("name",))
+    )
+
+    return {
+        "id": str(uuid.uuid4()),
+        "item_name": catalog_item.name,
+        "item_code": catalog_item.item_code or generated_item_code(catalog_item.id),
+        "unit": catalog_item.unit,
+        "description": catalog_item.description,
+        "planned_quantity": planned_quantity,
+        "ordered_quantity": 0,
+        "remaining_quantity": planned_quantity,
+        "project_id": project.id,
+        "project_name": project.name,
+        "category_id": category.id if category else catalog_item.category_id,
+        "category_name": category.name if category else catalog_item.category_name,
+        "catalog_item_id": catalog_item.id,
+        "expected_order_date": expected_order_date,
+        "status": plan_status(expected_order_date, 0, planned_quantity),
+        "priority": priority,
+        "notes": notes,
+        "created_by": user.id,
+        "created_by_name": user.name
+    }
+
+
+def header_row(chunk: Sequence[Sequence]) -> int:
+    """Row number of the column headers ("كود الصنف") in the first rows, 1 if not found"""
+    for row_num, row in enumerate(chunk[:HEADER_SCAN_ROWS], 1):
+        if row and row[0] and 'كود الصنف' in str(row[0]):
+            return row_num
+    return 1
+
+
+async def import_planned_rows(
+    session: AsyncSession,
+    chunks: AsyncIterator[Sequence[Sequence]],
+    user,
+    on_rows: Optional[Callable[[int], Awaitable[None]]] = None
+) -> dict:
+    """
+    Run the import over the sheet's chunks from row 1 (caller commits). on_rows
+    receives the number of rows read so far after each chunk.
+    Returns {"created", "errors": ["صف N: ..."]}.
+    """
+    lookups = await PlannedLookups.load(session)
+    report = {"created": 0, "errors": []}
+    first_data_row = None
+    finished = False
+    row_num = 0
+
+    async for chunk in chunks:
+        if finished:
+            continue  # drain the reference sections
+        if first_data_row is None:
+            first_data_row = header_row(chunk) + 1
+
+        records = []
+        for row in chunk:
+            row_num += 1
+            if row_num < first_data_row or not row or not row[0]:
+                continue
+
+            first_cell = str(row[0]).strip()
+            if first_cell.startswith(SECTION_MARKERS):
+                finished = True
+                break
+            if any(word in first_cell for word in HEADER_WORDS):
+                continue
+
+            try:
+                record = planned_record(row, lookups, user)
+            except ValueError as e:
+                report["errors"].append(f"صف {row_num}: {e}")
+                continue
+            if record:
+                records.append(record)
+
+        if records:
+            await session.execute(insert(PlannedQuantity), records)
+            report["created"] += len(records)
+        if on_rows:
+            await on_rows(row_num)
+
+    return report
@@ -0,0 +1,325 @@
+"""
+Purchase Order PDF Renderer
+Server-side rendering of purchase orders with the company branding from system
+settings (logo, colors, header/footer). Single orders and merged batches are
+rendered in the shared worker pool (services.workers); every rendered order is
+cached on disk, keyed on the order's updated_at and the branding settings, so
+reprints are a file read.
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from database.settings_cache import COMPANY_SETTING_KEYS
+from services.workers import run_in_worker
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_DIR = Path(__file__).parent.parent / "data" / "pdf_cache"
+PDF_FONT_PATH = os.environ.get("PDF_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+PDF_FONT_BOLD_PATH = os.environ.get("PDF_FONT_BOLD_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+
+DEFAULT_PRIMARY_COLOR = "#ea580c"
+
+ORDER_STATUS_LABELS = {
+    "pending_approval": "بانتظار الاعتماد",
+    "pending_gm_approval": "بانتظار موافقة المدير العام",
+    "approved": "معتمد",
+    "printed": "تمت الطباعة",
+    "shipped": "تم الشحن",
+    "partially_delivered": "تسليم جزئي",
+    "delivered": "تم التسليم",
+}
+
+# Bumped whenever the layout changes, so cached renderings of the old one are not served
+PDF_LAYOUT_VERSION = 2
+
+# ==================== SERIALIZATION ====================
+
+def order_to_render_dict(order, items) -> dict:
+    """Plain-data snapshot of an order (picklable for the process pool)"""
+    return {
+        "id": order.id,
+        "order_number": order.order_number,
+        "request_number": order.request_number,
+        "project_name": order.project_name,
+        "supplier_name": order.supplier_name,
+        "category_name": order.category_name,
+        "manager_name": order.manager_name,
+        "supervisor_name": order.supervisor_name,
+        "engineer_name": order.engineer_name,
+        "status": order.status,
+        "gm_approved_by_name": order.gm_approved_by_name,
+        "total_amount": order.total_amount,
+        "notes": order.notes,
+        "terms_conditions": order.terms_conditions,
+        "expected_delivery_date": order.expected_delivery_date,
+        "created_at": order.created_at.isoformat() if order.created_at else None,
+        "gm_approved_at": order.gm_approved_at.isoformat() if order.gm_approved_at else None,
+        "updated_at": order.updated_at.isoformat() if order.updated_at else None,
+        "items": [
+            {
+                "name": item.name,
+                "quantity": item.quantity,
+                "unit": item.unit,
+                "unit_price": item.unit_price,
+                "total_price": item.total_price
+            }
+            for item in items
+        ]
+    }
+
+
+# ==================== CACHE ====================
+
+def branding_fingerprint(settings: Dict[str, str]) -> str:
+    branding = {key: settings.get(key, "") for key in COMPANY_SETTING_KEYS}
+    payload = json.dumps({"layout": PDF_LAYOUT_VERSION, **branding}, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def cache_path(order: dict, fingerprint: str) -> Path:
+    version = (order.get("updated_at") or order.get("created_at") or "0").replace(":", "").replace("-", "").replace(".", "")
+    return PDF_CACHE_DIR / f"{order['id']}_{version}_{fingerprint}.pdf"
+
+
+def read_cached(order: dict, fingerprint: str) -> Optional[bytes]:
+    path = cache_path(order, fingerprint)
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def write_cached(order: dict, fingerprint: str, pdf_bytes: bytes) -> None:
+    """Store a rendering and drop older renderings of the same order"""
+    PDF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = cache_path(order, fingerprint)
+    for stale in PDF_CACHE_DIR.glob(f"{order['id']}_*.pdf"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(pdf_bytes)
+    tmp_path.replace(path)
+
+
+# ==================== RENDERING (runs in worker processes) ====================
+
+def hex_to_rgb(color: str) -> tuple:
+    color = (color or DEFAULT_PRIMARY_COLOR).lstrip("#")
+    try:
+        return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return hex_to_rgb(DEFAULT_PRIMARY_COLOR)
+
+
+def format_date(value: Optional[str]) -> str:
+    if not value:
+        return "-"
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d")
+    except ValueError:
+        return value
+
+
+def format_amount(value) -> str:
+    return f"{value:,.2f}" if value else "-"
+
+
+def render_order_pdf(order: dict, settings: Dict[str, str]) -> bytes:
+    """Render one purchase order to PDF bytes"""
+    from fpdf import FPDF
+    from fpdf.enums import XPos, YPos
+    from fpdf.fonts import FontFace
+
+    primary = hex_to_rgb(settings.get("pdf_primary_color"))
+    show_logo = str(settings.get("pdf_show_logo", "true")).lower() in ("true", "1", "yes", "on", "")
+
+    pdf = FPDF(orientation="P", unit="mm", format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_font("DejaVu", "", PDF_FONT_PATH)
+    pdf.add_font("DejaVu", "B", PDF_FONT_BOLD_PATH)
+    pdf.set_text_shaping(use_shaping_engine=True, direction="rtl")
+    pdf.add_page()
+    width = pdf.epw
+
+    def line(text, size=10, bold=False, color=(0, 0, 0), align="R", height=6):
+        pdf.set_font("DejaVu", "B" if bold else "", size)
+        pdf.set_text_color(*color)
+        pdf.cell(width, height, text, align=align, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    # Header: company info + logo + document title
+    top = pdf.get_y()
+    if show_logo and settings.get("company_logo", "").startswith("data:image"):
+        try:
+            logo_bytes = base64.b64decode(settings["company_logo"].split(",", 1)[1])
+            pdf.image(io.BytesIO(logo_bytes), x=pdf.l_margin + width / 2 - 15, y=top, h=18)
+        except Exception as e:
+            logger.warning(f"Could not render company logo: {e}")
+
+    if settings.get("company_name"):
+        line(settings["company_name"], size=14, bold=True, color=primary)
+    if settings.get("company_address"):
+        line(settings["company_address"], size=9, color=(102, 102, 102), height=5)
+    contact = " | ".join(v for v in [settings.get("company_phone"), settings.get("company_email")] if v)
+    if contact:
+        line(contact, size=9, color=(102, 102, 102), height=5)
+    if settings.get("report_header"):
+        line(settings["report_header"], size=9, color=(68, 68, 68), height=5)
+
+    pdf.set_y(max(pdf.get_y(), top + 20))
+    line("أمر شراء", size=18, bold=True, color=primary, align="L", height=9)
+    line(f"رقم: {order.get('order_number') or order['id'][:8].upper()}", size=11, align="L")
+    line(f"طلب رقم: {order.get('request_number') or '-'}", size=9, color=(102, 102, 102), align="L", height=5)
+
+    pdf.set_draw_color(*primary)
+    pdf.set_line_width(0.6)
+    pdf.line(pdf.l_margin, pdf.get_y() + 2, pdf.l_margin + width, pdf.get_y() + 2)
+    pdf.ln(5)
+
+    # Order info
+    info = [
+        ("المشروع", order.get("project_name")),
+        ("تاريخ الإصدار", format_date(order.get("created_at"))),
+        ("المورد", order.get("supplier_name")),
+        ("تاريخ التسليم", format_date(order.get("expected_delivery_date"))),
+        ("المشرف", order.get("supervisor_name")),
+        ("المهندس", order.get("engineer_name")),
+        ("مدير المشتريات", order.get("manager_name")),
+        ("الحالة", ORDER_STATUS_LABELS.get(order.get("status"), order.get("status"))),
+    ]
+    if order.get("category_name"):
+        info.append(("تصنيف الميزانية", order["category_name"]))
+    pdf.set_font("DejaVu", "", 9)
+    pdf.set_text_color(0, 0, 0)
+    for index in range(0, len(info), 2):
+        pair = info[index:index + 2]
+        for label, value in pair:
+            pdf.cell(width / 2, 6, f"{label}: {value or '-'}", align="R")
+        pdf.ln(6)
+    pdf.ln(3)
+
+    # Items table (columns listed left-to-right, so reversed for RTL reading)
+    line("المواد والأسعار", size=11, bold=True, color=primary, height=7)
+    headings = ["الإجمالي", "سعر الوحدة", "الوحدة", "الكمية", "اسم المادة", "#"]
+    pdf.set_font("DejaVu", "", 9)
+    with pdf.table(
+        col_widths=(24, 24, 20, 18, 90, 10),
+        text_align="CENTER",
+        headings_style=FontFace(emphasis="BOLD", color=(255, 255, 255), fill_color=primary),
+        line_height=6,
+    ) as table:
+        row = table.row()
+        for heading in headings:
+            row.cell(heading)
+        for idx, item in enumerate(order.get("items", []), 1):
+            unit_price = item.get("unit_price") or 0
+            total = item.get("total_price") or unit_price * (item.get("quantity") or 0)
+            row = table.row()
+            row.cell(format_amount(total))
+            row.cell(format_amount(unit_price))
+            row.cell(item.get("unit") or "قطعة")
+            row.cell(str(item.get("quantity") or 0))
+            row.cell(item.get("name") or "-", align="RIGHT")
+            row.cell(str(idx))
+
+    total_amount = sum(
+        (item.get("total_price") or (item.get("unit_price") or 0) * (item.get("quantity") or 0))
+        for item in order.get("items", [])
+    )
+    pdf.ln(2)
+    line(f"المجموع الكلي: {format_amount(total_amount)} ر.س", size=11, bold=True, color=primary, align="L", height=7)
+
+    if order.get("notes"):
+        pdf.ln(2)
+        pdf.set_font("DejaVu", "", 9)
+        pdf.set_text_color(0, 0, 0)
+        pdf.multi_cell(width, 5, f"ملاحظات: {order['notes']}", align="R", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    if order.get("terms_conditions"):
+        pdf.ln(2)
+        line("الشروط والأحكام:", size=9, bold=True, color=(29, 78, 216), height=5)
+        pdf.set_font("DejaVu", "", 8)
+        pdf.set_text_color(55, 65, 81)
+        pdf.multi_cell(width, 4.5, order["terms_conditions"], align="R", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    if order.get("gm_approved_by_name"):
+        pdf.ln(3)
+        line(
+            f"✓ معتمد من المدير العام: {order['gm_approved_by_name']} - {format_date(order.get('gm_approved_at'))}",
+            size=10, bold=True, color=(5, 150, 105), height=7
+        )
+
+    # Signatures
+    pdf.ln(12)
+    pdf.set_font("DejaVu", "", 9)
+    pdf.set_text_color(0, 0, 0)
+    signatures = ["توقيع المورد", "توقيع مدير المشتريات"]
+    if order.get("gm_approved_by_name"):
+        signatures.append("توقيع المدير العام")
+    box = width / len(signatures)
+    for _ in signatures:
+        pdf.cell(box, 6, "____________________", align="C")
+    pdf.ln(6)
+    for label in signatures:
+        pdf.cell(box, 6, label, align="C")
+    pdf.ln(10)
+
+    if settings.get("report_footer"):
+        line(settings["report_footer"], size=8, color=(102, 102, 102), align="C", height=5)
+    # No print date: the rendering is cached and served again on every reprint
+    line("نظام إدارة طلبات المواد", size=7, color=(156, 163, 175), align="C", height=4)
+
+    return bytes(pdf.output())
+
+
+def merge_pdfs(documents: List[bytes]) -> bytes:
+    """Concatenate rendered PDFs into one document"""
+    from pypdf import PdfWriter, PdfReader
+
+    writer = PdfWriter()
+    for document in documents:
+        writer.append(PdfReader(io.BytesIO(document)))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+# ==================== ASYNC API ====================
+
+async def render_orders(orders: List[dict], settings: Dict[str, str]) -> List[bytes]:
+    """Render orders (cache first, misses in the worker pool) keeping input order"""
+    fingerprint = branding_fingerprint(settings)
+
+    documents: List[Optional[bytes]] = [read_cached(order, fingerprint) for order in orders]
+    misses = [index for index, document in enumerate(documents) if document is None]
+    if misses:
+        rendered = await asyncio.gather(*[
+            run_in_worker(render_order_pdf, orders[index], settings)
+            for index in misses
+        ])
+        for index, pdf_bytes in zip(misses, rendered):
+            documents[index] = pdf_bytes
+            write_cached(orders[index], fingerprint, pdf_bytes)
+
+    return documents
+
+
+async def render_merged(orders: List[dict], settings: Dict[str, str]) -> bytes:
+    documents = await render_orders(orders, settings)
+    if len(documents) == 1:
+        return documents[0]
+    return await run_in_worker(merge_pdfs, documents)
+
+
+def iter_bytes(data: bytes, chunk_size: int = 64 * 1024):
+    """Stream a finished document in chunks"""
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
@@ -0,0 +1,193 @@
+"""
+Planned Quantity Statistics
+Totals, status breakdowns, per-project rollups and overdue/due-soon counts for
+the quantity dashboard and reports, computed in the database with grouped
+aggregates (SUM, COUNT ... FILTER, GROUP BY project_id). Only the top-N detail
+rows a report shows are fetched, so cost no longer grows with the plan size.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, case, func, literal_column, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import PlannedQuantity, PlannedQuantityStatus
+
+# Items due within this many days count as "due soon"
+DUE_SOON_DAYS = 10
+
+# Detail rows listed under overdue / due soon in the summary report
+TOP_ROWS = 10
+
+# Rows listed per supervisor alert list
+ALERT_ROWS = 20
+
+# Lines still to be ordered. The 0 is inlined rather than bound so the planner can
+# match the partial indexes declared WHERE remaining_quantity > 0
+OPEN_CONDITION = PlannedQuantity.remaining_quantity > literal_column("0")
+
+
+def plan_filters(project_id: Optional[str] = None) -> List:
+    """WHERE conditions for the plan, optionally limited to one project"""
+    return [PlannedQuantity.project_id == project_id] if project_id else []
+
+
+def overdue_condition():
+    """Open lines past their expected order date (kept current by services.plan_schedule)"""
+    return PlannedQuantity.status == PlannedQuantityStatus.OVERDUE.value
+
+
+def due_soon_condition():
+    """Open lines due within DUE_SOON_DAYS (kept current by services.plan_schedule)"""
+    return PlannedQuantity.status == PlannedQuantityStatus.DUE_SOON.value
+
+
+async def plan_totals(session: AsyncSession, filters: Sequence) -> Dict:
+    """{"items", "planned", "ordered", "remaining", "overdue", "due_soon"} in one query"""
+    result = await session.execute(
+        select(
+            func.count().label("items"),
+            func.coalesce(func.sum(PlannedQuantity.planned_quantity), 0).label("planned"),
+            func.coalesce(func.sum(PlannedQuantity.ordered_quantity), 0).label("ordered"),
+            func.coalesce(func.sum(PlannedQuantity.remaining_quantity), 0).label("remaining"),
+            func.count().filter(overdue_condition()).label("overdue"),
+            func.count().filter(due_soon_condition()).label("due_soon")
+        ).where(*filters)
+    )
+    return dict(result.one()._mapping)
+
+
+async def status_counts(session: AsyncSession, filters: Sequence) -> Dict[str, int]:
+    """{status: number of items}"""
+    result = await session.execute(
+        select(PlannedQuantity.status, func.count()).where(*filters).group_by(PlannedQuantity.status)
+    )
+    return {status: count for status, count in result.all()}
+
+
+async def project_totals(session: AsyncSession, filters: Sequence) -> List[Dict]:
+    """Item count and quantity sums per project, ordered by project name"""
+    project_name = func.max(PlannedQuantity.project_name)
+    result = await session.execute(
+        select(
+            PlannedQuantity.project_id,
+            project_name.label("project_name"),
+            func.count().label("total_items"),
+            func.coalesce(func.sum(PlannedQuantity.planned_quantity), 0).label("planned_qty"),
+            func.coalesce(func.sum(PlannedQuantity.ordered_quantity), 0).label("ordered_qty"),
+            func.coalesce(func.sum(PlannedQuantity.remaining_quantity), 0).label("remaining_qty")
+        )
+        .where(*filters)
+        .group_by(PlannedQuantity.project_id)
+        .order_by(project_name)
+    )
+    return [dict(row._mapping) for row in result.all()]
+
+
+async def top_rows(session: AsyncSession, filters: Sequence, condition, limit: int = TOP_ROWS) -> List:
+    """The first `limit` items matching condition by expected order date"""
+    result = await session.execute(
+        select(
+            PlannedQuantity.id,
+            PlannedQuantity.item_name,
+            PlannedQuantity.project_name,
+            PlannedQuantity.remaining_quantity,
+            PlannedQuantity.expected_order_date
+        )
+        .where(*filters, condition)
+        .order_by(PlannedQuantity.expected_order_date, PlannedQuantity.id)
+        .limit(limit)
+    )
+    return result.all()
+
+
+def completion_rate(totals: Dict) -> float:
+    return round((totals["ordered"] / totals["planned"] * 100), 1) if totals["planned"] > 0 else 0
+
+
+# ==================== ALERTS ====================
+
+def ranked_in(condition, *order_by):
+    """(flag, position of the row among the rows matching condition)"""
+    flag = case((condition, 1), else_=0)
+    return flag, func.row_number().over(partition_by=flag, order_by=order_by)
+
+
+async def alert_lists(
+    session: AsyncSession,
+    now: datetime,
+    days_threshold: int,
+    limit: int = ALERT_ROWS
+) -> Dict[str, Dict]:
+    """
+    The overdue, due-soon and high-priority open lines - the first `limit` of
+    each with exact counts - from one query: the open lines any list can hold
+    are ranked per list by window functions and cut down to the top rows.
+    Overdue lines are found by status; due soon keeps to the caller's
+    days_threshold, which may differ from the sweeper's DUE_SOON_DAYS.
+    Returns {list: {"count", "rows"}}.
+    """
+    lists = {
+        "overdue": (
+            overdue_condition(),
+            (PlannedQuantity.expected_order_date, PlannedQuantity.id)
+        ),
+        "due_soon": (
+            and_(
+                PlannedQuantity.expected_order_date >= now,
+                PlannedQuantity.expected_order_date <= now + timedelta(days=days_threshold)
+            ),
+            (PlannedQuantity.expected_order_date, PlannedQuantity.id)
+        ),
+        "high_priority": (
+            PlannedQuantity.priority == 1,
+            (PlannedQuantity.expected_order_date.asc().nullslast(), PlannedQuantity.id)
+        ),
+    }
+
+    columns = [
+        PlannedQuantity.id,
+        PlannedQuantity.item_name,
+        PlannedQuantity.project_name,
+        PlannedQuantity.remaining_quantity,
+        PlannedQuantity.unit,
+        PlannedQuantity.expected_order_date,
+        PlannedQuantity.priority
+    ]
+    for name, (condition, order_by) in lists.items():
+        flag, rank = ranked_in(condition, *order_by)
+        columns += [
+            flag.label(f"{name}_flag"),
+            rank.label(f"{name}_rank"),
+            func.count().filter(condition).over().label(f"{name}_count")
+        ]
+
+    ranked = (
+        select(*columns)
+        .where(
+            OPEN_CONDITION,
+            or_(
+                overdue_condition(),
+                PlannedQuantity.expected_order_date.between(now, now + timedelta(days=days_threshold)),
+                PlannedQuantity.priority == 1
+            )
+        )
+        .subquery()
+    )
+    result = await session.execute(
+        select(ranked).where(or_(*[
+            and_(ranked.c[f"{name}_flag"] == 1, ranked.c[f"{name}_rank"] <= limit)
+            for name in lists
+        ]))
+    )
+    rows = result.all()
+
+    alerts = {}
+    for name in lists:
+        listed = [row for row in rows if row._mapping[f"{name}_flag"] == 1]
+        alerts[name] = {
+            "count": rows[0]._mapping[f"{name}_count"] if rows else 0,
+            "rows": sorted(listed, key=lambda row: row._mapping[f"{name}_rank"])
+        }
+    return alerts
@@ -0,0 +1,142 @@
+"""
+In-process Scheduler
+Runs periodic maintenance jobs (e.g. the planned quantity status sweep) on a
+timer inside the app. With several uvicorn workers only one of them - the
+leader - runs the jobs: on PostgreSQL the leader holds a session-level
+advisory lock on a dedicated connection, which the database releases by
+itself if that worker dies, so another worker takes over on its next tick.
+SQLite deployments run a single worker, which is always the leader.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import text
+
+from database.connection import get_engine, is_sqlite
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key shared by every worker of the app
+LEADER_LOCK_KEY = 734_201_522
+
+# Longest sleep between checks, so a waiting worker notices a lost leader soon enough
+MAX_TICK = 30.0
+
+
+class LeaderLock:
+    """Session-level pg_try_advisory_lock held on a connection of its own"""
+
+    def __init__(self, key: int):
+        self.key = key
+        self._conn = None
+
+    async def acquire(self) -> bool:
+        """True while this process is the leader - takes the lock if it is free"""
+        engine = get_engine()
+        if is_sqlite(engine):
+            return True
+
+        if self._conn is not None:
+            try:
+                await self._conn.execute(text("SELECT 1"))
+                return True
+            except Exception:
+                logger.warning("Scheduler leader connection lost")
+                await self.release()
+
+        conn = await engine.connect()
+        try:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})).scalar()
+        except Exception:
+            await conn.close()
+            raise
+        if not locked:
+            await conn.close()
+            return False
+        self._conn = conn
+        logger.info("This worker now runs the scheduled jobs")
+        return True
+
+    async def release(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+        except Exception:
+            pass
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+
+class ScheduledJob:
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable[None]]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.next_run = 0.0
+
+
+class Scheduler:
+    """Periodic jobs run one after another by a single asyncio task, on the leader only"""
+
+    def __init__(self, lock: LeaderLock):
+        self.lock = lock
+        self.jobs: List[ScheduledJob] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def every(self, seconds: float, func: Callable[[], Awaitable[None]], name: Optional[str] = None) -> None:
+        """Run func every `seconds`, the first time right after start()"""
+        self.jobs.append(ScheduledJob(name or func.__name__, seconds, func))
+
+    def start(self) -> None:
+        if self._task is None and self.jobs:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.lock.release()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                leader = await self.lock.acquire()
+            except Exception as e:
+                logger.warning(f"Scheduler leader check failed: {e}")
+                leader = False
+
+            if not leader:
+                # Followers only check now and then whether the leader is gone
+                await asyncio.sleep(MAX_TICK)
+                continue
+
+            now = time.monotonic()
+            for job in self.jobs:
+                if job.next_run <= now:
+                    await self._run_job(job)
+                    job.next_run = time.monotonic() + job.interval
+
+            next_run = min(job.next_run for job in self.jobs)
+            await asyncio.sleep(min(max(next_run - time.monotonic(), 1.0), MAX_TICK))
+
+    async def _run_job(self, job: ScheduledJob) -> None:
+        try:
+            await job.func()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Scheduled job {job.name} failed")
+
+
+scheduler = Scheduler(LeaderLock(LEADER_LOCK_KEY))
@@ -0,0 +1,309 @@
+"""
+Spend Rollups - pre-aggregated order counts and amounts
+One row per (project, category, supplier, month, status) with the number and
+total amount of the purchase orders in it. Every write path that creates or
+deletes an order, or changes its status, amount, project, category or supplier,
+records the move with record_spend() before its commit, so the change lands in
+the same transaction. Reports then read a few hundred rollup rows instead of
+the whole order history; rebuild_spend_rollups() recomputes the table from the
+orders (startup backfill, restore, or `python -m services.spend_rollups`).
+
+Reports filtered by a date range read the whole months inside it from the
+rollups and sum only the orders of the partial months at either end.
+"""
+import asyncio
+import hashlib
+import logging
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import case, delete, func, insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import PurchaseOrder, SpendRollup, is_sqlite
+from services.exports import stream_rows
+
+logger = logging.getLogger(__name__)
+
+# Rows per executemany batch
+UPSERT_BATCH_SIZE = 1000
+
+KEY_FIELDS = ["project_id", "project_name", "category_id", "category_name", "supplier_id", "supplier_name"]
+NAME_FIELDS = ["project_name", "category_name", "supplier_name"]
+
+SpendEntry = namedtuple("SpendEntry", KEY_FIELDS + ["month", "status_bucket", "total_amount"])
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value: datetime) -> datetime:
+    return month_start(month_start(value) + timedelta(days=32))
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Order timestamps are stored as naive UTC"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def spend_entry(order, status: Optional[str] = None) -> SpendEntry:
+    """
+    An order's place in the rollups - order is an ORM object or a row with the
+    same columns; status overrides order.status (for set-based UPDATEs).
+    """
+    return SpendEntry(
+        order.project_id, order.project_name,
+        order.category_id, order.category_name,
+        order.supplier_id, order.supplier_name,
+        month_start(order.created_at or datetime.utcnow()),
+        status or order.status or "pending_approval",
+        float(order.total_amount or 0)
+    )
+
+
+def rollup_key(entry: SpendEntry) -> str:
+    """Ids identify project, category and supplier - orders without one are told apart by name"""
+    parts = [
+        entry.project_id or f"~{entry.project_name or ''}",
+        entry.category_id or f"~{entry.category_name or ''}",
+        entry.supplier_id or f"~{entry.supplier_name or ''}",
+        entry.month.strftime("%Y-%m"),
+        entry.status_bucket
+    ]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def accumulate(rows: Dict[str, dict], entries: Iterable[SpendEntry], sign: int, now: datetime) -> None:
+    """Add (sign=1) or subtract (sign=-1) entries into rows keyed by rollup_key"""
+    for entry in entries:
+        key = rollup_key(entry)
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = {
+                "rollup_key": key,
+                **{field: getattr(entry, field) for field in KEY_FIELDS},
+                "month": entry.month,
+                "status_bucket": entry.status_bucket,
+                "order_count": 0,
+                "total_amount": 0.0,
+                "updated_at": now
+            }
+        elif sign > 0:
+            row.update({field: getattr(entry, field) for field in NAME_FIELDS})
+        row["order_count"] += sign
+        row["total_amount"] += sign * entry.total_amount
+
+
+def upsert_statement(session: AsyncSession):
+    """INSERT ... ON CONFLICT (rollup_key) DO UPDATE adding the deltas to the stored totals"""
+    insert_ = sqlite_insert if is_sqlite(session) else pg_insert
+    stmt = insert_(SpendRollup)
+    excluded = stmt.excluded
+
+    # Names follow the latest order added to the row
+    adds = excluded.order_count > 0
+    values = {
+        field: case((adds, getattr(excluded, field)), else_=getattr(SpendRollup, field))
+        for field in NAME_FIELDS
+    }
+    values.update({
+        "order_count": SpendRollup.order_count + excluded.order_count,
+        "total_amount": SpendRollup.total_amount + excluded.total_amount,
+        "updated_at": excluded.updated_at
+    })
+    return stmt.on_conflict_do_update(index_elements=[SpendRollup.rollup_key], set_=values)
+
+
+# ==================== INCREMENTAL UPDATES ====================
+
+async def record_spend(
+    session: AsyncSession,
+    removed: Iterable[SpendEntry] = (),
+    added: Iterable[SpendEntry] = ()
+) -> None:
+    """
+    Call before commit with the entries of the changed orders before (removed)
+    and after (added) the change - nothing for a new order's removed side or a
+    deleted order's added side. Rows left without orders are dropped.
+    """
+    rows: Dict[str, dict] = {}
+    now = datetime.utcnow()
+    accumulate(rows, removed, -1, now)
+    accumulate(rows, added, 1, now)
+
+    # Status moves within a row cancel out; sorted keys keep lock order stable across transactions
+    changed = sorted(
+        (row for row in rows.values() if row["order_count"] or abs(row["total_amount"]) > 1e-9),
+        key=lambda row: row["rollup_key"]
+    )
+    if not changed:
+        return
+
+    for start in range(0, len(changed), UPSERT_BATCH_SIZE):
+        await session.execute(upsert_statement(session), changed[start:start + UPSERT_BATCH_SIZE])
+
+    emptied = [row["rollup_key"] for row in changed if row["order_count"] < 0]
+    if emptied:
+        await session.execute(
+            delete(SpendRollup).where(SpendRollup.rollup_key.in_(emptied), SpendRollup.order_count <= 0)
+        )
+
+
+# ==================== REPORT QUERIES ====================
+
+ROLLUP_COLUMNS = {field: getattr(SpendRollup, field) for field in KEY_FIELDS + ["month", "status_bucket"]}
+ORDER_COLUMNS = {**{field: getattr(PurchaseOrder, field) for field in KEY_FIELDS}, "status_bucket": PurchaseOrder.status}
+
+
+def rollup_months(start: Optional[datetime], end: Optional[datetime]):
+    """
+    (first, stop): the whole months in start <= created_at <= end are
+    first <= month < stop (None = unbounded), or None when there are none
+    """
+    first = None if start is None else (start if start == month_start(start) else next_month(start))
+    stop = None if end is None else month_start(end)
+    if first is not None and stop is not None and first >= stop:
+        return None
+    return first, stop
+
+
+async def spend_totals(
+    session: AsyncSession,
+    group_by: Sequence[str] = (),
+    statuses: Optional[Sequence[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    **filters
+) -> List[dict]:
+    """
+    Order count and amount grouped by rollup columns (e.g. "project_name",
+    "status_bucket", "month"), one dict per group with "order_count" and
+    "total_amount". filters are equalities on the id columns (project_id=...),
+    start/end bound created_at inclusively like the reports always did.
+    """
+    rows: Dict[tuple, dict] = {}
+    start, end = naive_utc(start), naive_utc(end)
+
+    def add(result_rows):
+        for row in result_rows:
+            key = tuple(row[:len(group_by)])
+            total = rows.setdefault(key, {**dict(zip(group_by, key)), "order_count": 0, "total_amount": 0.0})
+            total["order_count"] += int(row.order_count or 0)
+            total["total_amount"] += float(row.total_amount or 0)
+
+    months = rollup_months(start, end)
+    if months is not None:
+        first, stop = months
+        query = select(
+            *[ROLLUP_COLUMNS[field] for field in group_by],
+            func.sum(SpendRollup.order_count).label("order_count"),
+            func.sum(SpendRollup.total_amount).label("total_amount")
+        )
+        if statuses:
+            query = query.where(SpendRollup.status_bucket.in_(statuses))
+        for field, value in filters.items():
+            query = query.where(ROLLUP_COLUMNS[field] == value)
+        if first is not None:
+            query = query.where(SpendRollup.month >= first)
+        if stop is not None:
+            query = query.where(SpendRollup.month < stop)
+        if group_by:
+            query = query.group_by(*[ROLLUP_COLUMNS[field] for field in group_by])
+        add((await session.execute(query)).all())
+
+    # Partial months at the ends of the range come from the orders themselves
+    if months is None:
+        edges = [(start, None, end)]
+    else:
+        first, stop = months
+        edges = []
+        if start is not None and first != start:
+            edges.append((start, first, None))
+        if end is not None:
+            edges.append((stop, None, end))
+
+    for lower, before, upper in edges:
+        if "month" in group_by:
+            raise ValueError("month grouping needs a range of whole months")
+        query = select(
+            *[ORDER_COLUMNS[field] for field in group_by],
+            func.count(PurchaseOrder.id).label("order_count"),
+            func.sum(PurchaseOrder.total_amount).label("total_amount")
+        )
+        if statuses:
+            query = query.where(PurchaseOrder.status.in_(statuses))
+        for field, value in filters.items():
+            query = query.where(ORDER_COLUMNS[field] == value)
+        if lower is not None:
+            query = query.where(PurchaseOrder.created_at >= lower)
+        if before is not None:
+            query = query.where(PurchaseOrder.created_at < before)
+        if upper is not None:
+            query = query.where(PurchaseOrder.created_at <= upper)
+        if group_by:
+            query = query.group_by(*[ORDER_COLUMNS[field] for field in group_by])
+        add((await session.execute(query)).all())
+
+    return [total for total in rows.values() if total["order_count"]]
+
+
+# ==================== REBUILD ====================
+
+def order_entries_query():
+    return select(
+        *[ORDER_COLUMNS[field] for field in KEY_FIELDS],
+        PurchaseOrder.status, PurchaseOrder.total_amount, PurchaseOrder.created_at
+    )
+
+
+async def rebuild_spend_rollups(session: AsyncSession) -> int:
+    """Recompute the whole table from the purchase orders (caller commits) - returns the row count"""
+    if not is_sqlite(session):
+        # Order changes wait for the rebuild, then add their deltas on top of it
+        await session.execute(text("LOCK TABLE spend_rollups IN EXCLUSIVE MODE"))
+    await session.execute(delete(SpendRollup))
+
+    rows: Dict[str, dict] = {}
+    now = datetime.utcnow()
+    async for chunk in stream_rows(order_entries_query(), session=session):
+        accumulate(rows, (spend_entry(order) for order in chunk), 1, now)
+
+    values = list(rows.values())
+    for start in range(0, len(values), UPSERT_BATCH_SIZE):
+        await session.execute(insert(SpendRollup), values[start:start + UPSERT_BATCH_SIZE])
+    logger.info(f"Spend rollups rebuilt: {len(values)} rows")
+    return len(values)
+
+
+async def backfill_spend_rollups(session: AsyncSession) -> None:
+    """Build the table once for databases created before it existed"""
+    if (await session.execute(select(func.count()).select_from(SpendRollup))).scalar():
+        return
+    if (await session.execute(select(func.count()).select_from(PurchaseOrder))).scalar():
+        await rebuild_spend_rollups(session)
+        await session.commit()
+
+
+async def main() -> None:
+    from database import init_postgres_db, close_postgres_db
+    from database.connection import get_session_maker
+
+    await init_postgres_db()
+    try:
+        async with get_session_maker()() as session:
+            count = await rebuild_spend_rollups(session)
+            await session.commit()
+        print(f"Spend rollups rebuilt: {count} rows")
+    finally:
+        await close_postgres_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
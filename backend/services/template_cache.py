@@ -0,0 +1,92 @@
+"""
+Template File Cache
+Generated files (e.g. the planned quantities Excel template) kept on disk, one
+per version of the data they are built from. A download whose version is on
+disk is a plain file send; when the data has moved on, the newest file on disk
+is served while the new version builds in the background (only the very first
+build is waited for). The version doubles as the download's ETag.
+"""
+import asyncio
+import hashlib
+import logging
+import shutil
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_CACHE_DIR = Path(__file__).parent.parent / "data" / "template_cache"
+
+# Versions kept on disk - the previous one may still be mid-download
+KEEP_VERSIONS = 2
+
+Builder = Callable[[], Awaitable[str]]
+
+
+def data_version(parts: Iterable) -> str:
+    """Short stable hash of the values that describe the source data"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8"))
+    return digest.hexdigest()[:20]
+
+
+class FileCache:
+    """Built files named <name>-<version><suffix> in TEMPLATE_CACHE_DIR"""
+
+    def __init__(self, name: str, suffix: str):
+        self.name = name
+        self.suffix = suffix
+        self._builds: Dict[str, asyncio.Task] = {}
+
+    def path(self, version: str) -> Path:
+        return TEMPLATE_CACHE_DIR / f"{self.name}-{version}{self.suffix}"
+
+    def cached(self) -> list:
+        """Files on disk, newest first"""
+        if not TEMPLATE_CACHE_DIR.exists():
+            return []
+        files = TEMPLATE_CACHE_DIR.glob(f"{self.name}-*{self.suffix}")
+        return sorted(files, key=lambda path: path.stat().st_mtime, reverse=True)
+
+    def version_of(self, path: Path) -> str:
+        return path.name[len(self.name) + 1:-len(self.suffix)]
+
+    def store(self, built_path: str, version: str) -> None:
+        """Move a freshly built file into place and drop the oldest versions"""
+        TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        target = self.path(version)
+        tmp_path = target.with_suffix(".tmp")
+        shutil.move(built_path, tmp_path)
+        tmp_path.replace(target)
+        for old in self.cached()[KEEP_VERSIONS:]:
+            old.unlink(missing_ok=True)
+
+    async def _build(self, version: str, build: Builder) -> None:
+        self.store(await build(), version)
+
+    def _finished(self, version: str, task: asyncio.Task) -> None:
+        self._builds.pop(version, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Building {self.name} ({version}) failed", exc_info=task.exception())
+
+    def refresh(self, version: str, build: Builder) -> asyncio.Task:
+        """Start building version in the background unless it is already building"""
+        task = self._builds.get(version)
+        if task is None:
+            task = asyncio.create_task(self._build(version, build))
+            self._builds[version] = task
+            task.add_done_callback(lambda done: self._finished(version, done))
+        return task
+
+    async def get(self, version: str, build: Builder) -> Tuple[str, Path]:
+        """(version, path) of the file to send - the current one, or the newest while it builds"""
+        path = self.path(version)
+        if path.exists():
+            return version, path
+
+        task = self.refresh(version, build)
+        stale = self.cached()
+        if stale:
+            return self.version_of(stale[0]), stale[0]
+
+        await asyncio.shield(task)
+        return version, path
@@ -0,0 +1,49 @@
+"""
+Worker Pool - CPU-bound work off the event loop
+Workbook building and parsing, and PDF rendering, run in a shared process pool so a large export
+or import does not stall every other request. Each app worker also caps how
+many of its own jobs may be queued on the pool at once (WORKER_MAX_CONCURRENCY);
+further callers wait their turn on the event loop instead of piling up.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Optional, TypeVar
+
+WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES", "2"))
+WORKER_MAX_CONCURRENCY = int(os.environ.get("WORKER_MAX_CONCURRENCY", "4"))
+
+T = TypeVar("T")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def get_worker_pool() -> ProcessPoolExecutor:
+    """Lazily create the process pool"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=WORKER_PROCESSES)
+    return _pool
+
+
+def shutdown_worker_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_in_worker(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run fn(*args, **kwargs) in the process pool and await the result.
+    fn must be a module-level function and its arguments and result picklable.
+    """
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(WORKER_MAX_CONCURRENCY)
+
+    async with _slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_worker_pool(), partial(fn, *args, **kwargs))
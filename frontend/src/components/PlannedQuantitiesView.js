@@ -51,7 +51,9 @@ const PlannedQuantitiesView = ({ projectId = null, showProjectFilter = true }) =
     const statusMap = {
       planned: { label: "مخطط", className: "bg-blue-100 text-blue-700" },
       partially_ordered: { label: "طلب جزئي", className: "bg-yellow-100 text-yellow-700" },
-      fully_ordered: { label: "مكتمل", className: "bg-green-100 text-green-700" }
+      fully_ordered: { label: "مكتمل", className: "bg-green-100 text-green-700" },
+      overdue: { label: "متأخر", className: "bg-red-100 text-red-700" },
+      due_soon: { label: "قريب الموعد", className: "bg-orange-100 text-orange-700" }
     };
     const s = statusMap[status] || { label: status, className: "bg-slate-100 text-slate-700" };
     return <Badge className={s.className}>{s.label}</Badge>;
@@ -106,7 +108,7 @@ const PlannedQuantitiesView = ({ projectId = null, showProjectFilter = true }) =
             </div>
             <div className="bg-orange-50 p-3 rounded-lg text-center">
               <p className="text-xl font-bold text-orange-600">
-                {data.items?.filter(i => i.days_until !== null && i.days_until <= 7 && i.days_until >= 0).length || 0}
+                {data.summary?.due_soon_count || 0}
               </p>
               <p className="text-xs text-slate-500">قريب الموعد</p>
             </div>
@@ -178,9 +180,9 @@ const PlannedQuantitiesView = ({ projectId = null, showProjectFilter = true }) =
                   ))}
                 </tbody>
               </table>
-              {data.items.length > 20 && (
+              {data.summary?.total_items > 20 && (
                 <div className="bg-slate-50 px-3 py-2 text-center text-sm text-slate-500">
-                  يتم عرض 20 صنف من أصل {data.items.length}
+                  يتم عرض 20 صنف من أصل {data.summary.total_items}
                 </div>
               )}
             </div>
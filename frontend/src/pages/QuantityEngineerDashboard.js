@@ -450,7 +450,8 @@ const QuantityEngineerDashboard = () => {
       planned: { label: "مخطط", className: "bg-blue-100 text-blue-700" },
       partially_ordered: { label: "طلب جزئي", className: "bg-yellow-100 text-yellow-700" },
       fully_ordered: { label: "مكتمل", className: "bg-green-100 text-green-700" },
-      overdue: { label: "متأخر", className: "bg-red-100 text-red-700" }
+      overdue: { label: "متأخر", className: "bg-red-100 text-red-700" },
+      due_soon: { label: "قريب الموعد", className: "bg-orange-100 text-orange-700" }
     };
     const s = statusMap[status] || { label: status, className: "bg-slate-100 text-slate-700" };
     return <Badge className={s.className}>{s.label}</Badge>;
@@ -626,6 +627,8 @@ const QuantityEngineerDashboard = () => {
                       <option value="planned">مخطط</option>
                       <option value="partially_ordered">طلب جزئي</option>
                       <option value="fully_ordered">مكتمل</option>
+                      <option value="overdue">متأخر</option>
+                      <option value="due_soon">قريب الموعد</option>
                     </select>
                   </div>
                 </div>
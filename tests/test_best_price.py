@@ -0,0 +1,159 @@
+"""
+Best Price Alert Tests
+Tests for POST /api/pg/price-catalog/check-best-price backed by the best_prices table,
+which DELETE /api/pg/sysadmin/delete-order/{id} keeps in step
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+SUPERVISOR = {"email": "supervisor1@test.com", "password": "123456"}
+ENGINEER = {"email": "engineer1@test.com", "password": "123456"}
+SYSTEM_ADMIN = {"email": "admin@system.com", "password": "123456"}
+
+
+def login(credentials):
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=credentials)
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    data = response.json()
+    return {"Authorization": f"Bearer {data['access_token']}"}, data["user"]
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    """Get procurement manager authorization headers"""
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=PROCUREMENT_MANAGER)
+    assert response.status_code == 200, f"PM login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def offers(pm_headers):
+    """Same item from two suppliers in the catalog"""
+    name = f"بلاط سيراميك اختبار {uuid.uuid4().hex[:6]}"
+    created = []
+    for supplier, price in [("مورد أ", 40), ("مورد ب", 55)]:
+        response = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog/quick-add",
+            json={"name": name, "unit": "م2", "price": price, "supplier_name": supplier},
+            headers=pm_headers
+        )
+        assert response.status_code == 200, response.text
+        created.append(response.json()["item"])
+    yield {"name": name, "items": created}
+    for item in created:
+        requests.delete(f"{BASE_URL}/api/pg/price-catalog/{item['id']}", headers=pm_headers)
+
+
+class TestBestPriceLookup:
+    """Catalog offers are visible to the alert"""
+
+    def test_cheaper_supplier_reported(self, pm_headers, offers):
+        response = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog/check-best-price",
+            params={"item_name": offers["name"], "unit_price": 60},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["has_better_price"] is True
+        assert data["better_options"][0]["price"] == 40
+        assert data["better_options"][0]["currency"] == "SAR"
+
+    def test_spelling_variant_matches(self, pm_headers, offers):
+        variant = offers["name"].replace("اختبار", "إختبار")
+        response = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog/check-best-price",
+            params={"item_name": variant, "unit_price": 60},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        assert len(response.json()["all_suppliers"]) == 2
+
+    def test_repricing_updates_alert(self, pm_headers, offers):
+        cheap = offers["items"][0]
+        requests.put(
+            f"{BASE_URL}/api/pg/price-catalog/{cheap['id']}",
+            json={"price": 70},
+            headers=pm_headers
+        )
+        response = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog/check-best-price",
+            params={"item_name": offers["name"], "unit_price": 60},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["has_better_price"] is True
+        assert [o["price"] for o in data["better_options"]] == [55]
+
+    def test_unknown_item(self, pm_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog/check-best-price",
+            params={"item_name": f"صنف غير موجود {uuid.uuid4().hex}", "unit_price": 10},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["has_better_price"] is False
+
+
+class TestOrderHistory:
+    """Approved order prices, and what deleting an order leaves behind"""
+
+    def test_delete_keeps_spelling_variant_offer(self, pm_headers):
+        """Another order's price for the same normalized item survives a delete"""
+        supervisor_headers = login(SUPERVISOR)[0]
+        engineer_headers, engineer = login(ENGINEER)
+        admin_headers = login(SYSTEM_ADMIN)[0]
+        projects = requests.get(f"{BASE_URL}/api/pg/projects", headers=pm_headers).json()
+        if not projects:
+            pytest.skip("No project to create requests in")
+
+        name = f"حديد تسليح اختبار {uuid.uuid4().hex[:6]}"
+        variant = name.replace("اختبار", "إختبار")
+        response = requests.post(
+            f"{BASE_URL}/api/pg/requests",
+            json={
+                "items": [
+                    {"name": name, "quantity": 1, "unit": "طن", "estimated_price": 30},
+                    {"name": variant, "quantity": 1, "unit": "طن", "estimated_price": 20}
+                ],
+                "project_id": projects[0]["id"],
+                "reason": "TEST_best_price",
+                "engineer_id": engineer["id"]
+            },
+            headers=supervisor_headers
+        )
+        assert response.status_code == 200, response.text
+        request_id = response.json()["id"]
+        response = requests.post(f"{BASE_URL}/api/pg/requests/{request_id}/approve", headers=engineer_headers)
+        assert response.status_code == 200, response.text
+
+        order_ids = []
+        for index in range(2):
+            response = requests.post(
+                f"{BASE_URL}/api/pg/purchase-orders",
+                json={"request_id": request_id, "supplier_name": "مورد اختبار", "selected_items": [index]},
+                headers=pm_headers
+            )
+            assert response.status_code == 200, response.text
+            order_ids.append(response.json()["id"])
+            response = requests.post(f"{BASE_URL}/api/pg/purchase-orders/{order_ids[-1]}/approve", headers=pm_headers)
+            assert response.status_code == 200, response.text
+
+        response = requests.delete(f"{BASE_URL}/api/pg/sysadmin/delete-order/{order_ids[0]}", headers=admin_headers)
+        assert response.status_code == 200, response.text
+
+        response = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog/check-best-price",
+            params={"item_name": name, "unit_price": 60},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [o["price"] for o in data["better_options"]] == [20]
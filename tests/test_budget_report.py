@@ -0,0 +1,63 @@
+"""
+Budget Report Tests
+GET /api/pg/reports/budget - spend per project and category from one grouped query
+GET /api/pg/budget-categories - every category with the total of its orders
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    """Get procurement manager authorization headers"""
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=PROCUREMENT_MANAGER)
+    assert response.status_code == 200, f"PM login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestBudgetReport:
+    """Project and overall totals add up from the category lines"""
+
+    def test_totals(self, pm_headers):
+        response = requests.get(f"{BASE_URL}/api/pg/reports/budget", headers=pm_headers)
+        assert response.status_code == 200, response.text
+        data = response.json()
+
+        for project in data["projects"]:
+            assert project["total_budget"] == pytest.approx(sum(c["budget"] for c in project["categories"]))
+            assert project["total_spent"] == pytest.approx(sum(c["spent"] for c in project["categories"]))
+            for category in project["categories"]:
+                assert category["remaining"] == pytest.approx(category["budget"] - category["spent"])
+
+        summary = data["summary"]
+        assert summary["total_budget"] == pytest.approx(sum(p["total_budget"] for p in data["projects"]))
+        assert summary["total_spent"] == pytest.approx(sum(p["total_spent"] for p in data["projects"]))
+
+    def test_project_filter(self, pm_headers):
+        report = requests.get(f"{BASE_URL}/api/pg/reports/budget", headers=pm_headers).json()
+        if not report["projects"]:
+            pytest.skip("No active projects")
+        project = report["projects"][0]
+
+        response = requests.get(
+            f"{BASE_URL}/api/pg/reports/budget", params={"project_id": project["project_id"]}, headers=pm_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["projects"] == [project]
+
+    def test_categories_spend_covers_report(self, pm_headers):
+        """Categories count orders of every status, so never less than the approved spend"""
+        report = requests.get(f"{BASE_URL}/api/pg/reports/budget", headers=pm_headers).json()
+        response = requests.get(f"{BASE_URL}/api/pg/budget-categories", headers=pm_headers)
+        assert response.status_code == 200
+        actual = {c["id"]: c["actual_spent"] for c in response.json()}
+
+        for project in report["projects"]:
+            for category in project["categories"]:
+                assert actual[category["category_id"]] >= category["spent"] - 0.01
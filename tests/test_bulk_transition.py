@@ -0,0 +1,95 @@
+"""
+Bulk Purchase Order Transition Tests
+Tests for POST /api/pg/purchase-orders/bulk-transition
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+ENGINEER = {"email": "engineer1@test.com", "password": "123456"}
+
+
+def login(credentials):
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=credentials)
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    return login(PROCUREMENT_MANAGER)
+
+
+@pytest.fixture(scope="module")
+def eng_headers():
+    return login(ENGINEER)
+
+
+class TestBulkTransitionValidation:
+    """Request-level validation"""
+
+    def test_unknown_action_rejected(self, pm_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/pg/purchase-orders/bulk-transition",
+            json={"order_ids": ["x"], "action": "delete"},
+            headers=pm_headers
+        )
+        assert response.status_code == 400
+
+    def test_empty_order_list_rejected(self, pm_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/pg/purchase-orders/bulk-transition",
+            json={"order_ids": [], "action": "print"},
+            headers=pm_headers
+        )
+        assert response.status_code == 400
+
+
+class TestBulkTransitionOutcomes:
+    """Per-order outcomes"""
+
+    def test_missing_orders_reported_per_order(self, pm_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/pg/purchase-orders/bulk-transition",
+            json={"order_ids": ["missing-1", "missing-2", "missing-1"], "action": "print"},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 0
+        assert data["failed"] == 2, "Duplicate ids should be collapsed"
+        assert all(r["status_code"] == 404 for r in data["results"])
+
+    def test_role_rules_applied(self, pm_headers, eng_headers):
+        orders = requests.get(f"{BASE_URL}/api/pg/purchase-orders", headers=pm_headers).json()
+        approved = [o["id"] for o in orders if o["status"] == "approved"][:3]
+        if not approved:
+            pytest.skip("No approved orders to test with")
+
+        response = requests.post(
+            f"{BASE_URL}/api/pg/purchase-orders/bulk-transition",
+            json={"order_ids": approved, "action": "print"},
+            headers=eng_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 0
+        assert all(r["status_code"] == 403 for r in data["results"])
+
+    def test_wrong_state_rejected(self, pm_headers):
+        orders = requests.get(f"{BASE_URL}/api/pg/purchase-orders", headers=pm_headers).json()
+        delivered = [o["id"] for o in orders if o["status"] == "delivered"][:3]
+        if not delivered:
+            pytest.skip("No delivered orders to test with")
+
+        response = requests.post(
+            f"{BASE_URL}/api/pg/purchase-orders/bulk-transition",
+            json={"order_ids": delivered, "action": "ship"},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        assert all(r["status_code"] == 400 for r in response.json()["results"])
@@ -0,0 +1,83 @@
+"""
+Catalog Import Tests
+POST /api/pg/price-catalog/import - chunked upsert on item code with per-row errors
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+
+HEADER = "كود الصنف,اسم الصنف,الوصف,الوحدة,السعر,العملة,اسم المورد,التصنيف,صالح حتى\n"
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    """Get procurement manager authorization headers"""
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=PROCUREMENT_MANAGER)
+    assert response.status_code == 200, f"PM login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def import_csv(headers, body):
+    return requests.post(
+        f"{BASE_URL}/api/pg/price-catalog/import",
+        files={"file": ("catalog.csv", (HEADER + body).encode("utf-8-sig"), "text/csv")},
+        headers=headers
+    )
+
+
+def find_items(headers, search):
+    response = requests.get(f"{BASE_URL}/api/pg/price-catalog", params={"search": search}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["items"]
+
+
+class TestCatalogImport:
+    """Upsert semantics and error reporting"""
+
+    def test_code_upserts_and_errors_reported(self, pm_headers):
+        suffix = uuid.uuid4().hex[:8]
+        code = f"IMP-{suffix}"
+        body = (
+            f"{code},صنف مستورد {suffix},,قطعة,10,SAR,مورد {suffix},,\n"
+            f",بدون سعر {suffix},,قطعة,,SAR,,,\n"
+            f",سعر خاطئ {suffix},,قطعة,abc,SAR,,,\n"
+            f"{code},صنف مستورد {suffix},,قطعة,12,SAR,مورد {suffix},,\n"
+        )
+        response = import_csv(pm_headers, body)
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["imported"] == 1
+        assert data["error_count"] == 2
+        assert [e["row"] for e in data["errors"]] == [3, 4]
+
+        items = find_items(pm_headers, suffix)
+        assert len(items) == 1
+        assert items[0]["price"] == 12
+
+        # Same code again updates in place
+        response = import_csv(pm_headers, f"{code},صنف مستورد {suffix},,قطعة,15,SAR,مورد {suffix},,\n")
+        assert response.json()["updated"] == 1
+        items = find_items(pm_headers, suffix)
+        assert len(items) == 1
+        assert items[0]["price"] == 15
+
+        requests.delete(f"{BASE_URL}/api/pg/price-catalog/{items[0]['id']}", headers=pm_headers)
+
+    def test_rows_without_code_match_name_and_supplier(self, pm_headers):
+        suffix = uuid.uuid4().hex[:8]
+        row = f",صنف بلا كود {suffix},,كيس,20,SAR,مورد {suffix},,\n"
+        assert import_csv(pm_headers, row).json()["imported"] == 1
+
+        response = import_csv(pm_headers, row.replace(",20,", ",22,"))
+        assert response.json()["updated"] == 1
+        items = find_items(pm_headers, suffix)
+        assert len(items) == 1
+        assert items[0]["price"] == 22
+
+        requests.delete(f"{BASE_URL}/api/pg/price-catalog/{items[0]['id']}", headers=pm_headers)
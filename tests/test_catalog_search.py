@@ -0,0 +1,131 @@
+"""
+Catalog Search Index Tests
+Arabic-aware search for price catalog listing, alias suggestions and item validation
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    """Get procurement manager authorization headers"""
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=PROCUREMENT_MANAGER)
+    assert response.status_code == 200, f"PM login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def catalog_item(pm_headers):
+    """Create a catalog item spelled with hamza and taa marbuta, remove it afterwards"""
+    suffix = uuid.uuid4().hex[:6]
+    response = requests.post(
+        f"{BASE_URL}/api/pg/price-catalog",
+        json={"name": f"أسمنت مقاوم للكبريتات {suffix}", "unit": "كيس", "price": 25},
+        headers=pm_headers
+    )
+    assert response.status_code == 200, response.text
+    item = response.json()
+    item["suffix"] = suffix
+    yield item
+    requests.delete(f"{BASE_URL}/api/pg/price-catalog/{item['id']}", headers=pm_headers)
+
+
+class TestCatalogListingSearch:
+    """GET /api/pg/price-catalog?search=..."""
+
+    def test_spelling_variants_match(self, pm_headers, catalog_item):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/price-catalog",
+            params={"search": f"اسمنت مقاوم للكبريتات {catalog_item['suffix']}"},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        ids = [item["id"] for item in response.json()["items"]]
+        assert catalog_item["id"] in ids
+
+    def test_deleted_item_leaves_index(self, pm_headers):
+        suffix = uuid.uuid4().hex[:6]
+        created = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog",
+            json={"name": f"صنف مؤقت {suffix}", "unit": "قطعة", "price": 5},
+            headers=pm_headers
+        ).json()
+        requests.delete(f"{BASE_URL}/api/pg/price-catalog/{created['id']}", headers=pm_headers)
+
+        response = requests.get(
+            f"{BASE_URL}/api/pg/price-catalog",
+            params={"search": suffix},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["total"] == 0
+
+
+class TestSuggestions:
+    """Alias suggestion and item validation use the same index"""
+
+    def test_suggest_alias_finds_variant(self, pm_headers, catalog_item):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/item-aliases/suggest/اسمنت مقاوم للكبريتات {catalog_item['suffix']}",
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["found"] is True
+        assert catalog_item["id"] in [s["id"] for s in data["suggestions"]]
+
+    def test_validate_items_suggests_variant(self, pm_headers, catalog_item):
+        response = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog/validate-items",
+            json={"items": [{"name": f"اسمنت مقاوم الكبريتات {catalog_item['suffix']}", "quantity": 1}]},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        result = response.json()["results"][0]
+        assert result["found"] is False
+        assert catalog_item["id"] in [s["id"] for s in result["suggestions"]]
+
+
+class TestValidateItemsBatch:
+    """POST /api/pg/price-catalog/validate-items resolves every item in one pass"""
+
+    def test_mixed_batch_keeps_order_and_counts(self, pm_headers, catalog_item):
+        exact_name = f"أسمنت مقاوم للكبريتات {catalog_item['suffix']}"
+        items = [{"name": exact_name, "quantity": 1}]
+        items += [{"name": f"صنف غير موجود {i} {catalog_item['suffix']}", "quantity": i} for i in range(59)]
+        items.append({"name": exact_name, "quantity": 2})
+
+        response = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog/validate-items",
+            json={"items": items},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_items"] == 61
+        assert data["missing_items"] == 59
+        assert data["found_items"] == 2
+        assert [r["item_name"] for r in data["results"]] == [i["name"] for i in items]
+        assert data["results"][0]["found"] is True
+        assert data["results"][-1]["found"] is True
+
+
+class TestCatalogCsvExport:
+    """GET /api/pg/price-catalog/export streams the catalog as CSV"""
+
+    def test_export_has_bom_and_item(self, pm_headers, catalog_item):
+        response = requests.get(f"{BASE_URL}/api/pg/price-catalog/export", headers=pm_headers, stream=True)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        content = response.content
+        assert content.startswith(b"\xef\xbb\xbf")
+        lines = content.decode("utf-8-sig").splitlines()
+        assert lines[0].split(",")[0] == "الاسم"
+        assert any(line.startswith(catalog_item["name"] + ",") for line in lines[1:])
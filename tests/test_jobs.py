@@ -0,0 +1,138 @@
+"""
+Background Job Tests
+async=true on imports, budget export and backup returns a job id; the job is
+polled at /api/pg/jobs/{id} and its file downloaded from /download
+"""
+import pytest
+import requests
+import os
+import time
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+SYSTEM_ADMIN = {"email": "admin@system.com", "password": "123456"}
+
+CATALOG_HEADER = "كود الصنف,اسم الصنف,الوصف,الوحدة,السعر,العملة,اسم المورد,التصنيف,صالح حتى\n"
+
+
+def login(credentials):
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=credentials)
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    """Get procurement manager authorization headers"""
+    return login(PROCUREMENT_MANAGER)
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    """Get system admin authorization headers"""
+    return login(SYSTEM_ADMIN)
+
+
+def wait_for_job(headers, job_id, timeout=60):
+    """Poll until the job has finished"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = requests.get(f"{BASE_URL}/api/pg/jobs/{job_id}", headers=headers)
+        assert response.status_code == 200, response.text
+        job = response.json()
+        assert 0 <= job["progress"] <= 100
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.5)
+    pytest.fail(f"Job {job_id} did not finish in {timeout}s")
+
+
+class TestAsyncCatalogImport:
+    """Catalog import as a background job"""
+
+    def test_import_job_reports_result(self, pm_headers):
+        suffix = uuid.uuid4().hex[:8]
+        body = (
+            f",صنف مهمة {suffix},,قطعة,15,SAR,مورد {suffix},,\n"
+            f",بدون سعر {suffix},,قطعة,,SAR,,,\n"
+        )
+        response = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog/import",
+            params={"async": "true"},
+            files={"file": ("catalog.csv", (CATALOG_HEADER + body).encode("utf-8-sig"), "text/csv")},
+            headers=pm_headers
+        )
+        assert response.status_code == 202, response.text
+        job = wait_for_job(pm_headers, response.json()["job_id"])
+
+        assert job["status"] == "succeeded", job["message"]
+        assert job["progress"] == 100
+        assert job["result"]["imported"] == 1
+        assert [e["row"] for e in job["result"]["errors"]] == [3]
+        assert job["download_url"] is None
+
+    def test_bad_extension_rejected_before_job(self, pm_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog/import",
+            params={"async": "true"},
+            files={"file": ("catalog.txt", b"x", "text/plain")},
+            headers=pm_headers
+        )
+        assert response.status_code == 400
+
+
+class TestAsyncExports:
+    """Exports and backups produce a downloadable file"""
+
+    def test_budget_export_download(self, pm_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/reports/budget/export", params={"async": "true"}, headers=pm_headers
+        )
+        assert response.status_code == 202, response.text
+        job = wait_for_job(pm_headers, response.json()["job_id"])
+        assert job["status"] == "succeeded", job["message"]
+
+        download = requests.get(f"{BASE_URL}{job['download_url']}", headers=pm_headers)
+        assert download.status_code == 200
+        assert "spreadsheetml" in download.headers["content-type"]
+        assert download.content[:2] == b"PK"
+
+    def test_backup_download(self, admin_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/sysadmin/backup", params={"async": "true"}, headers=admin_headers
+        )
+        assert response.status_code == 202, response.text
+        job = wait_for_job(admin_headers, response.json()["job_id"])
+        assert job["status"] == "succeeded", job["message"]
+
+        backup = requests.get(f"{BASE_URL}{job['download_url']}", headers=admin_headers).json()
+        assert "backup_info" in backup
+        assert len(backup["users"]) == job["result"]["counts"]["users"]
+
+
+class TestJobAccess:
+    """Jobs are private to the user who started them"""
+
+    def test_unknown_job(self, pm_headers):
+        response = requests.get(f"{BASE_URL}/api/pg/jobs/{uuid.uuid4()}", headers=pm_headers)
+        assert response.status_code == 404
+
+    def test_other_users_job_forbidden(self, pm_headers, admin_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/sysadmin/backup", params={"async": "true"}, headers=admin_headers
+        )
+        job_id = response.json()["job_id"]
+        response = requests.get(f"{BASE_URL}/api/pg/jobs/{job_id}", headers=pm_headers)
+        assert response.status_code == 403
+        wait_for_job(admin_headers, job_id)
+
+    def test_finished_job_cannot_be_cancelled(self, pm_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/reports/budget/export", params={"async": "true"}, headers=pm_headers
+        )
+        job = wait_for_job(pm_headers, response.json()["job_id"])
+        response = requests.post(f"{BASE_URL}/api/pg/jobs/{job['id']}/cancel", headers=pm_headers)
+        assert response.status_code == 400
@@ -0,0 +1,109 @@
+"""
+Order and Request Numbering Tests
+Numbers come from counter rows instead of max() scans:
+POST /api/pg/requests - per-supervisor request numbers
+POST /api/pg/purchase-orders - global PO-xxxxxxxx order numbers
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+SUPERVISOR = {"email": "supervisor1@test.com", "password": "123456"}
+ENGINEER = {"email": "engineer1@test.com", "password": "123456"}
+
+
+def login(credentials):
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=credentials)
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    data = response.json()
+    return {"Authorization": f"Bearer {data['access_token']}"}, data["user"]
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    return login(PROCUREMENT_MANAGER)[0]
+
+
+@pytest.fixture(scope="module")
+def supervisor_headers():
+    return login(SUPERVISOR)[0]
+
+
+@pytest.fixture(scope="module")
+def engineer():
+    return login(ENGINEER)
+
+
+@pytest.fixture(scope="module")
+def project_id(pm_headers):
+    projects = requests.get(f"{BASE_URL}/api/pg/projects", headers=pm_headers).json()
+    active = [p for p in projects if p.get("status", "active") == "active"]
+    if not active:
+        pytest.skip("No active project to create requests in")
+    return active[0]["id"]
+
+
+def create_request(supervisor_headers, engineer_id, project_id, item_count=1):
+    response = requests.post(
+        f"{BASE_URL}/api/pg/requests",
+        json={
+            "items": [
+                {"name": f"TEST_numbering item {index}", "quantity": 1, "unit": "قطعة", "estimated_price": 10}
+                for index in range(item_count)
+            ],
+            "project_id": project_id,
+            "reason": "TEST_numbering",
+            "engineer_id": engineer_id
+        },
+        headers=supervisor_headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestRequestNumbers:
+    """Consecutive requests of one supervisor"""
+
+    def test_request_numbers_increase(self, supervisor_headers, engineer, project_id):
+        engineer_id = engineer[1]["id"]
+        created = [create_request(supervisor_headers, engineer_id, project_id) for _ in range(3)]
+
+        seqs = [r["request_seq"] for r in created]
+        assert seqs == sorted(seqs)
+        assert [b - a for a, b in zip(seqs, seqs[1:])] == [1, 1]
+        assert len({r["request_number"] for r in created}) == 3
+
+
+class TestOrderNumbers:
+    """Consecutive purchase orders"""
+
+    def test_order_numbers_increase(self, pm_headers, supervisor_headers, engineer, project_id):
+        engineer_headers, engineer_user = engineer
+        request = create_request(supervisor_headers, engineer_user["id"], project_id, item_count=3)
+        response = requests.post(f"{BASE_URL}/api/pg/requests/{request['id']}/approve", headers=engineer_headers)
+        assert response.status_code == 200, response.text
+
+        created = []
+        for index in range(3):
+            response = requests.post(
+                f"{BASE_URL}/api/pg/purchase-orders",
+                json={"request_id": request["id"], "supplier_name": "TEST_numbering", "selected_items": [index]},
+                headers=pm_headers
+            )
+            assert response.status_code == 200, response.text
+            created.append(response.json())
+
+        seqs = [o["order_seq"] for o in created]
+        assert [b - a for a, b in zip(seqs, seqs[1:])] == [1, 1]
+        numbers = [o["order_number"] for o in created]
+        assert len(set(numbers)) == 3
+        assert numbers == sorted(numbers), "Zero-padded numbers should sort like their sequence"
+
+        # No other order carries the new numbers
+        orders = requests.get(f"{BASE_URL}/api/pg/purchase-orders", headers=pm_headers).json()
+        for number in numbers:
+            assert sum(1 for o in orders if o["order_number"] == number) == 1
@@ -0,0 +1,83 @@
+"""
+Purchase Order Keyset Pagination Tests
+Tests for the opt-in cursor/limit mode of GET /api/pg/purchase-orders
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    """Get procurement manager authorization headers"""
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=PROCUREMENT_MANAGER)
+    assert response.status_code == 200, f"PM login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestLegacyListing:
+    """Without cursor/limit the endpoint keeps returning a plain list"""
+
+    def test_list_mode_unchanged(self, pm_headers):
+        response = requests.get(f"{BASE_URL}/api/pg/purchase-orders", headers=pm_headers)
+        assert response.status_code == 200
+        assert isinstance(response.json(), list)
+
+
+class TestKeysetPagination:
+    """Cursor mode returns pages ordered by (created_at, id) desc"""
+
+    def test_first_page_shape(self, pm_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/purchase-orders",
+            params={"limit": 2},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert "items" in data
+        assert "next_cursor" in data
+        assert len(data["items"]) <= 2
+        if data["items"]:
+            assert "items" in data["items"][0], "Order items should still be embedded"
+
+    def test_pages_do_not_overlap(self, pm_headers):
+        full = requests.get(f"{BASE_URL}/api/pg/purchase-orders", headers=pm_headers).json()
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = requests.get(f"{BASE_URL}/api/pg/purchase-orders", params=params, headers=pm_headers)
+            assert response.status_code == 200
+            data = response.json()
+            seen.extend(order["id"] for order in data["items"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+
+        assert len(seen) == len(set(seen)), "Pages must not repeat orders"
+        assert set(seen) == {order["id"] for order in full}
+
+    def test_invalid_cursor_rejected(self, pm_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/purchase-orders",
+            params={"cursor": "not-a-cursor"},
+            headers=pm_headers
+        )
+        assert response.status_code == 400
+
+    def test_limit_bounds(self, pm_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/purchase-orders",
+            params={"limit": 0},
+            headers=pm_headers
+        )
+        assert response.status_code == 422
@@ -0,0 +1,105 @@
+"""
+Planned Quantity Deduction Tests
+POST /api/pg/quantity/deduct/batch - every line of an order in one locked pass, FIFO by expected date
+POST /api/pg/quantity/deduct - single line through the same allocation
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    """Get procurement manager authorization headers"""
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=PROCUREMENT_MANAGER)
+    assert response.status_code == 200, f"PM login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def project_id(pm_headers):
+    response = requests.get(f"{BASE_URL}/api/pg/projects", headers=pm_headers)
+    assert response.status_code == 200
+    data = response.json()
+    projects = data if isinstance(data, list) else data.get("projects", [])
+    if not projects:
+        pytest.skip("No projects available")
+    return projects[0]["id"]
+
+
+@pytest.fixture
+def planned_lines(pm_headers, project_id):
+    """A catalog item planned three times: overdue, overdue for longer and undated"""
+    response = requests.post(
+        f"{BASE_URL}/api/pg/price-catalog/quick-add",
+        json={"name": f"خصم خطة {uuid.uuid4().hex[:8]}", "unit": "قطعة", "price": 5},
+        headers=pm_headers
+    )
+    assert response.status_code == 200, response.text
+    item = response.json()["item"]
+
+    lines = [
+        {"catalog_item_id": item["id"], "project_id": project_id, "planned_quantity": 10, "expected_order_date": "2026-05-01"},
+        {"catalog_item_id": item["id"], "project_id": project_id, "planned_quantity": 5, "expected_order_date": "2026-02-01"},
+        {"catalog_item_id": item["id"], "project_id": project_id, "planned_quantity": 7},
+    ]
+    response = requests.post(f"{BASE_URL}/api/pg/quantity/planned/bulk", json={"items": lines}, headers=pm_headers)
+    assert response.json()["created"] == 3, response.text
+    yield item
+
+    response = requests.get(
+        f"{BASE_URL}/api/pg/quantity/planned", params={"catalog_item_id": item["id"]}, headers=pm_headers
+    )
+    for planned in response.json()["items"]:
+        requests.delete(f"{BASE_URL}/api/pg/quantity/planned/{planned['id']}", headers=pm_headers)
+    requests.delete(f"{BASE_URL}/api/pg/price-catalog/{item['id']}", headers=pm_headers)
+
+
+def plan_by_date(headers, catalog_item_id):
+    response = requests.get(
+        f"{BASE_URL}/api/pg/quantity/planned", params={"catalog_item_id": catalog_item_id}, headers=headers
+    )
+    return {(i["expected_order_date"] or "")[:10]: i for i in response.json()["items"]}
+
+
+class TestBatchDeduction:
+    """Lines of the same item are merged and served earliest date first"""
+
+    def test_fifo_allocation(self, pm_headers, project_id, planned_lines):
+        response = requests.post(
+            f"{BASE_URL}/api/pg/quantity/deduct/batch",
+            json={"lines": [
+                {"catalog_item_id": planned_lines["id"], "project_id": project_id, "quantity": 8},
+                {"catalog_item_id": str(uuid.uuid4()), "project_id": project_id, "quantity": 3},
+                {"catalog_item_id": planned_lines["id"], "project_id": project_id, "quantity": 4},
+            ]},
+            headers=pm_headers
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["deducted"] == 12
+        planned, unknown = data["lines"]
+        assert (planned["requested"], planned["deducted"], planned["planned_lines"]) == (12, 12, 3)
+        assert (unknown["deducted"], unknown["remaining_to_deduct"], unknown["planned_lines"]) == (0, 3, 0)
+
+        plan = plan_by_date(pm_headers, planned_lines["id"])
+        assert (plan["2026-02-01"]["remaining_quantity"], plan["2026-02-01"]["status"]) == (0, "fully_ordered")
+        assert (plan["2026-05-01"]["remaining_quantity"], plan["2026-05-01"]["status"]) == (3, "overdue")
+        assert (plan[""]["remaining_quantity"], plan[""]["status"]) == (7, "planned")
+
+    def test_single_deduction_beyond_plan(self, pm_headers, project_id, planned_lines):
+        response = requests.post(
+            f"{BASE_URL}/api/pg/quantity/deduct",
+            json={"catalog_item_id": planned_lines["id"], "project_id": project_id, "quantity_to_deduct": 30},
+            headers=pm_headers
+        )
+        assert response.status_code == 200, response.text
+        assert (response.json()["deducted"], response.json()["remaining_to_deduct"]) == (22, 8)
+        plan = plan_by_date(pm_headers, planned_lines["id"])
+        assert all(i["remaining_quantity"] == 0 and i["ordered_quantity"] == i["planned_quantity"] for i in plan.values())
@@ -0,0 +1,137 @@
+"""
+Planned Quantity Bulk Create and Import Tests
+POST /api/pg/quantity/planned/bulk - prefetched lookups and a single batched insert
+POST /api/pg/quantity/planned/import - lookup maps with Arabic-normalized keys
+"""
+import pytest
+import requests
+import io
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    """Get procurement manager authorization headers"""
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=PROCUREMENT_MANAGER)
+    assert response.status_code == 200, f"PM login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def project_id(pm_headers):
+    response = requests.get(f"{BASE_URL}/api/pg/projects", headers=pm_headers)
+    assert response.status_code == 200
+    data = response.json()
+    projects = data if isinstance(data, list) else data.get("projects", [])
+    if not projects:
+        pytest.skip("No projects available")
+    return projects[0]["id"]
+
+
+@pytest.fixture(scope="module")
+def catalog_item(pm_headers):
+    """A fresh catalog item with a searchable name"""
+    name = f"أرضيات جملة {uuid.uuid4().hex[:8]}"
+    response = requests.post(
+        f"{BASE_URL}/api/pg/price-catalog/quick-add",
+        json={"name": name, "unit": "كيس", "price": 20, "supplier_name": "مورد الجملة"},
+        headers=pm_headers
+    )
+    assert response.status_code == 200, response.text
+    item = response.json()["item"]
+    yield item
+    requests.delete(f"{BASE_URL}/api/pg/price-catalog/{item['id']}", headers=pm_headers)
+
+
+class TestBulkCreate:
+    """Valid lines are inserted together, invalid ones reported by position"""
+
+    def test_bulk_create(self, pm_headers, project_id, catalog_item):
+        lines = [
+            {"catalog_item_id": catalog_item["id"], "project_id": project_id, "planned_quantity": 10,
+             "expected_order_date": "2026-03-01"},
+            {"catalog_item_id": str(uuid.uuid4()), "project_id": project_id, "planned_quantity": 5},
+            {"catalog_item_id": catalog_item["id"], "project_id": str(uuid.uuid4()), "planned_quantity": 5},
+            {"catalog_item_id": catalog_item["id"], "project_id": project_id, "planned_quantity": 7,
+             "expected_order_date": "2026-04-01T00:00:00Z", "priority": 1},
+        ]
+        response = requests.post(
+            f"{BASE_URL}/api/pg/quantity/planned/bulk", json={"items": lines}, headers=pm_headers
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["created"] == 2
+        assert len(data["errors"]) == 2
+        assert data["errors"][0].startswith("العنصر 2")
+        assert data["errors"][1].startswith("العنصر 3")
+
+        response = requests.get(
+            f"{BASE_URL}/api/pg/quantity/planned",
+            params={"search": catalog_item["name"], "page_size": 10},
+            headers=pm_headers
+        )
+        items = response.json()["items"]
+        assert sorted(i["planned_quantity"] for i in items) == [7, 10]
+        assert all(i["remaining_quantity"] == i["planned_quantity"] for i in items)
+        assert all(i["unit"] == "كيس" and i["project_id"] == project_id for i in items)
+
+        for item in items:
+            requests.delete(f"{BASE_URL}/api/pg/quantity/planned/{item['id']}", headers=pm_headers)
+
+
+@pytest.fixture(scope="module")
+def project(pm_headers, project_id):
+    response = requests.get(f"{BASE_URL}/api/pg/projects/{project_id}", headers=pm_headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def workbook_bytes(rows):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["كود الصنف", "اسم الصنف", "كود التصنيف", "تصنيف الميزانية", "اسم المشروع",
+                  "الكمية", "التاريخ", "الأولوية", "ملاحظات"])
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+class TestExcelImport:
+    """Rows resolve through normalized names; unknown items are reported by row"""
+
+    def test_import_matches_spelling_variants(self, pm_headers, project, catalog_item):
+        variant = catalog_item["name"].replace("أ", "ا")
+        content = workbook_bytes([
+            [variant, "", "", "", f"  {project['name'].upper()} ", 12, "2026-06-01", 1, None],
+            [f"صنف غير موجود {uuid.uuid4().hex[:6]}", "", "", "", project["name"], 3, None, None, None],
+            [catalog_item["name"], "", "", "", project["name"], 0, None, None, None],
+        ])
+        response = requests.post(
+            f"{BASE_URL}/api/pg/quantity/planned/import",
+            files={"file": ("plan.xlsx", content, "application/octet-stream")},
+            headers=pm_headers
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["created"] == 1
+        assert len(data["errors"]) == 1 and data["errors"][0].startswith("صف 3")
+
+        response = requests.get(
+            f"{BASE_URL}/api/pg/quantity/planned",
+            params={"search": catalog_item["name"], "page_size": 10},
+            headers=pm_headers
+        )
+        items = response.json()["items"]
+        assert [(i["planned_quantity"], i["priority"], i["project_id"]) for i in items] == [(12, 1, project["id"])]
+
+        for item in items:
+            requests.delete(f"{BASE_URL}/api/pg/quantity/planned/{item['id']}", headers=pm_headers)
@@ -0,0 +1,96 @@
+"""
+Purchase Order PDF Tests
+Tests for GET /api/pg/purchase-orders/{id}/pdf and
+POST /api/pg/purchase-orders/pdf/bulk
+"""
+import io
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+
+BULK_PDF_MAX_ORDERS = 200
+
+
+def login(credentials):
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=credentials)
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    return login(PROCUREMENT_MANAGER)
+
+
+@pytest.fixture(scope="module")
+def order_ids(pm_headers):
+    orders = requests.get(f"{BASE_URL}/api/pg/purchase-orders", headers=pm_headers).json()
+    if len(orders) < 2:
+        pytest.skip("Need at least two purchase orders")
+    return [order["id"] for order in orders[:2]]
+
+
+def page_count(content: bytes) -> int:
+    pypdf = pytest.importorskip("pypdf")
+    return len(pypdf.PdfReader(io.BytesIO(content)).pages)
+
+
+class TestOrderPdf:
+    """Single order rendering"""
+
+    def test_order_pdf(self, pm_headers, order_ids):
+        response = requests.get(f"{BASE_URL}/api/pg/purchase-orders/{order_ids[0]}/pdf", headers=pm_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/pdf"
+        assert response.content.startswith(b"%PDF")
+
+    def test_reprint_served_unchanged(self, pm_headers, order_ids):
+        """Reprints of an unchanged order come from the cache byte for byte"""
+        first = requests.get(f"{BASE_URL}/api/pg/purchase-orders/{order_ids[0]}/pdf", headers=pm_headers)
+        second = requests.get(f"{BASE_URL}/api/pg/purchase-orders/{order_ids[0]}/pdf", headers=pm_headers)
+        assert first.content == second.content
+
+    def test_missing_order(self, pm_headers):
+        response = requests.get(f"{BASE_URL}/api/pg/purchase-orders/missing-order/pdf", headers=pm_headers)
+        assert response.status_code == 404
+
+
+class TestBulkPdf:
+    """Merged rendering of several orders"""
+
+    def test_bulk_pdf_is_one_document(self, pm_headers, order_ids):
+        singles = [
+            requests.get(f"{BASE_URL}/api/pg/purchase-orders/{order_id}/pdf", headers=pm_headers).content
+            for order_id in order_ids
+        ]
+        response = requests.post(
+            f"{BASE_URL}/api/pg/purchase-orders/pdf/bulk",
+            json={"order_ids": order_ids},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/pdf"
+        assert response.content.count(b"%PDF") == 1, "Orders should be merged into a single document"
+        assert page_count(response.content) == sum(page_count(single) for single in singles)
+
+    def test_bulk_limit(self, pm_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/pg/purchase-orders/pdf/bulk",
+            json={"order_ids": [f"order-{index}" for index in range(BULK_PDF_MAX_ORDERS + 1)]},
+            headers=pm_headers
+        )
+        assert response.status_code == 400
+
+    def test_bulk_empty(self, pm_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/pg/purchase-orders/pdf/bulk",
+            json={"order_ids": []},
+            headers=pm_headers
+        )
+        assert response.status_code == 400
@@ -0,0 +1,128 @@
+"""
+Quantity Report Aggregation Tests
+GET /api/pg/quantity/reports/summary and /dashboard/stats - totals computed in SQL
+GET /api/pg/quantity/alerts - overdue, due-soon and high-priority lists from one query
+GET /api/pg/quantity/by-role - latest items by cursor, summary over the whole plan
+PUT /api/pg/quantity/planned/{id} - overdue / due-soon status set on write
+"""
+import pytest
+import requests
+import os
+from datetime import datetime, timedelta
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    """Get procurement manager authorization headers"""
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=PROCUREMENT_MANAGER)
+    assert response.status_code == 200, f"PM login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def all_by_role_items(headers, limit=2):
+    """Walk every by-role page"""
+    items, cursor = [], None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = requests.get(f"{BASE_URL}/api/pg/quantity/by-role", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert len(data["items"]) <= limit
+        items.extend(data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            return items, data["summary"]
+
+
+class TestQuantityAggregates:
+    """Aggregated figures agree with the detail rows"""
+
+    def test_summary_is_consistent(self, pm_headers):
+        response = requests.get(f"{BASE_URL}/api/pg/quantity/reports/summary", headers=pm_headers)
+        assert response.status_code == 200, response.text
+        data = response.json()
+        summary = data["summary"]
+
+        assert sum(data["status_breakdown"].values()) == summary["total_items"]
+        assert sum(p["total_items"] for p in data["by_project"]) == summary["total_items"]
+        assert sum(p["planned_qty"] for p in data["by_project"]) == pytest.approx(summary["total_planned_qty"])
+        assert len(data["overdue_items"]) == min(summary["overdue_count"], 10)
+        dates = [i["expected_date"] for i in data["overdue_items"]]
+        assert dates == sorted(dates)
+
+        stats = requests.get(f"{BASE_URL}/api/pg/quantity/dashboard/stats", headers=pm_headers).json()
+        assert stats["total_planned_items"] == summary["total_items"]
+        assert stats["overdue_items"] == summary["overdue_count"]
+
+    def test_by_role_pages_cover_the_summary(self, pm_headers):
+        items, summary = all_by_role_items(pm_headers)
+        assert len(items) == summary["total_items"]
+        assert len({i["id"] for i in items}) == len(items)
+        assert sum(i["remaining_quantity"] for i in items) == pytest.approx(summary["total_remaining"])
+        assert sum(1 for i in items if i["is_overdue"]) == summary["overdue_count"]
+
+
+class TestSupervisorAlerts:
+    """The three alert lists are capped at 20 but their counts are exact"""
+
+    def test_alert_lists(self, pm_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/quantity/alerts", params={"days_threshold": 10}, headers=pm_headers
+        )
+        assert response.status_code == 200, response.text
+        alerts = response.json()
+
+        for name in ("overdue", "due_soon", "high_priority"):
+            assert len(alerts[name]["items"]) == min(alerts[name]["count"], 20)
+        for name in ("overdue", "due_soon"):
+            dates = [i["expected_date"] for i in alerts[name]["items"]]
+            assert dates == sorted(dates)
+        assert all(i["priority"] == 1 and i["remaining_qty"] > 0 for i in alerts["high_priority"]["items"])
+
+        summary = requests.get(f"{BASE_URL}/api/pg/quantity/reports/summary", headers=pm_headers).json()["summary"]
+        assert alerts["overdue"]["count"] == summary["overdue_count"]
+        assert alerts["due_soon"]["count"] == summary["due_soon_count"]
+
+
+class TestScheduleStatus:
+    """Lines are marked overdue / due soon as they are written"""
+
+    def test_status_follows_expected_date(self, pm_headers):
+        projects = requests.get(f"{BASE_URL}/api/pg/projects", headers=pm_headers).json()
+        projects = projects if isinstance(projects, list) else projects.get("projects", [])
+        catalog = requests.get(f"{BASE_URL}/api/pg/quantity/catalog-items", headers=pm_headers).json()["items"]
+        if not projects or not catalog:
+            pytest.skip("No project or catalog item available")
+
+        soon = (datetime.utcnow() + timedelta(days=3)).strftime("%Y-%m-%d")
+        response = requests.post(
+            f"{BASE_URL}/api/pg/quantity/planned",
+            json={"catalog_item_id": catalog[0]["id"], "project_id": projects[0]["id"],
+                  "planned_quantity": 4, "expected_order_date": soon},
+            headers=pm_headers
+        )
+        assert response.status_code == 200, response.text
+        item_id = response.json()["id"]
+
+        def status_after(update):
+            response = requests.put(f"{BASE_URL}/api/pg/quantity/planned/{item_id}", json=update, headers=pm_headers)
+            assert response.status_code == 200, response.text
+            items = requests.get(
+                f"{BASE_URL}/api/pg/quantity/planned", params={"catalog_item_id": catalog[0]["id"], "page_size": 500},
+                headers=pm_headers
+            ).json()["items"]
+            return next(i["status"] for i in items if i["id"] == item_id)
+
+        try:
+            assert status_after({"notes": "x"}) == "due_soon"
+            assert status_after({"expected_order_date": "2020-01-01"}) == "overdue"
+            assert status_after({"expected_order_date": "2099-01-01"}) == "planned"
+        finally:
+            requests.delete(f"{BASE_URL}/api/pg/quantity/planned/{item_id}", headers=pm_headers)
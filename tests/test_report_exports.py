@@ -0,0 +1,111 @@
+"""
+Report Export Tests
+Every Excel export and import template is built by the shared write-only
+export engine in the worker pool
+"""
+import pytest
+import requests
+import os
+import io
+import time
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+EXPORTS = [
+    "/api/pg/price-catalog/export/excel",
+    "/api/pg/reports/budget/export",
+    "/api/pg/reports/advanced/price-variance/export",
+    "/api/pg/reports/advanced/summary/export",
+    "/api/pg/reports/advanced/approval-analytics/export",
+    "/api/pg/reports/advanced/supplier-performance/export",
+    "/api/pg/quantity/planned/export",
+    "/api/pg/quantity/reports/export",
+    "/api/pg/suppliers/performance/export",
+    "/api/pg/price-catalog/template",
+    "/api/pg/quantity/planned/template",
+]
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    """Get procurement manager authorization headers"""
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=PROCUREMENT_MANAGER)
+    assert response.status_code == 200, f"PM login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestExcelExports:
+    """Each export returns a readable right-to-left workbook"""
+
+    @pytest.mark.parametrize("path", EXPORTS)
+    def test_export_opens(self, pm_headers, path):
+        response = requests.get(f"{BASE_URL}{path}", headers=pm_headers)
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"] == XLSX_MEDIA_TYPE
+        assert ".xlsx" in response.headers["content-disposition"]
+
+        openpyxl = pytest.importorskip("openpyxl")
+        workbook = openpyxl.load_workbook(io.BytesIO(response.content))
+        sheet = workbook.active
+        assert sheet.sheet_view.rightToLeft is True
+        assert sheet.max_row >= 1
+
+
+class TestTemplateRoundTrip:
+    """Templates parse back through the worker pool on import"""
+
+    def test_planned_template_imports_nothing(self, pm_headers):
+        template = requests.get(f"{BASE_URL}/api/pg/quantity/planned/template", headers=pm_headers)
+        assert template.status_code == 200
+
+        response = requests.post(
+            f"{BASE_URL}/api/pg/quantity/planned/import",
+            files={"file": ("template.xlsx", template.content, XLSX_MEDIA_TYPE)},
+            headers=pm_headers
+        )
+        assert response.status_code == 200, response.text
+        assert response.json()["created"] == 0
+
+
+class TestPlannedTemplateCache:
+    """The planned template is a cached file per data version, revalidated by ETag"""
+
+    def template_etag(self, headers):
+        response = requests.get(f"{BASE_URL}/api/pg/quantity/planned/template", headers=headers)
+        assert response.status_code == 200, response.text
+        return response.headers["etag"]
+
+    def test_not_modified(self, pm_headers):
+        etag = self.template_etag(pm_headers)
+        response = requests.get(
+            f"{BASE_URL}/api/pg/quantity/planned/template",
+            headers={**pm_headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+    def test_rebuilt_when_catalog_changes(self, pm_headers):
+        etag = self.template_etag(pm_headers)
+        response = requests.post(
+            f"{BASE_URL}/api/pg/price-catalog/quick-add",
+            json={"name": f"نموذج مخزن {uuid.uuid4().hex[:8]}", "unit": "قطعة", "price": 3},
+            headers=pm_headers
+        )
+        assert response.status_code == 200, response.text
+        item = response.json()["item"]
+        try:
+            # The old file is served while the new version builds in the background
+            for _ in range(20):
+                new_etag = self.template_etag(pm_headers)
+                if new_etag != etag:
+                    break
+                time.sleep(0.5)
+            assert new_etag != etag
+        finally:
+            requests.delete(f"{BASE_URL}/api/pg/price-catalog/{item['id']}", headers=pm_headers)
@@ -0,0 +1,84 @@
+"""
+Material Request Listing Tests
+Tests for cursor pagination of GET /api/pg/requests and /api/pg/requests/approved
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+ENGINEER = {"email": "engineer1@test.com", "password": "123456"}
+
+
+def login(credentials):
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=credentials)
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    return login(PROCUREMENT_MANAGER)
+
+
+@pytest.fixture(scope="module")
+def eng_headers():
+    return login(ENGINEER)
+
+
+def collect_pages(url, headers, limit=2):
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = requests.get(url, params=params, headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["items"]) <= limit
+        seen.extend(req["id"] for req in data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            return seen
+
+
+class TestRequestListing:
+    """GET /api/pg/requests"""
+
+    def test_list_mode_unchanged(self, eng_headers):
+        response = requests.get(f"{BASE_URL}/api/pg/requests", headers=eng_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert isinstance(data, list)
+        if data:
+            assert "items" in data[0]
+
+    def test_pages_cover_full_list(self, eng_headers):
+        full = requests.get(f"{BASE_URL}/api/pg/requests", headers=eng_headers).json()
+        seen = collect_pages(f"{BASE_URL}/api/pg/requests", eng_headers)
+        assert len(seen) == len(set(seen)), "Pages must not repeat requests"
+        assert set(seen) == {req["id"] for req in full}
+
+
+class TestApprovedQueue:
+    """GET /api/pg/requests/approved"""
+
+    def test_approved_route_reachable(self, pm_headers):
+        response = requests.get(f"{BASE_URL}/api/pg/requests/approved", headers=pm_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert isinstance(data, list)
+        assert all(req["status"] in ("approved_by_engineer", "partially_ordered") for req in data)
+
+    def test_approved_pagination(self, pm_headers):
+        full = requests.get(f"{BASE_URL}/api/pg/requests/approved", headers=pm_headers).json()
+        seen = collect_pages(f"{BASE_URL}/api/pg/requests/approved", pm_headers)
+        assert set(seen) == {req["id"] for req in full}
+
+    def test_approved_requires_manager(self, eng_headers):
+        response = requests.get(f"{BASE_URL}/api/pg/requests/approved", headers=eng_headers)
+        assert response.status_code == 403
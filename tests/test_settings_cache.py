@@ -0,0 +1,108 @@
+"""
+System Settings Cache Tests
+Settings are served from a process-wide cache that writers invalidate:
+PUT /api/pg/settings/{key} - the new value applies to the next request
+POST /api/pg/purchase-orders - reads the approval limit from the cache
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+SUPERVISOR = {"email": "supervisor1@test.com", "password": "123456"}
+ENGINEER = {"email": "engineer1@test.com", "password": "123456"}
+
+ORDER_AMOUNT = 100
+
+
+def login(credentials):
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=credentials)
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    data = response.json()
+    return {"Authorization": f"Bearer {data['access_token']}"}, data["user"]
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    return login(PROCUREMENT_MANAGER)[0]
+
+
+@pytest.fixture(scope="module")
+def approval_limit(pm_headers):
+    """Yields a setter for approval_limit and restores the original value afterwards"""
+    response = requests.get(f"{BASE_URL}/api/pg/settings/approval_limit", headers=pm_headers)
+    if response.status_code == 404:
+        pytest.skip("approval_limit setting not initialized")
+    original = response.json()["value"]
+
+    def set_limit(value):
+        response = requests.put(
+            f"{BASE_URL}/api/pg/settings/approval_limit", json={"value": str(value)}, headers=pm_headers
+        )
+        assert response.status_code == 200, response.text
+
+    yield set_limit
+    set_limit(original)
+
+
+@pytest.fixture(scope="module")
+def approved_request(pm_headers):
+    """An engineer-approved request with two items of ORDER_AMOUNT each"""
+    supervisor_headers = login(SUPERVISOR)[0]
+    engineer_headers, engineer = login(ENGINEER)
+    projects = requests.get(f"{BASE_URL}/api/pg/projects", headers=pm_headers).json()
+    active = [p for p in projects if p.get("status", "active") == "active"]
+    if not active:
+        pytest.skip("No active project to create requests in")
+
+    response = requests.post(
+        f"{BASE_URL}/api/pg/requests",
+        json={
+            "items": [
+                {"name": f"TEST_settings item {index}", "quantity": 1, "unit": "قطعة", "estimated_price": ORDER_AMOUNT}
+                for index in range(2)
+            ],
+            "project_id": active[0]["id"],
+            "reason": "TEST_settings_cache",
+            "engineer_id": engineer["id"]
+        },
+        headers=supervisor_headers
+    )
+    assert response.status_code == 200, response.text
+    request_id = response.json()["id"]
+    response = requests.post(f"{BASE_URL}/api/pg/requests/{request_id}/approve", headers=engineer_headers)
+    assert response.status_code == 200, response.text
+    return request_id
+
+
+def create_order(pm_headers, request_id, item_index):
+    response = requests.post(
+        f"{BASE_URL}/api/pg/purchase-orders",
+        json={"request_id": request_id, "supplier_name": "TEST_settings_cache", "selected_items": [item_index]},
+        headers=pm_headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestApprovalLimit:
+    """A changed approval limit is used by the very next order"""
+
+    def test_setting_read_back(self, pm_headers, approval_limit):
+        approval_limit(12345)
+        response = requests.get(f"{BASE_URL}/api/pg/settings/approval_limit", headers=pm_headers)
+        assert response.json()["value"] == "12345"
+
+    def test_limit_change_applies_to_next_order(self, pm_headers, approval_limit, approved_request):
+        approval_limit(ORDER_AMOUNT / 2)
+        order = create_order(pm_headers, approved_request, 0)
+        assert order["needs_gm_approval"] is True
+        assert order["status"] == "pending_gm_approval"
+
+        approval_limit(ORDER_AMOUNT * 10)
+        order = create_order(pm_headers, approved_request, 1)
+        assert order["needs_gm_approval"] is False
+        assert order["status"] == "pending_approval"
@@ -0,0 +1,93 @@
+"""
+Sparse Fieldset Tests
+Tests for the `fields=` parameter of the order, request and planned-quantity listings
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    """Get procurement manager authorization headers"""
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=PROCUREMENT_MANAGER)
+    assert response.status_code == 200, f"PM login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestPurchaseOrderFields:
+    """GET /api/pg/purchase-orders?fields=..."""
+
+    def test_only_requested_fields_returned(self, pm_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/purchase-orders",
+            params={"fields": "order_number,status,total_amount"},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        for order in response.json():
+            assert set(order.keys()) == {"id", "order_number", "status", "total_amount"}
+
+    def test_fields_with_pagination(self, pm_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/purchase-orders",
+            params={"fields": "order_number,items", "limit": 2},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        for order in data["items"]:
+            assert set(order.keys()) == {"id", "order_number", "items"}
+            assert isinstance(order["items"], list)
+
+    def test_full_shape_without_fields(self, pm_headers):
+        response = requests.get(f"{BASE_URL}/api/pg/purchase-orders", headers=pm_headers)
+        assert response.status_code == 200
+        orders = response.json()
+        if not orders:
+            pytest.skip("No orders to test with")
+        assert "notes" in orders[0]
+        assert "items" in orders[0]
+
+    def test_unknown_field_rejected(self, pm_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/purchase-orders",
+            params={"fields": "order_number,password"},
+            headers=pm_headers
+        )
+        assert response.status_code == 400
+
+
+class TestRequestFields:
+    """GET /api/pg/requests?fields=..."""
+
+    def test_only_requested_fields_returned(self, pm_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/requests",
+            params={"fields": "request_number,status"},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        for req in response.json():
+            assert set(req.keys()) == {"id", "request_number", "status"}
+
+
+class TestPlannedQuantityFields:
+    """GET /api/pg/quantity/planned?fields=..."""
+
+    def test_only_requested_fields_returned(self, pm_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/pg/quantity/planned",
+            params={"fields": "item_name,remaining_quantity"},
+            headers=pm_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert "total" in data
+        for item in data["items"]:
+            assert set(item.keys()) == {"id", "item_name", "remaining_quantity"}
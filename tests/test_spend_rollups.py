@@ -0,0 +1,92 @@
+"""
+Spend Rollup Tests
+Reports read order counts and amounts from the spend rollups:
+GET /api/pg/reports/cost-savings, /reports/advanced/summary
+POST /api/pg/sysadmin/spend-rollups/rebuild - recompute from the orders
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+PROCUREMENT_MANAGER = {"email": "notofall@gmail.com", "password": "123456"}
+SYSTEM_ADMIN = {"email": "admin@system.com", "password": "123456"}
+
+SPENDING_STATUSES = ["approved", "printed", "shipped", "delivered"]
+
+
+def login(credentials):
+    response = requests.post(f"{BASE_URL}/api/pg/auth/login", json=credentials)
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def pm_headers():
+    return login(PROCUREMENT_MANAGER)
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    return login(SYSTEM_ADMIN)
+
+
+def summary(headers, **params):
+    response = requests.get(f"{BASE_URL}/api/pg/reports/advanced/summary", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestRollupReports:
+    """The reports agree with each other and with a rebuild"""
+
+    def test_cost_savings_matches_summary(self, pm_headers):
+        data = summary(pm_headers)
+        response = requests.get(f"{BASE_URL}/api/pg/reports/cost-savings", headers=pm_headers)
+        assert response.status_code == 200
+        savings = response.json()
+
+        assert savings["total_orders"] == sum(data["orders_by_status"].get(s, 0) for s in SPENDING_STATUSES)
+        assert savings["total_amount"] == pytest.approx(data["summary"]["total_spending"])
+        assert sum(p["total_amount"] for p in savings["by_supplier"]) == pytest.approx(savings["total_amount"])
+
+    def test_date_range_splits_add_up(self, pm_headers):
+        """Partial months at the ends of a range are summed from the orders"""
+        whole = summary(pm_headers, start_date="2020-01-01", end_date="2030-12-31")["summary"]["total_orders"]
+        before = summary(pm_headers, start_date="2020-01-01", end_date="2026-03-15T12:00:00")["summary"]["total_orders"]
+        after = summary(pm_headers, start_date="2026-03-15T12:00:00.000001", end_date="2030-12-31")["summary"]["total_orders"]
+        assert before + after == whole
+
+    def test_rebuild_keeps_reports(self, pm_headers, admin_headers):
+        before = summary(pm_headers)
+        response = requests.post(f"{BASE_URL}/api/pg/sysadmin/spend-rollups/rebuild", headers=admin_headers)
+        assert response.status_code == 200, response.text
+        after = summary(pm_headers)
+        assert after["orders_by_status"] == before["orders_by_status"]
+        assert after["summary"]["total_spending"] == pytest.approx(before["summary"]["total_spending"])
+
+    def test_rebuild_requires_system_admin(self, pm_headers):
+        response = requests.post(f"{BASE_URL}/api/pg/sysadmin/spend-rollups/rebuild", headers=pm_headers)
+        assert response.status_code == 403
+
+
+class TestRollupUpdates:
+    """Order transitions move their count and amount in the same request"""
+
+    def test_print_moves_order(self, pm_headers):
+        orders = requests.get(f"{BASE_URL}/api/pg/purchase-orders", headers=pm_headers).json()
+        approved = [o for o in orders if o["status"] == "approved"]
+        if not approved:
+            pytest.skip("No approved orders to print")
+        order = approved[0]
+
+        before = summary(pm_headers)
+        response = requests.post(f"{BASE_URL}/api/pg/purchase-orders/{order['id']}/print", headers=pm_headers)
+        assert response.status_code == 200, response.text
+        after = summary(pm_headers)
+
+        assert after["orders_by_status"].get("approved", 0) == before["orders_by_status"]["approved"] - 1
+        assert after["orders_by_status"]["printed"] == before["orders_by_status"].get("printed", 0) + 1
+        assert after["summary"]["total_spending"] == pytest.approx(before["summary"]["total_spending"])